@@ -3,52 +3,81 @@
 # and quiz interactions (submission, fetching questions/logs, recording attempts, creation).
 # Data is often fetched from or updated in the database based on user actions and IDs.
 import datetime
+import os
+import socket
+from functools import lru_cache
 from utils import is_valid_id
-from dbModels import User, db, Course, Question, UserQuiz
+from dbModels import User, db, Course, Question, UserQuiz, describe_db_connection
 from init import app, DBcreated
 import pandas as pd
 from flask import make_response,jsonify, request
-from repository import add_learner_from_user, add_teacher_from_user, create_Course, update_position, login,signup,teacher_course,teacher_course_unassigned,assign_teacher_course,unassign_teacher_course, learner_course_enrolled,generate_data,learner_course_unenrolled,enrolled_learner_data,enrolled_learners_by_course,calculate_all_module_centroids,add_enroll,update_by_quiz,learner_polyline_enrolled,get_suitable_position,change_resource_position,update_position_resource,update_summary_grade, quiz_adder_from_json,ta_course,ta_course_teached,ta_course_unteached, user_enrolled_courses, user_recom_courses
+from repository import add_learner_from_user, add_teacher_from_user, create_Course, update_position, login,signup,teacher_course,teacher_course_unassigned,assign_teacher_course,unassign_teacher_course, learner_course_enrolled,generate_data,learner_course_unenrolled,enrolled_learner_data,enrolled_learners_by_course,calculate_all_module_centroids,add_enroll,update_by_quiz,learner_polyline_enrolled,get_suitable_position,get_suitable_positions,change_resource_position,update_summary_grade,update_summary_grades, quiz_adder_from_json,ta_course,ta_course_teached,ta_course_unteached, user_enrolled_courses, user_recom_courses
 from datetime import datetime, timedelta,timezone
 from flask import Flask, Blueprint, request, jsonify
 import json
 import numpy as np
-from dbModels import db, Enroll, SummaryCoordinates, SummaryCluster
-from learning_summary_core import summary_to_coordinates, cluster_summaries, extract_keywords_for_text
-from topic_embeddings_loader import get_topic_embeddings
+from dbModels import db, Enroll, SummaryCoordinates, Topic
+from learning_summary_core import summary_keywords_and_coordinates
+from topic_embeddings_loader import get_summary_encoder, get_summary_topic_embeddings
 import modelsRoutes # to expose routes
-from routes_summary import summary_bp
+from routes_summary import summary_bp, recompute_topic_clusters
 from cli_backfill import backfill_topics
+from cli_models import warm_models
+from cli_schema import schema_upgrade, pack_vectors, accessible_bitmaps
+from cli_jobs import job_worker, spawn_job_workers
+from cli_parity import inference_parity, summary_encoder_report
+from cli_startup import startup_report
+from cli_bench import bench
+from cli_snapshot import snapshot_build
+from cli_trajectory import trajectory_backfill
+from trajectory_log import position_at, record_event, trajectory
+from watch_buffer import flush as flush_watch_events, watch_buffer_stats, watch_resource
+from model_registry import warm_up, model_stats
+from embedding_cache import get_embedding_cache
+from inference_service import inference_stats
+from job_queue import enqueue, job_handler, get_job_queue
+from polyline_kernel import beta_scale
+from radial_projection import project
+from model_library import rad_plot_axes
 
 # Register blueprint(s)
 app.register_blueprint(summary_bp)
 
 # Register CLI command(s)
 app.cli.add_command(backfill_topics)
+app.cli.add_command(warm_models)
+app.cli.add_command(schema_upgrade)
+app.cli.add_command(pack_vectors)
+app.cli.add_command(accessible_bitmaps)
+app.cli.add_command(job_worker)
+app.cli.add_command(inference_parity)
+app.cli.add_command(summary_encoder_report)
+app.cli.add_command(startup_report)
+app.cli.add_command(bench)
+app.cli.add_command(snapshot_build)
+app.cli.add_command(trajectory_backfill)
 
-# Read data from Excel file
-excel_file = 'DM_Resource_Plot.xlsx'
-df = pd.read_excel(excel_file)
-excel_file = 'DM_learner_plot.xlsx'
-df_learner = pd.read_excel(excel_file)
+# Optionally load every transformer model before serving the first request
+if os.environ.get("NAVIGATED_WARM_MODELS") == "1":
+    warm_up()
 
+# The demo Excel sheets are read on first request, not at import
+@lru_cache(maxsize=None)
+def excel_records(excel_file, columns):
+    return pd.read_excel(excel_file)[list(columns)].to_dict(orient='records')
 
-# Assuming your Excel file has columns 'x', 'y', and 'video_url'
-scatterplot_data = df[['index', 'name', 'x', 'y', 'video_url', 'module','module_id','submodule_id']].to_dict(orient='records')
 
-# Convert the scatterplot_data into a DataFrame
-df_scatter = pd.DataFrame(scatterplot_data)
+def scatterplot_data():
+    # Assuming your Excel file has columns 'x', 'y', and 'video_url'
+    return excel_records('DM_Resource_Plot.xlsx', ('index', 'name', 'x', 'y', 'video_url', 'module', 'module_id', 'submodule_id'))
 
-# Group by 'module_id' and calculate the mean of 'x' and 'y'
-module_data_df = df_scatter.groupby('module_id').agg({'x': 'mean', 'y': 'mean','module': 'first' }).reset_index()
 
-# Convert the result to a list of dictionaries with 'module_id', 'x', and 'y'
-module_data = module_data_df.to_dict(orient='records')
-topic_data_df=pd.read_excel('DM/DM_topics.xlsx')
-topic_data=topic_data_df[['name','description']].to_dict(orient='records')
+def topic_data():
+    return excel_records('DM/DM_topics.xlsx', ('name', 'description'))
 
 
-learner_data = df_learner[['index', 'resource_name', 'x', 'y', 'description']].to_dict(orient='records')
+def learner_data():
+    return excel_records('DM_learner_plot.xlsx', ('index', 'resource_name', 'x', 'y', 'description'))
 
 if DBcreated:
     # print("creating the course")
@@ -68,11 +97,35 @@ def get_ids(user_id):
             'ta_id': user.ta_id,
         })
 
+@app.route('/health/models')
+def get_model_stats():
+    return jsonify(model_stats())
+
+@app.route('/health/embedding-cache')
+def get_embedding_cache_stats():
+    return jsonify(get_embedding_cache().stats())
+
+@app.route('/health/inference')
+def get_inference_stats():
+    return jsonify(inference_stats())
+
+@app.route('/health/watch-buffer')
+def get_watch_buffer_stats():
+    return jsonify(watch_buffer_stats())
+
+@app.route('/health/db')
+def get_db_connection():
+    return jsonify(describe_db_connection())
+
+@app.route('/health/jobs')
+def get_job_counts():
+    return jsonify(get_job_queue().counts())
+
 @app.route('/data')
 def get_data():
     # print(cursor, dir(cursor))
     # print(scatterplot_data)
-    return jsonify(scatterplot_data)
+    return jsonify(scatterplot_data())
 
 
 
@@ -87,12 +140,12 @@ def get_module_data(id):
 @app.route('/topicData')
 def get_topic_data():
     # print(topic_data)
-    return jsonify(topic_data)
+    return jsonify(topic_data())
 
 
 @app.route('/new_positions')
 def get_new_data():
-    return jsonify(learner_data)
+    return jsonify(learner_data())
 
 
 @app.route("/signup", methods=['POST'])
@@ -197,6 +250,24 @@ def get_ta_recom_course(id):
 def get_enrolled_polyline(id):
     return learner_polyline_enrolled(id)
 
+@app.route("/trajectory/<int:enroll_id>", methods=['GET'])
+def get_trajectory(enroll_id):
+    """
+    Full logged path of a learner, or with ?at=<ISO time> their position
+    then (&polyline=1 adds the polyline).
+    """
+    at = request.args.get("at")
+    if at is None:
+        return jsonify(trajectory(enroll_id)), 200
+    try:
+        at = datetime.fromisoformat(at)
+    except ValueError:
+        return jsonify({"error": "'at' must be an ISO 8601 time"}), 400
+    event = position_at(enroll_id, at, with_polyline=request.args.get("polyline") in ("1", "true"))
+    if event is None:
+        return jsonify({"error": "No trajectory events at or before 'at'"}), 404
+    return jsonify(event), 200
+
 @app.route("/submitsummary", methods=['POST'])
 def get_new_postion():
     data = request.get_json()
@@ -213,22 +284,153 @@ def get_new_learner_postion():
     pos = update_summary_grade(contributionId,grade)
     return jsonify(pos), 200
 
+# Upper bound on (contribution_id, grade) pairs per /grades/batch call
+GRADES_BATCH_MAX = 10000
+
+@app.route("/grades/batch", methods=['POST'])
+def change_summary_grades():
+    """
+    Body: {"grades": [{"contribution_id": 1, "grade": 0.8}, ...]}
+    Each learner is replayed once; returns the new position of every affected learner.
+    """
+    data = request.get_json(silent=True) or {}
+    raw = data.get("grades")
+    if not isinstance(raw, list) or not raw:
+        return jsonify({"error": "'grades' must be a non-empty list"}), 400
+    if len(raw) > GRADES_BATCH_MAX:
+        return jsonify({"error": f"At most {GRADES_BATCH_MAX} grades per call"}), 400
+
+    grades = []
+    for item in raw:
+        contribution_id = item.get("contribution_id") if isinstance(item, dict) else None
+        grade = item.get("grade") if isinstance(item, dict) else None
+        if not is_valid_id(contribution_id) or isinstance(grade, bool) or not isinstance(grade, (int, float)):
+            return jsonify({"error": "Each grade needs a 'contribution_id' and a numeric 'grade'"}), 400
+        grades.append((int(contribution_id), grade))
+
+    positions, missing = update_summary_grades(grades)
+    return jsonify({
+        "positions": [{"enroll_id": enroll_id, "x": x, "y": y} for enroll_id, (x, y) in positions.items()],
+        "missing_contribution_ids": missing,
+    }), 200
+
 @app.route("/watchResource", methods=['POST'])
 def get_updated_postion():
     data = request.get_json()
     enrollId = data["enroll_id"]
     resourceId = data["resource_id"]
-    pos = update_position_resource(enrollId,resourceId)
+    pos = watch_resource(enrollId,resourceId)
     return jsonify(pos), 200
 
+# Upper bound on events per /watchResource/batch call
+WATCH_BATCH_MAX = 10000
+
+@app.route("/watchResource/batch", methods=['POST'])
+def watch_resources():
+    """
+    Body: {"events": [{"enroll_id": 1, "resource_id": 2}, ...]}
+    Applied as one flush; returns the new position of every learner moved.
+    """
+    data = request.get_json(silent=True) or {}
+    raw = data.get("events")
+    if not isinstance(raw, list) or not raw:
+        return jsonify({"error": "'events' must be a non-empty list"}), 400
+    if len(raw) > WATCH_BATCH_MAX:
+        return jsonify({"error": f"At most {WATCH_BATCH_MAX} events per call"}), 400
+
+    events = []
+    for item in raw:
+        if not isinstance(item, dict) or not is_valid_id(item.get("enroll_id")) or not is_valid_id(item.get("resource_id")):
+            return jsonify({"error": "Each event needs an 'enroll_id' and a 'resource_id'"}), 400
+        events.append((int(item["enroll_id"]), int(item["resource_id"])))
+
+    positions, skipped, seconds = flush_watch_events(events)
+    return jsonify({
+        "positions": [{"enroll_id": enroll_id, "x": x, "y": y} for enroll_id, (x, y) in positions.items()],
+        "skipped": [{"enroll_id": e, "resource_id": r} for e, r in skipped],
+        "flush_ms": round(1000 * seconds, 2),
+    }), 200
+
 @app.route("/suitableResourcePosition", methods=['POST'])
 def suitable_postion():
+    """
+    {"pos", "resource_id"} -> [x, y] (beta sweep 0..49).
+    Optional: "continuous": true searches the exact best beta up to "max_beta"
+    and returns {"position", "beta", "distance"}; "resources": [{"resource_id", "pos"}, ...]
+    places a batch and returns {"results": [...]}.
+    """
     data = request.get_json()
+    continuous = bool(data.get("continuous", False))
+    max_beta = data.get("max_beta")
+    if max_beta is not None and (not isinstance(max_beta, (int, float)) or max_beta < 0):
+        return jsonify({"error": "'max_beta' must be a non-negative number"}), 400
+
+    if "resources" in data:
+        batch = data["resources"]
+        if not isinstance(batch, list) or not all(
+                isinstance(r, dict) and is_valid_id(r.get("resource_id")) and isinstance(r.get("pos"), list)
+                for r in batch):
+            return jsonify({"error": "'resources' must be a list of {resource_id, pos}"}), 400
+        return jsonify({"results": get_suitable_positions(batch, continuous=continuous, max_beta=max_beta)}), 200
+
     initial_pos = data["pos"]
     resourceId = data["resource_id"]
+    if continuous:
+        result = get_suitable_positions([{"resource_id": resourceId, "pos": initial_pos}],
+                                        continuous=True, max_beta=max_beta)[0]
+        return jsonify(result), (404 if "error" in result else 200)
     pos = get_suitable_position(initial_pos,resourceId)
     return jsonify(pos), 200
 
+# Upper bound on polylines per /project call
+PROJECT_MAX_POLYLINES = 100000
+
+@app.route("/project", methods=['POST'])
+def project_polylines():
+    """
+    Read-only: radial (x, y) of a batch of polylines on a course's map.
+    Body: {"course_id": 1, "polylines": [[...], ...], "beta": optional number or one per polyline}
+    """
+    data = request.get_json(silent=True) or {}
+    course_id = data.get("course_id")
+    if not is_valid_id(course_id):
+        return jsonify({"error": "Invalid or missing 'course_id'"}), 400
+    if Course.query.get(int(course_id)) is None:
+        return jsonify({"error": "Course not found"}), 404
+
+    raw = data.get("polylines")
+    if not isinstance(raw, list) or not raw:
+        return jsonify({"error": "'polylines' must be a non-empty list of polylines"}), 400
+    if len(raw) > PROJECT_MAX_POLYLINES:
+        return jsonify({"error": f"At most {PROJECT_MAX_POLYLINES} polylines per call"}), 400
+    try:
+        polylines = np.asarray(raw, dtype=np.float64)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Polylines must be lists of numbers of the same length"}), 400
+    num_topics = db.session.query(Topic.id).filter(Topic.course_id == int(course_id)).count()
+    if num_topics < 2:
+        return jsonify({"error": "The course needs at least two topics"}), 400
+    if polylines.ndim != 2 or polylines.shape[1] != num_topics:
+        return jsonify({"error": f"Each polyline needs one value per topic ({num_topics})"}), 400
+    if not np.isfinite(polylines).all():
+        return jsonify({"error": "Polylines must be finite"}), 400
+
+    beta = data.get("beta")
+    if beta is not None:
+        try:
+            beta = np.asarray(beta, dtype=np.float64)
+        except (TypeError, ValueError):
+            return jsonify({"error": "'beta' must be a number or a list of numbers"}), 400
+        if beta.ndim > 1 or (beta.ndim == 1 and len(beta) != len(polylines)):
+            return jsonify({"error": "'beta' must be a number or one number per polyline"}), 400
+        if not np.isfinite(beta).all():
+            return jsonify({"error": "'beta' must be finite"}), 400
+        polylines = beta_scale(polylines, beta)
+
+    tlen, theta = rad_plot_axes(num_topics, 1, 1)
+    coordinates = project(polylines, tlen, theta)
+    return jsonify({"course_id": int(course_id), "num_topics": num_topics, "coordinates": coordinates.tolist()}), 200
+
 @app.route("/changeResourcePosition", methods=['POST'])
 def change_postion():
     data = request.get_json()
@@ -327,11 +529,9 @@ def create_quiz():
         if not data:
             return jsonify({"error": "No data provided"}), 400
 
-        # Use the imported function to process and add the quiz
-        x, y = quiz_adder_from_json(data)
-
-        # Return the success message along with the coordinates in a JSON response
-        return jsonify({"message": "Quiz and questions added successfully!", "x": x, "y": y}), 201
+        # Question keywords/embeddings are computed by a background job
+        job_id = enqueue('create_quiz', data)
+        return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
 
 
     except Exception as e:
@@ -339,6 +539,27 @@ def create_quiz():
         print("Unexpected error in create_quiz:", e)
         return jsonify({"error": str(e)}), 500
 
+
+@job_handler('create_quiz')
+def create_quiz_job(payload, progress):
+    progress(0.1, "Mapping questions")
+    # Use the imported function to process and add the quiz
+    x, y = quiz_adder_from_json(payload)
+
+    # Return the success message along with the coordinates
+    return {"message": "Quiz and questions added successfully!", "x": float(x), "y": float(y)}, 201
+
+
+@app.route('/jobs/<string:job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """
+    Status, progress and (once finished) the result of a background job.
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job), 200
+
 @app.route('/enrolls', methods=['POST'])
 def create_enroll():
     data = request.get_json()
@@ -406,21 +627,23 @@ def submit_learning_summary():
         return jsonify({"error": "Invalid enroll_id"}), 400
 
     # ---- 1. Topic embeddings for this course ----
-    topic_embeddings = get_topic_embeddings(course_id)
+    encoder = get_summary_encoder(course_id)
+    topic_embeddings = get_summary_topic_embeddings(course_id, encoder)
     if not topic_embeddings:
         return jsonify({"error": "No topics/embeddings for this course"}), 400
 
-    # ---- 2. Summary -> polyline + (x,y) ----
-    polyline_dicts, x, y = summary_to_coordinates(
+    # ---- 2. Summary -> keywords + polyline + (x,y) ----
+    kw_list, weight_list, polyline_dicts, x, y = summary_keywords_and_coordinates(
         summary_text,
         topic_embeddings=topic_embeddings,
         num_keywords=10,
-        beta=15.0
+        beta=15.0,
+        encoder=encoder
     )
 
     polyline_json = json.dumps(polyline_dicts)
 
-    # ---- 3. Save SummaryCoordinates ----
+    # ---- 3. Save SummaryCoordinates (keywords extracted once, reused for clustering) ----
     sc = SummaryCoordinates(
         enroll_id=enroll_id,
         course_id=course_id,
@@ -428,69 +651,23 @@ def submit_learning_summary():
         summary=summary_text,
         polyline=polyline_json,
         x_coordinate=x,
-        y_coordinate=y
+        y_coordinate=y,
+        keywords=kw_list,
+        keyword_weights=weight_list
     )
     db.session.add(sc)
 
     # ---- 4. Update Enroll record ----
+    previous = (enroll.polyline, enroll.x_coordinate, enroll.y_coordinate)
     enroll.x_coordinate = x
     enroll.y_coordinate = y
     enroll.polyline = polyline_json
+    record_event(enroll.id, polyline_dicts, x, y, "topic_summary", previous=previous)
 
     db.session.flush()  # ensure sc.id is available
 
     # ---- 5. Recompute clusters for this specific COURSE + TOPIC ----
-    all_summaries = SummaryCoordinates.query.filter_by(course_id=course_id, topic_id=topic_id).all()
-
-    poly_arrays = []
-    keywords_per_summary = []
-
-    for row in all_summaries:
-        pl = json.loads(row.polyline) if row.polyline else []
-        arr = np.array([p["y"] for p in pl], dtype=float)
-        poly_arrays.append(arr)
-
-        kws, _ = extract_keywords_for_text(row.summary, num_keywords=10)
-        keywords_per_summary.append(kws)
-
-    labels, top_keywords = cluster_summaries(poly_arrays, keywords_per_summary)
-
-    # ---- 6. Recreate SummaryCluster rows for this course + topic ----
-    SummaryCluster.query.filter_by(course_id=course_id, topic_id=topic_id).delete()
-    db.session.flush()
-
-    # Compute cluster centroids from (x,y) of each SummaryCoordinates
-    from collections import defaultdict
-    cluster_points = defaultdict(list)
-    for row, lab in zip(all_summaries, labels):
-        if row.x_coordinate is not None and row.y_coordinate is not None:
-            cluster_points[int(lab)].append(
-                (float(row.x_coordinate), float(row.y_coordinate))
-            )
-
-    clusters_by_index = {}
-    for lab, pts in cluster_points.items():
-        if not pts:
-            continue
-        cx = sum(p[0] for p in pts) / len(pts)
-        cy = sum(p[1] for p in pts) / len(pts)
-        cluster = SummaryCluster(
-            course_id=course_id,
-            topic_id=topic_id,
-            cluster_index=int(lab),
-            centroid_x=cx,
-            centroid_y=cy,
-            top_keywords=top_keywords.get(lab, [])
-        )
-        db.session.add(cluster)
-        db.session.flush()
-        clusters_by_index[lab] = cluster
-
-    # ---- 7. Attach cluster_id (primary key) to SummaryCoordinates ----
-    for row, lab in zip(all_summaries, labels):
-        cluster_obj = clusters_by_index.get(int(lab))
-        if cluster_obj:
-            row.cluster_id = cluster_obj.id
+    labels, clusters_by_index = recompute_topic_clusters(course_id, topic_id)
 
     db.session.commit()
 
@@ -513,4 +690,15 @@ def submit_learning_summary():
 
 
 if __name__ == "__main__":
+    describe_db_connection()
+    # Background job workers for the ingestion endpoints; set
+    # NAVIGATED_JOB_WORKERS=0 when running `flask job-worker` separately.
+    # `flask run` and gunicorn never reach this block: there the 202 jobs stay
+    # queued until a `flask --app app job-worker` is started next to the server.
+    # Started once, from the reloader's parent process.
+    job_workers = int(os.environ.get("NAVIGATED_JOB_WORKERS", "1"))
+    if job_workers > 0 and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        # only jobs of this host's workers that are gone; live `flask job-worker`s keep theirs
+        get_job_queue().requeue_orphaned(socket.gethostname())
+        spawn_job_workers(job_workers)
     app.run(host="0.0.0.0", port=5001, debug=True)
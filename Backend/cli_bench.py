@@ -0,0 +1,256 @@
+# cli_bench.py
+#
+# Micro-benchmarks for hot paths: `flask bench <name>`.
+
+import itertools
+import re
+import time
+
+from flask.cli import with_appcontext
+import click
+import numpy as np
+
+from dbModels import db, Topic
+
+
+@click.group("bench")
+def bench():
+    """
+    flask bench <benchmark>
+    """
+
+
+def _legacy_preprocess_text(text, flg_stemm=False, flg_lemm=True, lst_stopwords=None):
+    # utils_preprocess_text as it was before text_preprocessing (reference only)
+    from bs4 import BeautifulSoup
+    from nltk.stem import WordNetLemmatizer, PorterStemmer
+
+    soup = BeautifulSoup(text, 'lxml')
+    text = soup.get_text()
+    text = re.sub('[^a-zA-Z]', ' ', text)
+    text = re.sub(r"\s+[a-zA-Z]\s+", ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    lst_text = text.split()
+    if lst_stopwords is not None:
+        lst_text = [word for word in lst_text if word not in lst_stopwords]
+    if flg_stemm:
+        ps = PorterStemmer()
+        lst_text = [ps.stem(word) for word in lst_text]
+    if flg_lemm:
+        lem = WordNetLemmatizer()
+        lst_text = [lem.lemmatize(word) for word in lst_text]
+    return " ".join(lst_text)
+
+
+def _course_corpus(course_id, docs):
+    """
+    Topic descriptions (all courses, or one) cycled up to `docs` documents.
+    """
+    from cli_parity import PARITY_CORPUS
+    from topic_embeddings_loader import _description_to_text
+
+    query = db.session.query(Topic.description, Topic.name)
+    if course_id is not None:
+        query = query.filter(Topic.course_id == course_id)
+    texts = [_description_to_text(d, name_fallback=n) for d, n in query.all()]
+    texts = [t for t in texts if t] or PARITY_CORPUS
+    return list(itertools.islice(itertools.cycle(texts), docs))
+
+
+@bench.command("preprocessing")
+@click.option("--course-id", type=int, default=None, help="Use this course's topic descriptions.")
+@click.option("--docs", default=1000, show_default=True, help="Corpus size.")
+@click.option("--html/--no-html", default=False, help="Wrap every document in HTML markup.")
+@with_appcontext
+def bench_preprocessing(course_id, docs, html):
+    """
+    Legacy utils_preprocess_text vs the text_preprocessing engine.
+    """
+    import text_preprocessing
+    from nltk_resources import get_stop_words
+
+    corpus = _course_corpus(course_id, docs)
+    if html:
+        corpus = [f"<div><p>{t}</p><br/>&nbsp;</div>" for t in corpus]
+    stop_words = get_stop_words()
+    text_preprocessing.lemmatize.cache_clear()
+    text_preprocessing.stem.cache_clear()
+
+    start = time.perf_counter()
+    legacy = [_legacy_preprocess_text(t.lower(), lst_stopwords=stop_words) for t in corpus]
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cold = text_preprocessing.preprocess_texts(corpus)
+    cold_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    text_preprocessing.preprocess_texts(corpus)
+    warm_s = time.perf_counter() - start
+
+    mismatches = sum(a != b for a, b in zip(legacy, cold))
+    words = sum(len(t.split()) for t in corpus)
+    click.echo(f"{len(corpus)} documents, {words} words, html={html}")
+    click.echo(f"  legacy:        {legacy_s:8.3f}s")
+    click.echo(f"  engine (cold): {cold_s:8.3f}s  ({legacy_s / cold_s:.1f}x)")
+    click.echo(f"  engine (warm): {warm_s:8.3f}s  ({legacy_s / warm_s:.1f}x)")
+    click.echo(f"  output mismatches: {mismatches}")
+    click.echo(f"  lemma cache: {text_preprocessing.lemmatize.cache_info()}")
+
+
+def _legacy_resource_polylines(topic_embeddings, keyword_groups, beta):
+    # per-pair create_resource_polylines as it was before polyline_kernel (reference only)
+    from utils import get_cos_sim
+
+    polylines = []
+    for embeddings in keyword_groups:
+        keyword_polylines = [[(get_cos_sim(t, k) + 1) / 2 for t in topic_embeddings] for k in embeddings]
+        polylines.append([sum(p[j] for p in keyword_polylines) / len(keyword_polylines)
+                          for j in range(len(topic_embeddings))])
+    beta_polylines = []
+    for line in polylines:
+        mean_val = np.average(line)
+        beta_polylines.append([min(max(j + beta * (j - mean_val), 0), 1) for j in line])
+    return beta_polylines
+
+
+def _int_list(ctx, param, value):
+    try:
+        return [int(v) for v in value.split(",") if v.strip()]
+    except ValueError:
+        raise click.BadParameter("expected comma separated integers")
+
+
+@bench.command("polylines")
+@click.option("--topics", default="12,50,500", show_default=True, callback=_int_list, help="Topic counts.")
+@click.option("--docs", default="10,1000,100000", show_default=True, callback=_int_list, help="Document counts.")
+@click.option("--keywords", default=10, show_default=True, help="Keyword embeddings per document.")
+@click.option("--dim", default=768, show_default=True, help="Embedding size.")
+@click.option("--legacy-max-pairs", default=500_000, show_default=True,
+              help="Skip the per-pair reference above this many keyword-topic pairs.")
+def bench_polylines(topics, docs, keywords, dim, legacy_max_pairs):
+    """
+    Per-pair create_resource_polylines vs the polyline_kernel matmul.
+    """
+    import polyline_kernel
+
+    rng = np.random.default_rng(0)
+    # documents are views into one pool of keyword vectors so 100k documents fit in memory
+    pool = rng.standard_normal((min(max(docs) * keywords, 50_000) + keywords, dim), dtype=np.float32)
+
+    click.echo(f"{keywords} keywords per document, dim {dim}")
+    click.echo(f"  {'topics':>6s} {'docs':>7s} {'kernel':>10s} {'per-pair':>10s} {'speedup':>8s} {'max diff':>9s}")
+    for num_topics in topics:
+        topic_embeddings = rng.standard_normal((num_topics, dim)).tolist()
+        for num_docs in docs:
+            groups = [pool[(i * keywords) % (len(pool) - keywords):][:keywords] for i in range(num_docs)]
+
+            start = time.perf_counter()
+            polylines = polyline_kernel.beta_scale(
+                polyline_kernel.keyword_mean_polylines(topic_embeddings, groups), 8)
+            kernel_s = time.perf_counter() - start
+
+            if num_docs * keywords * num_topics > legacy_max_pairs:
+                click.echo(f"  {num_topics:6d} {num_docs:7d} {kernel_s:9.4f}s {'-':>10s} {'-':>8s} {'-':>9s}")
+                continue
+            start = time.perf_counter()
+            legacy = _legacy_resource_polylines(topic_embeddings, groups, 8)
+            legacy_s = time.perf_counter() - start
+            diff = float(np.max(np.abs(np.asarray(legacy) - polylines)))
+            click.echo(f"  {num_topics:6d} {num_docs:7d} {kernel_s:9.4f}s {legacy_s:9.3f}s "
+                       f"{legacy_s / kernel_s:7.0f}x {diff:9.1e}")
+
+
+def _legacy_rad_plot_poly(num, hd_point, tlen, theta):
+    # rad_plot_poly loop as it was before radial_projection (reference only)
+    import math
+
+    coordinates = []
+    for pnt in hd_point:
+        x_values = []
+        y_values = []
+        for p in range(num):
+            rlen = pnt[p] * tlen[p]
+            x_values.append(rlen * math.cos(p * theta))
+            y_values.append(rlen * math.sin(p * theta))
+        coordinates.append([sum(x_values) / num, sum(y_values) / num])
+    return coordinates
+
+
+@bench.command("radial")
+@click.option("--topics", default="12,50,500", show_default=True, callback=_int_list, help="Polyline lengths.")
+@click.option("--polylines", default=10000, show_default=True, help="Polylines per run.")
+def bench_radial(topics, polylines):
+    """
+    rad_plot_poly loop vs radial_projection.project (exact and matmul).
+    """
+    from radial_projection import project, radial_axes
+
+    rng = np.random.default_rng(0)
+    click.echo(f"{polylines} polylines")
+    click.echo(f"  {'topics':>6s} {'loop':>9s} {'exact':>9s} {'matmul':>9s} {'exact diffs':>11s} {'matmul max diff':>15s}")
+    for num in topics:
+        points = rng.random((polylines, num))
+        tlen, theta = radial_axes(num, 1, 1)
+        if len(tlen) < num:
+            click.echo(f"  {num:6d} skipped: the axes loop yields {len(tlen)} axes")
+            continue
+
+        start = time.perf_counter()
+        legacy = np.array(_legacy_rad_plot_poly(num, points.tolist(), tlen, theta))
+        loop_s = time.perf_counter() - start
+        start = time.perf_counter()
+        exact = project(points, tlen, theta)
+        exact_s = time.perf_counter() - start
+        start = time.perf_counter()
+        fast = project(points, exact=False)
+        matmul_s = time.perf_counter() - start
+
+        click.echo(f"  {num:6d} {loop_s:8.3f}s {exact_s:8.4f}s {matmul_s:8.4f}s "
+                   f"{int(np.sum(legacy != exact)):11d} {float(np.max(np.abs(legacy - fast))):15.1e}")
+
+
+@bench.command("vectors")
+@click.option("--dims", default="12,768", show_default=True, callback=_int_list, help="Vector sizes.")
+@click.option("--rows", default=10000, show_default=True, help="Values per size.")
+@click.option("--course-id", type=int, default=None, help="Also time reading this course's resources.")
+@with_appcontext
+def bench_vectors(dims, rows, course_id):
+    """
+    Stored size and decode time: JSON text vs vector_codec packed float32.
+    """
+    import json
+    from vector_codec import decode_vector, pack_vector
+
+    rng = np.random.default_rng(0)
+    click.echo(f"{rows} values per size")
+    click.echo(f"  {'dim':>5s} {'json bytes':>10s} {'packed':>7s} {'json decode':>12s} {'packed decode':>14s} {'max diff':>9s}")
+    for dim in dims:
+        vectors = rng.random((rows, dim)).tolist()
+        as_json = [json.dumps(v) for v in vectors]
+        as_packed = [pack_vector(v) for v in vectors]
+
+        start = time.perf_counter()
+        from_json = [np.asarray(json.loads(v), dtype=float) for v in as_json]
+        json_s = time.perf_counter() - start
+        start = time.perf_counter()
+        from_packed = [decode_vector(v) for v in as_packed]
+        packed_s = time.perf_counter() - start
+
+        diff = max(float(np.max(np.abs(a - b))) for a, b in zip(from_json, from_packed))
+        click.echo(f"  {dim:5d} {np.mean([len(v) for v in as_json]):10.0f} {len(as_packed[0]):7d} "
+                   f"{1e6 * json_s / rows:10.1f}us {1e6 * packed_s / rows:12.2f}us {diff:9.1e}")
+
+    if course_id is not None:
+        from sqlalchemy import text
+        from dbModels import Resource
+
+        stored = db.session.execute(
+            text("SELECT COUNT(*), AVG(LENGTH(polyline)) FROM resource WHERE course_id = :course_id"),
+            {"course_id": course_id}).fetchone()
+        db.session.expire_all()
+        start = time.perf_counter()
+        polylines = [r.polyline for r in Resource.query.filter_by(course_id=course_id).all()]
+        read_s = time.perf_counter() - start
+        click.echo(f"course {course_id}: {stored[0]} resources, {float(stored[1] or 0):.0f} bytes per polyline, "
+                   f"read in {1000 * read_s:.1f}ms ({sum(p is not None for p in polylines)} decoded)")
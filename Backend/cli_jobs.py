@@ -0,0 +1,56 @@
+# cli_jobs.py
+
+import os
+import socket
+import subprocess
+import sys
+
+from flask.cli import with_appcontext
+import click
+
+from dbModels import db
+from job_queue import get_job_queue, work
+
+
+def spawn_job_workers(count: int) -> list:
+    """
+    Start `count` `flask job-worker` processes that exit with this process.
+    """
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    return [
+        subprocess.Popen(
+            [sys.executable, '-m', 'flask', '--app', 'app', 'job-worker',
+             '--parent-pid', str(os.getpid())],
+            cwd=backend_dir,
+        )
+        for _ in range(count)
+    ]
+
+
+@click.command("job-worker")
+@click.option("--processes", default=1, show_default=True, help="Number of worker processes.")
+@click.option("--poll-interval", default=1.0, show_default=True, help="Seconds between polls when idle.")
+@click.option("--parent-pid", type=int, default=None, hidden=True)
+@with_appcontext
+def job_worker(processes, poll_interval, parent_pid):
+    """
+    flask --app app job-worker [--processes N]
+    """
+    host = socket.gethostname()
+    if parent_pid is None:
+        # Jobs left 'running' by workers of this host that died are picked up again
+        requeued = get_job_queue().requeue_orphaned(host)
+        if requeued:
+            click.echo(f"Requeued {requeued} interrupted job(s)")
+        if processes > 1:
+            spawn_job_workers(processes - 1)
+
+    worker = f"{host}:{os.getpid()}"
+    click.echo(f"Job worker {worker} started")
+    work(
+        worker,
+        poll_interval=poll_interval,
+        should_stop=(lambda: os.getppid() != parent_pid) if parent_pid else None,
+        on_error=db.session.rollback,
+        after_job=db.session.remove,
+    )
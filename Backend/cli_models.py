@@ -0,0 +1,17 @@
+# cli_models.py
+
+from flask.cli import with_appcontext
+import click
+
+from model_registry import warm_up
+
+
+@click.command("warm-models")
+@with_appcontext
+def warm_models():
+    """
+    flask warm-models
+    """
+    for key, stats in warm_up().items():
+        click.echo(f"{key}: {stats['name']} loaded in {stats['load_seconds']}s "
+                   f"({stats['memory_mb']} MiB)")
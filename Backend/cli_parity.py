@@ -0,0 +1,199 @@
+# cli_parity.py
+#
+# Coordinate-parity harnesses:
+#  - inference-parity: a fixed corpus goes through summary_to_coordinates and
+#    create_resource_polylines once with the fp32 models and once with the
+#    backend under test, and the largest polyline and (x, y) drift is reported.
+#  - summary-encoder-report: latency and coordinate drift of the single-encoder
+#    summary pipeline against the three-model one, on a course's summaries.
+
+import json
+import sys
+import time
+
+from flask.cli import with_appcontext
+import click
+import numpy as np
+
+from dbModels import db, Topic, SummaryCoordinates
+import inference_service
+from learning_summary_core import summary_keywords_and_coordinates, polyline_to_array, SINGLE_ENCODER, THREE_MODEL_ENCODER
+from model_library import create_keywords_list, create_resource_embeddings, create_resource_polylines, rad_plot_axes, rad_plot_poly
+from model_registry import INFERENCE_BACKENDS, onnx_backend_problems, get_inference_backend, set_inference_backend
+from topic_embeddings_loader import get_summary_topic_embeddings, get_topic_matrix
+
+# Short learner-style texts on the Discrete Mathematics course
+PARITY_CORPUS = [
+    "Propositional logic uses connectives such as and, or, not and implication. "
+    "Truth tables show when a compound proposition is a tautology or a contradiction.",
+    "A proof by induction proves a base case and then shows that if the statement holds "
+    "for n it also holds for n plus one.",
+    "Sets can be combined with union, intersection and difference. The power set of a set "
+    "with n elements has 2 to the n elements.",
+    "A relation is an equivalence relation when it is reflexive, symmetric and transitive; "
+    "its equivalence classes partition the set.",
+    "Functions can be injective, surjective or bijective. A bijection has an inverse function.",
+    "The pigeonhole principle says that if more than n objects go into n boxes, some box "
+    "holds at least two objects.",
+    "Permutations count ordered arrangements while combinations count unordered selections; "
+    "binomial coefficients appear in Pascal's triangle.",
+    "A graph is made of vertices and edges. Trees are connected acyclic graphs and an Euler "
+    "circuit uses every edge exactly once.",
+    "Recurrence relations such as the Fibonacci sequence can be solved with characteristic "
+    "equations or generating functions.",
+    "Modular arithmetic, the greatest common divisor and the Euclidean algorithm are the "
+    "basis of RSA encryption.",
+]
+
+
+def _load_corpus(path):
+    if not path:
+        return PARITY_CORPUS
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    if path.endswith(".json"):
+        return [str(t) for t in json.loads(content)]
+    # plain text: one document per blank-line separated paragraph
+    return [p.strip() for p in content.split("\n\n") if p.strip()]
+
+
+def _stored_topic_embeddings(course_id):
+    topic_matrix = get_topic_matrix(course_id)
+    return list(topic_matrix.unit) if topic_matrix is not None else []
+
+
+def _run_corpus(corpus, topic_embeddings):
+    """
+    Summary path and resource path for every text: polylines, (x, y), keywords.
+    """
+    summaries = []
+    for text in corpus:
+        kw_list, _, polyline, x, y = summary_keywords_and_coordinates(text, topic_embeddings)
+        summaries.append((polyline_to_array(polyline), (x, y), kw_list))
+
+    keywords, _ = create_keywords_list(corpus)
+    resource_polylines = create_resource_polylines(
+        topic_embeddings, create_resource_embeddings(keywords), 8)
+    num = len(topic_embeddings)
+    tlen, theta = rad_plot_axes(num, 1, 1)
+    centroids = rad_plot_poly(num, resource_polylines, tlen, theta)
+    resources = [
+        (np.asarray(p, dtype=float), tuple(c), kw)
+        for p, c, kw in zip(resource_polylines, centroids, keywords)
+    ]
+    return summaries, resources
+
+
+def _drift(reference, candidate):
+    poly_drift = []
+    xy_drift = []
+    keyword_changes = 0
+    for (ref_poly, ref_xy, ref_kw), (poly, xy, kw) in zip(reference, candidate):
+        poly_drift.append(float(np.max(np.abs(ref_poly - poly))))
+        xy_drift.append(float(np.hypot(ref_xy[0] - xy[0], ref_xy[1] - xy[1])))
+        keyword_changes += set(ref_kw) != set(kw)
+    return {
+        'max_polyline_drift': max(poly_drift),
+        'mean_polyline_drift': float(np.mean(poly_drift)),
+        'max_xy_drift': max(xy_drift),
+        'mean_xy_drift': float(np.mean(xy_drift)),
+        'keyword_set_changes': keyword_changes,
+    }
+
+
+@click.command("inference-parity")
+@click.option("--backend", type=click.Choice([b for b in INFERENCE_BACKENDS if b != 'fp32']),
+              required=True, help="Backend to compare against fp32.")
+@click.option("--course-id", type=int, default=None, help="Course whose stored topic embeddings are the axes.")
+@click.option("--corpus", "corpus_path", default=None, help="JSON list or blank-line separated text file.")
+@click.option("--max-xy-drift", type=float, default=None, help="Exit with status 1 above this (x, y) drift.")
+@with_appcontext
+def inference_parity(backend, course_id, corpus_path, max_xy_drift):
+    """
+    flask inference-parity --backend int8|onnx
+    """
+    # the setting, not get_inference_service(): that would start the worker pool
+    if inference_service.NUM_WORKERS > 0:
+        raise click.ClickException("Unset NAVIGATED_INFERENCE_WORKERS: the parity check runs the models in-process.")
+    if backend == 'onnx':
+        problems = onnx_backend_problems()
+        if problems:
+            raise click.ClickException("The onnx backend cannot be used: " + "; ".join(problems))
+
+    if course_id is None:
+        course_id = db.session.query(Topic.course_id).filter(Topic.embedding.isnot(None)).order_by(Topic.course_id).limit(1).scalar()
+    topic_embeddings = _stored_topic_embeddings(course_id)
+    if len(topic_embeddings) < 2:
+        raise click.ClickException(f"Course {course_id} has fewer than two topic embeddings.")
+
+    corpus = _load_corpus(corpus_path)
+    click.echo(f"Course {course_id}: {len(topic_embeddings)} topics, {len(corpus)} documents")
+
+    original_backend = get_inference_backend()
+    try:
+        set_inference_backend('fp32')
+        reference = _run_corpus(corpus, topic_embeddings)
+        set_inference_backend(backend)
+        candidate = _run_corpus(corpus, topic_embeddings)
+    finally:
+        set_inference_backend(original_backend)
+
+    worst = 0.0
+    for label, ref, cand in (("summary_to_coordinates", reference[0], candidate[0]),
+                             ("create_resource_polylines", reference[1], candidate[1])):
+        report = _drift(ref, cand)
+        worst = max(worst, report['max_xy_drift'])
+        click.echo(f"{label} ({backend} vs fp32):")
+        for key, value in report.items():
+            click.echo(f"  {key}: {value:.6f}" if isinstance(value, float) else f"  {key}: {value}")
+
+    if max_xy_drift is not None and worst > max_xy_drift:
+        click.echo(f"FAIL: max (x, y) drift {worst:.6f} > {max_xy_drift}")
+        sys.exit(1)
+    click.echo(f"Max (x, y) drift: {worst:.6f}")
+
+
+def _timed_summary_path(texts, course_id, encoder):
+    topic_embeddings = get_summary_topic_embeddings(course_id, encoder)
+    # first call loads models / topic vectors; not part of the timings
+    summary_keywords_and_coordinates(texts[0], topic_embeddings, encoder=encoder)
+
+    results, seconds = [], []
+    for text in texts:
+        start = time.perf_counter()
+        kw_list, _, _, x, y = summary_keywords_and_coordinates(text, topic_embeddings, encoder=encoder)
+        seconds.append(time.perf_counter() - start)
+        results.append(((x, y), set(kw_list)))
+    return results, np.array(seconds)
+
+
+@click.command("summary-encoder-report")
+@click.option("--course-id", type=int, required=True)
+@click.option("--limit", default=50, show_default=True, help="Most recent summaries of the course to use.")
+@with_appcontext
+def summary_encoder_report(course_id, limit):
+    """
+    flask summary-encoder-report --course-id N
+    """
+    rows = (
+        SummaryCoordinates.query
+        .filter_by(course_id=course_id)
+        .order_by(SummaryCoordinates.id.desc())
+        .limit(limit)
+        .all()
+    )
+    texts = [r.summary for r in rows if r.summary] or PARITY_CORPUS
+    click.echo(f"Course {course_id}: {len(texts)} summaries")
+
+    three, three_s = _timed_summary_path(texts, course_id, THREE_MODEL_ENCODER)
+    single, single_s = _timed_summary_path(texts, course_id, SINGLE_ENCODER)
+
+    for label, secs in (("three_model", three_s), ("single", single_s)):
+        click.echo(f"  {label:12s} mean {1000 * secs.mean():8.1f}ms  p50 {1000 * np.percentile(secs, 50):8.1f}ms  "
+                   f"p95 {1000 * np.percentile(secs, 95):8.1f}ms")
+    click.echo(f"  speedup (mean): {three_s.mean() / single_s.mean():.2f}x")
+
+    drift = np.array([np.hypot(a[0][0] - b[0][0], a[0][1] - b[0][1]) for a, b in zip(three, single)])
+    overlap = [len(a[1] & b[1]) / len(a[1] | b[1]) if a[1] | b[1] else 1.0 for a, b in zip(three, single)]
+    click.echo(f"  (x, y) drift: mean {drift.mean():.4f}  p95 {np.percentile(drift, 95):.4f}  max {drift.max():.4f}")
+    click.echo(f"  keyword overlap (Jaccard): mean {np.mean(overlap):.3f}")
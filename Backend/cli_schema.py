@@ -0,0 +1,168 @@
+# cli_schema.py
+#
+# Tables are managed outside SQLAlchemy (no db.create_all()), so columns and
+# tables added by the models are applied here, idempotently.
+# pack-vectors converts the rows of the PackedVector columns in place;
+# accessible-bitmaps moves Enroll.accessible_resources to bitmaps.
+
+from flask.cli import with_appcontext
+import click
+from sqlalchemy import inspect, text
+
+from dbModels import db, Course, Enroll, ExitPoint, ModuleCentroid, Resource, SummaryCoordinates, TAD, TAT, Topic, TrajectoryEvent
+from resource_index import resources_changed
+from resource_ordinals import convert_enroll, number_resources
+from vector_codec import pack_vector, packed_dtype
+
+# (table, column, DDL) — applied only when the column is missing
+SCHEMA_UPDATES = [
+    ("summary_coordinates", "keywords",
+     "ALTER TABLE summary_coordinates ADD COLUMN keywords JSON NULL"),
+    ("summary_coordinates", "keyword_weights",
+     "ALTER TABLE summary_coordinates ADD COLUMN keyword_weights JSON NULL"),
+    ("course", "summary_encoder",
+     "ALTER TABLE course ADD COLUMN summary_encoder VARCHAR(32) NULL"),
+    ("course", "topics_version",
+     "ALTER TABLE course ADD COLUMN topics_version INT NOT NULL DEFAULT 0"),
+    ("course", "resources_version",
+     "ALTER TABLE course ADD COLUMN resources_version INT NOT NULL DEFAULT 0"),
+    ("course", "module_centroids_ready",
+     "ALTER TABLE course ADD COLUMN module_centroids_ready BOOLEAN NOT NULL DEFAULT FALSE"),
+    ("resource", "ordinal",
+     "ALTER TABLE resource ADD COLUMN ordinal INT NULL"),
+    ("enroll", "accessible_bitmap",
+     "ALTER TABLE enroll ADD COLUMN accessible_bitmap BLOB NULL"),
+]
+
+# models whose tables are created when missing
+NEW_TABLE_MODELS = [ModuleCentroid, TrajectoryEvent]
+
+# PackedVector columns (see vector_codec); schema-upgrade turns them into
+# BLOBs, pack-vectors rewrites the old JSON values (and learner polylines
+# packed as float32 before those columns became float64)
+PACKED_VECTOR_COLUMNS = [
+    (Topic, "embedding"),
+    (TAD, "embedding"),
+    (Resource, "polyline"),
+    (Enroll, "polyline"),
+    (TAT, "polyline"),
+    (ExitPoint, "polyline"),
+    (SummaryCoordinates, "polyline"),
+]
+
+
+def _is_binary(column_info) -> bool:
+    return any(t in str(column_info["type"]).upper() for t in ("BLOB", "BINARY"))
+
+
+@click.command("schema-upgrade")
+@with_appcontext
+def schema_upgrade():
+    """
+    flask schema-upgrade
+    """
+    inspector = inspect(db.engine)
+
+    for model in NEW_TABLE_MODELS:
+        table = model.__table__
+        if not inspector.has_table(table.name):
+            table.create(db.engine, checkfirst=True)
+            click.echo(f"Created table {table.name}")
+
+    for table_name, column, ddl in SCHEMA_UPDATES:
+        existing = {c["name"] for c in inspector.get_columns(table_name)}
+        if column in existing:
+            continue
+        db.session.execute(text(ddl))
+        db.session.commit()
+        click.echo(f"Added {table_name}.{column}")
+
+    for model, column in PACKED_VECTOR_COLUMNS:
+        table_name = model.__tablename__
+        info = {c["name"]: c for c in inspector.get_columns(table_name)}.get(column)
+        if info is None or _is_binary(info):
+            continue
+        # the JSON text is kept as bytes and still readable until pack-vectors runs
+        db.session.execute(text(f"ALTER TABLE {table_name} MODIFY COLUMN {column} BLOB NULL"))
+        db.session.commit()
+        click.echo(f"Changed {table_name}.{column} to BLOB")
+
+    click.echo("Schema is up to date.")
+
+
+@click.command("pack-vectors")
+@click.option("--chunk-size", default=500, show_default=True, help="Rows read and updated per transaction.")
+@click.option("--table", "tables", multiple=True, help="Only convert these tables (default: all).")
+@with_appcontext
+def pack_vectors(chunk_size, tables):
+    """
+    flask pack-vectors [--table enroll ...]
+    """
+    inspector = inspect(db.engine)
+    for model, column in PACKED_VECTOR_COLUMNS:
+        table_name = model.__tablename__
+        if tables and table_name not in tables:
+            continue
+        info = {c["name"]: c for c in inspector.get_columns(table_name)}.get(column)
+        if info is None or not _is_binary(info):
+            raise click.ClickException(f"{table_name}.{column} is not a BLOB yet; run flask schema-upgrade first.")
+
+        select = text(f"SELECT id, {column} FROM {table_name} "
+                      f"WHERE id > :last_id AND {column} IS NOT NULL ORDER BY id LIMIT :limit")
+        # only rows still holding the value read, so concurrent writes are not overwritten
+        update = text(f"UPDATE {table_name} SET {column} = :packed WHERE id = :id AND {column} = :old")
+        dtype = model.__table__.c[column].type.dtype
+
+        last_id, converted, packed, failed = 0, 0, 0, 0
+        while True:
+            rows = db.session.execute(select, {"last_id": last_id, "limit": chunk_size}).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            updates = []
+            for row_id, value in rows:
+                if packed_dtype(value) == dtype:
+                    packed += 1
+                    continue
+                try:
+                    updates.append({"id": row_id, "packed": pack_vector(value, dtype), "old": value})
+                except (ValueError, KeyError, TypeError) as e:
+                    failed += 1
+                    click.echo(f"  {table_name} {row_id}: cannot convert ({e})")
+            if updates:
+                db.session.execute(update, updates)
+            db.session.commit()
+            converted += len(updates)
+
+        click.echo(f"{table_name}.{column}: {converted} converted, {packed} already packed, {failed} failed")
+
+
+@click.command("accessible-bitmaps")
+@click.option("--chunk-size", default=500, show_default=True, help="Enroll rows converted per transaction.")
+@click.option("--course-id", type=int, default=None, help="Only this course (default: all).")
+@with_appcontext
+def accessible_bitmaps(chunk_size, course_id):
+    """
+    flask accessible-bitmaps
+    Number every course's resources, then move the enroll rows' JSON id
+    lists into accessible_bitmap.
+    """
+    course_ids = [course_id] if course_id is not None else [cid for (cid,) in db.session.query(Course.id).all()]
+    for cid in course_ids:
+        numbered = number_resources(cid)
+        if numbered:
+            resources_changed(cid)
+        db.session.commit()
+
+        last_id, converted = 0, 0
+        while True:
+            enrolls = (Enroll.query
+                       .filter(Enroll.course_id == cid, Enroll.id > last_id,
+                               Enroll.accessible_resources_json.isnot(None))
+                       .order_by(Enroll.id.asc()).limit(chunk_size).with_for_update().all())
+            if not enrolls:
+                break
+            last_id = enrolls[-1].id
+            converted += sum(convert_enroll(enroll) for enroll in enrolls)
+            db.session.commit()
+        click.echo(f"course {cid}: {numbered} resources numbered, {converted} enrollments converted")
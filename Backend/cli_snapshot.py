@@ -0,0 +1,40 @@
+# cli_snapshot.py
+
+import time
+
+from flask.cli import with_appcontext
+import click
+
+from dbModels import db, Course
+import course_snapshot
+
+
+@click.command("snapshot-build")
+@click.option("--course-id", type=int, default=None, help="Only this course (default: all).")
+@click.option("--force", is_flag=True, help="Rebuild every part, even if its version is current.")
+@with_appcontext
+def snapshot_build(course_id, force):
+    """
+    NAVIGATED_SNAPSHOT_DIR=... flask snapshot-build
+    """
+    if not course_snapshot.enabled():
+        raise click.ClickException("Set NAVIGATED_SNAPSHOT_DIR to the snapshot directory.")
+
+    course_ids = [course_id] if course_id is not None else [cid for (cid,) in db.session.query(Course.id).all()]
+    for cid in course_ids:
+        start = time.perf_counter()
+        snapshot = course_snapshot.refresh_snapshot(cid, force=force)
+        if snapshot is None:
+            click.echo(f"course {cid}: not found")
+            continue
+        built_s = time.perf_counter() - start
+
+        # a fresh mapping, as a newly started worker would load it
+        course_snapshot.snapshot_by_course.pop(cid, None)
+        start = time.perf_counter()
+        course_snapshot.load_snapshot(cid)
+        load_s = time.perf_counter() - start
+        arrays = snapshot.arrays
+        click.echo(f"course {cid}: {len(arrays['topic_ids'])} topics (v{snapshot.topics_version}), "
+                   f"{len(arrays['resource_ids'])} resources (v{snapshot.resources_version}), "
+                   f"built in {built_s:.2f}s, mapped in {1000 * load_s:.2f}ms")
@@ -0,0 +1,83 @@
+# cli_startup.py
+#
+# Cold-import profile of the web app: `python -X importtime -c "import app"`
+# in a fresh interpreter, summarised by module, with an optional time budget
+# so CI can fail when startup regresses.
+
+import os
+import subprocess
+import sys
+import time
+
+import click
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def profile_cold_import(module: str = "app"):
+    """
+    Import `module` in a fresh interpreter with -X importtime.
+
+    Returns:
+        (wall_seconds, entries, returncode, stderr) where entries is a list
+        of (name, depth, self_us, cumulative_us) in import order.
+    """
+    env = dict(os.environ, NAVIGATED_WARM_MODELS="0", PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # header line
+        raw_name = parts[2].rstrip()
+        name = raw_name.lstrip()
+        depth = (len(raw_name) - len(name) - 1) // 2
+        entries.append((name, depth, int(parts[0]), int(parts[1])))
+    return wall, entries, proc.returncode, proc.stderr
+
+
+@click.command("startup-report")
+@click.option("--module", default="app", show_default=True, help="Module to cold-import.")
+@click.option("--top", default=20, show_default=True, help="Rows per table.")
+@click.option("--budget", type=float, default=None, help="Exit with status 1 if the cold import takes longer (seconds).")
+def startup_report(module, top, budget):
+    """
+    flask --app app startup-report [--budget SECONDS]
+    """
+    wall, entries, returncode, stderr = profile_cold_import(module)
+    if returncode != 0:
+        click.echo(stderr[-4000:])
+        click.echo(f"Importing '{module}' failed (exit code {returncode}).")
+        sys.exit(1)
+
+    local_modules = {f[:-3] for f in os.listdir(BACKEND_DIR) if f.endswith(".py")}
+    top_level = [e for e in entries if e[1] == 0]
+    local = [e for e in entries if e[0] in local_modules]
+
+    click.echo(f"Cold import of '{module}': {wall:.2f}s wall, {len(entries)} modules")
+
+    click.echo("\nTop-level imports by cumulative time:")
+    for name, _, self_us, cum_us in sorted(top_level, key=lambda e: -e[3])[:top]:
+        click.echo(f"  {cum_us / 1e6:8.3f}s  {name}")
+
+    click.echo("\nBackend modules (self / cumulative):")
+    for name, _, self_us, cum_us in sorted(local, key=lambda e: -e[3])[:top]:
+        click.echo(f"  {self_us / 1e6:8.3f}s  {cum_us / 1e6:8.3f}s  {name}")
+
+    click.echo("\nSlowest modules by self time:")
+    for name, _, self_us, cum_us in sorted(entries, key=lambda e: -e[2])[:top]:
+        click.echo(f"  {self_us / 1e6:8.3f}s  {name}")
+
+    if budget is not None:
+        if wall > budget:
+            click.echo(f"\nFAIL: cold import took {wall:.2f}s, budget is {budget:.2f}s")
+            sys.exit(1)
+        click.echo(f"\nOK: within the {budget:.2f}s budget")
@@ -0,0 +1,29 @@
+# cli_trajectory.py
+
+from flask.cli import with_appcontext
+import click
+
+from dbModels import db, Enroll, TrajectoryEvent
+from trajectory_log import seed_enrollment
+
+
+@click.command("trajectory-backfill")
+@click.option("--chunk-size", default=200, show_default=True, help="Enrollments seeded per transaction.")
+@with_appcontext
+def trajectory_backfill(chunk_size):
+    """
+    flask trajectory-backfill
+    Log the contribution history of enrollments that have no trajectory events
+    (otherwise done on their next event).
+    """
+    logged = db.session.query(TrajectoryEvent.enroll_id).distinct()
+    enroll_ids = [eid for (eid,) in db.session.query(Enroll.id).filter(Enroll.id.notin_(logged)).order_by(Enroll.id).all()]
+    seeded = events = 0
+    for start in range(0, len(enroll_ids), chunk_size):
+        for enroll in Enroll.query.filter(Enroll.id.in_(enroll_ids[start:start + chunk_size])).all():
+            added = seed_enrollment(enroll)
+            seeded += bool(added)
+            events += added
+        db.session.commit()
+        click.echo(f"{min(start + chunk_size, len(enroll_ids))}/{len(enroll_ids)} enrollments")
+    click.echo(f"Seeded {seeded} enrollments with {events} events")
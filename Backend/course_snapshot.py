@@ -0,0 +1,271 @@
+# course_snapshot.py
+#
+# Memory-mapped per-course snapshot of what every worker otherwise rebuilds
+# from MySQL on first touch: the unit topic matrix, the resource polyline
+# matrix, resource positions and modules, the id maps and the radial
+# projection weights. Enabled by NAVIGATED_SNAPSHOT_DIR.
+#
+# One file per course, replaced atomically; forked / gunicorn workers map the
+# same file and share its pages. The topic and resource parts are stamped with
+# the Course.topics_version / resources_version they were read at. When a
+# reader finds a part behind the course, it rebuilds the file from committed
+# data (own session), copying the part that is still current from the old one.
+#
+# Layout: MAGIC | header length (uint32) | JSON header | arrays, 64-byte
+# aligned, at the offsets given in the header.
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from dbModels import db, Course
+
+SNAPSHOT_DIR = os.environ.get("NAVIGATED_SNAPSHOT_DIR")
+
+MAGIC = b"NVSNAP"
+FORMAT_VERSION = 1
+ALIGN = 64
+_PREFIX = struct.Struct("<6sHI")
+
+TOPIC_ARRAYS = ("topic_ids", "topic_unit", "radial_weights")
+RESOURCE_ARRAYS = ("resource_ids", "resource_polylines", "resource_xy", "resource_module_ids")
+
+# cache: {course_id: CourseSnapshot}
+snapshot_by_course = {}
+
+# one refresh per course at a time in this process
+_refresh_locks = {}
+_refresh_locks_lock = threading.Lock()
+
+
+class CourseSnapshot:
+    """
+    A mapped snapshot file: header fields plus read-only array views.
+    """
+
+    def __init__(self, path, header, arrays, stat_key):
+        self.path = path
+        self.header = header
+        self.arrays = arrays
+        self.stat_key = stat_key
+
+    @property
+    def topics_version(self):
+        return self.header["topics_version"]
+
+    @property
+    def resources_version(self):
+        return self.header["resources_version"]
+
+
+def enabled() -> bool:
+    return bool(SNAPSHOT_DIR)
+
+
+def snapshot_path(course_id: int) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"course_{int(course_id)}.snap")
+
+
+def _align(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def write_snapshot(path, header, arrays):
+    """
+    Write header + arrays to `path` (through a temporary file and a rename,
+    so readers never see a partial file).
+    """
+    specs, offset = {}, 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        specs[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _align(offset + array.nbytes)
+    header = dict(header, format_version=FORMAT_VERSION, arrays=specs)
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _align(_PREFIX.size + len(header_bytes))
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    # a file of its own per writer (threads and processes), so a rename never
+    # publishes a file another writer is still filling
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            for name, array in arrays.items():
+                f.seek(data_start + specs[name]["offset"])
+                f.write(array.tobytes())
+            f.truncate(data_start + offset)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def read_snapshot(path) -> CourseSnapshot:
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, header_len = _PREFIX.unpack_from(mapped)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"{path} is not a version {FORMAT_VERSION} course snapshot")
+    header = json.loads(mapped[_PREFIX.size:_PREFIX.size + header_len])
+    data_start = _align(_PREFIX.size + header_len)
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        shape = tuple(spec["shape"])
+        arrays[name] = np.frombuffer(
+            mapped, dtype=np.dtype(spec["dtype"]), count=int(np.prod(shape)),
+            offset=data_start + spec["offset"]).reshape(shape)
+    return CourseSnapshot(path, header, arrays, (stat.st_ino, stat.st_mtime_ns, stat.st_size))
+
+
+def load_snapshot(course_id: int):
+    """
+    This process's mapping of the course's snapshot file (re-mapped when the
+    file was replaced), or None when there is none.
+    """
+    path = snapshot_path(course_id)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    snapshot = snapshot_by_course.get(course_id)
+    if snapshot is not None and snapshot.stat_key == (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+        return snapshot
+    try:
+        snapshot = read_snapshot(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"ERROR: Failed to read course snapshot {path} -> {e}")
+        return None
+    snapshot_by_course[course_id] = snapshot
+    return snapshot
+
+
+def _topic_part(session, course_id):
+    from topic_embeddings_loader import topic_arrays, topic_rows
+    from radial_projection import projection_weights
+
+    topic_ids, unit, complete = topic_arrays(course_id, topic_rows(session, course_id))
+    try:
+        weights = projection_weights(len(topic_ids)) if len(topic_ids) >= 2 else np.empty((0, 2))
+    except ValueError:
+        # sizes where the rad_plot_axes loop yields fewer axes than topics
+        weights = np.empty((0, 2))
+    arrays = {
+        "topic_ids": np.array(topic_ids, dtype=np.int64),
+        "topic_unit": unit,
+        "radial_weights": weights,
+    }
+    return arrays, complete
+
+
+def _resource_part(session, course_id):
+    from resource_index import resource_arrays, resource_rows
+
+    ids, polylines, xy, module_ids = resource_arrays(resource_rows(session, course_id))
+    return {
+        "resource_ids": ids,
+        "resource_polylines": polylines,
+        "resource_xy": xy,
+        "resource_module_ids": module_ids,
+    }
+
+
+def _refresh_lock(course_id: int) -> threading.Lock:
+    with _refresh_locks_lock:
+        return _refresh_locks.setdefault(course_id, threading.Lock())
+
+
+def refresh_snapshot(course_id: int, force: bool = False):
+    """
+    Rewrite the course's snapshot from committed data. Parts whose version
+    has not moved are copied from the current file unless `force`.
+    Refreshes of one course are serialized within the process.
+    """
+    course_id = int(course_id)
+    with _refresh_lock(course_id):
+        return _refresh_snapshot(course_id, force)
+
+
+def _refresh_snapshot(course_id: int, force: bool):
+    old = None if force else load_snapshot(course_id)
+    with Session(db.engine) as session:
+        versions = session.query(Course.topics_version, Course.resources_version).filter(Course.id == course_id).first()
+        if versions is None:
+            return None
+        topics_version, resources_version = versions[0] or 0, versions[1] or 0
+
+        if old is not None and old.topics_version == topics_version:
+            arrays = {name: old.arrays[name] for name in TOPIC_ARRAYS}
+            topics_complete = old.header["topics_complete"]
+        else:
+            arrays, topics_complete = _topic_part(session, course_id)
+        if old is not None and old.resources_version == resources_version:
+            arrays.update({name: old.arrays[name] for name in RESOURCE_ARRAYS})
+        else:
+            arrays.update(_resource_part(session, course_id))
+
+    header = {
+        "course_id": course_id,
+        "topics_version": topics_version,
+        "resources_version": resources_version,
+        "topics_complete": topics_complete,
+    }
+    write_snapshot(snapshot_path(course_id), header, arrays)
+    return load_snapshot(course_id)
+
+
+def _current_snapshot(course_id, version_key, version):
+    # snapshot whose part `version_key` is at `version`, refreshed if behind
+    if not enabled():
+        return None
+    course_id = int(course_id)
+    snapshot = load_snapshot(course_id)
+    if snapshot is None or snapshot.header[version_key] != version:
+        try:
+            with _refresh_lock(course_id):
+                # another thread may have refreshed it while this one waited
+                snapshot = load_snapshot(course_id)
+                if snapshot is None or snapshot.header[version_key] != version:
+                    snapshot = _refresh_snapshot(course_id, False)
+        except OSError as e:
+            print(f"ERROR: Failed to write course snapshot of course {course_id} -> {e}")
+            return None
+    if snapshot is None or snapshot.header[version_key] != version:
+        # the caller's transaction sees another version than the committed one
+        return None
+    return snapshot
+
+
+def topic_arrays_at(course_id, topics_version):
+    """
+    (topic_ids, unit, complete) of the course from its snapshot, or None when
+    snapshots are off or none matches topics_version.
+    """
+    snapshot = _current_snapshot(course_id, "topics_version", topics_version)
+    if snapshot is None:
+        return None
+    return (snapshot.arrays["topic_ids"].tolist(), snapshot.arrays["topic_unit"],
+            snapshot.header["topics_complete"])
+
+
+def resource_arrays_at(course_id, resources_version):
+    """
+    (ids, polylines, xy, module_ids) of the course from its snapshot, or
+    None when snapshots are off or none matches resources_version.
+    """
+    snapshot = _current_snapshot(course_id, "resources_version", resources_version)
+    if snapshot is None:
+        return None
+    return tuple(snapshot.arrays[name] for name in RESOURCE_ARRAYS)
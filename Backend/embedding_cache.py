@@ -0,0 +1,170 @@
+# embedding_cache.py
+#
+# Content-addressed keyword -> embedding cache shared by every pipeline.
+# Entries are keyed by (model name, normalized text). A bounded in-memory
+# LRU sits in front of a SQLite store of float32 vectors, so embeddings
+# survive restarts and are shared between worker processes.
+
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "NAVIGATED_EMBEDDING_CACHE", os.path.join(os.getcwd(), "embedding_cache.sqlite3"))
+DEFAULT_MEMORY_CAPACITY = int(os.environ.get("NAVIGATED_EMBEDDING_CACHE_SIZE", "50000"))
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalized form used as the cache key: lower-cased with collapsed
+    whitespace (what the uncased BERT tokenizer sees anyway).
+    """
+    return " ".join(str(text).lower().split())
+
+
+def _content_key(model_name: str, normalized: str) -> bytes:
+    return hashlib.sha1(f"{model_name}\0{normalized}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache: in-memory LRU over a SQLite store.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, capacity: int = DEFAULT_MEMORY_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writes = 0
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embedding ("
+                " key BLOB PRIMARY KEY,"
+                " model TEXT NOT NULL,"
+                " text TEXT NOT NULL,"
+                " dim INTEGER NOT NULL,"
+                " vector BLOB NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get_many(self, model_name: str, texts: list) -> dict:
+        """
+        Look up `texts` for `model_name`.
+
+        Returns:
+            dict: normalized text -> float32 vector, for every text found.
+        """
+        found = {}
+        with self._lock:
+            to_fetch = {}
+            for text in texts:
+                norm = normalize_text(text)
+                if norm in found or norm in to_fetch:
+                    continue
+                key = _content_key(model_name, norm)
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    found[norm] = vector
+                else:
+                    to_fetch[norm] = key
+
+            if to_fetch:
+                conn = self._connection()
+                keys = list(to_fetch.values())
+                by_key = {}
+                # stay well under SQLite's bound-parameter limit
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT key, vector FROM embedding WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                    for key, blob in rows:
+                        by_key[bytes(key)] = np.frombuffer(blob, dtype=np.float32)
+
+                for norm, key in to_fetch.items():
+                    vector = by_key.get(key)
+                    if vector is None:
+                        self.misses += 1
+                        continue
+                    self.disk_hits += 1
+                    self._remember(key, vector)
+                    found[norm] = vector
+        return found
+
+    def put_many(self, model_name: str, texts: list, vectors: np.ndarray):
+        """
+        Store one float32 vector per text for `model_name` in both tiers.
+        """
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                norm = normalize_text(text)
+                key = _content_key(model_name, norm)
+                vector = np.ascontiguousarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, model_name, norm, int(vector.shape[0]), vector.tobytes()))
+
+            if rows:
+                conn = self._connection()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embedding (key, model, text, dim, vector) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                conn.commit()
+                self.writes += len(rows)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'path': self.path,
+            'memory_entries': len(self._memory),
+            'memory_capacity': self.capacity,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'writes': self.writes,
+            'hit_rate': round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else None,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Process-wide cache instance, created on first use.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
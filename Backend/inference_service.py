@@ -0,0 +1,523 @@
+# inference_service.py
+#
+# NLP inference (KeyBERT keywords, BERT [CLS] keyword vectors, sentence
+# embeddings, single-encoder keywords) behind one small API. By default every call runs inline in the
+# calling thread. With NAVIGATED_INFERENCE_WORKERS=N the calls are queued
+# instead: a batcher thread gathers requests arriving within a few
+# milliseconds of each other (across all request threads), groups them by
+# operation and hands each group to one of N dedicated worker processes as a
+# single batched forward pass. Callers get concurrent.futures.Future objects.
+#
+# Workers are started as `python -m inference_service` (not forked from the
+# Flask process) and talk to the parent over a local authenticated socket.
+# A worker that dies is replaced and the batch it was running is queued again
+# (once); a worker that does not connect within NAVIGATED_INFERENCE_START_TIMEOUT
+# is given up on, and with no worker left inference runs inline again.
+
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+NUM_WORKERS = int(os.environ.get("NAVIGATED_INFERENCE_WORKERS", "0"))
+MAX_BATCH = int(os.environ.get("NAVIGATED_INFERENCE_MAX_BATCH", "32"))
+MAX_WAIT_MS = float(os.environ.get("NAVIGATED_INFERENCE_MAX_WAIT_MS", "5"))
+REQUEST_TIMEOUT = float(os.environ.get("NAVIGATED_INFERENCE_TIMEOUT", "120"))
+WORKER_THREADS = os.environ.get("NAVIGATED_INFERENCE_THREADS")
+# seconds a new worker process gets to connect back
+START_TIMEOUT = float(os.environ.get("NAVIGATED_INFERENCE_START_TIMEOUT", "60"))
+# times a batch is queued again after the worker running it died
+BATCH_RETRIES = 1
+
+
+# ---- batched executors (run inline or inside a worker process) ----
+
+def _run_keywords(texts, top_n, use_mmr):
+    from model_registry import get_keybert
+
+    all_keywords = get_keybert().extract_keywords(
+        list(texts),
+        keyphrase_ngram_range=(1, 2),
+        stop_words='english',
+        use_mmr=use_mmr,
+        diversity=0.5,
+        highlight=False,
+        top_n=top_n
+    )
+    # KeyBERT unwraps the result when it is given a single document
+    if len(texts) == 1:
+        all_keywords = [all_keywords]
+    # and returns [] for the whole batch when no document has a candidate
+    # word (CountVectorizer "empty vocabulary", e.g. all stop words)
+    if len(all_keywords) != len(texts):
+        return [[] for _ in texts]
+    return [list(keywords) for keywords in all_keywords]
+
+
+def _run_encode_keywords(keyword_lists):
+    from keyword_encoder import encode_keyword_groups
+    return encode_keyword_groups(keyword_lists)
+
+
+def _run_encode_sentences(texts, model_key):
+    from model_registry import get_model
+    emb = get_model(model_key).encode(list(texts), convert_to_numpy=True)
+    return list(np.asarray(emb, dtype=np.float32))
+
+
+def _run_single_encoder(items, top_n):
+    """
+    KeyBERT keywords plus their vectors and a heading vector, all from the
+    KeyBERT (mpnet) model: the document / candidate embeddings KeyBERT
+    computes are passed back into extract_keywords and reused as keyword
+    vectors instead of being thrown away.
+    """
+    from sklearn.feature_extraction.text import CountVectorizer
+    from model_registry import get_keybert, get_model
+
+    kw_model = get_keybert()
+    docs = [doc for doc, _ in items]
+    headings = np.asarray(
+        get_model('keyword_sentence').encode([heading for _, heading in items], convert_to_numpy=True),
+        dtype=np.float32)
+
+    try:
+        # same candidate vocabulary KeyBERT builds internally, so rows line up
+        vocabulary = CountVectorizer(ngram_range=(1, 2), stop_words='english').fit(docs).get_feature_names_out()
+    except ValueError:
+        # no candidate words in any document
+        return [([], np.zeros((0, headings.shape[1]), dtype=np.float32), h) for h in headings]
+
+    doc_embeddings, word_embeddings = kw_model.extract_embeddings(
+        docs, keyphrase_ngram_range=(1, 2), stop_words='english')
+    all_keywords = kw_model.extract_keywords(
+        docs,
+        keyphrase_ngram_range=(1, 2),
+        stop_words='english',
+        use_mmr=True,
+        diversity=0.5,
+        top_n=top_n,
+        doc_embeddings=doc_embeddings,
+        word_embeddings=word_embeddings,
+    )
+    if len(docs) == 1:
+        all_keywords = [all_keywords]
+    if len(all_keywords) != len(docs):
+        all_keywords = [[] for _ in docs]
+
+    row_of = {word: i for i, word in enumerate(vocabulary)}
+    word_embeddings = np.asarray(word_embeddings, dtype=np.float32)
+    results = []
+    for keywords, heading in zip(all_keywords, headings):
+        rows = [row_of[k] for k, _ in keywords]
+        results.append((list(keywords), word_embeddings[rows], heading))
+    return results
+
+
+def run_batch(op_key: tuple, args_list: list) -> list:
+    """
+    Execute one batch of same-kind requests and return one result per item.
+    op_key is the grouping key, e.g. ('keywords', top_n, use_mmr).
+    """
+    op = op_key[0]
+    if op == 'keywords':
+        _, top_n, use_mmr = op_key
+        return _run_keywords(args_list, top_n, use_mmr)
+    if op == 'encode_keywords':
+        return _run_encode_keywords(args_list)
+    if op == 'encode_sentences':
+        return _run_encode_sentences(args_list, op_key[1])
+    if op == 'single_encoder':
+        return _run_single_encoder(args_list, op_key[1])
+    if op == 'ping':
+        # round trip without a model (liveness checks)
+        return list(args_list)
+    raise ValueError(f"Unknown inference op '{op}'")
+
+
+# ---- the service (parent side) ----
+
+class _Request:
+    __slots__ = ('op_key', 'args', 'future', 'enqueued_at')
+
+    def __init__(self, op_key, args):
+        self.op_key = op_key
+        self.args = args
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class InferenceService:
+    """
+    Local micro-batching queue in front of a pool of inference processes.
+    """
+
+    # the worker process, given the parent's host and port
+    worker_command = [sys.executable, '-m', 'inference_service']
+
+    def __init__(self, num_workers: int, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS,
+                 start_timeout: float = START_TIMEOUT):
+        self.num_workers = num_workers
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.start_timeout = start_timeout
+        self._requests = queue.Queue()
+        self._batches = queue.Queue()
+        self._processes = []
+        self._lock = threading.Lock()
+        self._spawn_lock = threading.Lock()
+        self._listener = None
+        self._closed = False
+        self._connections = queue.Queue()
+        self._authkey = None
+        # metrics
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.batches = 0
+        self.batch_sizes = Counter()
+        self.max_queue_depth = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+        self.respawns = 0
+        self.retried_batches = 0
+
+    def start(self) -> int:
+        """
+        Start the worker processes and the batcher.
+
+        Returns:
+            int: Number of workers that connected (0: nothing was started).
+        """
+        self._authkey = os.urandom(16)
+        self._listener = Listener(('127.0.0.1', 0), authkey=self._authkey)
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        started = 0
+        for _ in range(self.num_workers):
+            worker = self._spawn()
+            if worker is None:
+                continue
+            with self._lock:
+                self._processes.append(worker[1])
+            threading.Thread(target=self._worker_loop, args=worker, daemon=True).start()
+            started += 1
+        if not started:
+            self._closed = True
+            self._listener.close()
+            return 0
+        threading.Thread(target=self._batch_loop, daemon=True).start()
+        print(f"[inference_service] started {started}/{self.num_workers} worker(s), "
+              f"max_batch={self.max_batch}, max_wait={self.max_wait * 1000:.1f}ms")
+        return started
+
+    def _accept_loop(self):
+        # every connection, authenticated, with the pid the worker announces
+        while True:
+            try:
+                conn = self._listener.accept()
+                pid = conn.recv()
+            except (EOFError, OSError):
+                if self._closed:
+                    return
+                continue
+            except Exception as e:
+                print(f"ERROR: Rejected an inference worker connection -> {e}")
+                continue
+            self._connections.put((pid, conn))
+
+    def _spawn(self):
+        """
+        Start one worker process and wait (up to start_timeout) for it to
+        connect. Returns (conn, process), or None when it exits or times out.
+        """
+        host, port = self._listener.address
+        env = dict(os.environ, NAVIGATED_INFERENCE_WORKERS="0",
+                   NAVIGATED_INFERENCE_AUTHKEY=self._authkey.hex())
+        backend_dir = os.path.dirname(os.path.abspath(__file__))
+        with self._spawn_lock:
+            process = subprocess.Popen(self.worker_command + [host, str(port)], cwd=backend_dir, env=env)
+            deadline = time.monotonic() + self.start_timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print(f"ERROR: Inference worker (pid {process.pid}) did not connect "
+                          f"within {self.start_timeout:.0f}s")
+                    process.kill()
+                    return None
+                try:
+                    pid, conn = self._connections.get(timeout=min(remaining, 0.2))
+                except queue.Empty:
+                    if process.poll() is not None:
+                        print(f"ERROR: Inference worker exited with code {process.returncode} before connecting")
+                        return None
+                    continue
+                if pid == process.pid:
+                    return conn, process
+                conn.close()  # a worker given up on earlier
+
+    def _replace(self, process):
+        # a new worker in place of `process`; None when it cannot be started
+        if process.poll() is None:
+            process.kill()
+        worker = self._spawn()
+        with self._lock:
+            if worker is None:
+                self._processes.remove(process)
+            else:
+                self._processes[self._processes.index(process)] = worker[1]
+                self.respawns += 1
+        return worker
+
+    def submit(self, op_key: tuple, args) -> Future:
+        request = _Request(op_key, args)
+        self._requests.put(request)
+        with self._lock:
+            self.submitted += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth())
+        return request.future
+
+    def queue_depth(self) -> int:
+        return self._requests.qsize() + self._batches.qsize()
+
+    def _batch_loop(self):
+        while True:
+            first = self._requests.get()
+            pending = [first]
+            deadline = time.perf_counter() + self.max_wait
+            while len(pending) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            groups = {}
+            for request in pending:
+                groups.setdefault(request.op_key, []).append(request)
+            for op_key, requests in groups.items():
+                self._batches.put((op_key, requests, 0))
+
+    def _worker_loop(self, conn, process):
+        while True:
+            op_key, requests, attempts = self._batches.get()
+            started = time.perf_counter()
+            if conn is None:
+                # last worker gone: run the batch in this process
+                try:
+                    ok, payload = True, run_batch(op_key, [r.args for r in requests])
+                except Exception as e:
+                    ok, payload = False, f"{type(e).__name__}: {e}"
+            else:
+                sent = False
+                try:
+                    if process.poll() is not None:
+                        raise EOFError(f"exited with code {process.returncode}")
+                    conn.send((op_key, [r.args for r in requests]))
+                    sent = True
+                    ok, payload = conn.recv()
+                except (EOFError, OSError) as e:
+                    # the worker died: stop taking batches on this connection
+                    print(f"ERROR: Inference worker (pid {process.pid}) connection lost -> {e}")
+                    conn.close()
+                    if not sent:
+                        # it never saw the batch
+                        self._batches.put((op_key, requests, attempts))
+                    elif attempts < BATCH_RETRIES:
+                        with self._lock:
+                            self.retried_batches += 1
+                        self._batches.put((op_key, requests, attempts + 1))
+                    else:
+                        self._finish(op_key, requests, started, False,
+                                     f"inference worker connection lost: {e}")
+                    worker = self._replace(process)
+                    if worker is not None:
+                        conn, process = worker
+                        continue
+                    with self._lock:
+                        others = len(self._processes)
+                    if others:
+                        return  # dropped from the pool
+                    print("ERROR: No inference worker left; running inference in the web process")
+                    conn, process = None, None
+                    continue
+            if ok and (not isinstance(payload, list) or len(payload) != len(requests)):
+                ok, payload = False, (f"inference worker returned {len(payload) if isinstance(payload, list) else type(payload).__name__} "
+                                      f"results for a batch of {len(requests)}")
+            self._finish(op_key, requests, started, ok, payload)
+
+    def _finish(self, op_key, requests, started, ok, payload):
+        finished = time.perf_counter()
+        with self._lock:
+            self.batches += 1
+            self.batch_sizes[len(requests)] += 1
+            self.total_run_seconds += finished - started
+            self.total_wait_seconds += sum(started - r.enqueued_at for r in requests)
+            if ok:
+                self.completed += len(requests)
+            else:
+                self.failed += len(requests)
+
+        try:
+            for i, request in enumerate(requests):
+                if ok:
+                    request.future.set_result(payload[i])
+                else:
+                    request.future.set_exception(RuntimeError(payload))
+        except Exception as e:
+            # one bad batch must not end the worker loop (every later caller would time out)
+            print(f"ERROR: Failed to deliver an inference batch -> {e}")
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(RuntimeError(f"inference batch delivery failed: {e}"))
+
+    def stats(self) -> dict:
+        with self._lock:
+            done = self.completed + self.failed
+            return {
+                'workers': self.num_workers,
+                'alive_workers': sum(1 for p in self._processes if p.poll() is None),
+                'respawns': self.respawns,
+                'retried_batches': self.retried_batches,
+                'queue_depth': self.queue_depth(),
+                'max_queue_depth': self.max_queue_depth,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'batches': self.batches,
+                'mean_batch_size': round(done / self.batches, 2) if self.batches else None,
+                'batch_size_histogram': {str(k): v for k, v in sorted(self.batch_sizes.items())},
+                'mean_queue_wait_ms': round(1000 * self.total_wait_seconds / done, 2) if done else None,
+                'mean_batch_run_ms': round(1000 * self.total_run_seconds / self.batches, 2) if self.batches else None,
+            }
+
+
+_service = None
+_service_lock = threading.Lock()
+# no worker could be started: inference runs inline for the life of the process
+_start_failed = False
+
+
+def get_inference_service():
+    """
+    The process-wide service, started on first use; None when
+    NAVIGATED_INFERENCE_WORKERS is 0 or no worker could be started
+    (inference runs inline).
+    """
+    global _service, _start_failed
+    if NUM_WORKERS <= 0 or _start_failed:
+        return None
+    if _service is None:
+        with _service_lock:
+            if _service is None and not _start_failed:
+                service = InferenceService(NUM_WORKERS)
+                if service.start():
+                    _service = service
+                else:
+                    print("ERROR: No inference worker started; running inference in the web process")
+                    _start_failed = True
+    return _service
+
+
+def inference_stats() -> dict:
+    if _service is None:
+        if NUM_WORKERS <= 0:
+            mode = 'inline'
+        else:
+            mode = 'inline (workers failed to start)' if _start_failed else 'not started'
+        return {'workers': 0, 'mode': mode}
+    return _service.stats()
+
+
+def _run(op_key: tuple, args_list: list) -> list:
+    service = get_inference_service()
+    if service is None:
+        return run_batch(op_key, args_list)
+    futures = [service.submit(op_key, args) for args in args_list]
+    return [f.result(timeout=REQUEST_TIMEOUT) for f in futures]
+
+
+# ---- public API used by the pipelines ----
+
+def extract_keywords(texts, top_n=10, use_mmr=False) -> list:
+    """
+    KeyBERT keywords for each (already preprocessed) text:
+    a list of (keyword, score) lists.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    return _run(('keywords', top_n, use_mmr), texts)
+
+
+def encode_keyword_groups(keyword_groups) -> list:
+    """
+    BERT [CLS] embeddings: one float32 matrix per keyword list.
+    """
+    groups = [list(g) for g in keyword_groups]
+    if not groups:
+        return []
+    return _run(('encode_keywords',), groups)
+
+
+def encode_keywords(keywords) -> np.ndarray:
+    """
+    BERT [CLS] embeddings for a single keyword list (float32 matrix).
+    """
+    return encode_keyword_groups([keywords])[0]
+
+
+def encode_sentences(texts, model: str = 'sentence') -> np.ndarray:
+    """
+    SentenceTransformer embeddings, one float32 row per text. `model` is a
+    model_registry key ('sentence' or 'keyword_sentence').
+    """
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack(_run(('encode_sentences', model), texts))
+
+
+def single_encoder_keywords(clean_texts, headings, top_n=10) -> list:
+    """
+    Single-encoder keywords: for each (preprocessed text, heading) a tuple
+    (list of (keyword, score), keyword vectors (k x 768), heading vector),
+    all from the KeyBERT mpnet model.
+    """
+    items = list(zip(clean_texts, headings))
+    if not items:
+        return []
+    return _run(('single_encoder', top_n), items)
+
+
+# ---- worker process entry point ----
+
+def _worker_main(host: str, port: int):
+    if WORKER_THREADS:
+        import torch
+        torch.set_num_threads(int(WORKER_THREADS))
+
+    authkey = bytes.fromhex(os.environ["NAVIGATED_INFERENCE_AUTHKEY"])
+    conn = Client((host, port), authkey=authkey)
+    conn.send(os.getpid())
+    while True:
+        try:
+            op_key, args_list = conn.recv()
+        except EOFError:
+            break
+        try:
+            conn.send((True, run_batch(op_key, args_list)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+
+
+if __name__ == "__main__":
+    _worker_main(sys.argv[1], int(sys.argv[2]))
@@ -3,12 +3,15 @@
 from flask import Flask
 from flask_cors import CORS
 from flask_mysqldb import MySQL
+from vector_codec import NumpyJSONProvider
 # from routes_summary import summary_bp
 
 
 print("this should run only once")
 
 app: Flask = Flask(__name__)
+# polyline / embedding columns come back as numpy arrays
+app.json = NumpyJSONProvider(app)
 
 CORS(app)
 
@@ -0,0 +1,265 @@
+# job_queue.py
+#
+# Persistent background jobs for the heavy content-ingestion endpoints (PDF /
+# transcript parsing, KeyBERT, BERT). A route validates its input, calls
+# enqueue() and answers 202 with a job id right away; `flask job-worker`
+# processes claim queued jobs from a SQLite table, run the registered handler
+# and store its result. GET /jobs/<id> reports status, progress and result.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+DEFAULT_JOB_DB_PATH = os.environ.get(
+    "NAVIGATED_JOB_DB", os.path.join(os.getcwd(), "jobs.sqlite3"))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+_handlers = {}
+
+
+def job_handler(kind: str):
+    """
+    Register `fn(payload, progress)` as the handler for jobs of `kind`.
+    The handler returns (body, http_status) like a Flask view; `progress`
+    is a callback progress(fraction, message=None).
+    """
+    def decorator(fn):
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+class JobQueue:
+    """
+    SQLite-backed job table shared by the web process and the workers.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOB_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30,
+                                         isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS job ("
+                " id TEXT PRIMARY KEY,"
+                " kind TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " progress REAL NOT NULL DEFAULT 0,"
+                " message TEXT,"
+                " payload TEXT NOT NULL,"
+                " result TEXT,"
+                " http_status INTEGER,"
+                " error TEXT,"
+                " worker TEXT,"
+                " created_at REAL NOT NULL,"
+                " started_at REAL,"
+                " finished_at REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS job_status_created ON job (status, created_at)")
+        return self._conn
+
+    def enqueue(self, kind: str, payload: dict) -> str:
+        if kind not in _handlers:
+            raise KeyError(f"No job handler registered for '{kind}'")
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._connection().execute(
+                "INSERT INTO job (id, kind, status, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(payload), time.time()),
+            )
+        return job_id
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._connection().execute("SELECT * FROM job WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_dict(row) if row is not None else None
+
+    def claim(self, worker: str):
+        """
+        Atomically move the oldest queued job to 'running' and return it.
+        """
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM job WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE job SET status = ?, worker = ?, started_at = ? WHERE id = ?",
+                        (RUNNING, worker, time.time(), row['id']),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return _row_to_dict(row, include_payload=True) if row is not None else None
+
+    def set_progress(self, job_id: str, progress: float, message: str = None):
+        with self._lock:
+            self._connection().execute(
+                "UPDATE job SET progress = ?, message = COALESCE(?, message) WHERE id = ?",
+                (float(progress), message, job_id),
+            )
+
+    def finish(self, job_id: str, result, http_status: int):
+        status = SUCCEEDED if http_status < 400 else FAILED
+        with self._lock:
+            self._connection().execute(
+                "UPDATE job SET status = ?, progress = 1, result = ?, http_status = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result), http_status, time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, error: str):
+        with self._lock:
+            self._connection().execute(
+                "UPDATE job SET status = ?, error = ?, http_status = 500, result = ?, finished_at = ? WHERE id = ?",
+                (FAILED, error, json.dumps({"error": "Server error", "details": error}), time.time(), job_id),
+            )
+
+    def requeue_running(self, worker_prefix: str = None) -> int:
+        """
+        Put 'running' jobs back in the queue (after a worker crash/restart).
+        """
+        with self._lock:
+            if worker_prefix:
+                cur = self._connection().execute(
+                    "UPDATE job SET status = ?, worker = NULL WHERE status = ? AND worker LIKE ?",
+                    (QUEUED, RUNNING, worker_prefix + '%'),
+                )
+            else:
+                cur = self._connection().execute(
+                    "UPDATE job SET status = ?, worker = NULL WHERE status = ?", (QUEUED, RUNNING))
+            return cur.rowcount
+
+    def requeue_orphaned(self, host: str) -> int:
+        """
+        Put back in the queue the 'running' jobs of workers on `host`
+        ("host:pid") whose process is gone. Jobs of live workers, e.g. a
+        separately started `flask job-worker`, are left alone.
+        """
+        prefix = f"{host}:"
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT id, worker FROM job WHERE status = ? AND worker LIKE ?", (RUNNING, prefix + '%'),
+            ).fetchall()
+        orphaned = [row['id'] for row in rows if not _process_alive(row['worker'][len(prefix):])]
+        if not orphaned:
+            return 0
+        with self._lock:
+            cur = self._connection().executemany(
+                "UPDATE job SET status = ?, worker = NULL WHERE id = ? AND status = ?",
+                [(QUEUED, job_id, RUNNING) for job_id in orphaned],
+            )
+            return cur.rowcount
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._connection().execute("SELECT status, COUNT(*) FROM job GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+def _process_alive(pid: str) -> bool:
+    try:
+        os.kill(int(pid), 0)
+    except ValueError:
+        return False
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # exists, owned by another user
+        return True
+    return True
+
+
+def _row_to_dict(row, include_payload: bool = False) -> dict:
+    job = {
+        'id': row['id'],
+        'kind': row['kind'],
+        'status': row['status'],
+        'progress': row['progress'],
+        'message': row['message'],
+        'http_status': row['http_status'],
+        'result': json.loads(row['result']) if row['result'] is not None else None,
+        'error': row['error'],
+        'created_at': row['created_at'],
+        'started_at': row['started_at'],
+        'finished_at': row['finished_at'],
+    }
+    if include_payload:
+        job['payload'] = json.loads(row['payload'])
+    return job
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Process-wide queue instance, created on first use.
+    """
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
+
+
+def enqueue(kind: str, payload: dict) -> str:
+    return get_job_queue().enqueue(kind, payload)
+
+
+def run_job(job: dict, on_error=None):
+    """
+    Run one claimed job through its handler and store the outcome.
+    `on_error` (e.g. db.session.rollback) is called when the handler raises.
+    """
+    queue = get_job_queue()
+    job_id = job['id']
+
+    def progress(fraction, message=None):
+        queue.set_progress(job_id, fraction, message)
+
+    try:
+        handler = _handlers[job['kind']]
+        body, http_status = handler(job['payload'], progress)
+        queue.finish(job_id, body, http_status)
+    except Exception as e:
+        if on_error is not None:
+            on_error()
+        print(f"[job_queue] job {job_id} ({job['kind']}) failed: {e}")
+        traceback.print_exc()
+        queue.fail(job_id, str(e))
+
+
+def work(worker: str, poll_interval: float = 1.0, should_stop=None, on_error=None, after_job=None):
+    """
+    Worker loop: claim and run jobs until should_stop() returns True.
+    """
+    queue = get_job_queue()
+    while not (should_stop and should_stop()):
+        job = queue.claim(worker)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        print(f"[job_queue] {worker} running job {job['id']} ({job['kind']})")
+        run_job(job, on_error=on_error)
+        if after_job is not None:
+            after_job()
@@ -0,0 +1,106 @@
+# keyword_encoder.py
+#
+# Batched BERT [CLS] encoder for keywords / keyphrases.
+# Keywords are tokenized once, sorted by token length so that every batch
+# holds similarly sized inputs, padded only up to the longest item in the
+# batch, and run through the shared BERT model under torch.inference_mode.
+# Results are cached per (model, normalized keyword) in embedding_cache, so
+# only keywords that were never seen before reach the model.
+
+import numpy as np
+import torch
+
+from embedding_cache import get_embedding_cache, normalize_text
+from model_registry import get_bert, cache_namespace, BERT_MODEL_NAME
+
+DEFAULT_BATCH_SIZE = 64
+EMBEDDING_DIM = 768
+
+
+def encode_keywords(keywords, batch_size: int = DEFAULT_BATCH_SIZE, use_cache: bool = True) -> np.ndarray:
+    """
+    Encode keywords into BERT [CLS] embeddings.
+
+    Parameters:
+        keywords (list): Keyword / keyphrase strings, in any order.
+        batch_size (int): Number of keywords per forward pass.
+        use_cache (bool): Serve repeated keywords from the embedding cache.
+
+    Returns:
+        np.ndarray: C-contiguous float32 matrix of shape (len(keywords), 768),
+        row i being the embedding of keywords[i].
+    """
+    keywords = [str(k) for k in keywords]
+    if not keywords:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    if not use_cache:
+        return _encode_batched(keywords, batch_size)
+
+    cache = get_embedding_cache()
+    namespace = cache_namespace(BERT_MODEL_NAME)
+    normalized = [normalize_text(k) for k in keywords]
+    found = cache.get_many(namespace, normalized)
+
+    missing = list(dict.fromkeys(n for n in normalized if n not in found))
+    if missing:
+        encoded = _encode_batched(missing, batch_size)
+        cache.put_many(namespace, missing, encoded)
+        found.update(zip(missing, encoded))
+
+    out = np.empty((len(keywords), found[normalized[0]].shape[0]), dtype=np.float32)
+    for row, norm in enumerate(normalized):
+        out[row] = found[norm]
+    return out
+
+
+def _encode_batched(keywords: list, batch_size: int) -> np.ndarray:
+    """
+    Run the length-bucketed forward passes for `keywords` (no caching).
+    """
+    tokenizer, model = get_bert()
+    input_ids = tokenizer(keywords, truncation=True)["input_ids"]
+    pad_id = tokenizer.pad_token_id or 0
+
+    # Length buckets: sorting by token count keeps padding inside a batch minimal
+    order = sorted(range(len(input_ids)), key=lambda i: len(input_ids[i]))
+    out = np.empty((len(keywords), model.config.hidden_size), dtype=np.float32)
+
+    with torch.inference_mode():
+        for start in range(0, len(order), batch_size):
+            batch_idx = order[start:start + batch_size]
+            max_len = len(input_ids[batch_idx[-1]])
+
+            ids = np.full((len(batch_idx), max_len), pad_id, dtype=np.int64)
+            mask = np.zeros((len(batch_idx), max_len), dtype=np.int64)
+            for row, i in enumerate(batch_idx):
+                seq = input_ids[i]
+                ids[row, :len(seq)] = seq
+                mask[row, :len(seq)] = 1
+
+            outputs = model(
+                input_ids=torch.from_numpy(ids),
+                attention_mask=torch.from_numpy(mask),
+                token_type_ids=torch.zeros_like(torch.from_numpy(ids)),
+            )
+            out[batch_idx] = outputs.last_hidden_state[:, 0, :].float().numpy()
+
+    return out
+
+
+def encode_keyword_groups(keyword_groups, batch_size: int = DEFAULT_BATCH_SIZE) -> list:
+    """
+    Encode several keyword lists (one per document) in a single batched pass.
+
+    Returns:
+        list: One float32 matrix per group, shape (len(group), 768).
+    """
+    groups = [list(g) for g in keyword_groups]
+    flat = [k for g in groups for k in g]
+    matrix = encode_keywords(flat, batch_size=batch_size)
+
+    result = []
+    offset = 0
+    for g in groups:
+        result.append(matrix[offset:offset + len(g)])
+        offset += len(g)
+    return result
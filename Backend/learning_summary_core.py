@@ -1,133 +1,61 @@
 # learning_summary_core.py
 
-import re
-import math
 import json
 from collections import Counter
 
 import numpy as np
-import torch
 
-from bs4 import BeautifulSoup
-import nltk
-from nltk.stem import WordNetLemmatizer, PorterStemmer
-from nltk.corpus import stopwords
+import inference_service
+import polyline_kernel
+from radial_projection import radial_axes, project
+# preprocessing (same structure as utils_preprocess_text, shared engine)
+from text_preprocessing import preprocess_texts
 
-from sentence_transformers import SentenceTransformer
-from transformers import BertModel, BertTokenizer
-from keybert import KeyBERT
-from sklearn.cluster import KMeans
+# summary pipeline modes, selectable per course (Course.summary_encoder)
+THREE_MODEL_ENCODER = 'three_model'
+SINGLE_ENCODER = 'single'
+SUMMARY_ENCODERS = (THREE_MODEL_ENCODER, SINGLE_ENCODER)
 
 
-# ---- NLTK setup (same resources ma'am used) ----
-# Run these once; in production you might pre-download.
-import ssl
-try:
-    _create_unverified_https_context = ssl._create_unverified_context
-except AttributeError:
-    pass
-else:
-    ssl._create_default_https_context = _create_unverified_https_context
-
-nltk.download('stopwords', quiet=True)
-nltk.download('wordnet', quiet=True)
-nltk.download('punkt', quiet=True)
-
-stop_words = set(stopwords.words('english'))
-
-
-# ---- PREPROCESSING (same structure as utils_preprocess_text) ----
-
-def utils_preprocess_text(text, flg_stemm=False, flg_lemm=True, lst_stopwords=None):
-    # Remove HTML
-    soup = BeautifulSoup(text, 'lxml')
-    text = soup.get_text()
-
-    # Remove punctuations and numbers
-    text = re.sub('[^a-zA-Z]', ' ', text)
-
-    # Single character removal
-    text = re.sub(r"\s+[a-zA-Z]\s+", ' ', text)
-
-    # Removing multiple spaces
-    text = re.sub(r'\s+', ' ', text)
-
-    # Tokenize
-    lst_text = text.split()
-
-    # Remove stopwords
-    if lst_stopwords is not None:
-        lst_text = [word for word in lst_text if word not in lst_stopwords]
-
-    # Stemming
-    if flg_stemm:
-        ps = PorterStemmer()
-        lst_text = [ps.stem(word) for word in lst_text]
-
-    # Lemmatization
-    if flg_lemm:
-        lem = WordNetLemmatizer()
-        lst_text = [lem.lemmatize(word) for word in lst_text]
-
-    return " ".join(lst_text)
-
-
-# ---- GLOBAL MODELS (same architecture ma'am used) ----
-
-_sentence_model = SentenceTransformer('bert-base-nli-mean-tokens')
-_kw_model = KeyBERT(model='all-mpnet-base-v2')
-_bert_tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
-_bert_model = BertModel.from_pretrained('bert-base-uncased')
-
-
-# ---- KEYWORDS + EMBEDDINGS (KeyBERT + BERT) ----
+# ---- KEYWORDS + EMBEDDINGS (KeyBERT + BERT, via inference_service) ----
 
 def extract_keywords_for_text(text, num_keywords=10):
     """
     Given raw summary text, return (keyword_list, weight_list)
     using KeyBERT with same settings as notebook.
     """
-    clean_text = utils_preprocess_text(
-        text.lower(),
-        flg_stemm=False,
-        flg_lemm=True,
-        lst_stopwords=stop_words
-    )
-
-    keywords = _kw_model.extract_keywords(
-        clean_text,
-        keyphrase_ngram_range=(1, 2),
-        stop_words='english',
-        use_mmr=True,
-        diversity=0.5,
-        highlight=False,
-        top_n=num_keywords
-    )
-
-    keyword_list = list(dict(keywords).keys())
-    weight_list = list(dict(keywords).values())
-    return keyword_list, weight_list
+    return extract_keywords_for_texts([text], num_keywords=num_keywords)[0]
 
 
-def create_embeddings_for_keywords(keywords):
+def extract_keywords_for_texts(texts, num_keywords=10):
     """
-    BERT [CLS] embeddings for each keyword.
+    Batched extract_keywords_for_text: all documents go through one KeyBERT
+    call (or one inference-worker batch, see inference_service).
+    Returns a list of (keyword_list, weight_list), one per text.
     """
-    if not keywords:
+    if not texts:
         return []
 
-    tokenized_inputs = _bert_tokenizer(
-        keywords,
-        padding=True,
-        truncation=True,
-        return_tensors="pt"
-    )
+    clean_texts = preprocess_texts(texts, lower=True, flg_stemm=False, flg_lemm=True, lst_stopwords='english')
 
-    with torch.no_grad():
-        outputs = _bert_model(**tokenized_inputs)
+    all_keywords = inference_service.extract_keywords(clean_texts, top_n=num_keywords, use_mmr=True)
 
-    embeddings = outputs.last_hidden_state[:, 0, :].numpy()
-    return embeddings.tolist()
+    results = []
+    for keywords in all_keywords:
+        results.append((list(dict(keywords).keys()), [float(w) for w in dict(keywords).values()]))
+    # KeyBERT returns [] for the whole batch when no text has a candidate word
+    results += [([], [])] * (len(texts) - len(results))
+    return results
+
+
+def create_embeddings_for_keywords(keywords):
+    """
+    BERT [CLS] embeddings for each keyword (batched encoder).
+    """
+    if not keywords:
+        return []
+
+    return inference_service.encode_keywords(keywords).tolist()
 
 
 def create_embeddings_centroid(embeddings, weights):
@@ -150,8 +78,7 @@ def heading_embedding_from_text(text):
     Use first line of summary as 'heading' for SentenceTransformer embedding.
     """
     first_line = text.split('\n')[0]
-    emb = _sentence_model.encode(first_line, convert_to_tensor=True)
-    return emb.cpu().numpy().tolist()
+    return inference_service.encode_sentences([first_line])[0].tolist()
 
 
 def average_embeddings(emb1, emb2, num_keywords):
@@ -166,29 +93,15 @@ def average_embeddings(emb1, emb2, num_keywords):
     return [(x + y * num_keywords) / (num_keywords + 1) for x, y in zip(emb1, emb2)]
 
 
-# ---- TOPIC POLYLINE (cosine similarity against topic embeddings) ----
-
-def get_cos_sim(a, b):
-    a = np.array(a)
-    b = np.array(b)
-    dot_product = float(np.dot(a, b))
-    norm_a = float(np.linalg.norm(a))
-    norm_b = float(np.linalg.norm(b))
-    if norm_a == 0 or norm_b == 0:
-        return 0.0
-    return dot_product / (norm_a * norm_b)
-
+# ---- TOPIC POLYLINE (cosine similarity against topic embeddings, see polyline_kernel) ----
 
 def create_polyline_for_embedding(embedding, topic_embeddings):
     """
     Same as create_polyline(final_embeddings):
     embedding -> list[{x: topic_index, y: scaled_cos_sim}]
     """
-    polyline = []
-    for j, topic_vec in enumerate(topic_embeddings):
-        cos_sim = (get_cos_sim(topic_vec, embedding) + 1) / 2.0  # [0,1]
-        polyline.append({'x': j, 'y': float(cos_sim)})
-    return polyline
+    scaled = polyline_kernel.scaled_similarity(embedding, topic_embeddings)[0]  # [0,1]
+    return [{'x': j, 'y': y} for j, y in enumerate(scaled.tolist())]
 
 
 def polyline_to_array(polyline):
@@ -205,76 +118,43 @@ def beta_scale_array(arr, beta=15.0):
     if len(arr) == 0:
         return arr
 
-    mean_val = np.average(arr)
-    v2 = []
-    for j in arr:
-        jj = j + beta * (j - mean_val)
-        if jj > 1:
-            jj = 1
-        if jj < 0:
-            jj = 0
-        v2.append(jj)
-    return np.array(v2, dtype=float)
+    return polyline_kernel.beta_scale(arr, beta)
 
 
 # ---- RADIAL PROJECTION TO 2D (rad_plot_axes + rad_plot_poly) ----
 
 def rad_plot_axes(num, x_max=1.0, y_max=1.0):
     """
-    Compute tlen and theta using same logic as rad_plot_axes in notebook.
+    tlen and theta using same logic as rad_plot_axes in notebook (memoized).
     """
-    empt_arr = []
-    xstop = []
-    ystop = []
-    tlen = []
-    ttempl = []
-    theta = ((math.pi) / (num - 1)) / 2
-    b = 0
-    while (b * theta) <= (math.atan(y_max / x_max)):
-        empt_arr.append(x_max * math.tan(b * theta))
-        ystop.append(empt_arr[b])
-        ttemp = math.sqrt(
-            (x_max * x_max)
-            + (x_max * math.tan(b * theta) * x_max * math.tan(b * theta))
-        )
-        tlen.append(ttemp)
-        if (b * theta != math.atan(y_max / x_max)):
-            ttempl.append(ttemp)
-        b += 1
-
-    while b < num:
-        ystop.append(y_max)
-        b += 1
-
-    tlen.extend(list(reversed(ttempl)))
-    xstop = list(reversed(ystop))
-    # we don't need xstop for centroid, just tlen + theta
-    return tlen, theta
+    return radial_axes(num, x_max, y_max)
 
 
 def radial_centroid(poly_array, tlen, theta):
     """
     Convert 1D poly_array to x,y using same formula as rad_plot_poly centroid.
     """
-    num = len(poly_array)
-    if num == 0:
+    if len(poly_array) == 0:
         return 0.0, 0.0
 
-    x_values = []
-    y_values = []
-    for p in range(num):
-        rlen = poly_array[p] * tlen[p]
-        x_values.append(rlen * math.cos(p * theta))
-        y_values.append(rlen * math.sin(p * theta))
-
-    avg_x = sum(x_values) / num
-    avg_y = sum(y_values) / num
-    return float(avg_x), float(avg_y)
+    x, y = project(poly_array, tlen, theta)[0]
+    return float(x), float(y)
 
 
 # ---- MAIN: SUMMARY -> POLYLINE + (x, y) ----
 
-def summary_to_coordinates(summary_text, topic_embeddings, num_keywords=10, beta=15.0):
+def summary_to_coordinates(summary_text, topic_embeddings, num_keywords=10, beta=15.0, encoder=THREE_MODEL_ENCODER):
+    """
+    Take ONE learner summary text and topic_embeddings.
+    Returns: (polyline_list_of_dicts, x, y)
+    """
+    _, _, polyline, x, y = summary_keywords_and_coordinates(
+        summary_text, topic_embeddings, num_keywords=num_keywords, beta=beta, encoder=encoder)
+    return polyline, x, y
+
+
+def summary_keywords_and_coordinates(summary_text, topic_embeddings, num_keywords=10, beta=15.0,
+                                     encoder=THREE_MODEL_ENCODER):
     """
     Take ONE learner summary text and topic_embeddings:
       - preprocess
@@ -285,18 +165,32 @@ def summary_to_coordinates(summary_text, topic_embeddings, num_keywords=10, beta
       - polyline vs topics
       - beta scaling
       - radial projection -> (x, y)
-    Returns: (polyline_list_of_dicts, x, y)
+    encoder selects where keywords and vectors come from:
+      'three_model' - KeyBERT keywords, BERT [CLS] keyword vectors, NLI heading
+      'single'      - keywords, keyword vectors and heading all from KeyBERT's
+                      mpnet model (topic_embeddings must be mpnet vectors too)
+    Returns: (keyword_list, weight_list, polyline_list_of_dicts, x, y)
     """
 
-    # 1. keywords + weights
-    kw_list, weight_list = extract_keywords_for_text(summary_text, num_keywords=num_keywords)
-
-    # 2. keyword embeddings + centroid
-    kw_emb = create_embeddings_for_keywords(kw_list)
-    centroid_emb = create_embeddings_centroid(kw_emb, weight_list)
-
-    # 3. heading embedding
-    head_emb = heading_embedding_from_text(summary_text)
+    if encoder == SINGLE_ENCODER:
+        # 1-3. keywords, keyword vectors and heading in one model
+        clean_text = preprocess_texts([summary_text], lower=True, flg_stemm=False, flg_lemm=True, lst_stopwords='english')[0]
+        keywords, kw_vectors, head_vector = inference_service.single_encoder_keywords(
+            [clean_text], [summary_text.split('\n')[0]], top_n=num_keywords)[0]
+        kw_list = [k for k, _ in keywords]
+        weight_list = [float(w) for _, w in keywords]
+        centroid_emb = create_embeddings_centroid(kw_vectors.tolist(), weight_list)
+        head_emb = head_vector.tolist()
+    else:
+        # 1. keywords + weights
+        kw_list, weight_list = extract_keywords_for_text(summary_text, num_keywords=num_keywords)
+
+        # 2. keyword embeddings + centroid
+        kw_emb = create_embeddings_for_keywords(kw_list)
+        centroid_emb = create_embeddings_centroid(kw_emb, weight_list)
+
+        # 3. heading embedding
+        head_emb = heading_embedding_from_text(summary_text)
 
     # 4. combined embedding
     final_emb = average_embeddings(head_emb, centroid_emb, num_keywords)
@@ -311,7 +205,7 @@ def summary_to_coordinates(summary_text, topic_embeddings, num_keywords=10, beta
     tlen, theta = rad_plot_axes(num_topics, 1, 1)
     x, y = radial_centroid(beta_arr, tlen, theta)
 
-    return polyline, x, y
+    return kw_list, weight_list, polyline, x, y
 
 
 # ---- CLUSTERING + TOP-10 KEYWORDS (KMeans + Counter) ----
@@ -326,6 +220,7 @@ def cluster_summaries(poly_arrays, keywords_per_summary, opt_k=None):
         top_keywords: dict cluster_index -> list of top 10 keywords
     """
     from sympy.geometry import Point, Line
+    from sklearn.cluster import KMeans
 
     before_learners = poly_arrays
     n = len(before_learners)
@@ -1,81 +1,16 @@
 import pandas as pd
-from bs4 import BeautifulSoup
-import re
-import nltk
-from nltk.stem import WordNetLemmatizer, PorterStemmer
-from nltk.corpus import stopwords
-from sentence_transformers import SentenceTransformer
+from text_preprocessing import utils_preprocess_text, preprocess_column  # utils_preprocess_text kept importable from here
 import numpy as np
-from transformers import BertModel, BertTokenizer, BertForMaskedLM
-import torch
 from dbModels import db, Resource, Course, Topic, app, Enroll, Learner
-import math
-from keybert import KeyBERT
-from utils import get_cos_sim
-from statistics import mean
+from model_registry import get_sentence_model
+import inference_service
+import polyline_kernel
+from radial_projection import radial_axes, project
+from topic_embeddings_loader import bump_topics_version, get_topic_matrix
+from resource_index import resources_added
 # from memory_profiler import profile
 import gc
 
-import ssl
-try:
-    _create_unverified_https_context = ssl._create_unverified_context
-except AttributeError:
-    pass
-else:
-    ssl._create_default_https_context = _create_unverified_https_context
-
-nltk.download('stopwords')
-nltk.download('wordnet')
-stop_words = set(stopwords.words('english'))
-
-
-def utils_preprocess_text(text: str, flg_stemm: bool = False, flg_lemm: bool = True, lst_stopwords: list = None) -> str:
-    """
-    Preprocess text by removing HTML tags, punctuations, numbers, stopwords, and applying stemming/lemmatization.
-
-    Parameters:
-        text (str): The text to preprocess.
-        flg_stemm (bool): Flag to apply stemming. Default is False.
-        flg_lemm (bool): Flag to apply lemmatization. Default is True.
-        lst_stopwords (list): List of stopwords to remove. Default is None.
-
-    Returns:
-        str: The preprocessed text.
-    """
-
-    # Remove HTML
-    soup = BeautifulSoup(text, 'lxml')
-    text = soup.get_text()
-
-    # Remove punctuations and numbers
-    text = re.sub('[^a-zA-Z]', ' ', text)
-
-    # Single character removal
-    text = re.sub(r"\s+[a-zA-Z]\s+", ' ', text)
-
-    # Remove multiple spaces
-    text = re.sub(r'\s+', ' ', text)
-
-    # Tokenize text
-    lst_text = text.split()
-
-    # Remove stopwords
-    if lst_stopwords is not None:
-        lst_text = [word for word in lst_text if word not in lst_stopwords]
-
-    # Apply stemming
-    if flg_stemm:
-        ps = PorterStemmer()
-        lst_text = [ps.stem(word) for word in lst_text]
-
-    # Apply lemmatization
-    if flg_lemm:
-        lem = WordNetLemmatizer()
-        lst_text = [lem.lemmatize(word) for word in lst_text]
-
-    text = " ".join(lst_text)
-    return text
-
 
 def apply_preprocessing(df: pd.DataFrame):
     """
@@ -84,11 +19,10 @@ def apply_preprocessing(df: pd.DataFrame):
     Parameters:
         df (pd.DataFrame): DataFrame containing topics.
     """
-    stop_words = set(stopwords.words('english'))  # Define stopwords
-    df['clean_text'] = df['description'].apply(lambda x: x.lower())
-    df['clean_text'] = df['clean_text'].apply(lambda x: utils_preprocess_text(
-        x, flg_stemm=False, flg_lemm=True, lst_stopwords=stop_words))
-    df['tokens'] = df['clean_text'].apply(lambda x: x.split())
+    # lower-case, clean, remove stopwords and lemmatize in one batch
+    preprocess_column(df, 'description', 'clean_text', lower=True,
+                      flg_stemm=False, flg_lemm=True, lst_stopwords='english')
+    df['tokens'] = df['clean_text'].str.split()
 
 # @profile
 def create_topic_embeddings(topics: pd.DataFrame) -> list:
@@ -101,7 +35,7 @@ def create_topic_embeddings(topics: pd.DataFrame) -> list:
     Returns:
         list: List of topic embeddings.
     """
-    model = SentenceTransformer('bert-base-nli-mean-tokens')
+    model = get_sentence_model()
     topic_embeddings = []
 
     for i in range(len(topics)):
@@ -137,33 +71,12 @@ def create_topic_polylines(topics: pd.DataFrame, topic_embeddings: list) -> pd.D
     nowl = len(topic_modules)
     for i in range(length-nowl):
         topic_modules.append(3)
-    # Topic embedding - mean of topic embeddings of individual words of a keyphrase
-
-    top_poly = []
-    top_module = []
-    topic = []
-
-    # Going through each topic and computing the cosine similarity between it's embedding and all other topic's embeddings
-    for i in range(len(topic_names)):
-        polyline = [0]*len(topic_names)
-        for j in range(len(topic_names)):
-            cos_sim = 0
-            if topic_names[i] == topic_names[j]:
-                cos_sim = 1
-            else:
-                topic1_vector = topic_embeddings[i]
-                topic2_vector = topic_embeddings[j]
-
-                # scaling cosine similarity value from [-1,1] to [0,1]
-                cos_sim = (get_cos_sim(
-                    (topic1_vector), (topic2_vector)) + 1) / 2
-
-            polyline[j] = cos_sim  # format 1
-            # polyline.append((j, cos_sim)) #format 2
-
-        topic.append(topic_names[i])
-        top_module.append(topic_modules[i])
-        top_poly.append(polyline)
+
+    # cosine similarity of every topic's embedding to all other topics' embeddings,
+    # scaled from [-1,1] to [0,1]; 1 where the topic keyphrases are the same
+    top_poly = polyline_kernel.topic_polylines(topic_embeddings, names=topic_names).tolist()  # format 1
+    topic = topic_names
+    top_module = topic_modules[:len(topic_names)]
 
     polyline_dict = {"topic": topic,
                      "module": top_module, "polyline": top_poly}
@@ -180,7 +93,7 @@ def create_topic_polylines(topics: pd.DataFrame, topic_embeddings: list) -> pd.D
 # @profile
 
 def create_summary_embeddings(summary) -> list:
-    model = SentenceTransformer('bert-base-nli-mean-tokens')
+    model = get_sentence_model()
     summary_embeddings_list = []
 
     # Encode the summary and convert to numpy array, then wrap in an additional list to match the format
@@ -194,129 +107,42 @@ def create_summary_embeddings(summary) -> list:
     return summary_embeddings_list
 
 def create_resource_embeddings(keywords):
-    model_name = 'bert-base-uncased'
-    tokenizer = BertTokenizer.from_pretrained(model_name)
-    new_model = BertModel.from_pretrained(model_name)
-
-    keybert_embeddings_list = []
-    for i in keywords:
-
-        # Tokenize the keywords and convert them into token IDs
-        tokenized_inputs = tokenizer(
-            i, padding=True, truncation=True, return_tensors="pt")
-
-        # Obtain the embeddings from the BERT model
-        with torch.no_grad():
-            outputs = new_model(**tokenized_inputs)
-
-        # Extract the embeddings corresponding to the [CLS] token
-        embeddings = outputs.last_hidden_state[:, 0, :].numpy()
-        embeddings = embeddings.tolist()
-        keybert_embeddings_list.append(embeddings)
-        # Clear unnecessary objects and free memory after each iteration
-        del tokenized_inputs, outputs, embeddings
-        gc.collect()
-    del tokenizer, new_model
-    gc.collect()    
-    return keybert_embeddings_list
+    """
+    BERT [CLS] embeddings for the keywords of every document.
+
+    Parameters:
+        keywords (list): One keyword list per document.
+
+    Returns:
+        list: One float32 matrix (num_keywords x 768) per document.
+    """
+    return inference_service.encode_keyword_groups(keywords)
 
 # @profile
 def create_resource_polylines(topicembedding, keybert_embeddings_list, beta):
-    all_polylines = []
-    topic_embeddings = topicembedding
-    for embeddings in keybert_embeddings_list:
-        single_file_polyline = []
-        for i in range(len(embeddings)):
-            docVector = embeddings[i]
-            polyline = []
-            for j in range(len(topic_embeddings)):
-                wordVector = topic_embeddings[j]
-                # find the cosine similarity between resource embeddings and the topic embeddings
-                cos_sim = (get_cos_sim(wordVector, docVector) + 1) / 2
-                polyline.append({'x': j, 'y': cos_sim})
-            single_file_polyline.append(polyline)
-        all_polylines.append(single_file_polyline)
-    new_polylines = []
-
-    for single_file_polyline in all_polylines:
-        templ = [0]*len(topicembedding)
-        for i in range(len(topicembedding)):
-            temp = 0
-            # between the multiple polylines for each doc find the average and set that as the final polyline
-            for j in range(len(single_file_polyline)):
-                temp += single_file_polyline[j][i]['y']
-            templ[i] = temp / len(single_file_polyline)
-        new_polylines.append(templ)
-
-    polylines = []
-    temporary_list = []
-    learning_objects = []
-    for i in range(len(new_polylines)):
-        polyline = new_polylines[i]
-        pol = {}
-        temporary_dict = {}
-        for j in range(len(polyline)):
-            pol[j] = polyline[j]
-        hd1 = np.array([v for v in pol.values()])
-        hd1.tolist()
-        temporary_dict["polyline"] = hd1
-        temporary_dict["ID"] = "r"
-        learning_objects.append(temporary_dict)
-        temporary_list.append(hd1)
-    polylines.extend(temporary_list)
-
-    beta = beta  # beta funtion to get more variance when plotting the polyline
-    polyline2 = polylines.copy()
-    beta_polylines = []
-    for line in polyline2:
-        v2 = []
-        mean_val = np.average(line)
-        len_arr = len(line)
-        for j in line:
-            j = j + beta*(j - mean_val)
-            if j > 1:
-                j = 1
-            if j < 0:
-                j = 0
-            v2.append(j)
-        beta_polylines.append(v2)
-
-    return beta_polylines
-
-def create_beta_polylines(resource_polylines,beta):
-    beta = beta  # beta funtion to get more variance when plotting the polyline
-    polyline2 = resource_polylines.copy()
-    beta_polylines = []
-    for line in polyline2:
-        v2 = []
-        mean_val = np.average(line)
-        len_arr = len(line)
-        for j in line:
-            j = j + beta*(j - mean_val)
-            if j > 1:
-                j = 1
-            if j < 0:
-                j = 0
-            v2.append(j)
-        beta_polylines.append(v2)
-
-    return beta_polylines
+    """
+    Resource polylines: for every document the scaled cosine similarity of
+    each keyword embedding to each topic, averaged over the keywords, then
+    beta-scaled (beta = 0 leaves them unchanged).
+
+    Parameters:
+        topicembedding (list): Topic embeddings (or Topic.embedding rows).
+        keybert_embeddings_list (list): One keyword embedding matrix per document.
+        beta (float): Beta factor to get more variance when plotting the polyline.
+
+    Returns:
+        list: One polyline (list of floats, one per topic) per document.
+    """
+    polylines = polyline_kernel.keyword_mean_polylines(topicembedding, keybert_embeddings_list)
+    return polyline_kernel.beta_scale(polylines, beta).tolist()
+
+def create_beta_polylines(resource_polylines, beta):
+    # beta funtion to get more variance when plotting the polyline
+    return polyline_kernel.beta_scale(resource_polylines, beta).tolist()
 
 def create_beta_polyline(polyline, beta):
-    # Apply beta transformation to a single polyline
-    beta_polyline = []
-    mean_val = np.average(polyline)
-    
-    for j in polyline:
-        j = j + beta * (j - mean_val)
-        # Clamping the values between 0 and 1
-        if j > 1:
-            j = 1
-        if j < 0:
-            j = 0
-        beta_polyline.append(j)
-    
-    return beta_polyline
+    # Apply beta transformation to a single polyline, clamped between 0 and 1
+    return polyline_kernel.beta_scale(polyline, beta).tolist()
 
 #
 #
@@ -346,45 +172,15 @@ def rad_plot_axes(num: int, x_max: float, y_max: float):
         y_max (float): Maximum y-coordinate.
 
     Returns:
-        tuple: A tuple containing the lengths of the axes and the angle theta.
+        tuple: A tuple containing the lengths of the axes and the angle theta
+        (memoized per arguments; do not modify the lengths).
     """
-    empt_arr = []  # Temporary container for y-coordinate calculations
-    xstop = []  # List to store x-coordinate of the axes endpoints
-    ystop = []  # List to store y-coordinate of the axes endpoints
-    tlen = []  # List to store the length of axes
-    ttempl = []  # Temporary container for reversed lengths
-    theta = ((np.pi) / (num - 1)) / 2  # Calculate theta
-    b = 0
-
-    while (b * theta) <= (np.arctan(y_max / x_max)):
-        y_val = x_max * math.tan(b * theta)
-        empt_arr.append(y_val)
-        ystop.append(y_val)
-        ttemp = math.sqrt((x_max ** 2) + (y_val ** 2))
-        tlen.append(ttemp)
-        if (b * theta) != np.arctan(y_max / x_max):
-            ttempl.append(ttemp)
-        b += 1
-
-    while b < num:
-        ystop.append(y_max)
-        b += 1
-
-    tlen.extend(list(reversed(ttempl)))
-    xstop = list(reversed(ystop))
-
-    # Plotting is commented out for modularity; can be enabled as needed
-    # for d in range(num):
-    #     x_values = [0, xstop[d]]
-    #     y_values = [0, ystop[d]]
-    #     plt.plot(x_values, y_values, label=f'Axis {d+1}', alpha=1, linewidth=0.2)
-
-    return tlen, theta
+    return radial_axes(num, x_max, y_max)
 
 # @profile
 def rad_plot_poly(num: int, hd_point: list, tlen: list, theta: float) -> list:
     """
-    Plot the polyline and calculate their centroids.
+    Calculate the centroids of the polylines (radial_projection.project).
 
     Parameters:
         num (int): Number of points.
@@ -395,27 +191,10 @@ def rad_plot_poly(num: int, hd_point: list, tlen: list, theta: float) -> list:
     Returns:
         list: List of centroid coordinates.
     """
-    coordinates = []
-
-    for pnt in hd_point:
-        x_values = []
-        y_values = []
-        for p in range(num):
-            rlen = pnt[p] * tlen[p]
-            x_values.append(rlen * math.cos(p * theta))
-            y_values.append(rlen * math.sin(p * theta))
-
-        # Plotting is commented out for modularity; can be enabled as needed
-        # plt.plot(x_values, y_values, label='Polyline', alpha=0.6, linewidth=0.5)
-
-        average_x = sum(x_values) / num
-        average_y = sum(y_values) / num
-        coordinates.append([average_x, average_y])
-
-    # Print statement for debugging
-    print("Red    - Resources ")
-
-    return coordinates
+    if len(hd_point) == 0:
+        return []
+    polylines = np.asarray([list(pnt)[:num] for pnt in hd_point], dtype=np.float64)
+    return project(polylines, tlen, theta).tolist()
 
 
 def push_topics_to_db(topics: pd.DataFrame, topic_embeddings: list, topic_polylines: pd.DataFrame, course_id: str):
@@ -458,40 +237,16 @@ def push_topics_to_db(topics: pd.DataFrame, topic_embeddings: list, topic_polyli
 
         # Add all topics to the session and commit to the database
         db.session.add_all(all_topics)
+        bump_topics_version(course_id)
         db.session.commit()
 
     print("Added topics to DB")
 
 
 def get_cord_from_polyline(polylines):
-    x_max = y_max = 1
-    tlen, ttempl = [], []
-    b = 0
-    theta = ((np.pi) / (len(polylines[0]) - 1)) / 2
-    while (b * theta) <= (np.arctan(y_max / x_max)):
-        y_val = x_max * math.tan(b * theta)
-        ttemp = math.sqrt((x_max ** 2) + (y_val ** 2))
-        tlen.append(ttemp)
-        if (b * theta) != np.arctan(y_max / x_max):
-            ttempl.append(ttemp)
-        b += 1
-
-    while b < len(polylines[0]):
-        b += 1
-
-    tlen.extend(list(reversed(ttempl)))
-    print(tlen)
-    coordinates = []
-
-    for polyline in polylines:
-        x_values = []
-        y_values = []
-        for p in range(len(polyline)):
-            rlen = polyline[p] * tlen[p]
-            x_values.append(rlen * math.cos(p * theta))
-            y_values.append(rlen * math.sin(p * theta))
-        coordinates.append([mean(x_values), mean(y_values)])
-    return coordinates
+    # radial centroids on the unit axes of len(polylines[0]) topics
+    num = len(polylines[0])
+    return project([list(p)[:num] for p in polylines]).tolist()
 
 
 def pushResourcesToDB(resources, resourceembedding, resource_polylines, course_id):
@@ -526,6 +281,8 @@ def pushResourcesToDB(resources, resourceembedding, resource_polylines, course_i
             # db.session.add(new_resource)
             # db.session.commit()
         db.session.add_all(allresources)
+        db.session.flush()
+        resources_added(course_id, allresources)
         db.session.commit()
     print("added resources to the DB")
     # breakpoint()
@@ -533,12 +290,9 @@ def pushResourcesToDB(resources, resourceembedding, resource_polylines, course_i
 
 # find the keywords for all the documents and store it in a list
 def create_keywords_list(content_list,num_keywords=10):
-    kw_model = KeyBERT(model='all-mpnet-base-v2')
     all_keywords_list = []
     all_weight_list = []
-    for i in range(len(content_list)):
-        keywords = kw_model.extract_keywords(content_list[i], keyphrase_ngram_range=(
-            1, 2), stop_words='english', highlight=False, top_n=num_keywords)
+    for keywords in inference_service.extract_keywords(content_list, top_n=num_keywords):
         keywords_list = list(dict(keywords).keys())
         cs_list = list(dict(keywords).values())
         weight = sum(cs_list)/len(cs_list)
@@ -547,45 +301,17 @@ def create_keywords_list(content_list,num_keywords=10):
     return all_keywords_list, all_weight_list
 
 
-# Load pre-trained BERT model and tokenizer
+# BERT [CLS] embeddings for a list of keyword lists
 def create_embeddings_list(l):
-    model_name = 'bert-base-uncased'
-    tokenizer = BertTokenizer.from_pretrained(model_name)
-    new_model = BertModel.from_pretrained(model_name)
-
-    keybert_embeddings_list = []
-    for i in l:
-
-        # Tokenize the keywords and convert them into token IDs
-        tokenized_inputs = tokenizer(
-            i, padding=True, truncation=True, return_tensors="pt")
-
-        # Obtain the embeddings from the BERT model
-        with torch.no_grad():
-            outputs = new_model(**tokenized_inputs)
-
-        # Extract the embeddings corresponding to the [CLS] token
-        embeddings = outputs.last_hidden_state[:, 0, :].numpy()
-        embeddings = embeddings.tolist()
-        keybert_embeddings_list.append(embeddings)
-    return keybert_embeddings_list
+    return inference_service.encode_keyword_groups(l)
 
 
 def create_polyline(l, course_id):
-    all_polylines = []
-    embeddings = db.session.query(
-        Topic.embedding).filter_by(course_id=course_id).all()
-    topic_embeddings = embeddings
-    for keybert_embeddings in l:
-        docVector = keybert_embeddings
-        polyline = []
-        for j in range(len(topic_embeddings)):
-            wordVector = topic_embeddings[j]
-            # find cosine similarity between the learner embeddings and the topic embeddings
-            cos_sim = (get_cos_sim(wordVector, docVector) + 1) / 2
-            polyline.append(cos_sim)
-        all_polylines.append(polyline)
-    return all_polylines
+    topic_matrix = get_topic_matrix(course_id)
+    if topic_matrix is None:
+        return []
+    # cosine similarity between the learner embeddings and the topic embeddings, scaled to [0,1]
+    return polyline_kernel.scaled_similarity(l, topic_matrix.unit).tolist()
 
 
 
@@ -614,6 +340,8 @@ def pushQuizToResourceInDB(
 
     with app.app_context():
         db.session.add(new_resource)
+        db.session.flush()
+        resources_added(course_id, [new_resource])
         db.session.commit()
     
     print("Quiz resource added to the DB")
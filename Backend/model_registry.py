@@ -0,0 +1,271 @@
+# model_registry.py
+#
+# One process-wide home for the transformer models used by the backend
+# (SentenceTransformer, BERT [CLS] encoder, KeyBERT). Every model is loaded
+# lazily on first use, exactly once, behind a per-model lock, so concurrent
+# request threads never load the same weights twice.
+#
+# NAVIGATED_INFERENCE_BACKEND selects how the models run on CPU:
+#   fp32 - plain torch modules (default)
+#   int8 - torch dynamic quantization of every nn.Linear
+#   onnx - exported ONNX graphs on onnxruntime; needs sentence-transformers
+#          >= 3.2 and optimum[onnxruntime], which requirements.txt does not
+#          pin, so the mode is refused at import when they are missing
+# Check a backend with `flask inference-parity` before switching to it.
+
+import os
+import threading
+import time
+from importlib import metadata
+
+SENTENCE_MODEL_NAME = 'bert-base-nli-mean-tokens'
+KEYWORD_MODEL_NAME = 'all-mpnet-base-v2'
+BERT_MODEL_NAME = 'bert-base-uncased'
+
+INFERENCE_BACKENDS = ('fp32', 'int8', 'onnx')
+_inference_backend = os.environ.get("NAVIGATED_INFERENCE_BACKEND", "fp32")
+if _inference_backend not in INFERENCE_BACKENDS:
+    raise ValueError(f"NAVIGATED_INFERENCE_BACKEND must be one of {INFERENCE_BACKENDS}, got '{_inference_backend}'")
+
+# SentenceTransformer(..., backend='onnx') first appeared in 3.2
+ONNX_MIN_SENTENCE_TRANSFORMERS = (3, 2)
+
+
+def _version_tuple(version: str) -> tuple:
+    # leading digits of the first two components: "3.2rc1" -> (3, 2)
+    parts = []
+    for part in version.split(".")[:2]:
+        digits = ""
+        for ch in part:
+            if not ch.isdigit():
+                break
+            digits += ch
+        parts.append(int(digits) if digits else 0)
+    return tuple(parts)
+
+
+def onnx_backend_problems() -> list:
+    """
+    Why the onnx backend cannot load in this environment (empty if it can).
+    Reads package metadata only, so nothing heavy is imported.
+    """
+    problems = []
+    try:
+        st_version = metadata.version("sentence-transformers")
+        if _version_tuple(st_version) < ONNX_MIN_SENTENCE_TRANSFORMERS:
+            problems.append(f"sentence-transformers {st_version} is installed, the onnx backend needs >= "
+                            + ".".join(map(str, ONNX_MIN_SENTENCE_TRANSFORMERS)))
+    except metadata.PackageNotFoundError:
+        problems.append("sentence-transformers is not installed")
+    for package in ("optimum", "onnxruntime"):
+        try:
+            metadata.version(package)
+        except metadata.PackageNotFoundError:
+            problems.append(f"{package} is not installed (pip install 'optimum[onnxruntime]')")
+    return problems
+
+
+if _inference_backend == 'onnx':
+    _problems = onnx_backend_problems()
+    if _problems:
+        raise ValueError("NAVIGATED_INFERENCE_BACKEND=onnx cannot be used: " + "; ".join(_problems))
+
+
+class _ModelEntry:
+    """
+    A single registered model: its loader plus load/memory bookkeeping.
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.value = None
+        self.loaded = False
+        self.load_seconds = None
+        self.memory_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self):
+        if self.loaded:
+            return self.value
+        with self.lock:
+            if not self.loaded:
+                start = time.perf_counter()
+                value = self.loader()
+                self.load_seconds = time.perf_counter() - start
+                self.memory_bytes = _module_memory_bytes(value)
+                self.value = value
+                self.loaded = True
+                print(f"[model_registry] loaded '{self.name}' in {self.load_seconds:.2f}s "
+                      f"({self.memory_bytes / (1024 * 1024):.1f} MiB)")
+        return self.value
+
+    def unload(self):
+        with self.lock:
+            self.value = None
+            self.loaded = False
+            self.load_seconds = None
+            self.memory_bytes = 0
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'backend': _inference_backend,
+            'loaded': self.loaded,
+            'load_seconds': round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            'memory_mb': round(self.memory_bytes / (1024 * 1024), 1),
+        }
+
+
+def _module_memory_bytes(value) -> int:
+    """
+    Bytes held by parameters and buffers of every torch module in `value`
+    (a module, or a tuple such as (tokenizer, model)).
+    """
+    values = value if isinstance(value, tuple) else (value,)
+    total = 0
+    for item in values:
+        if hasattr(item, 'state_dict'):
+            # state_dict also covers the packed weights of quantized Linear layers
+            for tensor in item.state_dict().values():
+                if hasattr(tensor, 'numel'):
+                    total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def _quantize_int8(module):
+    import torch
+    return torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+# ---- loaders (heavy imports stay inside so importing this module is cheap) ----
+
+def _load_sentence_transformer(name):
+    from sentence_transformers import SentenceTransformer
+    if _inference_backend == 'onnx':
+        return SentenceTransformer(name, backend='onnx')
+    model = SentenceTransformer(name)
+    if _inference_backend == 'int8':
+        model = _quantize_int8(model)
+    return model
+
+
+def _load_sentence_model():
+    return _load_sentence_transformer(SENTENCE_MODEL_NAME)
+
+
+def _load_keyword_sentence_model():
+    return _load_sentence_transformer(KEYWORD_MODEL_NAME)
+
+
+def _load_keybert():
+    from keybert import KeyBERT
+    # KeyBERT wraps the shared mpnet SentenceTransformer instead of loading its own copy
+    return KeyBERT(model=get_model('keyword_sentence'))
+
+
+def _load_bert():
+    from transformers import BertModel, BertTokenizerFast
+    tokenizer = BertTokenizerFast.from_pretrained(BERT_MODEL_NAME)
+    if _inference_backend == 'onnx':
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        # same call signature and last_hidden_state output as BertModel
+        return tokenizer, ORTModelForFeatureExtraction.from_pretrained(BERT_MODEL_NAME, export=True)
+    model = BertModel.from_pretrained(BERT_MODEL_NAME)
+    model.eval()
+    if _inference_backend == 'int8':
+        model = _quantize_int8(model)
+    return tokenizer, model
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def register_model(key: str, loader, name: str = None):
+    """
+    Register a lazily loaded model under `key`. Re-registering an existing
+    key is a no-op so modules can register defensively at import time.
+    """
+    with _registry_lock:
+        if key not in _registry:
+            _registry[key] = _ModelEntry(name or key, loader)
+
+
+def get_model(key: str):
+    """
+    Return the model registered under `key`, loading it on first use.
+    """
+    entry = _registry.get(key)
+    if entry is None:
+        raise KeyError(f"Unknown model '{key}'")
+    return entry.get()
+
+
+register_model('sentence', _load_sentence_model, SENTENCE_MODEL_NAME)
+register_model('keyword_sentence', _load_keyword_sentence_model, KEYWORD_MODEL_NAME)
+register_model('keybert', _load_keybert, f'KeyBERT({KEYWORD_MODEL_NAME})')
+register_model('bert', _load_bert, BERT_MODEL_NAME)
+
+
+def get_inference_backend() -> str:
+    return _inference_backend
+
+
+def set_inference_backend(backend: str):
+    """
+    Switch the backend for this process. Loaded models are dropped and are
+    reloaded with the new backend on next use.
+    """
+    global _inference_backend
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {INFERENCE_BACKENDS}")
+    if backend == 'onnx':
+        problems = onnx_backend_problems()
+        if problems:
+            raise ValueError("The onnx inference backend cannot be used: " + "; ".join(problems))
+    with _registry_lock:
+        _inference_backend = backend
+        for entry in _registry.values():
+            entry.unload()
+
+
+def cache_namespace(model_name: str) -> str:
+    """
+    Embedding-cache namespace for `model_name` under the current backend, so
+    quantized/ONNX vectors never mix with fp32 ones.
+    """
+    return model_name if _inference_backend == 'fp32' else f"{model_name}@{_inference_backend}"
+
+
+def get_sentence_model():
+    """SentenceTransformer used for topic, summary and heading embeddings."""
+    return get_model('sentence')
+
+
+def get_keybert():
+    """KeyBERT keyword extractor (shares the mpnet SentenceTransformer)."""
+    return get_model('keybert')
+
+
+def get_bert():
+    """(tokenizer, model) pair used for BERT [CLS] keyword embeddings."""
+    return get_model('bert')
+
+
+def warm_up(keys=None):
+    """
+    Load the given models (default: all registered) ahead of the first
+    request. Returns the per-model stats after loading.
+    """
+    for key in (keys or list(_registry.keys())):
+        get_model(key)
+    return model_stats()
+
+
+def model_stats():
+    """
+    Load time and memory accounting for every registered model.
+    KeyBERT reuses the mpnet weights, so its own memory is reported as 0.
+    """
+    return {key: entry.stats() for key, entry in _registry.items()}
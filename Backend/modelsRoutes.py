@@ -1,26 +1,29 @@
 # modelRoutes.py
 import gc
 import json
-import math
 import os
 import re
 from datetime import datetime
 import numpy as np
 import pandas as pd
-import pdfplumber
-import torch
 from flask import jsonify, request, send_from_directory
 from utils import is_valid_id
 from repository import add_ta_from_user
 from dbModels import TAT, Activity, Contribution, Course, Enroll, Learner, Module, Question, Quiz, Resource, Topic, UserQuiz, db, Description, ExitPoint, SummaryCluster, SummaryCoordinates, User
 from init import app
-from keybert import KeyBERT
-from sentence_transformers import SentenceTransformer
+from model_registry import get_sentence_model
+import inference_service
+import polyline_kernel
+from radial_projection import radial_axes, project
+from job_queue import enqueue, job_handler
+from topic_embeddings_loader import bump_topics_version, get_topic_matrix
+from resource_index import resources_added
+from resource_ordinals import accessible_columns
+from trajectory_log import record_event
+from vector_codec import DTYPE_F64, pack_vector
 from sqlalchemy import text
 from sqlalchemy.sql import func
-from transformers import BertModel, BertTokenizer
 from werkzeug.utils import secure_filename
-from youtube_transcript_api import YouTubeTranscriptApi
 
 UPLOAD_FOLDER_NAME = "uploads"
 UPLOAD_FOLDER = os.path.join(os.getcwd(), UPLOAD_FOLDER_NAME)  # Save files in a 'uploads' folder in the project directory
@@ -28,13 +31,6 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)  # Create the folder if it doesn't exi
 
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 
-def get_cos_sim(a: np.ndarray, b: np.ndarray) -> float:
-    dot_product = np.dot(a, b)
-    norm_a = np.linalg.norm(a)
-    norm_b = np.linalg.norm(b)
-    return dot_product / (norm_a * norm_b)
-
-
 # Routes
 
 # Learners
@@ -108,6 +104,8 @@ def create_resource():
         type=data['type']
     )
     db.session.add(new_resource)
+    db.session.flush()
+    resources_added(data['course_id'], [new_resource])
     db.session.commit()
     return jsonify(new_resource.to_dict()), 201
 
@@ -132,6 +130,7 @@ def create_topic():
         embedding=data['embedding']
     )
     db.session.add(new_topic)
+    bump_topics_version(data['course_id'])
     db.session.commit()
     return jsonify(new_topic.to_dict()), 201
 
@@ -198,19 +197,23 @@ def get_contribution_view(id):
 @app.route('/contributions', methods=['POST'])
 def create_contribution():
     data = request.get_json()
+    # file_path / embedding are accepted but not stored (Contribution has no such columns)
     new_contribution = Contribution(
         enroll_id=data['enroll_id'],
         submitted_on=datetime.strptime(
             data['submitted_on'], '%Y-%m-%d %H:%M:%S'),
-        file_path=data['file_path'],
         description=data['description'],
         prev_polyline=data['prev_polyline'],
         polyline=data['polyline'],
         x_coordinate=data['x_coordinate'],
         y_coordinate=data['y_coordinate'],
-        embedding=data['embedding']
     )
     db.session.add(new_contribution)
+    if data['polyline']:
+        enroll = Enroll.query.get(data['enroll_id'])
+        previous = (enroll.polyline, enroll.x_coordinate, enroll.y_coordinate) if enroll else None
+        record_event(data['enroll_id'], data['polyline'], data['x_coordinate'], data['y_coordinate'],
+                     "contribution", contribution=new_contribution, previous=previous)
     db.session.commit()
     return jsonify(new_contribution.to_dict()), 201
 
@@ -298,7 +301,7 @@ def course_module_mappings(course_id):
 
 # Function to create topic embeddings
 def create_topic_embeddings(topics: pd.DataFrame) -> list:
-    model = SentenceTransformer('bert-base-nli-mean-tokens')
+    model = get_sentence_model()
     topic_embeddings = []
 
     for i in range(len(topics)):
@@ -315,25 +318,9 @@ def create_topic_polylines(topics: pd.DataFrame, topic_embeddings: list) -> pd.D
     length = len(topics)
     topic_modules = [1] * 12 + [2] * 8 + [3] * (length - 20)
 
-    top_poly = []
-    top_module = []
-    topic = []
-
-    for i in range(len(topic_names)):
-        polyline = [0] * len(topic_names)
-        for j in range(len(topic_names)):
-            cos_sim = 0
-            if topic_names[i] == topic_names[j]:
-                cos_sim = 1
-            else:
-                topic1_vector = topic_embeddings[i]
-                topic2_vector = topic_embeddings[j]
-                cos_sim = (get_cos_sim(topic1_vector, topic2_vector) + 1) / 2
-            polyline[j] = cos_sim
-
-        topic.append(topic_names[i])
-        top_module.append(topic_modules[i])
-        top_poly.append(polyline)
+    top_poly = polyline_kernel.topic_polylines(topic_embeddings, names=topic_names).tolist()
+    top_module = topic_modules[:len(topic_names)]
+    topic = topic_names
 
     polyline_dict = {"topic": topic, "module": top_module, "polyline": top_poly}
     topic_polylines = pd.DataFrame(polyline_dict)
@@ -341,12 +328,10 @@ def create_topic_polylines(topics: pd.DataFrame, topic_embeddings: list) -> pd.D
 
 # Function to create a list of keywords from the topic descriptions
 def create_keywords_list(content_list, num_keywords=10):
-    kw_model = KeyBERT(model='all-mpnet-base-v2')
     all_keywords_list = []
     all_weight_list = []
 
-    for i in range(len(content_list)):
-        keywords = kw_model.extract_keywords(content_list[i], keyphrase_ngram_range=(1, 2), stop_words='english', highlight=False, top_n=num_keywords)
+    for keywords in inference_service.extract_keywords(content_list, top_n=num_keywords):
         keywords_list = list(dict(keywords).keys())
         cs_list = list(dict(keywords).values())
 
@@ -374,45 +359,15 @@ def rad_plot_axes(num: int, x_max: float, y_max: float):
         y_max (float): Maximum y-coordinate.
 
     Returns:
-        tuple: A tuple containing the lengths of the axes and the angle theta.
+        tuple: A tuple containing the lengths of the axes and the angle theta
+        (memoized per arguments; do not modify the lengths).
     """
-    empt_arr = []  # Temporary container for y-coordinate calculations
-    xstop = []  # List to store x-coordinate of the axes endpoints
-    ystop = []  # List to store y-coordinate of the axes endpoints
-    tlen = []  # List to store the length of axes
-    ttempl = []  # Temporary container for reversed lengths
-    theta = ((np.pi) / (num - 1)) / 2  # Calculate theta
-    b = 0
-
-    while (b * theta) <= (np.arctan(y_max / x_max)):
-        y_val = x_max * math.tan(b * theta)
-        empt_arr.append(y_val)
-        ystop.append(y_val)
-        ttemp = math.sqrt((x_max ** 2) + (y_val ** 2))
-        tlen.append(ttemp)
-        if (b * theta) != np.arctan(y_max / x_max):
-            ttempl.append(ttemp)
-        b += 1
-
-    while b < num:
-        ystop.append(y_max)
-        b += 1
-
-    tlen.extend(list(reversed(ttempl)))
-    xstop = list(reversed(ystop))
-
-    # Plotting is commented out for modularity; can be enabled as needed
-    # for d in range(num):
-    #     x_values = [0, xstop[d]]
-    #     y_values = [0, ystop[d]]
-    #     plt.plot(x_values, y_values, label=f'Axis {d+1}', alpha=1, linewidth=0.2)
-
-    return tlen, theta
+    return radial_axes(num, x_max, y_max)
 
 
 def rad_plot_poly(num: int, hd_point: list, tlen: list, theta: float) -> list:
     """
-    Plot the polyline and calculate their centroids.
+    Calculate the centroids of the polylines (radial_projection.project).
 
     Parameters:
         num (int): Number of points.
@@ -423,27 +378,10 @@ def rad_plot_poly(num: int, hd_point: list, tlen: list, theta: float) -> list:
     Returns:
         list: List of centroid coordinates.
     """
-    coordinates = []
-
-    for pnt in hd_point:
-        x_values = []
-        y_values = []
-        for p in range(num):
-            rlen = pnt[p] * tlen[p]
-            x_values.append(rlen * math.cos(p * theta))
-            y_values.append(rlen * math.sin(p * theta))
-
-        # Plotting is commented out for modularity; can be enabled as needed
-        # plt.plot(x_values, y_values, label='Polyline', alpha=0.6, linewidth=0.5)
-
-        average_x = sum(x_values) / num
-        average_y = sum(y_values) / num
-        coordinates.append([average_x, average_y])
-
-    # Print statement for debugging
-    print("Red    - Resources ")
-
-    return coordinates
+    if len(hd_point) == 0:
+        return []
+    polylines = np.asarray([list(pnt)[:num] for pnt in hd_point], dtype=np.float64)
+    return project(polylines, tlen, theta).tolist()
 
 
 
@@ -484,50 +422,62 @@ def create_new_topics_for_new_course():
         if not course_id or not topics_data or not isinstance(topics_data, list):
             return jsonify({"error": "Invalid or missing 'course_id' or 'topics'"}), 400
 
-        topics = pd.DataFrame(topics_data)
+        job_id = enqueue('new_course_topics', {"course_id": course_id, "topics": topics_data})
+        return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
 
-        # Generate embeddings, polylines, and keywords
-        topic_embeddings = create_topic_embeddings(topics)
-        topic_polylines = create_topic_polylines(topics, topic_embeddings)
-        keywords, weights = create_keywords_list(topics["description"].tolist())
+    except Exception as e:
+        app.logger.error(f"Error in create_new_topics_for_new_course: {str(e)}", exc_info=True)
+        return jsonify({"error": "Server error", "details": str(e)}), 500
 
-        # Ensure polylines exist before calculating centroids
-        if not topic_polylines.empty and "polyline" in topic_polylines:
-            feature_length = len(topic_polylines["polyline"][0])
-            tlen, theta = rad_plot_axes(feature_length, 1, 1)
-            centroid_list = rad_plot_poly(feature_length, topic_polylines["polyline"], tlen, theta)
-        else:
-            return jsonify({"error": "Failed to generate topic polylines"}), 500
-
-        # Check if generated lists match topic count
-        if len(topic_embeddings) != len(topics) or len(topic_polylines) != len(topics) or len(centroid_list) != len(topics):
-            return jsonify({"error": "Mismatch in topic processing results"}), 500
-
-        # Insert topics into the database
-        for i in range(len(topics)):
-            new_topic = Topic(
-                name=topics.loc[i, 'name'],
-                description=topics.loc[i, 'description'],
-                module_id=topics.loc[i, 'module_id'],
-                keywords=keywords[i] if i < len(keywords) else None,
-                polyline=topic_polylines.loc[i, 'polyline'] if i < len(topic_polylines) else None,
-                course_id=course_id,
-                x_coordinate=centroid_list[i][0] if i < len(centroid_list) else None,
-                y_coordinate=centroid_list[i][1] if i < len(centroid_list) else None,
-                embedding=topic_embeddings[i] if i < len(topic_embeddings) else None
-            )
-            db.session.add(new_topic)
 
-        db.session.commit()
+@job_handler('new_course_topics')
+def create_new_topics_job(payload, progress):
+    course_id = payload["course_id"]
+    topics = pd.DataFrame(payload["topics"])
 
-        return jsonify({"message": "Topics created successfully"}), 201
+    # Generate embeddings, polylines, and keywords
+    progress(0.1, "Embedding topics")
+    topic_embeddings = create_topic_embeddings(topics)
+    topic_polylines = create_topic_polylines(topics, topic_embeddings)
+    progress(0.5, "Extracting keywords")
+    keywords, weights = create_keywords_list(topics["description"].tolist())
 
-    except Exception as e:
-        app.logger.error(f"Error in create_new_topics_for_new_course: {str(e)}", exc_info=True)
-        return jsonify({"error": "Server error", "details": str(e)}), 500
+    # Ensure polylines exist before calculating centroids
+    if not topic_polylines.empty and "polyline" in topic_polylines:
+        feature_length = len(topic_polylines["polyline"][0])
+        tlen, theta = rad_plot_axes(feature_length, 1, 1)
+        centroid_list = rad_plot_poly(feature_length, topic_polylines["polyline"], tlen, theta)
+    else:
+        return {"error": "Failed to generate topic polylines"}, 500
+
+    # Check if generated lists match topic count
+    if len(topic_embeddings) != len(topics) or len(topic_polylines) != len(topics) or len(centroid_list) != len(topics):
+        return {"error": "Mismatch in topic processing results"}, 500
+
+    # Insert topics into the database
+    progress(0.9, "Saving topics")
+    for i in range(len(topics)):
+        new_topic = Topic(
+            name=topics.loc[i, 'name'],
+            description=topics.loc[i, 'description'],
+            module_id=topics.loc[i, 'module_id'],
+            keywords=keywords[i] if i < len(keywords) else None,
+            polyline=topic_polylines.loc[i, 'polyline'] if i < len(topic_polylines) else None,
+            course_id=course_id,
+            x_coordinate=centroid_list[i][0] if i < len(centroid_list) else None,
+            y_coordinate=centroid_list[i][1] if i < len(centroid_list) else None,
+            embedding=topic_embeddings[i] if i < len(topic_embeddings) else None
+        )
+        db.session.add(new_topic)
+
+    bump_topics_version(course_id)
+    db.session.commit()
+
+    return {"message": "Topics created successfully"}, 201
 
 def extract_transcript(video_id):
     try:
+        from youtube_transcript_api import YouTubeTranscriptApi
         transcript = YouTubeTranscriptApi.get_transcript(video_id)
         transcript_text = ""
         for i in transcript:
@@ -553,44 +503,23 @@ def create_resource_embeddings(keywords):
         print("ERROR: Received empty keywords list!")
         return []
 
-    model_name = 'bert-base-uncased'
-    try:
-        tokenizer = BertTokenizer.from_pretrained(model_name)
-        model = BertModel.from_pretrained(model_name)
-    except Exception as e:
-        print(f"ERROR: Failed to load BERT model -> {e}")
-        return []
-
-    model.eval()
-    keybert_embeddings_list = []
-
+    valid_keywords = []
     for keyword in keywords:
         if not isinstance(keyword, str) or not keyword.strip():
             print(f"WARNING: Skipping invalid keyword -> {keyword}")
             continue
+        valid_keywords.append(keyword)
 
-        try:
-            tokenized_inputs = tokenizer(keyword, padding=True, truncation=True, return_tensors="pt")
-            with torch.no_grad():
-                outputs = model(**tokenized_inputs)
-
-            embeddings = outputs.last_hidden_state[:, 0, :].detach().cpu().numpy()
-
-            # Ensure embeddings are always lists of lists
-            if isinstance(embeddings, np.ndarray):
-                embeddings = embeddings.tolist()
-
-            if isinstance(embeddings, list) and isinstance(embeddings[0], list):
-                keybert_embeddings_list.append(embeddings[0])
-            else:
-                print(f"ERROR: Unexpected embedding format for '{keyword}', skipping.")
-                continue
+    if not valid_keywords:
+        return []
 
-        except Exception as e:
-            print(f"ERROR: Failed to generate embedding for '{keyword}' -> {e}")
-            continue
+    try:
+        embeddings = inference_service.encode_keywords(valid_keywords)
+    except Exception as e:
+        print(f"ERROR: Failed to generate keyword embeddings -> {e}")
+        return []
 
-    return keybert_embeddings_list
+    return embeddings.tolist()
 
 def get_topic_embedding(topic_id):
     topic = Topic.query.filter_by(id=topic_id).first()
@@ -623,44 +552,37 @@ def get_topic_embedding(topic_id):
 
 
 def create_resource_polylines(topic_embeddings, keybert_embeddings_list, beta):
-    if not keybert_embeddings_list or not topic_embeddings:
+    # topic_embeddings: list of vectors, or a TopicMatrix.unit matrix
+    if not keybert_embeddings_list or not len(topic_embeddings):
         print("ERROR: Empty embeddings provided")
         return []
 
-    all_polylines = []
-
+    doc_vectors = []
     for i, docVector in enumerate(keybert_embeddings_list):
         if not isinstance(docVector, list):
             print(f"ERROR: Skipping invalid embedding at index {i} -> Expected list, got {type(docVector)}")
             continue
+        doc_vectors.append(docVector)
 
-        polyline = []
+    if isinstance(topic_embeddings, np.ndarray):
+        topic_vectors = topic_embeddings
+    else:
+        topic_vectors = []
         for idx, wordVector in enumerate(topic_embeddings):
             if not isinstance(wordVector, list):
                 print(f"ERROR: Invalid topic embedding at [{idx}] -> Expected list, got {type(wordVector)}")
                 continue
+            topic_vectors.append(wordVector)
 
-            cos_sim = get_cos_sim(wordVector, docVector)
-            cos_sim = (cos_sim + 1) / 2 if cos_sim is not None else 0  # Normalize and handle None
-            polyline.append({'x': idx, 'y': cos_sim})
-
-        all_polylines.append(polyline)
-
-    if not all_polylines:
+    if not doc_vectors or not len(topic_vectors):
         print("WARNING: No polylines were generated")
         return []
 
-    # Averaging polylines across multiple keywords
-    new_polylines = []
-    for polyline in all_polylines:
-        averaged_polyline = [sum(p['y'] for p in polyline) / len(polyline) for _ in range(len(topic_embeddings))]
-        new_polylines.append(averaged_polyline)
-
-    beta = float(beta)
-    beta_polylines = [[max(0, min(val + beta * (val - np.mean(polyline)), 1)) for val in polyline] for polyline in new_polylines]
+    # One polyline per keyword embedding: its mean scaled similarity over the topics, on every axis
+    keyword_means = polyline_kernel.scaled_similarity(doc_vectors, topic_vectors).mean(axis=1)
+    new_polylines = np.repeat(keyword_means[:, None], len(topic_embeddings), axis=1)
 
-
-    return beta_polylines
+    return polyline_kernel.beta_scale(new_polylines, beta).tolist()
 
 
 @app.route('/new-resources-topics', methods=['POST'])
@@ -682,92 +604,113 @@ def create_new_resources_for_new_course():
         if video_id == "Invalid YouTube URL":
             return jsonify({"error": "Invalid YouTube URL"}), 400
 
-        transcript = extract_transcript(video_id)
-        if transcript.startswith("Error:"):
-            return jsonify({"error": f"Failed to fetch transcript: {transcript}"}), 400
-
-        try:
-            keywords, weights = create_keywords_list([transcript])
-            if keywords and isinstance(keywords[0], list):
-                keywords = [word for sublist in keywords for word in sublist]
-
-        except Exception as e:
-            return jsonify({"error": f"Failed to extract keywords: {str(e)}"}), 400
-
-        if not keywords:
-            return jsonify({"error": "No keywords extracted"}), 400
-
-        resource_embeddings = create_resource_embeddings(keywords)
-        if not resource_embeddings:
-            return jsonify({"error": "Failed to generate resource embeddings"}), 400
-
-        topic_embeddings = get_topic_embedding(module_id)
-
-        # Debugging
-        if topic_embeddings is None:
-            return jsonify({"error": "Topic embeddings not found"}), 400
-
-        if isinstance(topic_embeddings, np.ndarray) and topic_embeddings.ndim == 1:
-            topic_embeddings = [topic_embeddings]
-
-        # If only one topic embedding is available, duplicate it
-        if len(topic_embeddings) == 1:
-            print("WARNING: Only one topic embedding found, duplicating it.")
-            topic_embeddings.append(topic_embeddings[0])
-
-        if len(topic_embeddings) < 2:
-            return jsonify({"error": "Insufficient topic embeddings"}), 400
-
-        resource_polylines = create_resource_polylines(topic_embeddings, resource_embeddings, 8)
-        if not resource_polylines:
-            return jsonify({"error": "Generated polylines are empty"}), 400
-
-        # Ensure num_axes is valid
-        num_axes = len(topic_embeddings)
-        x_max, y_max = 1.0, 1.0
-
-        # Compute axes lengths and angle safely
-        tlen, theta = rad_plot_axes(num_axes, x_max, y_max)
-
-        # Compute x, y coordinates
-        centroids = rad_plot_poly(num_axes, resource_polylines, tlen, theta)
-
-        max_id = db.session.query(db.func.max(Resource.id)).scalar() or 0
-        new_resources = []
-
-        if centroids:
-            x_coordinate, y_coordinate = centroids[0]  # Use only the first centroid
-            new_resource = Resource(
-                id=max_id + 1,
-                name=name,
-                description=None,
-                keywords=keywords,
-                polyline=resource_polylines,
-                x_coordinate=x_coordinate,
-                y_coordinate=y_coordinate,
-                course_id=course_id,
-                module_id=module_id,
-                submodule_id=None,
-                type=res_type,
-                link=link,
-                index=max_id + 1,
-                module=module,
-                beta=8
-            )
-
-            db.session.add(new_resource)
-            db.session.commit()
-
-            return jsonify({"message": "Resource created successfully"}), 201
-        else:
-            return jsonify({"error": "No valid centroid found"}), 400
+        job_id = enqueue('youtube_resource', {
+            "name": name, "course_id": course_id, "module_id": module_id,
+            "type": res_type, "link": link, "module": module, "video_id": video_id,
+        })
+        return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
 
     except Exception as e:
-        db.session.rollback()
         app.logger.error(f"Error occurred: {e}")
         return jsonify({"error": "Server error", "details": str(e)}), 500
 
 
+@job_handler('youtube_resource')
+def create_youtube_resource_job(payload, progress):
+    name = payload["name"]
+    course_id = payload["course_id"]
+    module_id = payload["module_id"]
+    res_type = payload["type"]
+    link = payload["link"]
+    module = payload["module"]
+    video_id = payload["video_id"]
+
+    progress(0.1, "Fetching transcript")
+    transcript = extract_transcript(video_id)
+    if transcript.startswith("Error:"):
+        return {"error": f"Failed to fetch transcript: {transcript}"}, 400
+
+    progress(0.4, "Extracting keywords")
+    try:
+        keywords, weights = create_keywords_list([transcript])
+        if keywords and isinstance(keywords[0], list):
+            keywords = [word for sublist in keywords for word in sublist]
+
+    except Exception as e:
+        return {"error": f"Failed to extract keywords: {str(e)}"}, 400
+
+    if not keywords:
+        return {"error": "No keywords extracted"}, 400
+
+    resource_embeddings = create_resource_embeddings(keywords)
+    if not resource_embeddings:
+        return {"error": "Failed to generate resource embeddings"}, 400
+
+    progress(0.7, "Mapping to topics")
+    topic_embeddings = get_topic_embedding(module_id)
+
+    # Debugging
+    if topic_embeddings is None:
+        return {"error": "Topic embeddings not found"}, 400
+
+    if isinstance(topic_embeddings, np.ndarray) and topic_embeddings.ndim == 1:
+        topic_embeddings = [topic_embeddings]
+
+    # If only one topic embedding is available, duplicate it
+    if len(topic_embeddings) == 1:
+        print("WARNING: Only one topic embedding found, duplicating it.")
+        topic_embeddings.append(topic_embeddings[0])
+
+    if len(topic_embeddings) < 2:
+        return {"error": "Insufficient topic embeddings"}, 400
+
+    resource_polylines = create_resource_polylines(topic_embeddings, resource_embeddings, 8)
+    if not resource_polylines:
+        return {"error": "Generated polylines are empty"}, 400
+
+    # Ensure num_axes is valid
+    num_axes = len(topic_embeddings)
+    x_max, y_max = 1.0, 1.0
+
+    # Compute axes lengths and angle safely
+    tlen, theta = rad_plot_axes(num_axes, x_max, y_max)
+
+    # Compute x, y coordinates
+    centroids = rad_plot_poly(num_axes, resource_polylines, tlen, theta)
+
+    max_id = db.session.query(db.func.max(Resource.id)).scalar() or 0
+    new_resources = []
+
+    if centroids:
+        x_coordinate, y_coordinate = centroids[0]  # Use only the first centroid
+        new_resource = Resource(
+            id=max_id + 1,
+            name=name,
+            description=None,
+            keywords=keywords,
+            polyline=resource_polylines,
+            x_coordinate=x_coordinate,
+            y_coordinate=y_coordinate,
+            course_id=course_id,
+            module_id=module_id,
+            submodule_id=None,
+            type=res_type,
+            link=link,
+            index=max_id + 1,
+            module=module,
+            beta=8
+        )
+
+        db.session.add(new_resource)
+        db.session.flush()
+        resources_added(course_id, [new_resource])
+        db.session.commit()
+
+        return {"message": "Resource created successfully"}, 201
+    else:
+        return {"error": "No valid centroid found"}, 400
+
+
 def allowed_file(filename):
     ALLOWED_EXTENSIONS = {"pdf"}
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -811,87 +754,109 @@ def upload_pdf_resource():
         if not all([name, course_id, module_id, res_type]):
             return jsonify({"error": "Missing required fields"}), 400
 
-        # Extract text from PDF
-        extracted_text = ""
-        with pdfplumber.open(filepath) as pdf:
-            for page in pdf.pages:
-                extracted_text += page.extract_text() or ""
+        job_id = enqueue('pdf_resource', {
+            "name": name, "course_id": course_id, "module_id": module_id,
+            "type": res_type, "module": module, "filename": filename, "filepath": os.path.abspath(filepath),
+        })
+        return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
 
-        if not extracted_text.strip():
-            return jsonify({"error": "Failed to extract text from PDF"}), 400
+    except Exception as e:
+        app.logger.error(f"Error occurred: {e}")
+        return jsonify({"error": "Server error", "details": str(e)}), 500
 
-        # Generate keywords
-        try:
-            keywords, _ = create_keywords_list([extracted_text])
-            if keywords and isinstance(keywords[0], list):
-                keywords = [word for sublist in keywords for word in sublist]
-        except Exception as e:
-            return jsonify({"error": f"Failed to extract keywords: {str(e)}"}), 400
 
-        if not keywords:
-            return jsonify({"error": "No keywords extracted"}), 400
+@job_handler('pdf_resource')
+def upload_pdf_resource_job(payload, progress):
+    name = payload["name"]
+    course_id = payload["course_id"]
+    module_id = payload["module_id"]
+    res_type = payload["type"]
+    module = payload["module"]
+    filename = payload["filename"]
+    filepath = payload["filepath"]
+
+    progress(0.1, "Reading PDF")
+    # Extract text from PDF
+    extracted_text = ""
+    import pdfplumber
+    with pdfplumber.open(filepath) as pdf:
+        for page in pdf.pages:
+            extracted_text += page.extract_text() or ""
+
+    if not extracted_text.strip():
+        return {"error": "Failed to extract text from PDF"}, 400
+
+    # Generate keywords
+    progress(0.4, "Extracting keywords")
+    try:
+        keywords, _ = create_keywords_list([extracted_text])
+        if keywords and isinstance(keywords[0], list):
+            keywords = [word for sublist in keywords for word in sublist]
+    except Exception as e:
+        return {"error": f"Failed to extract keywords: {str(e)}"}, 400
 
-        # Generate embeddings
-        resource_embeddings = create_resource_embeddings(keywords)
-        if not resource_embeddings:
-            return jsonify({"error": "Failed to generate resource embeddings"}), 400
-
-        topic_embeddings = get_topic_embedding(module_id)
-        if topic_embeddings is None:
-            return jsonify({"error": "Topic embeddings not found"}), 400
-
-        if isinstance(topic_embeddings, np.ndarray) and topic_embeddings.ndim == 1:
-            topic_embeddings = [topic_embeddings]
-
-        if len(topic_embeddings) == 1:
-            topic_embeddings.append(topic_embeddings[0])
-
-        if len(topic_embeddings) < 2:
-            return jsonify({"error": "Insufficient topic embeddings"}), 400
-
-        # Generate resource polylines
-        resource_polylines = create_resource_polylines(topic_embeddings, resource_embeddings, 8)
-        if not resource_polylines:
-            return jsonify({"error": "Generated polylines are empty"}), 400
-
-        num_axes = len(topic_embeddings)
-        x_max, y_max = 1.0, 1.0
-        tlen, theta = rad_plot_axes(num_axes, x_max, y_max)
-        centroids = rad_plot_poly(num_axes, resource_polylines, tlen, theta)
-
-        max_id = db.session.query(db.func.max(Resource.id)).scalar() or 0
-        if centroids:
-            x_coordinate, y_coordinate = centroids[0]
-
-            new_resource = Resource(
-                id=max_id + 1,
-                name=name,
-                description=None,
-                keywords=keywords,
-                polyline=resource_polylines,
-                x_coordinate=x_coordinate,
-                y_coordinate=y_coordinate,
-                course_id=course_id,
-                module_id=module_id,
-                submodule_id=None,
-                type=res_type,
-                link='/' + UPLOAD_FOLDER_NAME + '/' + filename,
-                index=max_id + 1,
-                module=module,
-                beta=8
-            )
-
-            db.session.add(new_resource)
-            db.session.commit()
-
-            return jsonify({"message": "PDF Resource uploaded successfully"}), 201
-        else:
-            return jsonify({"error": "No valid centroid found"}), 400
+    if not keywords:
+        return {"error": "No keywords extracted"}, 400
 
-    except Exception as e:
-        db.session.rollback()
-        app.logger.error(f"Error occurred: {e}")
-        return jsonify({"error": "Server error", "details": str(e)}), 500
+    # Generate embeddings
+    resource_embeddings = create_resource_embeddings(keywords)
+    if not resource_embeddings:
+        return {"error": "Failed to generate resource embeddings"}, 400
+
+    progress(0.7, "Mapping to topics")
+    topic_embeddings = get_topic_embedding(module_id)
+    if topic_embeddings is None:
+        return {"error": "Topic embeddings not found"}, 400
+
+    if isinstance(topic_embeddings, np.ndarray) and topic_embeddings.ndim == 1:
+        topic_embeddings = [topic_embeddings]
+
+    if len(topic_embeddings) == 1:
+        topic_embeddings.append(topic_embeddings[0])
+
+    if len(topic_embeddings) < 2:
+        return {"error": "Insufficient topic embeddings"}, 400
+
+    # Generate resource polylines
+    resource_polylines = create_resource_polylines(topic_embeddings, resource_embeddings, 8)
+    if not resource_polylines:
+        return {"error": "Generated polylines are empty"}, 400
+
+    num_axes = len(topic_embeddings)
+    x_max, y_max = 1.0, 1.0
+    tlen, theta = rad_plot_axes(num_axes, x_max, y_max)
+    centroids = rad_plot_poly(num_axes, resource_polylines, tlen, theta)
+
+    max_id = db.session.query(db.func.max(Resource.id)).scalar() or 0
+    if centroids:
+        x_coordinate, y_coordinate = centroids[0]
+
+        new_resource = Resource(
+            id=max_id + 1,
+            name=name,
+            description=None,
+            keywords=keywords,
+            polyline=resource_polylines,
+            x_coordinate=x_coordinate,
+            y_coordinate=y_coordinate,
+            course_id=course_id,
+            module_id=module_id,
+            submodule_id=None,
+            type=res_type,
+            link='/' + UPLOAD_FOLDER_NAME + '/' + filename,
+            index=max_id + 1,
+            module=module,
+            beta=8
+        )
+
+        db.session.add(new_resource)
+        db.session.flush()
+        resources_added(course_id, [new_resource])
+        db.session.commit()
+
+        return {"message": "PDF Resource uploaded successfully"}, 201
+    else:
+        return {"error": "No valid centroid found"}, 400
 
 
 def convert_to_lists(data):
@@ -943,22 +908,11 @@ def changed_by_summary():
             return jsonify({"error": "Embedding generation failed"}), 400
 
         # Fetch topic embeddings for the given course_id
-        raw_embeddings = db.session.query(Topic.embedding).filter_by(course_id=course_id).all()
-
-        # Convert embeddings safely
-        topic_embeddings = []
-        for embed in raw_embeddings:
-            try:
-                emb_value = json.loads(embed[0]) if isinstance(embed[0], str) else embed[0]
-                if isinstance(emb_value, list):
-                    topic_embeddings.append(emb_value)
-                else:
-                    print(f"ERROR: Invalid topic embedding -> Expected list, got {type(emb_value)}")
-            except json.JSONDecodeError:
-                print("ERROR: Failed to parse embedding JSON")
+        topic_matrix = get_topic_matrix(course_id)
+        topic_embeddings = topic_matrix.unit if topic_matrix is not None else []
 
         # Validate topic embeddings
-        if not topic_embeddings:
+        if not len(topic_embeddings):
             print("p4")
             return jsonify({"error": "No valid topic embeddings found for this course"}), 400
 
@@ -1011,14 +965,10 @@ def changed_by_summary():
         max_learner_id = db.session.query(db.func.max(Learner.id)).scalar()
         new_learner_id = (max_learner_id ) if max_learner_id else 1  # Start from 1 if table is empty
 
-        # 🔹 Fetch all resource indexes for this course_id
-        resource_indexes = db.session.query(Resource.index).filter_by(course_id=course_id).all()
-        resource_index_list = [idx[0] for idx in resource_indexes if idx[0] is not None]  # Extract values from tuples
-
-        # 🔹 Insert into enroll table with learner_id as max+1 and ta_id as given
+        # 🔹 Insert into enroll table with learner_id as max+1 and ta_id as given; every resource of the course is accessible
         enroll_insert_query = text("""
-            INSERT INTO enroll (learner_id, course_id, x_coordinate, y_coordinate, polyline, ta_id, accessible_resources)
-            VALUES (:learner_id, :course_id, :x_coordinate, :y_coordinate, :polyline, :ta_id, :accessible_resources)
+            INSERT INTO enroll (learner_id, course_id, x_coordinate, y_coordinate, polyline, ta_id, accessible_resources, accessible_bitmap)
+            VALUES (:learner_id, :course_id, :x_coordinate, :y_coordinate, :polyline, :ta_id, :accessible_resources, :accessible_bitmap)
         """)
 
         db.session.execute(enroll_insert_query, {
@@ -1026,9 +976,9 @@ def changed_by_summary():
             "course_id": course_id,
             "x_coordinate": float(x_coordinate),
             "y_coordinate": float(y_coordinate),
-            "polyline": json.dumps(learner_polylines),
+            "polyline": pack_vector(learner_polylines, DTYPE_F64),
             "ta_id": ta_id,
-            "accessible_resources": json.dumps(resource_index_list)  # Store indexes as JSON array
+            **accessible_columns(course_id),
         })
 
         db.session.commit()
@@ -1077,21 +1027,10 @@ def changed_ta_position():
             return jsonify({"error": "Embedding generation failed"}), 400
 
         # Fetch topic embeddings for the given course_id
-        raw_embeddings = db.session.query(Topic.embedding).filter_by(course_id=course_id).all()
-
-        # Convert embeddings safely
-        topic_embeddings = []
-        for embed in raw_embeddings:
-            try:
-                emb_value = json.loads(embed[0]) if isinstance(embed[0], str) else embed[0]
-                if isinstance(emb_value, list):
-                    topic_embeddings.append(emb_value)
-                else:
-                    print(f"ERROR: Invalid topic embedding -> Expected list, got {type(emb_value)}")
-            except json.JSONDecodeError:
-                print("ERROR: Failed to parse embedding JSON")
-
-        if not topic_embeddings:
+        topic_matrix = get_topic_matrix(course_id)
+        topic_embeddings = topic_matrix.unit if topic_matrix is not None else []
+
+        if not len(topic_embeddings):
             return jsonify({"error": "No valid topic embeddings found for this course"}), 400
 
         # Generate polylines
@@ -1130,7 +1069,7 @@ def changed_ta_position():
             "course_id": course_id,
             "x_coordinate": float(x_coordinate),
             "y_coordinate": float(y_coordinate),
-            "polyline": json.dumps(learner_polylines)
+            "polyline": pack_vector(learner_polylines, DTYPE_F64)
         })
 
         # 🔹 Fetch user info to add to learner table
@@ -1160,23 +1099,19 @@ def changed_ta_position():
         # 🔹 Get newly inserted learner_id
         new_learner_id = db.session.query(db.func.max(Learner.id)).scalar()
 
-        # 🔹 Fetch accessible resources for course
-        resource_indexes = db.session.query(Resource.index).filter_by(course_id=course_id).all()
-        resource_index_list = [idx[0] for idx in resource_indexes if idx[0] is not None]
-
-        # 🔹 Insert into enroll table
+        # 🔹 Insert into enroll table; every resource of the course is accessible
         enroll_insert_query = text("""
-            INSERT INTO enroll (learner_id, course_id, x_coordinate, y_coordinate, polyline, ta_id, accessible_resources)
-            VALUES (:learner_id, :course_id, :x_coordinate, :y_coordinate, :polyline, :ta_id, :accessible_resources)
+            INSERT INTO enroll (learner_id, course_id, x_coordinate, y_coordinate, polyline, ta_id, accessible_resources, accessible_bitmap)
+            VALUES (:learner_id, :course_id, :x_coordinate, :y_coordinate, :polyline, :ta_id, :accessible_resources, :accessible_bitmap)
         """)
         db.session.execute(enroll_insert_query, {
             "learner_id": new_learner_id,
             "course_id": course_id,
             "x_coordinate": float(x_coordinate),
             "y_coordinate": float(y_coordinate),
-            "polyline": json.dumps(learner_polylines),
+            "polyline": pack_vector(learner_polylines, DTYPE_F64),
             "ta_id": ta_id,
-            "accessible_resources": json.dumps(resource_index_list)
+            **accessible_columns(course_id),
         })
 
         db.session.commit()
@@ -1219,20 +1154,10 @@ def teacher_exit_points():
             return jsonify({"error": "Embedding generation failed"}), 400
 
         # 🔹 Step 3: Fetch topic embeddings for the given course_id
-        raw_embeddings = db.session.query(Topic.embedding).filter_by(course_id=course_id).all()
-
-        topic_embeddings = []
-        for embed in raw_embeddings:
-            try:
-                emb_value = json.loads(embed[0]) if isinstance(embed[0], str) else embed[0]
-                if isinstance(emb_value, list):
-                    topic_embeddings.append(emb_value)
-                else:
-                    print(f"ERROR: Invalid topic embedding -> Expected list, got {type(emb_value)}")
-            except json.JSONDecodeError:
-                print("ERROR: Failed to parse embedding JSON")
-
-        if not topic_embeddings:
+        topic_matrix = get_topic_matrix(course_id)
+        topic_embeddings = topic_matrix.unit if topic_matrix is not None else []
+
+        if not len(topic_embeddings):
             return jsonify({"error": "No valid topic embeddings found for this course"}), 400
 
         # 🔹 Step 4: Generate polylines
@@ -1266,7 +1191,7 @@ def teacher_exit_points():
             "id": new_id,
             "course_id": course_id,
             "description": json.dumps(description),
-            "polyline": json.dumps(learner_polylines),
+            "polyline": pack_vector(learner_polylines, DTYPE_F64),
             "x": float(x_coordinate),
             "y": float(y_coordinate)
         })
@@ -1302,99 +1227,102 @@ def insert_summary_coordinates_per_contribution(enroll_id, course_id):
     try:
         print(f"[REQUEST RECEIVED] Inserting summary coordinates for enroll_id: {enroll_id}, course_id: {course_id}")
 
-        # Fetch summary contributions for enroll_id
-        contributions = Contribution.query.filter(
-            Contribution.enroll_id == enroll_id,
-            Contribution.description['summary'].as_boolean() == True
-        ).order_by(Contribution.submitted_on.asc()).all()
-
-        if not contributions:
-            return jsonify({"error": "No summary contributions found for the given enroll_id"}), 404
-
-        # Fetch topic embeddings for course
-        raw_embeddings = db.session.query(Topic.embedding).filter_by(course_id=course_id).all()
-        topic_embeddings = []
-        for embed in raw_embeddings:
-            try:
-                emb_value = json.loads(embed[0]) if isinstance(embed[0], str) else embed[0]
-                if isinstance(emb_value, list):
-                    topic_embeddings.append(emb_value)
-            except json.JSONDecodeError:
-                print("ERROR: Failed to parse embedding JSON")
-
-        if not topic_embeddings:
-            return jsonify({"error": "No valid topic embeddings found for this course"}), 400
+        job_id = enqueue('summary_coordinates', {"enroll_id": enroll_id, "course_id": course_id})
+        return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
 
-        inserted_count = 0
+    except Exception as e:
+        print(f"[ERROR] Server error: {str(e)}")
+        return jsonify({"error": "Internal Server Error", "details": str(e)}), 500
 
-        for contrib in contributions:
-            content = contrib.contribution_content
-            if not content or content.strip() == "":
-                continue
 
-            # Extract keywords
-            all_keywords_list, _ = create_keywords_list([content])
-            if not all_keywords_list:
-                print(f"Keyword extraction failed for contribution id: {contrib.id}")
-                continue
+@job_handler('summary_coordinates')
+def insert_summary_coordinates_job(payload, progress):
+    enroll_id = payload["enroll_id"]
+    course_id = payload["course_id"]
 
-            if isinstance(all_keywords_list[0], list):
-                all_keywords_list = [word for sublist in all_keywords_list for word in sublist]
+    # Fetch summary contributions for enroll_id
+    contributions = Contribution.query.filter(
+        Contribution.enroll_id == enroll_id,
+        Contribution.description['summary'].as_boolean() == True
+    ).order_by(Contribution.submitted_on.asc()).all()
 
-            # Generate embeddings
-            learner_embeddings = create_resource_embeddings(all_keywords_list)
-            if not learner_embeddings:
-                print(f"Embedding generation failed for contribution id: {contrib.id}")
-                continue
+    if not contributions:
+        return {"error": "No summary contributions found for the given enroll_id"}, 404
 
-            # Generate polyline
-            learner_polylines = create_resource_polylines(topic_embeddings, learner_embeddings, 8)
-            if not learner_polylines:
-                print(f"Polyline generation failed for contribution id: {contrib.id}")
-                continue
+    # Fetch topic embeddings for course
+    topic_matrix = get_topic_matrix(course_id)
+    topic_embeddings = topic_matrix.unit if topic_matrix is not None else []
 
-            # Prepare polyline list for centroid calculation
-            description_polyline_list = [
-                item for sublist in convert_to_lists(learner_polylines[0]) 
-                for item in (sublist if isinstance(sublist, list) else [sublist])
-            ]
-
-            # Compute (x,y)
-            feature_length = len(learner_polylines[0])
-            tlen, theta = rad_plot_axes(feature_length, 1, 1)
-            centroid_list = rad_plot_poly(feature_length, [description_polyline_list], tlen, theta)
-            x_coordinate, y_coordinate = centroid_list[0]
-
-            # Get new id for summary_coordinates
-            new_id_query = text("SELECT COALESCE(MAX(id), 0) + 1 FROM summary_coordinates")
-            new_id = db.session.execute(new_id_query).scalar()
-
-            # Insert into summary_coordinates table
-            insert_query = text("""
-                INSERT INTO summary_coordinates (id, enroll_id, course_id, summary, polyline, x_coordinate, y_coordinate)
-                VALUES (:id, :enroll_id, :course_id, :summary, :polyline, :x, :y)
-            """)
-
-            db.session.execute(insert_query, {
-                "id": new_id,
-                "enroll_id": enroll_id,
-                "course_id": course_id,
-                "summary": json.dumps(content),
-                "polyline": json.dumps(learner_polylines),
-                "x": float(x_coordinate),
-                "y": float(y_coordinate)
-            })
-
-            inserted_count += 1
+    if not len(topic_embeddings):
+        return {"error": "No valid topic embeddings found for this course"}, 400
 
-        db.session.commit()
-        print(f"[SUCCESS] Inserted {inserted_count} summary coordinate entries.")
-        return jsonify({"message": f"Inserted {inserted_count} summary coordinate entries."}), 201
+    inserted_count = 0
+
+    for n, contrib in enumerate(contributions):
+        progress(n / len(contributions), f"Contribution {n + 1} of {len(contributions)}")
+        content = contrib.contribution_content
+        if not content or content.strip() == "":
+            continue
+
+        # Extract keywords
+        all_keywords_list, _ = create_keywords_list([content])
+        if not all_keywords_list:
+            print(f"Keyword extraction failed for contribution id: {contrib.id}")
+            continue
+
+        if isinstance(all_keywords_list[0], list):
+            all_keywords_list = [word for sublist in all_keywords_list for word in sublist]
+
+        # Generate embeddings
+        learner_embeddings = create_resource_embeddings(all_keywords_list)
+        if not learner_embeddings:
+            print(f"Embedding generation failed for contribution id: {contrib.id}")
+            continue
+
+        # Generate polyline
+        learner_polylines = create_resource_polylines(topic_embeddings, learner_embeddings, 8)
+        if not learner_polylines:
+            print(f"Polyline generation failed for contribution id: {contrib.id}")
+            continue
+
+        # Prepare polyline list for centroid calculation
+        description_polyline_list = [
+            item for sublist in convert_to_lists(learner_polylines[0]) 
+            for item in (sublist if isinstance(sublist, list) else [sublist])
+        ]
+
+        # Compute (x,y)
+        feature_length = len(learner_polylines[0])
+        tlen, theta = rad_plot_axes(feature_length, 1, 1)
+        centroid_list = rad_plot_poly(feature_length, [description_polyline_list], tlen, theta)
+        x_coordinate, y_coordinate = centroid_list[0]
+
+        # Get new id for summary_coordinates
+        new_id_query = text("SELECT COALESCE(MAX(id), 0) + 1 FROM summary_coordinates")
+        new_id = db.session.execute(new_id_query).scalar()
+
+        # Insert into summary_coordinates table
+        insert_query = text("""
+            INSERT INTO summary_coordinates (id, enroll_id, course_id, summary, polyline, x_coordinate, y_coordinate)
+            VALUES (:id, :enroll_id, :course_id, :summary, :polyline, :x, :y)
+        """)
+
+        db.session.execute(insert_query, {
+            "id": new_id,
+            "enroll_id": enroll_id,
+            "course_id": course_id,
+            "summary": json.dumps(content),
+            "polyline": pack_vector(learner_polylines, DTYPE_F64),
+            "x": float(x_coordinate),
+            "y": float(y_coordinate)
+        })
+
+        inserted_count += 1
+
+    db.session.commit()
+    print(f"[SUCCESS] Inserted {inserted_count} summary coordinate entries.")
+    return {"message": f"Inserted {inserted_count} summary coordinate entries."}, 201
 
-    except Exception as e:
-        db.session.rollback()
-        print(f"[ERROR] Server error: {str(e)}")
-        return jsonify({"error": "Internal Server Error", "details": str(e)}), 500
 
 @app.route('/exit-points/<int:course_id>', methods=['GET'])
 def get_exit_coordinates(course_id):
@@ -0,0 +1,130 @@
+# module_centroids.py
+#
+# Materialized module centroids of a course (the /moduleData map). Each
+# module_centroid row keeps the running sum and count of its resources'
+# beta-scaled polylines plus the projected (x, y) of their mean, so new
+# resources are added in O(modules touched) and reading is one indexed query.
+# A course's rows are built from its resources on first read
+# (Course.module_centroids_ready); until then writes leave them alone.
+
+import numpy as np
+
+from dbModels import db, Course, ModuleCentroid, Resource
+import polyline_kernel
+from radial_projection import project
+
+
+def _contribution(resource):
+    # beta-scaled polyline a resource adds to its module's sum, or None
+    polyline = resource.polyline
+    if polyline is None or not len(polyline):
+        return None
+    # at the stored (float32) precision: a just-added resource still holds the
+    # values it was given, a rebuild reads them back from the column
+    polyline = np.asarray(polyline, dtype=np.float32).astype(np.float64)
+    return polyline_kernel.beta_scale(polyline, resource.beta or 0)
+
+
+def _locked_course(course_id):
+    # the course row, locked: serializes rebuilds with concurrent resource writes
+    return db.session.query(Course).filter(Course.id == course_id).with_for_update().first()
+
+
+def _store(row, polyline_sum, count):
+    row.resource_count = count
+    row.polyline_sum = polyline_sum.tolist()
+    x, y = project(polyline_sum / count)[0]
+    row.x_coordinate = float(x)
+    row.y_coordinate = float(y)
+
+
+def rebuild_module_centroids(course_id):
+    """
+    Recompute the course's module_centroid rows from its resources and mark
+    them ready. Does not commit.
+    """
+    course = _locked_course(course_id)
+    if course is None:
+        return
+    ModuleCentroid.query.filter_by(course_id=course_id).delete()
+
+    sums = {}  # module_id -> [module, sum, count], in order of first resource
+    resources = Resource.query.filter_by(course_id=course_id).order_by(Resource.id.asc()).all()
+    for resource in resources:
+        scaled = _contribution(resource)
+        if scaled is None:
+            continue
+        entry = sums.get(resource.module_id)
+        if entry is None:
+            sums[resource.module_id] = [resource.module, scaled, 1]
+            continue
+        if len(scaled) != len(entry[1]):
+            print(f"WARNING: resource {resource.id} polyline has {len(scaled)} values, "
+                  f"module {resource.module_id} has {len(entry[1])}")
+            continue
+        entry[0] = resource.module
+        entry[1] = entry[1] + scaled
+        entry[2] += 1
+
+    for module_id, (module, polyline_sum, count) in sums.items():
+        row = ModuleCentroid(course_id=course_id, module_id=module_id, module=module)
+        _store(row, polyline_sum, count)
+        db.session.add(row)
+    course.module_centroids_ready = True
+
+
+def update_module_centroids(course_id, added=(), removed=()):
+    """
+    Add resources to / remove them from their modules' running sums, in the
+    current transaction. `removed` takes objects with the resource's previous
+    module_id, module, polyline and beta (e.g. before a re-embedding).
+    No-op until the course's centroids have been materialized.
+    """
+    course = _locked_course(course_id)
+    if course is None or not course.module_centroids_ready:
+        return
+
+    rows = {
+        row.module_id: row
+        for row in ModuleCentroid.query.filter_by(course_id=course_id).with_for_update().all()
+    }
+    changes = [(resource, 1) for resource in added] + [(resource, -1) for resource in removed]
+    touched = {}
+    for resource, sign in changes:
+        scaled = _contribution(resource)
+        if scaled is None:
+            continue
+        row = rows.get(resource.module_id)
+        if row is None:
+            if sign < 0:
+                continue
+            row = ModuleCentroid(course_id=course_id, module_id=resource.module_id, resource_count=0)
+            db.session.add(row)
+            rows[resource.module_id] = row
+        polyline_sum, count = touched.get(resource.module_id) or (
+            np.asarray(row.polyline_sum or np.zeros(len(scaled)), dtype=np.float64), row.resource_count or 0)
+        if len(scaled) != len(polyline_sum):
+            print(f"WARNING: resource {resource.id} polyline has {len(scaled)} values, "
+                  f"module {resource.module_id} has {len(polyline_sum)}")
+            continue
+        if sign > 0:
+            row.module = resource.module
+        touched[resource.module_id] = (polyline_sum + sign * scaled, count + sign)
+
+    for module_id, (polyline_sum, count) in touched.items():
+        if count <= 0:
+            db.session.delete(rows[module_id])
+        else:
+            _store(rows[module_id], polyline_sum, count)
+
+
+def get_module_centroids(course_id):
+    """
+    [{module_id, module, x, y}] of the course, materializing it first if needed.
+    """
+    ready = db.session.query(Course.module_centroids_ready).filter(Course.id == course_id).scalar()
+    if not ready:
+        rebuild_module_centroids(course_id)
+        db.session.commit()
+    rows = ModuleCentroid.query.filter_by(course_id=course_id).order_by(ModuleCentroid.id.asc()).all()
+    return [row.to_dict() for row in rows]
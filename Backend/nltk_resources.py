@@ -0,0 +1,60 @@
+# nltk_resources.py
+#
+# NLTK corpora used by the text preprocessing, fetched on first use instead
+# of at import time. Data that is already installed is never re-downloaded.
+
+import ssl
+import threading
+
+import nltk
+
+# (download name, nltk.data path used to check whether it is installed)
+_NLTK_PACKAGES = [
+    ('stopwords', 'corpora/stopwords'),
+    ('wordnet', 'corpora/wordnet'),
+    ('punkt', 'tokenizers/punkt'),
+]
+
+_ready = False
+_lock = threading.Lock()
+_stop_words = None
+
+
+def ensure_nltk_data():
+    """
+    Download the NLTK packages that are missing (once per process).
+    """
+    global _ready
+    if _ready:
+        return
+    with _lock:
+        if _ready:
+            return
+        missing = []
+        for package, path in _NLTK_PACKAGES:
+            try:
+                nltk.data.find(path)
+            except LookupError:
+                missing.append(package)
+        if missing:
+            try:
+                _create_unverified_https_context = ssl._create_unverified_context
+            except AttributeError:
+                pass
+            else:
+                ssl._create_default_https_context = _create_unverified_https_context
+            for package in missing:
+                nltk.download(package, quiet=True)
+        _ready = True
+
+
+def get_stop_words() -> set:
+    """
+    English stopword set, loaded once.
+    """
+    global _stop_words
+    if _stop_words is None:
+        ensure_nltk_data()
+        from nltk.corpus import stopwords
+        _stop_words = set(stopwords.words('english'))
+    return _stop_words
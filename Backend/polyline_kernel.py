@@ -0,0 +1,133 @@
+# polyline_kernel.py
+#
+# Vectorized polyline maths shared by the topic, resource, learner and summary
+# paths. Topic and document vectors are L2-normalised once and every cosine
+# similarity of a call comes out of one matrix product, instead of one
+# get_cos_sim() call per (document, topic) pair.
+
+import numpy as np
+
+# Keyword rows handled at once when averaging keyword polylines (bounds memory
+# at 100k+ documents)
+CHUNK_ROWS = 65536
+
+
+def as_matrix(vectors) -> np.ndarray:
+    """
+    (n, d) float64 matrix from a list of vectors, an array, or DB rows such as
+    db.session.query(Topic.embedding).all() (one-element tuples).
+    """
+    if isinstance(vectors, np.ndarray):
+        matrix = vectors.astype(np.float64, copy=False)
+    elif len(vectors) == 0:
+        return np.empty((0, 0))
+    else:
+        matrix = np.asarray(vectors, dtype=np.float64)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    return matrix.reshape(matrix.shape[0], -1)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Rows scaled to unit length; zero rows stay zero (similarity 0).
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def scaled_similarity(docs, topics) -> np.ndarray:
+    """
+    (num_docs, num_topics) cosine similarities scaled from [-1, 1] to [0, 1].
+    """
+    doc_unit = normalize_rows(as_matrix(docs))
+    topic_unit = normalize_rows(as_matrix(topics))
+    return (doc_unit @ topic_unit.T + 1.0) / 2.0
+
+
+def beta_scale(polylines, beta) -> np.ndarray:
+    """
+    p + beta * (p - mean(p)) per row, clipped to [0, 1]. `beta` is a number
+    or one value per row.
+    """
+    polylines = np.asarray(polylines, dtype=np.float64)
+    if polylines.size == 0:
+        return polylines
+    beta = np.asarray(beta, dtype=np.float64)
+    if beta.ndim == 1:
+        beta = beta[:, None]
+    mean = polylines.mean(axis=-1, keepdims=True)
+    return np.clip(polylines + beta * (polylines - mean), 0.0, 1.0)
+
+
+def keyword_mean_polylines(topics, keyword_groups) -> np.ndarray:
+    """
+    One polyline per document: the scaled similarity of each of its keyword
+    vectors to every topic, averaged over the keywords.
+
+    Parameters:
+        topics: Topic vectors (num_topics x d).
+        keyword_groups: One (num_keywords x d) matrix per document.
+
+    Returns:
+        np.ndarray: (num_docs x num_topics). Documents without keywords get
+        a zero polyline.
+    """
+    topic_unit = normalize_rows(as_matrix(topics))
+    out = np.zeros((len(keyword_groups), topic_unit.shape[0]))
+
+    start = 0
+    while start < len(keyword_groups):
+        # documents [start, stop) with at most CHUNK_ROWS keywords (at least one document)
+        stop, num_rows = start, 0
+        chunk = []
+        while stop < len(keyword_groups) and (not chunk or num_rows + len(keyword_groups[stop]) <= CHUNK_ROWS):
+            group = keyword_groups[stop]
+            if not (isinstance(group, np.ndarray) and group.ndim == 2 and group.dtype.kind == 'f'):
+                group = as_matrix(group) if len(group) else np.empty((0, topic_unit.shape[1]))
+            chunk.append(group)
+            num_rows += group.shape[0]
+            stop += 1
+
+        counts = np.array([g.shape[0] for g in chunk])
+        # mean over keywords of (k/|k| . t + 1) / 2 == (mean(k/|k|) . t + 1) / 2, so the unit
+        # keyword vectors are averaged per document first and only documents go through the matmul.
+        # Encoder output is read as is (no float64 copy of every keyword row up front).
+        keyword_rows = np.vstack(chunk)
+        norms = np.sqrt(np.einsum('ij,ij->i', keyword_rows, keyword_rows, dtype=np.float64))
+        norms[norms == 0] = 1.0
+        unit = keyword_rows / norms.astype(keyword_rows.dtype)[:, None]
+
+        # per-document sums over runs of documents with the same keyword count
+        # (usually one run: every document has top_n keywords)
+        sums = np.zeros((len(chunk), unit.shape[1]))
+        run_starts = np.concatenate(([0], np.flatnonzero(np.diff(counts)) + 1, [len(chunk)]))
+        row = 0
+        for first, last in zip(run_starts[:-1], run_starts[1:]):
+            n = counts[first]
+            if n:
+                block = unit[row:row + (last - first) * n]
+                sums[first:last] = block.reshape(last - first, n, -1).sum(axis=1, dtype=np.float64)
+            row += (last - first) * n
+
+        nonempty = counts > 0
+        mean_unit = sums[nonempty] / counts[nonempty, None]
+        out[start:stop][nonempty] = (mean_unit @ topic_unit.T + 1.0) / 2.0
+        start = stop
+    return out
+
+
+def topic_polylines(topic_embeddings, names=None) -> np.ndarray:
+    """
+    Topic-topic polylines: scaled similarity of every topic to every other,
+    with 1 on the diagonal (or wherever two topics share a name, if `names`
+    is given).
+    """
+    polylines = scaled_similarity(topic_embeddings, topic_embeddings)
+    if names is None:
+        np.fill_diagonal(polylines, 1.0)
+    else:
+        names = np.asarray(names, dtype=object)
+        polylines[names[:, None] == names[None, :]] = 1.0
+    return polylines
@@ -0,0 +1,151 @@
+# radial_projection.py
+#
+# Radial projection of polylines to 2D (rad_plot_axes + rad_plot_poly).
+# The axes only depend on the number of topics, so they and the per-axis
+# cos / sin factors are computed once per size. With the axes fixed the
+# centroid is linear in the polyline:
+#   x = sum_p poly[p] * tlen[p] * cos(p * theta) / num   (y likewise with sin)
+# so N polylines are projected together instead of in a Python loop.
+
+import math
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def radial_axes(num: int, x_max: float = 1, y_max: float = 1):
+    """
+    Axis lengths and angle of a radial plot with `num` axes (the
+    rad_plot_axes loop, computed once per arguments).
+
+    Returns:
+        tuple: (tlen, theta). tlen is shared between callers; do not modify it.
+    """
+    tlen = []  # List to store the length of axes
+    ttempl = []  # Temporary container for reversed lengths
+    theta = ((np.pi) / (num - 1)) / 2  # Calculate theta
+    b = 0
+
+    while (b * theta) <= (np.arctan(y_max / x_max)):
+        y_val = x_max * math.tan(b * theta)
+        ttemp = math.sqrt((x_max ** 2) + (y_val ** 2))
+        tlen.append(ttemp)
+        if (b * theta) != np.arctan(y_max / x_max):
+            ttempl.append(ttemp)
+        b += 1
+
+    tlen.extend(list(reversed(ttempl)))
+    return tlen, theta
+
+
+def _factors(num: int, tlen, theta: float):
+    # (tlen, cos(p * theta), sin(p * theta)) per axis; math.cos / math.sin as in rad_plot_poly
+    lengths = np.array(tlen[:num], dtype=np.float64)
+    cos = np.array([math.cos(p * theta) for p in range(num)])
+    sin = np.array([math.sin(p * theta) for p in range(num)])
+    return lengths, cos, sin
+
+
+@lru_cache(maxsize=None)
+def _unit_factors(num: int):
+    factors = _factors(num, *radial_axes(num, 1, 1))
+    for f in factors:
+        f.setflags(write=False)
+    return factors
+
+
+@lru_cache(maxsize=None)
+def projection_weights(num: int) -> np.ndarray:
+    """
+    (num x 2) matrix [tlen * cos, tlen * sin] / num of the unit axes: a
+    polyline @ weights is its radial centroid (up to float rounding).
+    """
+    lengths, cos, sin = _unit_factors(num)
+    weights = np.stack([lengths * cos, lengths * sin], axis=1) / num
+    weights.setflags(write=False)
+    return weights
+
+
+def project(polylines, tlen=None, theta=None, exact: bool = True) -> np.ndarray:
+    """
+    Radial centroids of polylines.
+
+    Parameters:
+        polylines: (N x D) matrix, list of polylines or a single polyline.
+        tlen, theta: Axes from radial_axes / rad_plot_axes; default are the
+            unit axes for D topics.
+        exact (bool): Same float operations, in the same order, as the
+            rad_plot_poly loop (bit-identical coordinates). False uses one
+            matmul with projection_weights (differences of ~1e-16).
+
+    Returns:
+        np.ndarray: (N x 2) array of (x, y).
+    """
+    polylines = np.asarray(polylines, dtype=np.float64)
+    if polylines.ndim == 1:
+        polylines = polylines[None, :]
+    num = polylines.shape[1]
+    if num == 0:
+        return np.zeros((len(polylines), 2))
+
+    unit_axes = tlen is None or tlen is radial_axes(num, 1, 1)[0]
+    if not exact and unit_axes:
+        return polylines @ projection_weights(num)
+
+    lengths, cos, sin = _unit_factors(num) if unit_axes else _factors(num, tlen, theta)
+    rlen = polylines * lengths
+    coordinates = np.empty((len(polylines), 2))
+    # cumsum adds left to right like sum(); np.sum would sum pairwise
+    coordinates[:, 0] = np.cumsum(rlen * cos, axis=1)[:, -1] / num
+    coordinates[:, 1] = np.cumsum(rlen * sin, axis=1)[:, -1] / num
+    return coordinates
+
+
+def beta_positions(polyline, betas) -> np.ndarray:
+    """
+    (len(betas) x 2) centroids of the polyline beta-scaled with every beta
+    (polyline_kernel.beta_scale), in one pass.
+    """
+    from polyline_kernel import beta_scale
+
+    polyline = np.asarray(polyline, dtype=np.float64)
+    betas = np.asarray(betas, dtype=np.float64)
+    scaled = beta_scale(np.broadcast_to(polyline, (len(betas), len(polyline))), betas)
+    return project(scaled)
+
+
+def closest_beta_position(polyline, target, max_beta: float):
+    """
+    Beta in [0, max_beta] whose beta-scaled polyline lands closest to target.
+
+    Every clipped value p + beta * (p - mean) is linear in beta between the
+    betas where it reaches 0 or 1, and so is the centroid. The positions are
+    therefore a polyline in the plane with a knot at each of those betas,
+    and the closest point of each segment gives the exact optimum.
+
+    Returns:
+        tuple: (position [x, y], beta, distance)
+    """
+    polyline = np.asarray(polyline, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64)
+    slope = polyline - polyline.mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hits = np.concatenate([(1.0 - polyline) / slope, -polyline / slope])
+    hits = hits[np.isfinite(hits) & (hits > 0) & (hits < max_beta)]
+    knots = np.unique(np.concatenate([[0.0, float(max_beta)], hits]))
+
+    points = beta_positions(polyline, knots)
+    if len(knots) == 1:
+        return points[0].tolist(), float(knots[0]), float(np.hypot(*(points[0] - target)))
+
+    start, step = points[:-1], np.diff(points, axis=0)
+    length2 = np.einsum('ij,ij->i', step, step)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(length2 > 0, np.einsum('ij,ij->i', target - start, step) / length2, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    closest = start + t[:, None] * step
+    distances = np.hypot(closest[:, 0] - target[0], closest[:, 1] - target[1])
+    k = int(np.argmin(distances))
+    beta = knots[k] + t[k] * (knots[k + 1] - knots[k])
+    return closest[k].tolist(), float(beta), float(distances[k])
@@ -5,8 +5,13 @@ from model_library import apply_preprocessing, create_topic_embeddings, create_t
 from flask import jsonify
 from datetime import datetime, timezone
 from itertools import chain
-from utils import get_highline_of_polylines, convert_to_lists, get_lowline_of_polylines, calculate_centroid, nearest_seven, calculate_distance
-from collections import defaultdict
+from topic_embeddings_loader import get_topic_matrix
+from radial_projection import beta_positions, closest_beta_position, project
+from module_centroids import get_module_centroids
+from resource_index import NeighbourIndex, nearest_resources, resources_changed, unlocked_resources
+from resource_ordinals import grant_resources, set_accessible_ids
+from trajectory_log import contribution_path, record_event, record_events, rewrite_contributions
+from utils import get_highline_of_polylines, convert_to_lists, get_lowline_of_polylines, calculate_distance
 import gc
 import numpy as np
 from sqlalchemy import or_
@@ -18,18 +23,16 @@ def update_position(summary, enrollId):
         raise IndexError
     (all_keywords_list, all_weight_list) = create_keywords_list([summary],5)
     learner_embeddings = create_resource_embeddings(all_keywords_list)
-    topicembedding = db.session.query(
-        Topic.embedding).filter_by(course_id=enroll.course_id).all()
-    if not topicembedding:
+    topic_matrix = get_topic_matrix(enroll.course_id)
+    if topic_matrix is None:
         raise IndexError()
 
     learner_polylines = create_resource_polylines(
-        topicembedding, learner_embeddings, 0)
+        topic_matrix.unit, learner_embeddings, 0)
     original_summary_list = convert_to_lists(learner_polylines[0])
     summary_polyline = [item for sublist in original_summary_list for item in (
         sublist if isinstance(sublist, list) else [sublist])]
-    resources: list[Resource] = Resource.query.filter_by(
-        course_id=enroll.course_id).all()
+    previous_position = (enroll.x_coordinate, enroll.y_coordinate)
     polylines = enroll.polyline
     new_polylines = get_highline_of_polylines(
         [learner_polylines[0], polylines])
@@ -45,12 +48,9 @@ def update_position(summary, enrollId):
     enroll.x_coordinate = centroid_list[0][0]
     enroll.y_coordinate = centroid_list[0][1]
     enroll.polyline = new_polylines_list
-    enroll.accessible_resources = list(set(enroll.accessible_resources).union(set(
-        nearest_seven(enroll.polyline, [[res.id, res.polyline] for res in resources]))))
-    for resource in resources:
-        if resource.x_coordinate<enroll.x_coordinate and resource.y_coordinate<enroll.y_coordinate :
-            if resource.id not in enroll.accessible_resources:
-                enroll.accessible_resources.append(resource.id)
+    grant_resources(enroll, chain(
+        nearest_resources(enroll.course_id, enroll.polyline),
+        unlocked_resources(enroll.course_id, enroll.x_coordinate, enroll.y_coordinate, previous_position)))
     db.session.commit()
     new_contribution = Contribution(
         enroll_id=enrollId,
@@ -65,131 +65,295 @@ def update_position(summary, enrollId):
         grade=1,
     )
     db.session.add(new_contribution)
+    record_event(enrollId, new_polylines_list, centroid_list[0][0], centroid_list[0][1], "summary",
+                 contribution=new_contribution, previous=(polylines, *previous_position))
     db.session.commit()
     new_contribution_id=new_contribution.id
     return centroid_list[0],new_contribution_id
 
-def update_summary_grade(contributionId, grade):
-    print(f'given grade is {grade}')
-    contribution: Contribution = Contribution.query.get(contributionId)
+def _regraded_polyline(contribution, prev_polyline):
+    # highline of the prefix and the graded contribution (running maximum);
+    # contributions without a contribution_polyline (quiz updates) carry their stored polyline
+    if contribution.contribution_polyline is not None:
+        graded = np.asarray(contribution.contribution_polyline, dtype=np.float64) * float(contribution.grade)
+    else:
+        graded = np.asarray(contribution.polyline, dtype=np.float64)
+    if len(graded) != len(prev_polyline):
+        raise ValueError("Polylines are of different lengths")
+    return np.maximum(prev_polyline, graded)
+
+
+# enrollments re-graded per transaction by update_summary_grades
+GRADE_BATCH_ENROLLMENTS = 100
+
+
+def _set_grade(contribution, grade):
     contribution.grade = grade
-    
     if grade is not None and float(grade) >= 0:
         contribution.is_graded = True
-    
+
+
+def _replay_enrollment(enroll_id, edited):
+    """
+    Replay one enrollment's highlines from its first edited contribution.
+    Every contribution stores its prefix (prev_polyline) and the running
+    highline after it (polyline), so the replay stops as soon as, past the
+    last edit, a highline comes out as stored and the next prefix matches.
+
+    Returns:
+        tuple: (replayed contributions, their new highlines, last contribution)
+    """
+    first = min(edited, key=lambda c: c.id)
+    last_edited_id = max(c.id for c in edited)
+    contributions: list[Contribution] = (
+        Contribution.query
+        .filter(Contribution.enroll_id == enroll_id, Contribution.id >= first.id)
+        .order_by(Contribution.id.asc())
+        .all()
+    )
+
+    prev_polyline = np.asarray(first.prev_polyline, dtype=np.float64)
+    replayed, polylines = [], []
+    unchanged = False
+    for current in contributions:
+        if unchanged and current.id > last_edited_id and np.array_equal(
+                np.asarray(current.prev_polyline, dtype=np.float64), prev_polyline):
+            # the previous highline came out as stored and this prefix matches it: nothing changes from here on
+            break
+        polyline = _regraded_polyline(current, prev_polyline)
+        unchanged = current.polyline is not None and np.array_equal(
+            np.asarray(current.polyline, dtype=np.float64), polyline)
+        current.prev_polyline = prev_polyline.tolist()
+        current.polyline = polyline.tolist()
+        replayed.append(current)
+        polylines.append(polyline)
+        prev_polyline = polyline
+    return replayed, polylines, contributions[-1]
+
+
+def _project_rows(polylines) -> list:
+    # radial centroids of polylines of possibly different lengths, one batch per length
+    coordinates = [None] * len(polylines)
+    by_length = {}
+    for i, polyline in enumerate(polylines):
+        by_length.setdefault(len(polyline), []).append(i)
+    for rows in by_length.values():
+        for i, xy in zip(rows, project(np.vstack([polylines[i] for i in rows])).tolist()):
+            coordinates[i] = xy
+    return coordinates
+
+
+def _apply_regrades(edited_by_enroll) -> dict:
+    """
+    Replay every enrollment, project all replayed contributions and learners
+    in one batch, move the learners and refresh their accessible resources.
+    Does not commit.
+
+    Returns:
+        dict: {enroll_id: [x, y]}
+    """
+    replays = [(enroll_id, *_replay_enrollment(enroll_id, edited))
+               for enroll_id, edited in edited_by_enroll.items()]
+
+    # every replayed highline, then every learner's final (last contribution) highline
+    rows = [p for _, _, polylines, _ in replays for p in polylines]
+    rows += [np.asarray(last.polyline, dtype=np.float64) for _, _, _, last in replays]
+    coordinates = _project_rows(rows)
+    i = 0
+    logged = {}  # enroll_id -> last logged polyline after rewriting the replayed contributions
+    for enroll_id, replayed, polylines, _ in replays:
+        for current in replayed:
+            current.x_coordinate, current.y_coordinate = coordinates[i]
+            i += 1
+        logged[enroll_id] = rewrite_contributions(enroll_id, {
+            current.id: (polyline, current.x_coordinate, current.y_coordinate)
+            for current, polyline in zip(replayed, polylines)})
+
+    enrolls = {e.id: e for e in Enroll.query.filter(Enroll.id.in_(list(edited_by_enroll))).all()}
+    positions = {}
+    for (enroll_id, _, _, last), (x, y) in zip(replays, coordinates[i:]):
+        enroll = enrolls[enroll_id]
+        enroll.x_coordinate = x
+        enroll.y_coordinate = y
+        enroll.polyline = last.polyline
+        if logged[enroll_id] is not None and not np.array_equal(
+                logged[enroll_id], np.asarray(last.polyline, dtype=np.float32)):
+            # later (e.g. watch) events no longer end where the learner is now
+            record_event(enroll_id, last.polyline, x, y, "regrade")
+        # the regraded position can move back: every resource below and left of
+        # it, plus the nearest ones
+        set_accessible_ids(enroll, chain(
+            unlocked_resources(enroll.course_id, x, y),
+            nearest_resources(enroll.course_id, enroll.polyline)))
+        positions[enroll_id] = [x, y]
+    return positions
+
+
+def update_summary_grade(contributionId, grade):
+    """
+    Re-grade a contribution: only it and the contributions after it are
+    replayed (see _replay_enrollment). One commit.
+    """
+    print(f'given grade is {grade}')
+    contribution: Contribution = Contribution.query.get(contributionId)
+    _set_grade(contribution, grade)
+    _apply_regrades({contribution.enroll_id: [contribution]})
     db.session.commit()
 
-    enrollId = contribution.enroll_id
-    enroll: Enroll = Enroll.query.get(enrollId)
-    resources: list[Resource] = Resource.query.filter_by(course_id=enroll.course_id).all()
-    all_contributions: list[Contribution] = Contribution.query.filter_by(enroll_id=enrollId).all()
-
-    newpolyline = all_contributions[0].prev_polyline
-    for contribution in all_contributions:
-        contribution.prev_polyline = newpolyline
-        actual_contribution_polyline = [x * float(contribution.grade) for x in contribution.contribution_polyline]
-        contribution.polyline = get_highline_of_polylines([newpolyline, actual_contribution_polyline])
-        
-        feature_length = len(contribution.polyline)
-        (tlen, theta) = rad_plot_axes(feature_length, 1, 1)
-        centroid_list = rad_plot_poly(feature_length, [contribution.polyline], tlen, theta)
-        print(f'centroid list is {centroid_list}')
-        contribution.x_coordinate = centroid_list[0][0]
-        contribution.y_coordinate = centroid_list[0][1]
+
+def update_summary_grades(grades):
+    """
+    Re-grade many contributions: each learner is replayed once for all of
+    their grades, GRADE_BATCH_ENROLLMENTS learners per commit.
+
+    Parameters:
+        grades: (contribution_id, grade) pairs; the last grade of a
+            contribution wins.
+
+    Returns:
+        tuple: ({enroll_id: [x, y]} of the affected learners, unknown contribution ids)
+    """
+    latest = dict(grades)
+    contributions = Contribution.query.filter(Contribution.id.in_(list(latest))).all()
+    missing = sorted(set(latest) - {c.id for c in contributions})
+
+    by_enroll = {}
+    for contribution in contributions:
+        by_enroll.setdefault(contribution.enroll_id, []).append(contribution.id)
+
+    positions = {}
+    enroll_ids = sorted(by_enroll)
+    for start in range(0, len(enroll_ids), GRADE_BATCH_ENROLLMENTS):
+        chunk_ids = [cid for enroll_id in enroll_ids[start:start + GRADE_BATCH_ENROLLMENTS]
+                     for cid in by_enroll[enroll_id]]
+        chunk = {}
+        for contribution in Contribution.query.filter(Contribution.id.in_(chunk_ids)).all():
+            _set_grade(contribution, latest[contribution.id])
+            chunk.setdefault(contribution.enroll_id, []).append(contribution)
+        positions.update(_apply_regrades(chunk))
         db.session.commit()
-        newpolyline = contribution.polyline
+    return positions, missing
 
-    feature_length = len(newpolyline)
-    (tlen, theta) = rad_plot_axes(feature_length, 1, 1)
-    centroid_list = rad_plot_poly(feature_length, [newpolyline], tlen, theta)
-    print(f'centroid list is {centroid_list}')
-    enroll.x_coordinate = centroid_list[0][0]
-    enroll.y_coordinate = centroid_list[0][1]
-    enroll.polyline = newpolyline
 
-    for resource in resources:
-        if resource.x_coordinate < enroll.x_coordinate and resource.y_coordinate < enroll.y_coordinate:
-            if resource.id not in enroll.accessible_resources:
-                enroll.accessible_resources.append(resource.id)
 
-    enroll.accessible_resources = [
-        res_id for res_id in enroll.accessible_resources
-        if any(resource.id == res_id and resource.x_coordinate < enroll.x_coordinate
-               and resource.y_coordinate < enroll.y_coordinate for resource in resources)
-    ]
-    enroll.accessible_resources = list(set(enroll.accessible_resources).union(set(
-        nearest_seven(enroll.polyline, [[res.id, res.polyline] for res in resources]))))
+# share of a watched resource's polyline added to the learner's
+WATCH_STEP = 0.01
 
-    db.session.commit()
 
+def update_positions_resources(events):
+    """
+    Apply watched resources together: each learner moves by WATCH_STEP times
+    the sum of the polylines they watched (summed in one matmul per polyline
+    length) and gains what the new position unlocks. Positions only grow, so
+    the unlocked strip from the old to the new position covers every
+    intermediate step. One commit.
 
+    Parameters:
+        events: (enroll_id, resource_id) pairs, repeats allowed.
 
-def update_position_resource(enrollId, resourceId):
+    Returns:
+        tuple: ({enroll_id: [x, y]}, skipped (enroll_id, resource_id) pairs)
+    """
+    events = [(int(enroll_id), int(resource_id)) for enroll_id, resource_id in events]
+    if not events:
+        return {}, []
+    enrolls = {e.id: e for e in Enroll.query.filter(Enroll.id.in_({e for e, _ in events})).all()}
+    resources = {r.id: r for r in Resource.query.filter(Resource.id.in_({r for _, r in events})).all()}
+
+    skipped = []
+    by_length = {}  # polyline length -> ({enroll_id: row}, {resource_id: column}, [(row, column)])
+    for enroll_id, resource_id in events:
+        enroll, resource = enrolls.get(enroll_id), resources.get(resource_id)
+        if (enroll is None or enroll.polyline is None or resource is None or resource.polyline is None
+                or len(resource.polyline) != len(enroll.polyline)):
+            skipped.append((enroll_id, resource_id))
+            continue
+        rows, columns, cells = by_length.setdefault(len(enroll.polyline), ({}, {}, []))
+        cells.append((rows.setdefault(enroll_id, len(rows)), columns.setdefault(resource_id, len(columns))))
+
+    positions, moves = {}, []
+    for rows, columns, cells in by_length.values():
+        counts = np.zeros((len(rows), len(columns)))
+        np.add.at(counts, tuple(np.array(cells).T), 1)
+        watched = np.vstack([np.asarray(resources[r].polyline, dtype=np.float64) for r in columns])
+        current = np.vstack([np.asarray(enrolls[e].polyline, dtype=np.float64) for e in rows])
+        polylines = current + WATCH_STEP * (counts @ watched)
+
+        for enroll_id, polyline, (x, y) in zip(rows, polylines, project(polylines).tolist()):
+            enroll = enrolls[enroll_id]
+            previous = (enroll.polyline, enroll.x_coordinate, enroll.y_coordinate)
+            enroll.x_coordinate = x
+            enroll.y_coordinate = y
+            enroll.polyline = polyline.tolist()
+            grant_resources(enroll, unlocked_resources(enroll.course_id, x, y, previous[1:]))
+            moves.append((enroll_id, polyline, x, y, "watch", previous))
+            positions[enroll_id] = [x, y]
+
+    record_events(moves)
+    db.session.commit()
+    return positions, skipped
 
-    enroll: Enroll = Enroll.query.get(enrollId)
-    if not enroll:
+
+def update_position_resource(enrollId, resourceId):
+    positions, _ = update_positions_resources([(enrollId, resourceId)])
+    if int(enrollId) not in positions:
         raise IndexError
-    resource: Resource = Resource.query.get(resourceId)
-    resources: list[Resource] = Resource.query.filter_by(
-        course_id=enroll.course_id).all()
+    return positions[int(enrollId)]
 
-    # result_list = [x + 0.1 * y for x, y in zip(enroll.polyline, resource.polyline)]
+# betas tried by get_suitable_position (and the range of the continuous search)
+SUITABLE_BETAS = np.arange(0, 50)
 
-    result = np.array(enroll.polyline) + 0.01 * np.array(resource.polyline)
-    result_list = result.tolist()
 
-    new_polylines_list=result_list
+def suitable_position_for_polyline(initial_pos, polyline, continuous=False, max_beta=None):
+    """
+    Position of the beta-scaled polyline closest to initial_pos.
+    The beta 0..49 sweep is one array operation; with continuous=True the
+    exact best beta in [0, max_beta] is searched instead.
 
-    feature_length = len(new_polylines_list)
-    (tlen, theta) = rad_plot_axes(feature_length, 1, 1)
-    centroid_list = rad_plot_poly(
-        feature_length, [new_polylines_list], tlen, theta)
-    print(f'centroid list is {centroid_list}')
-    enroll.x_coordinate = centroid_list[0][0]
-    enroll.y_coordinate = centroid_list[0][1]
-    enroll.polyline = new_polylines_list
-    enroll.accessible_resources=list(enroll.accessible_resources)
-    for resource in resources:
-        if resource.x_coordinate<enroll.x_coordinate and resource.y_coordinate<enroll.y_coordinate :
-            if resource.id not in enroll.accessible_resources:
-                enroll.accessible_resources.append(resource.id)
-    db.session.commit()
+    Returns:
+        tuple: (position [x, y], beta, distance)
+    """
+    if continuous:
+        max_beta = float(SUITABLE_BETAS[-1] if max_beta is None else max_beta)
+        return closest_beta_position(polyline, initial_pos, max_beta)
 
+    positions = beta_positions(polyline, SUITABLE_BETAS)
+    distances = np.hypot(positions[:, 0] - initial_pos[0], positions[:, 1] - initial_pos[1])
+    k = int(np.argmin(distances))
+    return positions[k].tolist(), int(SUITABLE_BETAS[k]), float(distances[k])
 
-    return centroid_list[0]
 
 def get_suitable_position(initial_pos,resourceId):
     resource: Resource =Resource.query.get(resourceId)
-    polyline=resource.polyline
-    positions_array=[]
-    for beta in range(0,50):
-        beta_polyline=create_beta_polyline(polyline,beta)
-        feature_length = len(beta_polyline)
-        (tlen, theta) = rad_plot_axes(feature_length, 1, 1)
-        centroid_list = rad_plot_poly(
-        feature_length, [beta_polyline], tlen, theta)
-        print(f'coordinates is {centroid_list}')
-        x=centroid_list[0][0]
-        y=centroid_list[0][1]
-        new_pos=[x,y]
-        positions_array.append(new_pos)
-
-    closest_position = None
-    min_distance = float('inf')
-
-    for position in positions_array:
-        distance = calculate_distance(initial_pos, position)
-        if distance < min_distance:
-            min_distance = distance
-            closest_position = position
-
+    closest_position, _, _ = suitable_position_for_polyline(initial_pos, resource.polyline)
     return closest_position
 
+
+def get_suitable_positions(placements, continuous=False, max_beta=None):
+    """
+    get_suitable_position for a batch of {"resource_id", "pos"} requests
+    (e.g. a whole module), with the resources loaded in one query.
+    """
+    ids = [int(r["resource_id"]) for r in placements]
+    resources = {r.id: r for r in Resource.query.filter(Resource.id.in_(ids)).all()}
+
+    results = []
+    for request_item, resource_id in zip(placements, ids):
+        resource = resources.get(resource_id)
+        if resource is None or resource.polyline is None or not len(resource.polyline):
+            results.append({"resource_id": resource_id, "error": "Resource not found or has no polyline"})
+            continue
+        position, beta, distance = suitable_position_for_polyline(
+            request_item["pos"], resource.polyline, continuous=continuous, max_beta=max_beta)
+        results.append({"resource_id": resource_id, "position": position, "beta": beta, "distance": distance})
+    return results
+
 def change_resource_position(pos, resourceId):
     resource: Resource = Resource.query.get(resourceId)
     if resource:
         resource.x_coordinate = pos[0]
         resource.y_coordinate = pos[1]
+        resources_changed(resource.course_id, [resource])
         db.session.commit()
     else:
         print(f"Resource with ID {resourceId} not found.")
@@ -204,7 +368,7 @@ def update_by_quiz(enrollId, courseId, to_consider, question_polylines, position
     if not enroll:
         raise IndexError("Enroll record not found")
 
-    learner_polylines = enroll.polyline or []  # Initialize as an empty list if None
+    learner_polylines = enroll.polyline.tolist() if enroll.polyline is not None else []
     print(f"Current learner polyline: {learner_polylines}")
 
     # Ensure learner_polylines is a valid list
@@ -273,6 +437,8 @@ def update_by_quiz(enrollId, courseId, to_consider, question_polylines, position
             y_coordinate=centroid_list[0][1],
         )
         db.session.add(new_contribution)
+        record_event(enrollId, new_polylines_list, centroid_list[0][0], centroid_list[0][1], "quiz",
+                     contribution=new_contribution)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
@@ -442,11 +608,14 @@ def add_enroll(learner_id, course_id):
             x_coordinate=float(x_coordinate),
             y_coordinate=float(y_coordinate),
             polyline=lowline,
-            accessible_resources=nearest_seven(lowline, resource_id_polyline),
             ta_id=None
         )
+        set_accessible_ids(new_enroll, NeighbourIndex(
+            [r[0] for r in resource_id_polyline], [r[1] for r in resource_id_polyline]).nearest(lowline))
 
         db.session.add(new_enroll)
+        db.session.flush()
+        record_event(new_enroll.id, lowline, x_coordinate, y_coordinate, "start")
         db.session.commit()
 
         enroll_dict = new_enroll.to_dict()
@@ -821,6 +990,15 @@ def ta_course_teached(id):
     return jsonify(teached_course)
 
 def learner_polyline_enrolled(id):
+    # the contribution path from the trajectory log (one read)
+    path = contribution_path(id)
+    if path is None:
+        # enrollments without logged events yet
+        path = contribution_rows_path(id)
+    return jsonify(path)
+
+
+def contribution_rows_path(id):
     # Get the first contribution for the given enroll_id
     first_contribution = Contribution.query.filter_by(enroll_id=id).order_by(Contribution.id.asc()).first()
 
@@ -833,7 +1011,7 @@ def learner_polyline_enrolled(id):
     # Add all other polylines
     polyline_list += [polyline[0] for polyline in polylines]
 
-    return jsonify(polyline_list)
+    return polyline_list
 
 
 def enrolled_learner_data(id, id2):
@@ -861,48 +1039,8 @@ def enrolled_learner_data(id, id2):
 
 
 def calculate_all_module_centroids(id):
-    # Fetch all resources from the database
-    resources = Resource.query.filter_by(course_id=id)
-
-    # Dictionary to group resources by module_id and module name
-    module_polylines = defaultdict(lambda: {"polylines": [], "module": None})
-
-    # Group polylines by module_id and capture module name
-    for resource in resources:
-        if resource.polyline:  # Only add resources with polylines
-            beta_scaled_polyline = create_beta_polyline(resource.polyline, resource.beta)
-            module_polylines[resource.module_id]["polylines"].append(beta_scaled_polyline)
-            module_polylines[resource.module_id]["module"] = resource.module
-
-    # Create a list of objects (dictionaries) containing module_id, module name, and polyline
-    module_data_list = []
-    for module_id, module_data in module_polylines.items():
-        polylines = module_data["polylines"]
-        module = module_data["module"]
-        if polylines:  # Only calculate if there are polylines
-            centroid = calculate_centroid(polylines)
-            feature_length = len(centroid)
-            (tlen, theta) = rad_plot_axes(feature_length, 1, 1)
-            centroid_list = rad_plot_poly(
-                feature_length, [centroid], tlen, theta)
-            print(f'centroid list is {centroid_list}')
-            x_coordinate = centroid_list[0][0]
-            y_coordinate = centroid_list[0][1]
-            print(f'module x is {x_coordinate} module y is {y_coordinate}')
-        else:
-            centroid = None
-            x_coordinate = 0
-            y_coordinate = 0
-
-        # Append each module's data as a dictionary to the list
-        module_data_list.append({
-            "module_id": module_id,
-            "module": module,
-            "x": float(x_coordinate),
-            "y": float(y_coordinate),
-        })
-
-    return module_data_list
+    # materialized in module_centroid, kept up to date as resources are added
+    return get_module_centroids(id)
 
 
 def enrolled_learners_by_course(course_id):
@@ -1025,12 +1163,10 @@ def generate_question_polyline(quiz_id, question_text, course_id):
     gc.collect()
     # Step 3: Fetch topic embeddings for the course
     with app.app_context():
-        topic_embedding = db.session.query(
-            Topic.embedding).filter_by(course_id=course_id).all()
-        if not topic_embedding:
+        topic_matrix = get_topic_matrix(course_id)
+        if topic_matrix is None:
             raise IndexError("No topic embeddings found for the course.")
-    # Free memory after fetching topic embeddings
-    gc.collect()
+        topic_embedding = topic_matrix.unit
     # Step 4: Create polylines by comparing question embeddings with course/topic embeddings
     question_polylines = create_resource_polylines(
         topic_embedding, question_embeddings, 0)
@@ -1044,8 +1180,9 @@ def generate_question_polyline(quiz_id, question_text, course_id):
     centroid_list = rad_plot_poly(
         feature_length, [question_polylines[0]], tlen, theta)
 
-    # Step 6: Flatten the polyline list (assuming it's a list of lists)
-    flat_polyline = [item for sublist in question_polylines[0] for item in sublist]
+    # Step 6: Flatten the polyline list (one float per topic, or one-element lists)
+    flat_polyline = [item for value in question_polylines[0] for item in (
+        value if isinstance(value, list) else [value])]
 
     # Ensure the polyline has exactly 12 elements, pad or truncate if necessary
     flat_polyline = (flat_polyline[:12] + [0] * (12 - len(flat_polyline))) if len(flat_polyline) < 12 else flat_polyline[:12]
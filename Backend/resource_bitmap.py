@@ -0,0 +1,84 @@
+# resource_bitmap.py
+#
+# Packed bitsets over a course's resources, bit i standing for the resource
+# with Resource.ordinal i (see resource_ordinals). In memory a bitmap is a
+# Python int, so union (a | b), difference (a & ~b) and popcount are single
+# big-integer operations. Stored as
+#   b"RB" | format version (uint8) | reserved (uint8) | bit length (uint32)
+# followed by the bits, little-endian.
+
+import struct
+
+import numpy as np
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+MAGIC = b"RB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<2sBxI")
+
+
+def from_ordinals(ordinals) -> int:
+    """
+    Bitmap with the given (non-negative) ordinals set.
+    """
+    ordinals = np.asarray(ordinals, dtype=np.int64).reshape(-1)
+    ordinals = ordinals[ordinals >= 0]
+    if not len(ordinals):
+        return 0
+    flags = np.zeros(int(ordinals.max()) + 1, dtype=bool)
+    flags[ordinals] = True
+    return int.from_bytes(np.packbits(flags, bitorder="little").tobytes(), "little")
+
+
+def to_ordinals(bits: int) -> np.ndarray:
+    """
+    Sorted ordinals set in a bitmap.
+    """
+    if not bits:
+        return np.empty(0, dtype=np.int64)
+    raw = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder="little"))
+
+
+def popcount(bits: int) -> int:
+    return bin(bits).count("1")
+
+
+def pack_bitmap(bits: int) -> bytes:
+    if bits < 0:
+        raise ValueError("Bitmaps are non-negative")
+    length = bits.bit_length()
+    return HEADER.pack(MAGIC, FORMAT_VERSION, length) + bits.to_bytes((length + 7) // 8, "little")
+
+
+def unpack_bitmap(blob) -> int:
+    if len(blob) < HEADER.size:
+        raise ValueError("Packed bitmap is shorter than its header")
+    magic, version, length = HEADER.unpack_from(blob)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"Unknown packed bitmap header {magic!r} v{version}")
+    if len(blob) != HEADER.size + (length + 7) // 8:
+        raise ValueError(f"Packed bitmap of {length} bits has {len(blob)} bytes")
+    return int.from_bytes(bytes(blob[HEADER.size:]), "little")
+
+
+class ResourceBitmap(TypeDecorator):
+    """
+    Column of packed resource bitmaps; ints in Python. A stored value that
+    does not decode raises ValueError: reading it as "no bitmap" would fall
+    back to the legacy list and the next write would drop the learner's
+    unlocked resources.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return pack_bitmap(int(value))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return unpack_bitmap(value)
@@ -0,0 +1,397 @@
+# resource_index.py
+#
+# Per-course in-memory indexes over the course's resources, used for the
+# resources a learner can access: the nearest resource polylines, and the
+# resources below and to the left of the learner's position. Stamped with
+# Course.resources_version: writes made in this process are applied
+# incrementally once their transaction commits, writes made elsewhere (job
+# workers, other web processes) are noticed by the version check and the index
+# is rebuilt.
+
+import json
+import os
+
+import numpy as np
+from sqlalchemy import event, func
+
+from dbModels import db, Course, Resource
+import course_snapshot
+from module_centroids import update_module_centroids
+from resource_ordinals import assign_ordinals
+
+# accessible resources added by proximity (was nearest_seven)
+NEAREST_RESOURCES = int(os.environ.get("NAVIGATED_NEAREST_RESOURCES", "7"))
+
+# KD-tree (scipy) only pays off in low dimensions and for enough rows
+KD_TREE_MAX_DIM = 16
+KD_TREE_MIN_ROWS = 256
+
+# cache: {course_id: CourseResourceIndex}
+resource_index_by_course = {}
+
+# session.info key of the index updates waiting for the transaction to commit
+PENDING_KEY = "resource_index_pending"
+
+
+def _as_polyline(value):
+    # Resource.polyline -> flat list of floats, or None when unusable
+    if isinstance(value, np.ndarray):
+        return value.astype(float).tolist() if value.ndim == 1 and len(value) else None
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return None
+    if not isinstance(value, (list, tuple)) or not value:
+        return None
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value):
+        return None
+    return [float(v) for v in value]
+
+
+class NeighbourIndex:
+    """
+    k-nearest resources by Euclidean polyline distance. Rows live in one
+    contiguous float32 matrix; queries use a KD-tree for low dimensions and
+    brute force (one BLAS matrix-vector product) otherwise.
+    """
+
+    def __init__(self, ids=(), polylines=(), dim=None):
+        self.ids = []
+        self.rows = {}  # resource id -> row
+        rows = []
+        for resource_id, polyline in zip(ids, polylines):
+            polyline = _as_polyline(polyline)
+            if polyline is None:
+                continue
+            if dim is None:
+                dim = len(polyline)
+            if len(polyline) != dim:
+                print(f"WARNING: resource {resource_id} polyline has {len(polyline)} values, expected {dim}")
+                continue
+            self.rows[resource_id] = len(self.ids)
+            self.ids.append(resource_id)
+            rows.append(polyline)
+        self.dim = dim
+        self.matrix = np.ascontiguousarray(np.asarray(rows, dtype=np.float32).reshape(len(rows), dim or 0))
+        self._sq_norms = None
+        self._tree = None
+
+    @classmethod
+    def from_matrix(cls, ids, matrix):
+        """
+        Index over the rows of a (n x dim) float32 matrix, e.g. a read-only
+        snapshot view (used as is); NaN rows are left out.
+        """
+        index = cls()
+        keep = ~np.isnan(matrix).any(axis=1) if matrix.shape[1] else np.zeros(len(matrix), dtype=bool)
+        index.ids = np.asarray(ids)[keep].tolist()
+        index.rows = {rid: i for i, rid in enumerate(index.ids)}
+        if index.ids:
+            index.dim = matrix.shape[1]
+            index.matrix = matrix if keep.all() else np.ascontiguousarray(matrix[keep])
+        return index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def upsert(self, resource_id, polyline):
+        polyline = _as_polyline(polyline)
+        if polyline is None or (self.dim is not None and len(polyline) != self.dim):
+            self.remove(resource_id)
+            return
+        if self.dim is None:
+            self.dim = len(polyline)
+            self.matrix = np.empty((0, self.dim), dtype=np.float32)
+        row = self.rows.get(resource_id)
+        if row is None:
+            self.rows[resource_id] = len(self.ids)
+            self.ids.append(resource_id)
+            self.matrix = np.vstack([self.matrix, np.asarray([polyline], dtype=np.float32)])
+        else:
+            if not self.matrix.flags.writeable:
+                self.matrix = self.matrix.copy()
+            self.matrix[row] = polyline
+        self._sq_norms = None
+        self._tree = None
+
+    def remove(self, resource_id):
+        row = self.rows.pop(resource_id, None)
+        if row is None:
+            return
+        self.matrix = np.delete(self.matrix, row, axis=0)
+        del self.ids[row]
+        self.rows = {rid: i for i, rid in enumerate(self.ids)}
+        self._sq_norms = None
+        self._tree = None
+
+    def _kd_tree(self):
+        if self.dim is None or self.dim > KD_TREE_MAX_DIM or len(self.ids) < KD_TREE_MIN_ROWS:
+            return None
+        if self._tree is None:
+            try:
+                from scipy.spatial import cKDTree
+            except ImportError:
+                return None
+            self._tree = cKDTree(self.matrix)
+        return self._tree
+
+    def nearest(self, polyline, k=NEAREST_RESOURCES) -> list:
+        """
+        Ids of the k resources closest to polyline, nearest first.
+        """
+        if not self.ids or k <= 0:
+            return []
+        query = np.asarray(polyline, dtype=np.float64).reshape(-1)
+        if len(query) != self.dim:
+            raise ValueError("Points must have the same dimensions")
+        k = min(k, len(self.ids))
+
+        tree = self._kd_tree()
+        if tree is not None:
+            _, rows = tree.query(query, k=k)
+            return [self.ids[r] for r in np.atleast_1d(rows)]
+
+        # |x - q|^2 = |x|^2 - 2 x.q + |q|^2, then the candidates are re-ranked exactly
+        if self._sq_norms is None:
+            self._sq_norms = np.einsum('ij,ij->i', self.matrix, self.matrix, dtype=np.float64)
+        approx = self._sq_norms - 2.0 * (self.matrix @ query.astype(np.float32))
+        candidates = min(len(self.ids), max(4 * k, k + 16))
+        rows = np.argpartition(approx, candidates - 1)[:candidates]
+        exact = np.sum((self.matrix[rows].astype(np.float64) - query) ** 2, axis=1)
+        order = rows[np.lexsort((rows, exact))][:k]
+        return [self.ids[r] for r in order]
+
+
+class DominanceIndex:
+    """
+    Resources with x < X and y < Y. Points are sorted by x and stored in a
+    merge-sort tree: level k holds blocks of 2**k consecutive points, each
+    block sorted by y. An x range splits into O(log n) aligned blocks and each
+    block answers its y range with a binary search, so a query costs
+    O(log^2 n + output).
+    """
+
+    def __init__(self, points=None):
+        self.points = dict(points or {})  # resource id -> (x, y)
+        self._levels = None
+
+    def __len__(self):
+        return len(self.points)
+
+    def upsert(self, resource_id, x, y):
+        if x is None or y is None:
+            self.remove(resource_id)
+            return
+        self.points[resource_id] = (float(x), float(y))
+        self._levels = None
+
+    def remove(self, resource_id):
+        if self.points.pop(resource_id, None) is not None:
+            self._levels = None
+
+    def _build(self):
+        ids = np.fromiter(self.points.keys(), dtype=np.int64, count=len(self.points))
+        xy = np.array(list(self.points.values()), dtype=np.float64).reshape(len(ids), 2)
+        order = np.lexsort((ids, xy[:, 0]))
+        self._xs = xy[order, 0]
+        ids, ys = ids[order], xy[order, 1]
+
+        levels = []
+        size = 1
+        positions = np.arange(len(ids))
+        while True:
+            by_y = np.lexsort((ys, positions // size))
+            levels.append((ys[by_y], ids[by_y]))
+            if size >= len(ids):
+                break
+            size *= 2
+        self._levels = levels
+
+    def _report(self, lo, hi, y_lo, y_hi, out):
+        # ids with x rank in [lo, hi) and y_lo <= y < y_hi
+        n = len(self._xs)
+        while lo < hi:
+            k = 0
+            while (k + 1 < len(self._levels) and lo % (2 << k) == 0
+                   and min(lo + (2 << k), n) <= hi):
+                k += 1
+            end = min(lo + (1 << k), n)
+            ys, ids = self._levels[k]
+            a = np.searchsorted(ys[lo:end], y_lo, side='left') if y_lo is not None else 0
+            b = np.searchsorted(ys[lo:end], y_hi, side='left')
+            if b > a:
+                out.extend(ids[lo + a:lo + b].tolist())
+            lo = end
+
+    def dominated(self, x, y, previous=None) -> list:
+        """
+        Ids of the resources with x' < x and y' < y. With previous=(x0, y0),
+        only those that were not already below and left of (x0, y0).
+        """
+        if not self.points:
+            return []
+        if self._levels is None:
+            self._build()
+        x, y = float(x), float(y)
+        hi = int(np.searchsorted(self._xs, x, side='left'))
+        out = []
+        if previous is None or previous[0] is None or previous[1] is None:
+            self._report(0, hi, None, y, out)
+            return out
+
+        x0, y0 = float(previous[0]), float(previous[1])
+        # new rectangle minus the old one: x0 <= x' < x (any y' < y) ...
+        lo = int(np.searchsorted(self._xs, x0, side='left'))
+        if lo < hi:
+            self._report(lo, hi, None, y, out)
+        # ... and x' < min(x, x0) with y0 <= y' < y
+        if y0 < y:
+            self._report(0, min(lo, hi), y0, y, out)
+        return out
+
+
+class CourseResourceIndex:
+    """
+    Index structures over one course's resources at a Course.resources_version.
+    """
+
+    def __init__(self, course_id, version, ids, polylines, xy, module_ids):
+        self.course_id = course_id
+        self.version = version
+        self.neighbours = NeighbourIndex.from_matrix(ids, polylines)
+        placed = ~np.isnan(xy).any(axis=1)
+        self.dominance = DominanceIndex(zip(ids[placed].tolist(), map(tuple, xy[placed].tolist())))
+        self.module_ids = dict(zip(ids.tolist(), module_ids.tolist()))
+
+    def apply(self, row):
+        # row: (id, polyline, x, y, module_id), as resource_rows returns them
+        resource_id, polyline, x, y, module_id = row
+        self.neighbours.upsert(resource_id, polyline)
+        self.dominance.upsert(resource_id, x, y)
+        self.module_ids[resource_id] = module_id if module_id is not None else -1
+
+
+def resource_rows(session, course_id: int):
+    return (
+        session.query(Resource.id, Resource.polyline, Resource.x_coordinate,
+                      Resource.y_coordinate, Resource.module_id)
+        .filter(Resource.course_id == course_id)
+        .order_by(Resource.id.asc())
+        .all()
+    )
+
+
+def resource_arrays(rows):
+    """
+    (id, polyline, x, y, module_id) rows -> ids, polyline matrix (NaN rows
+    where the polyline is missing or of another size), (x, y) matrix (NaN
+    where unplaced) and module ids (-1 where unset).
+    """
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    polylines = [_as_polyline(r[1]) for r in rows]
+    dim = next((len(p) for p in polylines if p is not None), 0)
+    matrix = np.full((len(rows), dim), np.nan, dtype=np.float32)
+    for i, polyline in enumerate(polylines):
+        if polyline is None:
+            continue
+        if len(polyline) != dim:
+            print(f"WARNING: resource {ids[i]} polyline has {len(polyline)} values, expected {dim}")
+            continue
+        matrix[i] = polyline
+    xy = np.array([[float(r[2]), float(r[3])] if r[2] is not None and r[3] is not None else [np.nan, np.nan]
+                   for r in rows], dtype=np.float64).reshape(len(rows), 2)
+    module_ids = np.array([r[4] if r[4] is not None else -1 for r in rows], dtype=np.int64)
+    return ids, matrix, xy, module_ids
+
+
+def _resources_version(course_id: int) -> int:
+    return db.session.query(Course.resources_version).filter(Course.id == course_id).scalar() or 0
+
+
+def get_resource_index(course_id) -> CourseResourceIndex:
+    """
+    Cached CourseResourceIndex of the course, rebuilt from the resource rows
+    when Course.resources_version has moved on.
+    """
+    course_id = int(course_id)
+    version = _resources_version(course_id)
+    index = resource_index_by_course.get(course_id)
+    if index is None or index.version != version:
+        # from the course snapshot when it is at this version, else from the DB
+        arrays = course_snapshot.resource_arrays_at(course_id, version)
+        if arrays is None:
+            arrays = resource_arrays(resource_rows(db.session, course_id))
+        index = CourseResourceIndex(course_id, version, *arrays)
+        resource_index_by_course[course_id] = index
+    return index
+
+
+def resources_changed(course_id, resources=()):
+    """
+    Bump Course.resources_version in the current transaction. Call it with
+    the added / updated Resource rows (flushed, so they have ids) before
+    committing; a cached index that was current is updated when the
+    transaction commits, and dropped if it rolls back.
+    """
+    course_id = int(course_id)
+    db.session.query(Course).filter(Course.id == course_id).update(
+        {Course.resources_version: func.coalesce(Course.resources_version, 0) + 1},
+        synchronize_session=False,
+    )
+    version = _resources_version(course_id)
+    # the values as of now: the rows are expired (not loadable) after commit
+    rows = [(r.id, r.polyline, r.x_coordinate, r.y_coordinate, r.module_id) for r in resources]
+    pending = db.session.info.setdefault(PENDING_KEY, {})
+    if course_id in pending:
+        base_version, _, updates = pending[course_id]
+        pending[course_id] = (base_version, version, updates + rows)
+    else:
+        pending[course_id] = (version - 1, version, rows)
+
+
+@event.listens_for(db.session, "after_commit")
+def _apply_pending(session):
+    for course_id, (base_version, version, rows) in session.info.pop(PENDING_KEY, {}).items():
+        index = resource_index_by_course.get(course_id)
+        if index is None or index.version == version:
+            continue
+        if index.version != base_version:
+            resource_index_by_course.pop(course_id, None)
+            continue
+        for row in rows:
+            index.apply(row)
+        index.version = version
+
+
+@event.listens_for(db.session, "after_rollback")
+def _drop_pending(session):
+    # an index rebuilt inside the rolled-back transaction may hold its rows
+    for course_id in session.info.pop(PENDING_KEY, {}):
+        resource_index_by_course.pop(course_id, None)
+
+
+def resources_added(course_id, resources):
+    """
+    resources_changed for newly inserted Resource rows, which are also
+    numbered for the accessible-resource bitmaps and added to the course's
+    module centroid sums.
+    """
+    resources_changed(course_id, resources)
+    assign_ordinals(course_id, resources)
+    update_module_centroids(course_id, added=resources)
+
+
+def nearest_resources(course_id, polyline, k=NEAREST_RESOURCES) -> list:
+    """
+    Ids of the k course resources whose polylines are closest to polyline.
+    """
+    return get_resource_index(course_id).neighbours.nearest(polyline, k)
+
+
+def unlocked_resources(course_id, x, y, previous=None) -> list:
+    """
+    Ids of the course resources below and to the left of (x, y); with
+    previous=(x0, y0) only the ones unlocked by moving from there.
+    """
+    return get_resource_index(course_id).dominance.dominated(x, y, previous)
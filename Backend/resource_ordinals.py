@@ -0,0 +1,190 @@
+# resource_ordinals.py
+#
+# Per-course resource ordinals and the learners' accessible resources as
+# bitmaps over them. Resource.ordinal numbers a course's resources 0, 1, 2,
+# ... in insertion order and is never reused; Enroll.accessible_bitmap has
+# bit i set when the resource with ordinal i is accessible (resource_bitmap).
+# The ordinal -> id map of a course is cached per Course.resources_version.
+#
+# A course switches over once all its resources are numbered, which
+# `flask accessible-bitmaps` does (and converts the enroll rows). Until
+# then, and for enroll rows not converted yet, the legacy JSON id list in
+# the accessible_resources column is read and written as before.
+
+import json
+
+import numpy as np
+
+from dbModels import db, Course, Resource
+from resource_bitmap import from_ordinals, pack_bitmap, to_ordinals
+
+# cache: {course_id: CourseOrdinals}
+ordinals_by_course = {}
+
+
+class CourseOrdinals:
+    """
+    Ordinal <-> id map of one course at a Course.resources_version.
+    """
+
+    def __init__(self, version, ids, complete):
+        self.version = version
+        self.ids = ids  # ordinal -> resource id, -1 for no resource
+        self.complete = complete  # every resource has an ordinal
+        self.ordinal_by_id = {int(rid): ordinal for ordinal, rid in enumerate(ids.tolist()) if rid >= 0}
+
+    def bitmap_of(self, resource_ids) -> int:
+        # ids without an ordinal (deleted / unknown resources) are dropped
+        return from_ordinals([self.ordinal_by_id[int(rid)] for rid in resource_ids
+                              if int(rid) in self.ordinal_by_id])
+
+    def ids_of(self, bits: int) -> list:
+        ordinals = to_ordinals(bits)
+        ids = self.ids[ordinals[ordinals < len(self.ids)]]
+        return ids[ids >= 0].tolist()
+
+    def all_resources(self) -> int:
+        return from_ordinals(np.flatnonzero(self.ids >= 0))
+
+
+def _resources_version(course_id: int) -> int:
+    return db.session.query(Course.resources_version).filter(Course.id == course_id).scalar() or 0
+
+
+def get_course_ordinals(course_id) -> CourseOrdinals:
+    """
+    Cached CourseOrdinals of the course, re-read when Course.resources_version
+    has moved on.
+    """
+    course_id = int(course_id)
+    version = _resources_version(course_id)
+    ordinals = ordinals_by_course.get(course_id)
+    if ordinals is None or ordinals.version != version:
+        rows = db.session.query(Resource.id, Resource.ordinal).filter(Resource.course_id == course_id).all()
+        numbered = [(ordinal, rid) for rid, ordinal in rows if ordinal is not None]
+        ids = np.full(max((o for o, _ in numbered), default=-1) + 1, -1, dtype=np.int64)
+        for ordinal, rid in numbered:
+            ids[ordinal] = rid
+        ordinals = CourseOrdinals(version, ids, len(numbered) == len(rows))
+        ordinals_by_course[course_id] = ordinals
+    return ordinals
+
+
+def assign_ordinals(course_id, resources):
+    """
+    Number newly inserted (flushed) resources after the course's last
+    ordinal. Call with the course row locked (resources_changed). No-op for
+    courses whose resources have not been numbered yet.
+    """
+    course_id = int(course_id)
+    new_ids = [r.id for r in resources]
+    unnumbered = (db.session.query(db.func.count(Resource.id))
+                  .filter(Resource.course_id == course_id, Resource.ordinal.is_(None),
+                          Resource.id.notin_(new_ids))
+                  .scalar())
+    if unnumbered:
+        return
+    last = db.session.query(db.func.max(Resource.ordinal)).filter(Resource.course_id == course_id).scalar()
+    next_ordinal = -1 if last is None else last
+    for resource in sorted(resources, key=lambda r: r.id):
+        if resource.ordinal is None:
+            next_ordinal += 1
+            resource.ordinal = next_ordinal
+    ordinals_by_course.pop(course_id, None)
+
+
+def number_resources(course_id) -> int:
+    """
+    Give every resource of the course without an ordinal one, in id order.
+    Does not commit (nor bump the version).
+
+    Returns:
+        int: Number of resources numbered.
+    """
+    course_id = int(course_id)
+    db.session.query(Course).filter(Course.id == course_id).with_for_update().first()
+    last = db.session.query(db.func.max(Resource.ordinal)).filter(Resource.course_id == course_id).scalar()
+    next_ordinal = -1 if last is None else last
+    resources = (Resource.query.filter(Resource.course_id == course_id, Resource.ordinal.is_(None))
+                 .order_by(Resource.id.asc()).all())
+    for resource in resources:
+        next_ordinal += 1
+        resource.ordinal = next_ordinal
+    ordinals_by_course.pop(course_id, None)
+    return len(resources)
+
+
+def _legacy_ids(value) -> list:
+    if isinstance(value, str):
+        value = json.loads(value) if value.strip() else []
+    return list(value or [])
+
+
+def _accessible_bits(enroll, ordinals) -> int:
+    if enroll.accessible_bitmap is not None:
+        return enroll.accessible_bitmap
+    return ordinals.bitmap_of(_legacy_ids(enroll.accessible_resources_json))
+
+
+def accessible_ids(enroll) -> list:
+    """
+    Accessible resource ids of a learner (the JSON view).
+    """
+    if enroll.accessible_bitmap is None:
+        return _legacy_ids(enroll.accessible_resources_json)
+    return get_course_ordinals(enroll.course_id).ids_of(enroll.accessible_bitmap)
+
+
+def set_accessible_ids(enroll, resource_ids):
+    """
+    Replace a learner's accessible resources. Does not commit.
+    """
+    ordinals = get_course_ordinals(enroll.course_id)
+    if ordinals.complete:
+        enroll.accessible_bitmap = ordinals.bitmap_of(resource_ids)
+        enroll.accessible_resources_json = None
+    else:
+        enroll.accessible_resources_json = list(dict.fromkeys(int(rid) for rid in resource_ids))
+
+
+def grant_resources(enroll, resource_ids):
+    """
+    Add resources to a learner's accessible ones. Does not commit.
+    """
+    ordinals = get_course_ordinals(enroll.course_id)
+    if ordinals.complete:
+        enroll.accessible_bitmap = _accessible_bits(enroll, ordinals) | ordinals.bitmap_of(resource_ids)
+        enroll.accessible_resources_json = None
+    else:
+        current = _legacy_ids(enroll.accessible_resources_json)
+        enroll.accessible_resources_json = list(dict.fromkeys(current + [int(rid) for rid in resource_ids]))
+
+
+def accessible_columns(course_id, resource_ids=None) -> dict:
+    """
+    accessible_resources / accessible_bitmap values for a raw enroll INSERT;
+    resource_ids None grants every resource of the course.
+    """
+    ordinals = get_course_ordinals(course_id)
+    if resource_ids is None:
+        if ordinals.complete:
+            return {"accessible_resources": None, "accessible_bitmap": pack_bitmap(ordinals.all_resources())}
+        resource_ids = [rid for (rid,) in db.session.query(Resource.id).filter(Resource.course_id == course_id).all()]
+    elif ordinals.complete:
+        return {"accessible_resources": None, "accessible_bitmap": pack_bitmap(ordinals.bitmap_of(resource_ids))}
+    return {"accessible_resources": json.dumps([int(rid) for rid in resource_ids]), "accessible_bitmap": None}
+
+
+def convert_enroll(enroll) -> bool:
+    """
+    Move a learner's legacy id list into the bitmap (numbered courses only).
+    Does not commit.
+    """
+    if enroll.accessible_bitmap is not None and enroll.accessible_resources_json is None:
+        return False
+    ordinals = get_course_ordinals(enroll.course_id)
+    if not ordinals.complete:
+        return False
+    enroll.accessible_bitmap = _accessible_bits(enroll, ordinals)
+    enroll.accessible_resources_json = None
+    return True
@@ -2,6 +2,8 @@
 
 from flask import Blueprint, request, jsonify
 import json
+from collections import defaultdict
+
 import numpy as np
 from flask import Blueprint, request, jsonify
 from sqlalchemy import func
@@ -15,13 +17,15 @@ from dbModels import (
 )
 
 
-from dbModels import db, Enroll, SummaryCoordinates, SummaryCluster, Topic
+from dbModels import db, Enroll, SummaryCoordinates, SummaryCluster, Topic, Course
 from learning_summary_core import (
-    summary_to_coordinates,
+    summary_keywords_and_coordinates,
     cluster_summaries,
-    extract_keywords_for_text,
+    extract_keywords_for_texts,
+    SUMMARY_ENCODERS,
 )
-from topic_embeddings_loader import get_topic_embeddings
+from topic_embeddings_loader import get_summary_encoder, get_summary_topic_embeddings
+from trajectory_log import record_event
 
 summary_bp = Blueprint("summary_bp", __name__)
 
@@ -48,21 +52,23 @@ def submit_learning_summary():
     if not topic or topic.course_id != course_id:
         return jsonify({"error": "topic_id does not belong to given course_id"}), 400
 
-    # ---- load topic embeddings for this course (unchanged logic) ----
-    topic_embeddings = get_topic_embeddings(course_id)
+    # ---- load topic embeddings for this course (in the course's encoder space) ----
+    encoder = get_summary_encoder(course_id)
+    topic_embeddings = get_summary_topic_embeddings(course_id, encoder)
     if not topic_embeddings:
         return jsonify({"error": "No topics/embeddings for this course"}), 400
 
-    # ---- summary -> polyline + coordinates ----
-    polyline_dicts, x, y = summary_to_coordinates(
+    # ---- summary -> keywords + polyline + coordinates ----
+    kw_list, weight_list, polyline_dicts, x, y = summary_keywords_and_coordinates(
         summary_text,
         topic_embeddings=topic_embeddings,
         num_keywords=10,
         beta=15.0,
+        encoder=encoder,
     )
     polyline_json = json.dumps(polyline_dicts)
 
-    # create summary row
+    # create summary row (keywords are stored once and reused for clustering)
     sc = SummaryCoordinates(
         enroll_id=enroll_id,
         course_id=course_id,
@@ -71,25 +77,24 @@ def submit_learning_summary():
         polyline=polyline_json,
         x_coordinate=x,
         y_coordinate=y,
+        keywords=kw_list,
+        keyword_weights=weight_list,
     )
     db.session.add(sc)
 
     # update learner's “current position” if you want course-level view
+    previous = (enroll.polyline, enroll.x_coordinate, enroll.y_coordinate)
     enroll.x_coordinate = x
     enroll.y_coordinate = y
     enroll.polyline = polyline_json
+    record_event(enroll.id, polyline_dicts, x, y, "topic_summary", previous=previous)
 
     db.session.flush()  # so sc.id is available
 
     # ---- recompute clusters for this (course, topic) ----
+    labels, clusters_by_index = recompute_topic_clusters(course_id, topic_id)
 
-    # only summaries for this course + topic
-    all_summaries = SummaryCoordinates.query.filter_by(
-        course_id=course_id,
-        topic_id=topic_id,
-    ).all()
-
-    if len(all_summaries) == 0:
+    if len(labels) == 0:
         # should not happen, we just added one
         db.session.commit()
         return jsonify({
@@ -100,17 +105,77 @@ def submit_learning_summary():
             "cluster_keywords": [],
         })
 
+    db.session.commit()
+
+    # current summary's cluster:
+    current_label = int(labels[-1]) if len(labels) else None
+    current_cluster = clusters_by_index.get(current_label)
+    current_keywords = current_cluster.top_keywords if current_cluster else []
+
+    return jsonify({
+        "summary_id": sc.id,
+        "new_position": {"x": float(x), "y": float(y)},
+        "polyline": polyline_dicts,
+        "cluster_id": sc.cluster_id,
+        "cluster_keywords": current_keywords,
+        "course_id": course_id,
+        "topic_id": topic_id,
+    })
+
+
+@summary_bp.route("/api/summary-encoder/<int:course_id>", methods=["GET", "PUT"])
+def summary_encoder_setting(course_id):
+    """
+    Read or set the summary pipeline mode of a course:
+    PUT {"encoder": "three_model" | "single"}
+    """
+    course = Course.query.get(course_id)
+    if not course:
+        return jsonify({"error": "Invalid course_id"}), 404
+
+    if request.method == "PUT":
+        encoder = (request.get_json() or {}).get("encoder")
+        if encoder not in SUMMARY_ENCODERS:
+            return jsonify({"error": f"encoder must be one of {list(SUMMARY_ENCODERS)}"}), 400
+        course.summary_encoder = encoder
+        db.session.commit()
+
+    return jsonify({"course_id": course_id, "encoder": get_summary_encoder(course_id)})
+
+
+def recompute_topic_clusters(course_id, topic_id):
+    """
+    Re-run clustering over every summary of (course, topic) and recreate
+    the SummaryCluster rows. Keywords come from the stored per-summary
+    columns; rows submitted before those columns existed are extracted
+    once, in one batched KeyBERT call, and persisted.
+    Returns (labels, clusters_by_index). Does not commit.
+    """
+    all_summaries = SummaryCoordinates.query.filter_by(
+        course_id=course_id,
+        topic_id=topic_id,
+    ).order_by(SummaryCoordinates.id.asc()).all()
+
+    if len(all_summaries) == 0:
+        return np.array([]), {}
+
+    missing = [row for row in all_summaries if row.keywords is None]
+    if missing:
+        extracted = extract_keywords_for_texts([row.summary or "" for row in missing], num_keywords=10)
+        # a short result (no keywords for the batch) leaves the rest without keywords
+        extracted = list(extracted) + [([], [])] * (len(missing) - len(extracted))
+        for row, (kws, weights) in zip(missing, extracted):
+            row.keywords = kws or []
+            row.keyword_weights = weights or []
+
     # prepare polyline arrays and per-summary keywords
     poly_arrays = []
     keywords_per_summary = []
 
     for row in all_summaries:
-        pl = json.loads(row.polyline) if row.polyline else []
-        arr = np.array([p["y"] for p in pl], dtype=float)
+        arr = np.asarray(row.polyline if row.polyline is not None else [], dtype=float)
         poly_arrays.append(arr)
-
-        kws, _ = extract_keywords_for_text(row.summary, num_keywords=10)
-        keywords_per_summary.append(kws)
+        keywords_per_summary.append(row.keywords or [])
 
     # cluster_summaries: same as before, but now applied per-topic
     labels, top_keywords = cluster_summaries(poly_arrays, keywords_per_summary)
@@ -119,7 +184,6 @@ def submit_learning_summary():
     SummaryCluster.query.filter_by(course_id=course_id, topic_id=topic_id).delete()
     db.session.flush()
 
-    from collections import defaultdict
     cluster_points = defaultdict(list)
 
     for row, lab in zip(all_summaries, labels):
@@ -152,22 +216,9 @@ def submit_learning_summary():
         if cluster_obj:
             row.cluster_id = cluster_obj.id
 
-    db.session.commit()
+    return labels, clusters_by_index
 
-    # current summary's cluster:
-    current_label = int(labels[-1]) if len(labels) else None
-    current_cluster = clusters_by_index.get(current_label)
-    current_keywords = current_cluster.top_keywords if current_cluster else []
 
-    return jsonify({
-        "summary_id": sc.id,
-        "new_position": {"x": float(x), "y": float(y)},
-        "polyline": polyline_dicts,
-        "cluster_id": sc.cluster_id,
-        "cluster_keywords": current_keywords,
-        "course_id": course_id,
-        "topic_id": topic_id,
-    })
 @summary_bp.route("/summary-clusters/<int:course_id>/<int:topic_id>", methods=["GET"])
 def get_summary_clusters(course_id, topic_id):
     """
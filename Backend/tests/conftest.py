@@ -0,0 +1,47 @@
+# conftest.py
+#
+# The backend modules are imported by their top-level names (as app.py does),
+# so the Backend directory goes on sys.path. Database tests run against an
+# in-memory SQLite database (NAVIGATED_DATABASE_URI) through the `database`
+# fixture, which creates the tables and empties the per-course caches.
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("NAVIGATED_DATABASE_URI", "sqlite://")
+
+
+def _clear_caches():
+    import course_snapshot
+    import resource_index
+    import resource_ordinals
+    import topic_embeddings_loader
+
+    course_snapshot.snapshot_by_course.clear()
+    resource_index.resource_index_by_course.clear()
+    resource_ordinals.ordinals_by_course.clear()
+    topic_embeddings_loader.topic_matrix_by_course.clear()
+    topic_embeddings_loader.single_encoder_topic_embeddings_by_course.clear()
+
+
+@pytest.fixture
+def database():
+    """
+    Flask-SQLAlchemy `db` inside an app context, over fresh tables.
+    """
+    pytest.importorskip("flask_mysqldb")
+    from dbModels import app, db
+
+    with app.app_context():
+        db.create_all()
+        _clear_caches()
+        try:
+            yield db
+        finally:
+            db.session.rollback()
+            db.session.info.clear()
+            db.drop_all()
+            _clear_caches()
@@ -0,0 +1,150 @@
+# test_course_snapshot.py
+#
+# Course snapshot files: the on-disk layout, and the topic / resource parts
+# that the topic matrix and resource index are built from when
+# NAVIGATED_SNAPSHOT_DIR is set, refreshed per part as the course's
+# topics_version / resources_version move.
+
+import os
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip("flask_mysqldb")
+
+import course_snapshot
+from course_snapshot import ALIGN, read_snapshot, write_snapshot
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(course_snapshot, "SNAPSHOT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_write_read_round_trip(tmp_path):
+    rng = np.random.default_rng(19)
+    arrays = {
+        "ids": np.arange(5, dtype=np.int64),
+        "matrix": rng.standard_normal((5, 7)).astype(np.float32),
+        "empty": np.empty((0, 2)),
+        "xy": rng.uniform(size=(3, 2)),
+    }
+    path = str(tmp_path / "course_1.snap")
+
+    write_snapshot(path, {"course_id": 1, "topics_version": 3}, dict(arrays))
+    snapshot = read_snapshot(path)
+
+    assert snapshot.header["course_id"] == 1 and snapshot.topics_version == 3
+    for name, array in arrays.items():
+        np.testing.assert_array_equal(snapshot.arrays[name], array)
+        assert snapshot.arrays[name].dtype == array.dtype
+        assert not snapshot.arrays[name].flags.writeable
+        assert snapshot.header["arrays"][name]["offset"] % ALIGN == 0
+    assert os.listdir(tmp_path) == ["course_1.snap"]  # no temporary file left behind
+
+
+def test_concurrent_writers_publish_whole_files(tmp_path):
+    path = str(tmp_path / "course_1.snap")
+    barrier = threading.Barrier(8)
+
+    def write(n):
+        barrier.wait()
+        for _ in range(20):
+            write_snapshot(path, {"writer": n}, {"values": np.full(50_000, n, dtype=np.int64)})
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = read_snapshot(path)
+    assert (snapshot.arrays["values"] == snapshot.header["writer"]).all()
+    assert os.listdir(tmp_path) == ["course_1.snap"]
+
+
+def test_foreign_file_rejected(tmp_path):
+    path = tmp_path / "course_1.snap"
+    path.write_bytes(b"NOTSNAP" + bytes(64))
+    with pytest.raises(ValueError, match="course snapshot"):
+        read_snapshot(str(path))
+
+
+@pytest.fixture
+def course(database):
+    from dbModels import Course, Resource, Topic
+    from resource_index import resources_changed
+    from topic_embeddings_loader import bump_topics_version
+
+    course = Course(name="course")
+    database.session.add(course)
+    database.session.flush()
+    rng = np.random.default_rng(7)
+    database.session.add_all(Topic(name=f"t{i}", course_id=course.id, embedding=rng.standard_normal(6).tolist())
+                             for i in range(4))
+    resources = [Resource(name=f"r{i}", course_id=course.id, polyline=rng.uniform(size=4).tolist(),
+                          x_coordinate=0.1 * i, y_coordinate=0.2 * i, module_id=i % 2) for i in range(6)]
+    database.session.add_all(resources)
+    database.session.flush()
+    bump_topics_version(course.id)
+    resources_changed(course.id, resources)
+    database.session.commit()
+    return course
+
+
+def _uncached():
+    from resource_index import resource_index_by_course
+    from topic_embeddings_loader import topic_matrix_by_course
+
+    topic_matrix_by_course.clear()
+    resource_index_by_course.clear()
+
+
+def test_indexes_built_from_the_snapshot_match_the_database(database, course, snapshot_dir):
+    from resource_index import get_resource_index
+    from topic_embeddings_loader import get_topic_matrix
+
+    from_db = get_topic_matrix(course.id)
+    from_db_index = get_resource_index(course.id)
+    _uncached()
+    assert course_snapshot.enabled()
+
+    matrix = get_topic_matrix(course.id)
+    index = get_resource_index(course.id)
+
+    assert os.path.exists(course_snapshot.snapshot_path(course.id))
+    assert not matrix.unit.flags.writeable  # a view into the mapped file
+    assert matrix.topic_ids == from_db.topic_ids and matrix.complete
+    np.testing.assert_array_equal(matrix.unit, from_db.unit)
+    assert index.neighbours.ids == from_db_index.neighbours.ids
+    np.testing.assert_array_equal(index.neighbours.matrix, from_db_index.neighbours.matrix)
+    assert index.module_ids == from_db_index.module_ids
+    assert index.dominance.dominated(1.0, 2.0) == from_db_index.dominance.dominated(1.0, 2.0)
+
+
+def test_only_the_part_behind_is_rebuilt(database, course, snapshot_dir):
+    from dbModels import Resource
+    from resource_index import get_resource_index, resources_changed
+    from topic_embeddings_loader import get_topic_matrix
+
+    get_topic_matrix(course.id)
+    first = course_snapshot.load_snapshot(course.id)
+    assert (first.topics_version, first.resources_version) == (1, 1)
+    topic_unit = np.array(first.arrays["topic_unit"])
+
+    resource = Resource(name="new", course_id=course.id, polyline=[0.5] * 4, x_coordinate=0.9, y_coordinate=0.9)
+    database.session.add(resource)
+    database.session.flush()
+    resources_changed(course.id, [resource])
+    database.session.commit()
+    _uncached()
+    index = get_resource_index(course.id)
+
+    second = course_snapshot.load_snapshot(course.id)
+    assert second is not first
+    assert (second.topics_version, second.resources_version) == (1, 2)
+    assert resource.id in index.neighbours.ids
+    np.testing.assert_array_equal(second.arrays["topic_unit"], topic_unit)
+
@@ -0,0 +1,62 @@
+# test_embedding_cache.py
+#
+# The two-tier embedding cache: memory LRU over SQLite, keyed by model and
+# normalized text.
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache, normalize_text
+
+
+def _vectors(n, dim=8, seed=3):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def test_normalized_texts_share_an_entry(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    vector = _vectors(1)
+    cache.put_many("bert", ["Binary  Search Tree"], vector)
+
+    found = cache.get_many("bert", ["binary search tree", " BINARY search\ttree "])
+
+    assert list(found) == [normalize_text("binary search tree")]
+    np.testing.assert_array_equal(found["binary search tree"], vector[0])
+    assert cache.memory_hits == 1 and cache.misses == 0
+
+
+def test_models_do_not_share_entries(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    cache.put_many("bert", ["heap"], _vectors(1, seed=1))
+    cache.put_many("bert@int8", ["heap"], _vectors(1, seed=2))
+
+    assert not np.array_equal(cache.get_many("bert", ["heap"])["heap"], cache.get_many("bert@int8", ["heap"])["heap"])
+    assert cache.get_many("mpnet", ["heap"]) == {}
+
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    texts = [f"keyword {i}" for i in range(1200)]  # more than one SQLite lookup chunk
+    vectors = _vectors(len(texts))
+    EmbeddingCache(path).put_many("bert", texts, vectors)
+
+    cache = EmbeddingCache(path)
+    found = cache.get_many("bert", texts + ["never stored"])
+
+    assert len(found) == len(texts)
+    np.testing.assert_array_equal(np.vstack([found[t] for t in texts]), vectors)
+    assert cache.disk_hits == len(texts) and cache.misses == 1 and cache.memory_hits == 0
+
+
+def test_memory_tier_is_bounded(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path, capacity=3)
+    texts = ["a", "b", "c", "d", "e"]
+    cache.put_many("bert", texts, _vectors(5))
+
+    stats = cache.stats()
+    assert stats["memory_entries"] == 3 and stats["evictions"] == 2
+
+    # the evicted ones come back from disk, the recent ones from memory
+    cache.get_many("bert", texts)
+    assert cache.memory_hits == 3 and cache.disk_hits == 2
+    assert cache.stats()["hit_rate"] == 1.0
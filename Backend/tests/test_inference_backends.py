@@ -0,0 +1,100 @@
+# test_inference_backends.py
+#
+# Choosing the int8 / onnx inference backends: the onnx backend is refused
+# with the reasons when its packages are missing or too old, an unknown
+# backend fails at import, and the parity check reports drift between runs.
+
+import os
+import subprocess
+import sys
+from importlib import metadata
+
+import numpy as np
+import pytest
+
+import model_registry
+
+
+def _installed(versions):
+    def version(package):
+        if versions.get(package) is None:
+            raise metadata.PackageNotFoundError(package)
+        return versions[package]
+    return version
+
+
+@pytest.mark.parametrize("version, expected", [("3.2.1", (3, 2)), ("3.2rc1", (3, 2)), ("2.7", (2, 7)),
+                                               ("10.0.0.post1", (10, 0)), ("4", (4,))])
+def test_version_tuple(version, expected):
+    assert model_registry._version_tuple(version) == expected
+
+
+def test_onnx_problems_name_every_missing_package(monkeypatch):
+    monkeypatch.setattr(metadata, "version", _installed({"sentence-transformers": "2.7.0"}))
+
+    problems = model_registry.onnx_backend_problems()
+
+    assert len(problems) == 3
+    assert "sentence-transformers 2.7.0 is installed" in problems[0]
+    assert any(p.startswith("optimum is not installed") for p in problems)
+    assert any(p.startswith("onnxruntime is not installed") for p in problems)
+
+
+def test_onnx_problems_empty_when_installed(monkeypatch):
+    monkeypatch.setattr(metadata, "version", _installed(
+        {"sentence-transformers": "3.2.0", "optimum": "1.23.0", "onnxruntime": "1.19.0"}))
+    assert model_registry.onnx_backend_problems() == []
+
+
+def test_onnx_backend_refused_and_backend_kept(monkeypatch):
+    monkeypatch.setattr(model_registry, "_inference_backend", "fp32")
+    monkeypatch.setattr(metadata, "version", _installed({}))
+
+    with pytest.raises(ValueError, match="sentence-transformers is not installed"):
+        model_registry.set_inference_backend("onnx")
+    assert model_registry.get_inference_backend() == "fp32"
+
+
+def test_unknown_backend_fails_at_import():
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, NAVIGATED_INFERENCE_BACKEND="fp16")
+    result = subprocess.run([sys.executable, "-c", "import model_registry"], cwd=backend_dir, env=env,
+                            capture_output=True, text=True)
+
+    assert result.returncode != 0
+    assert "NAVIGATED_INFERENCE_BACKEND must be one of" in result.stderr
+
+
+def test_drift_report():
+    pytest.importorskip("flask_mysqldb")  # cli_parity -> dbModels
+    pytest.importorskip("pandas")
+    pytest.importorskip("nltk")
+    from cli_parity import _drift
+
+    reference = [(np.array([0.1, 0.2]), (0.0, 0.0), ["a", "b"]),
+                 (np.array([0.5, 0.5]), (1.0, 1.0), ["c"])]
+    candidate = [(np.array([0.1, 0.25]), (3.0, 4.0), ["b", "a"]),
+                 (np.array([0.5, 0.4]), (1.0, 1.0), ["d"])]
+
+    report = _drift(reference, candidate)
+
+    assert report["max_polyline_drift"] == pytest.approx(0.1)
+    assert report["mean_polyline_drift"] == pytest.approx(0.075)
+    assert report["max_xy_drift"] == pytest.approx(5.0)
+    assert report["mean_xy_drift"] == pytest.approx(2.5)
+    assert report["keyword_set_changes"] == 1
+
+
+def test_parity_check_refuses_worker_pool(monkeypatch):
+    pytest.importorskip("flask_mysqldb")
+    pytest.importorskip("pandas")
+    pytest.importorskip("nltk")
+    import inference_service
+    from cli_parity import inference_parity
+    from dbModels import app
+
+    monkeypatch.setattr(inference_service, "NUM_WORKERS", 2)
+    result = app.test_cli_runner().invoke(inference_parity, ["--backend", "int8"])
+
+    assert result.exit_code != 0
+    assert "Unset NAVIGATED_INFERENCE_WORKERS" in result.output
@@ -0,0 +1,88 @@
+# test_inference_service.py
+#
+# The worker pool with real worker processes, using the model-free 'ping' op:
+# a killed worker is replaced without failing later requests, and workers that
+# never connect do not hang start().
+
+import sys
+import time
+
+import pytest
+
+from inference_service import InferenceService
+
+TIMEOUT = 30
+
+
+def ping(service, values):
+    futures = [service.submit(('ping',), value) for value in values]
+    return [f.result(timeout=TIMEOUT) for f in futures]
+
+
+@pytest.fixture
+def service():
+    service = InferenceService(2, max_wait_ms=2, start_timeout=TIMEOUT)
+    assert service.start() == 2
+    yield service
+    for process in service._processes:
+        process.kill()
+
+
+def test_requests_round_trip(service):
+    assert ping(service, range(50)) == list(range(50))
+    assert service.stats()['completed'] == 50
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + TIMEOUT
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_killed_worker_is_replaced(service):
+    assert ping(service, range(10)) == list(range(10))
+    victim = service._processes[0]
+    victim.kill()
+    victim.wait(timeout=TIMEOUT)
+
+    # every later request succeeds, whichever thread picks it up
+    for round_ in range(20):
+        values = list(range(round_ * 10, round_ * 10 + 10))
+        assert ping(service, values) == values
+    wait_for(lambda: service.stats()['respawns'] == 1)
+    assert ping(service, range(30)) == list(range(30))
+
+    stats = service.stats()
+    assert stats['failed'] == 0
+    assert stats['respawns'] == 1
+    assert stats['alive_workers'] == 2
+    assert victim not in service._processes
+
+
+def test_all_workers_killed_falls_back_inline(service):
+    service.worker_command = [sys.executable, '-c', 'import sys; sys.exit(3)']
+    for process in list(service._processes):
+        process.kill()
+        process.wait(timeout=TIMEOUT)
+
+    for round_ in range(5):
+        values = list(range(round_ * 4, round_ * 4 + 4))
+        assert ping(service, values) == values
+    assert service.stats()['alive_workers'] == 0
+
+
+def test_start_gives_up_on_workers_that_exit():
+    service = InferenceService(2, start_timeout=TIMEOUT)
+    service.worker_command = [sys.executable, '-c', 'import sys; sys.exit(3)']
+    started = time.monotonic()
+    assert service.start() == 0
+    assert time.monotonic() - started < TIMEOUT
+
+
+def test_start_times_out_on_workers_that_never_connect():
+    service = InferenceService(1, start_timeout=1)
+    service.worker_command = [sys.executable, '-c', 'import time; time.sleep(60)']
+    started = time.monotonic()
+    assert service.start() == 0
+    assert time.monotonic() - started < 10
@@ -0,0 +1,88 @@
+# test_keyword_encoder.py
+#
+# The batched keyword encoder against one forward pass per keyword, on a
+# small randomly initialised BERT registered as the 'bert' model: length
+# buckets and padding must not change any [CLS] row, rows come back in input
+# order, and cached keywords never reach the model again.
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+import keyword_encoder
+import model_registry
+from embedding_cache import EmbeddingCache
+
+WORDS = ["graph", "tree", "search", "binary", "heap", "sort", "merge", "quick", "hash", "table", "node", "edge"]
+KEYWORDS = ["graph", "binary search tree", "heap sort", "merge sort quick sort hash table",
+            "node", "edge graph", "hash", "binary heap", "Graph", "tree  node edge"]
+
+
+@pytest.fixture
+def bert(tmp_path, monkeypatch):
+    vocab = tmp_path / "vocab.txt"
+    vocab.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS) + "\n")
+    tokenizer = transformers.BertTokenizerFast(vocab_file=str(vocab))
+    torch.manual_seed(2)
+    config = transformers.BertConfig(vocab_size=len(WORDS) + 5, hidden_size=32, num_hidden_layers=2,
+                                     num_attention_heads=2, intermediate_size=64)
+    model = transformers.BertModel(config).eval()
+    calls = []
+    model.register_forward_hook(lambda module, args, kwargs, output: calls.append(kwargs["input_ids"].shape),
+                                with_kwargs=True)
+
+    monkeypatch.setattr(model_registry, "_registry", dict(model_registry._registry))
+    model_registry._registry.pop("bert")
+    model_registry.register_model("bert", lambda: (tokenizer, model), "tiny-bert")
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(keyword_encoder, "get_embedding_cache", lambda: cache)
+    return calls
+
+
+def _one_by_one(keywords):
+    return np.vstack([keyword_encoder.encode_keywords([k], batch_size=1, use_cache=False) for k in keywords])
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 64])
+def test_batches_match_single_passes(bert, batch_size):
+    expected = _one_by_one(KEYWORDS)
+    bert.clear()
+
+    encoded = keyword_encoder.encode_keywords(KEYWORDS, batch_size=batch_size, use_cache=False)
+
+    assert encoded.shape == (len(KEYWORDS), 32) and encoded.dtype == np.float32
+    np.testing.assert_allclose(encoded, expected, rtol=0, atol=1e-5)
+    assert len(bert) == -(-len(KEYWORDS) // batch_size)
+
+
+def test_batches_are_length_bucketed(bert):
+    keyword_encoder.encode_keywords(KEYWORDS, batch_size=3, use_cache=False)
+
+    # sorted by token count: every batch is padded to no more than the next one
+    widths = [shape[1] for shape in bert]
+    assert widths == sorted(widths)
+
+
+def test_cached_keywords_skip_the_model(bert):
+    first = keyword_encoder.encode_keywords(KEYWORDS, batch_size=4)
+    encoded_keywords = sum(shape[0] for shape in bert)
+    # "graph" / "Graph" and the whitespace variant share a normalized key
+    assert encoded_keywords == len({" ".join(k.lower().split()) for k in KEYWORDS})
+    bert.clear()
+
+    again = keyword_encoder.encode_keywords(list(reversed(KEYWORDS)), batch_size=4)
+
+    assert bert == []
+    np.testing.assert_array_equal(again, first[::-1])
+
+
+def test_groups_are_split_back_per_document(bert):
+    groups = [KEYWORDS[:3], [], KEYWORDS[3:4], KEYWORDS[4:]]
+    expected = _one_by_one(KEYWORDS)
+
+    result = keyword_encoder.encode_keyword_groups(groups, batch_size=4)
+
+    assert [len(matrix) for matrix in result] == [3, 0, 1, len(KEYWORDS) - 4]
+    np.testing.assert_allclose(np.vstack(result), expected, rtol=0, atol=1e-5)
@@ -0,0 +1,98 @@
+# test_model_registry.py
+#
+# The model registry: every model loads once, on first use, however many
+# threads ask for it at the same time; switching the inference backend drops
+# the loaded models. Test models are registered under their own keys.
+
+import threading
+import time
+
+import pytest
+
+import model_registry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # a copy, so the test keys do not outlive the test
+    monkeypatch.setattr(model_registry, "_registry", dict(model_registry._registry))
+    return model_registry
+
+
+def _counting_loader(delay=0.0):
+    calls = []
+
+    def load():
+        calls.append(threading.get_ident())
+        time.sleep(delay)
+        return object()
+
+    return load, calls
+
+
+def test_model_loads_lazily_and_once(registry):
+    load, calls = _counting_loader()
+    registry.register_model("test", load, "test-model")
+    assert calls == []
+    assert registry.model_stats()["test"]["loaded"] is False
+
+    model = registry.get_model("test")
+
+    assert registry.get_model("test") is model
+    assert len(calls) == 1
+    stats = registry.model_stats()["test"]
+    assert stats["name"] == "test-model" and stats["loaded"] is True
+    assert stats["load_seconds"] is not None
+
+
+def test_concurrent_first_use_loads_once(registry):
+    load, calls = _counting_loader(delay=0.2)
+    registry.register_model("test", load)
+    barrier = threading.Barrier(8)
+    models = []
+
+    def use():
+        barrier.wait()
+        models.append(registry.get_model("test"))
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(models) == 8 and all(model is models[0] for model in models)
+
+
+def test_registering_again_keeps_the_first_loader(registry):
+    first, first_calls = _counting_loader()
+    second, second_calls = _counting_loader()
+    registry.register_model("test", first)
+    registry.register_model("test", second)
+
+    registry.get_model("test")
+
+    assert len(first_calls) == 1 and second_calls == []
+
+
+def test_unknown_model_raises(registry):
+    with pytest.raises(KeyError, match="Unknown model"):
+        registry.get_model("no-such-model")
+
+
+def test_backend_switch_reloads(registry, monkeypatch):
+    monkeypatch.setattr(model_registry, "_inference_backend", "fp32")
+    load, calls = _counting_loader()
+    registry.register_model("test", load)
+    before = registry.get_model("test")
+    assert registry.cache_namespace("m") == "m"
+
+    registry.set_inference_backend("int8")
+
+    assert registry.model_stats()["test"]["loaded"] is False
+    assert registry.get_model("test") is not before
+    assert len(calls) == 2
+    assert registry.cache_namespace("m") == "m@int8"
+    with pytest.raises(ValueError, match="Unknown inference backend"):
+        registry.set_inference_backend("fp16")
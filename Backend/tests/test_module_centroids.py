@@ -0,0 +1,106 @@
+# test_module_centroids.py
+#
+# Module centroids kept as running sums: adding and removing resources with
+# update_module_centroids must leave the same rows as rebuild_module_centroids
+# over the resulting resources, and the mean of each module's beta-scaled
+# polylines projected as /moduleData always placed it.
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("flask_mysqldb")
+
+from dbModels import Course, ModuleCentroid, Resource
+from module_centroids import get_module_centroids, rebuild_module_centroids, update_module_centroids
+from polyline_kernel import beta_scale
+from radial_projection import project
+
+TOPICS = 7
+
+
+@pytest.fixture
+def course(database):
+    course = Course(name="course")
+    database.session.add(course)
+    database.session.commit()
+    return course
+
+
+def _resource(rng, course, module_id, beta=None):
+    return Resource(name="r", course_id=course.id, module_id=module_id, module=f"module {module_id}",
+                    polyline=rng.uniform(0, 1, TOPICS).tolist(), beta=beta)
+
+
+def _rows(course):
+    rows = ModuleCentroid.query.filter_by(course_id=course.id).order_by(ModuleCentroid.module_id.asc()).all()
+    return {row.module_id: (row.resource_count, np.asarray(row.polyline_sum), row.to_dict()) for row in rows}
+
+
+def _assert_same_rows(incremental, rebuilt):
+    assert incremental.keys() == rebuilt.keys()
+    for module_id, (count, polyline_sum, data) in incremental.items():
+        assert count == rebuilt[module_id][0]
+        np.testing.assert_allclose(polyline_sum, rebuilt[module_id][1], rtol=0, atol=1e-9)
+        assert data["module"] == rebuilt[module_id][2]["module"]
+        assert data["x"] == pytest.approx(rebuilt[module_id][2]["x"], abs=1e-9)
+        assert data["y"] == pytest.approx(rebuilt[module_id][2]["y"], abs=1e-9)
+
+
+def test_incremental_updates_match_a_rebuild(database, course):
+    rng = np.random.default_rng(20)
+    database.session.add_all(_resource(rng, course, i % 3, beta=i % 4) for i in range(9))
+    database.session.commit()
+    assert len(get_module_centroids(course.id)) == 3  # materialized on first read
+
+    added = [_resource(rng, course, module_id, beta=2) for module_id in (0, 2, 5, 5)]
+    database.session.add_all(added)
+    database.session.flush()
+    update_module_centroids(course.id, added=added)
+    database.session.commit()
+
+    # a re-embedded resource: out with its old values, in with the new ones
+    moved = Resource.query.filter_by(course_id=course.id, module_id=1).order_by(Resource.id.asc()).first()
+    previous = SimpleNamespace(id=moved.id, module_id=moved.module_id, module=moved.module,
+                               polyline=list(moved.polyline), beta=moved.beta)
+    moved.polyline, moved.module_id, moved.module = rng.uniform(0, 1, TOPICS).tolist(), 2, "module 2"
+    gone = Resource.query.filter_by(course_id=course.id, module_id=0).all()
+    for resource in gone:
+        database.session.delete(resource)
+    database.session.flush()
+    update_module_centroids(course.id, added=[moved], removed=[previous] + gone)
+    database.session.commit()
+
+    incremental = _rows(course)
+    assert 0 not in incremental  # its last resource went
+    rebuild_module_centroids(course.id)
+    database.session.commit()
+    _assert_same_rows(incremental, _rows(course))
+
+
+def test_centroid_is_the_projected_mean(database, course):
+    rng = np.random.default_rng(21)
+    resources = [_resource(rng, course, 4, beta=beta) for beta in (0, 3, 15)]
+    database.session.add_all(resources)
+    database.session.commit()
+
+    (centroid,) = get_module_centroids(course.id)
+
+    mean = np.mean([beta_scale(np.asarray(r.polyline), r.beta) for r in resources], axis=0)
+    x, y = project(mean)[0]
+    assert centroid["module_id"] == 4 and centroid["module"] == "module 4"
+    assert centroid["x"] == pytest.approx(x, abs=1e-9) and centroid["y"] == pytest.approx(y, abs=1e-9)
+
+
+def test_updates_wait_for_the_first_read(database, course):
+    rng = np.random.default_rng(22)
+    resource = _resource(rng, course, 1)
+    database.session.add(resource)
+    database.session.flush()
+    update_module_centroids(course.id, added=[resource])
+    database.session.commit()
+
+    assert ModuleCentroid.query.filter_by(course_id=course.id).count() == 0
+    assert not Course.query.get(course.id).module_centroids_ready
+    assert [c["module_id"] for c in get_module_centroids(course.id)] == [1]
@@ -0,0 +1,109 @@
+# test_polyline_kernel.py
+#
+# The vectorized polyline maths against the per-pair loops they replaced
+# (get_cos_sim per keyword and topic, the clamping create_beta_polyline loop).
+
+import numpy as np
+import pytest
+
+import polyline_kernel
+from polyline_kernel import beta_scale, keyword_mean_polylines
+from utils import get_cos_sim
+
+
+def loop_keyword_polyline(topics, keywords):
+    # create_resource_polylines: scaled similarity per (keyword, topic), averaged over the keywords
+    polylines = [[(get_cos_sim(topic, keyword) + 1) / 2 for topic in topics] for keyword in keywords]
+    return [sum(column) / len(column) for column in zip(*polylines)]
+
+
+def loop_beta_polyline(polyline, beta):
+    # create_beta_polyline before polyline_kernel
+    beta_polyline = []
+    mean_val = np.average(polyline)
+    for j in polyline:
+        j = j + beta * (j - mean_val)
+        if j > 1:
+            j = 1
+        if j < 0:
+            j = 0
+        beta_polyline.append(j)
+    return beta_polyline
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_keyword_mean_polylines_matches_get_cos_sim(dtype):
+    rng = np.random.default_rng(11)
+    topics = rng.normal(size=(9, 24))
+    groups = [rng.normal(size=(n, 24)).astype(dtype) for n in (5, 5, 1, 7, 5, 3)]
+
+    result = keyword_mean_polylines(topics, groups)
+
+    assert result.shape == (len(groups), len(topics))
+    expected = [loop_keyword_polyline(topics, group.astype(np.float64)) for group in groups]
+    tolerance = 1e-12 if dtype == np.float64 else 1e-6
+    np.testing.assert_allclose(result, expected, rtol=0, atol=tolerance)
+
+
+def test_keyword_mean_polylines_accepts_lists():
+    rng = np.random.default_rng(12)
+    topics = rng.normal(size=(4, 6)).tolist()
+    groups = [rng.normal(size=(3, 6)).tolist(), rng.normal(size=(2, 6)).tolist()]
+
+    result = keyword_mean_polylines(topics, groups)
+
+    expected = [loop_keyword_polyline(np.array(topics), np.array(group)) for group in groups]
+    np.testing.assert_allclose(result, expected, rtol=0, atol=1e-12)
+
+
+def test_keyword_mean_polylines_across_chunks(monkeypatch):
+    monkeypatch.setattr(polyline_kernel, "CHUNK_ROWS", 8)
+    rng = np.random.default_rng(13)
+    topics = rng.normal(size=(5, 10))
+    groups = [rng.normal(size=(n, 10)) for n in (3, 4, 12, 2, 0, 5, 5, 1)]
+
+    result = keyword_mean_polylines(topics, groups)
+
+    for row, group in zip(result, groups):
+        expected = loop_keyword_polyline(topics, group) if len(group) else np.zeros(len(topics))
+        np.testing.assert_allclose(row, expected, rtol=0, atol=1e-12)
+
+
+def test_empty_keyword_groups_give_zero_polylines():
+    rng = np.random.default_rng(14)
+    topics = rng.normal(size=(6, 8))
+    groups = [[], rng.normal(size=(4, 8)), np.empty((0, 8)), []]
+
+    result = keyword_mean_polylines(topics, groups)
+
+    assert result.shape == (4, 6)
+    np.testing.assert_array_equal(result[[0, 2, 3]], np.zeros((3, 6)))
+    np.testing.assert_allclose(result[1], loop_keyword_polyline(topics, groups[1]), rtol=0, atol=1e-12)
+
+
+def test_only_empty_keyword_groups():
+    topics = np.eye(3)
+    np.testing.assert_array_equal(keyword_mean_polylines(topics, [[], []]), np.zeros((2, 3)))
+
+
+@pytest.mark.parametrize("beta", [0.0, 0.5, 3.0, 15.0])
+def test_beta_scale_matches_create_beta_polyline(beta):
+    rng = np.random.default_rng(15)
+    polylines = rng.uniform(size=(7, 12))
+
+    result = beta_scale(polylines, beta)
+
+    expected = [loop_beta_polyline(polyline, beta) for polyline in polylines]
+    np.testing.assert_allclose(result, expected, rtol=0, atol=1e-15)
+    np.testing.assert_allclose(beta_scale(polylines[0], beta), expected[0], rtol=0, atol=1e-15)
+
+
+def test_beta_scale_per_row_betas():
+    rng = np.random.default_rng(16)
+    polylines = rng.uniform(size=(4, 9))
+    betas = [0.0, 1.0, 5.0, 20.0]
+
+    result = beta_scale(polylines, betas)
+
+    expected = [loop_beta_polyline(polyline, beta) for polyline, beta in zip(polylines, betas)]
+    np.testing.assert_allclose(result, expected, rtol=0, atol=1e-15)
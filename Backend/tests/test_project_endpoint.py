@@ -0,0 +1,65 @@
+# test_project_endpoint.py
+#
+# POST /project: batch projection of polylines onto a course's map, and the
+# 400s for inputs it cannot project (non-finite polylines or beta).
+
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("flask_mysqldb")
+
+from dbModels import Course, Topic
+from polyline_kernel import beta_scale
+from radial_projection import project
+
+TOPICS = 5
+
+
+@pytest.fixture
+def client(database):
+    app = pytest.importorskip("app").app
+    course = Course(name="course")
+    database.session.add(course)
+    database.session.flush()
+    database.session.add_all(Topic(name=f"t{i}", course_id=course.id) for i in range(TOPICS))
+    database.session.commit()
+    return app.test_client(), course.id
+
+
+def _post(client, body):
+    # raw JSON text, so NaN / Infinity literals reach the endpoint as written
+    return client.post("/project", data=body, content_type="application/json")
+
+
+def test_projects_polylines_with_beta(client):
+    client, course_id = client
+    polylines = np.random.default_rng(14).uniform(0, 1, (3, TOPICS))
+    beta = [0.0, 2.0, 15.0]
+
+    response = _post(client, json.dumps({"course_id": course_id, "polylines": polylines.tolist(), "beta": beta}))
+
+    assert response.status_code == 200
+    np.testing.assert_allclose(response.get_json()["coordinates"], project(beta_scale(polylines, beta)))
+
+
+@pytest.mark.parametrize("beta", ["NaN", "Infinity", "-Infinity", "1e400", "[1.0, NaN]"])
+def test_non_finite_beta_rejected(client, beta):
+    client, course_id = client
+    polylines = json.dumps(np.full((2, TOPICS), 0.5).tolist())
+
+    response = _post(client, f'{{"course_id": {course_id}, "polylines": {polylines}, "beta": {beta}}}')
+
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "'beta' must be finite"
+
+
+def test_non_finite_polyline_rejected(client):
+    client, course_id = client
+    polyline = ", ".join(["0.5"] * (TOPICS - 1) + ["NaN"])
+
+    response = _post(client, f'{{"course_id": {course_id}, "polylines": [[{polyline}]]}}')
+
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Polylines must be finite"
@@ -0,0 +1,95 @@
+# test_radial_projection.py
+#
+# radial_projection.project against the rad_plot_axes + rad_plot_poly loops it
+# replaced: bit-identical with exact=True, within float rounding with the
+# projection_weights matmul.
+
+import math
+
+import numpy as np
+import pytest
+
+from radial_projection import project, projection_weights, radial_axes
+
+# sizes the rad_plot_axes loop gives num axes for (at some, e.g. 51 or 101,
+# float rounding makes it stop one short)
+SIZES = [2, 3, 5, 8, 13, 24, 50, 64, 100]
+
+
+def loop_axes(num, x_max=1, y_max=1):
+    # rad_plot_axes before radial_projection
+    tlen = []
+    ttempl = []
+    theta = ((np.pi) / (num - 1)) / 2
+    b = 0
+    while (b * theta) <= (np.arctan(y_max / x_max)):
+        y_val = x_max * math.tan(b * theta)
+        ttemp = math.sqrt((x_max ** 2) + (y_val ** 2))
+        tlen.append(ttemp)
+        if (b * theta) != np.arctan(y_max / x_max):
+            ttempl.append(ttemp)
+        b += 1
+    tlen.extend(list(reversed(ttempl)))
+    return tlen, theta
+
+
+def loop_poly(num, hd_point, tlen, theta):
+    # rad_plot_poly before radial_projection
+    coordinates = []
+    for pnt in hd_point:
+        x_values = []
+        y_values = []
+        for p in range(num):
+            rlen = pnt[p] * tlen[p]
+            x_values.append(rlen * math.cos(p * theta))
+            y_values.append(rlen * math.sin(p * theta))
+        coordinates.append([sum(x_values) / num, sum(y_values) / num])
+    return coordinates
+
+
+@pytest.mark.parametrize("num", SIZES)
+def test_axes_match_loop(num):
+    tlen, theta = radial_axes(num, 1, 1)
+    expected_tlen, expected_theta = loop_axes(num)
+    assert theta == expected_theta
+    assert list(tlen) == expected_tlen
+
+
+@pytest.mark.parametrize("num", SIZES)
+def test_exact_projection_is_bit_identical(num):
+    rng = np.random.default_rng(num)
+    polylines = rng.uniform(size=(40, num))
+    tlen, theta = loop_axes(num)
+
+    expected = np.array(loop_poly(num, polylines.tolist(), tlen, theta))
+
+    np.testing.assert_array_equal(project(polylines), expected)
+    np.testing.assert_array_equal(project(polylines, *radial_axes(num, 1, 1)), expected)
+    np.testing.assert_array_equal(project(polylines[0]), expected[:1])
+
+
+@pytest.mark.parametrize("num", [3, 8, 24])
+def test_exact_projection_with_other_axes(num):
+    rng = np.random.default_rng(100 + num)
+    polylines = rng.uniform(size=(10, num))
+    tlen, theta = loop_axes(num, 2.0, 2.0)
+
+    expected = np.array(loop_poly(num, polylines.tolist(), tlen, theta))
+
+    np.testing.assert_array_equal(project(polylines, tlen, theta), expected)
+
+
+@pytest.mark.parametrize("num", SIZES)
+def test_matmul_projection_within_tolerance(num):
+    rng = np.random.default_rng(200 + num)
+    polylines = rng.uniform(size=(40, num))
+    tlen, theta = loop_axes(num)
+
+    expected = np.array(loop_poly(num, polylines.tolist(), tlen, theta))
+
+    np.testing.assert_allclose(project(polylines, exact=False), expected, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(polylines @ projection_weights(num), expected, rtol=0, atol=1e-12)
+
+
+def test_empty_polylines():
+    np.testing.assert_array_equal(project(np.empty((3, 0))), np.zeros((3, 2)))
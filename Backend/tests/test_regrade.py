@@ -0,0 +1,230 @@
+# test_regrade.py
+#
+# Re-grading replays an enrollment's highlines from the edited contribution
+# onward and stops once they come out as stored; the result must be what a
+# full replay of every contribution gives, also when POST /grades/batch
+# re-grades many learners at once.
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+pytest.importorskip("flask_mysqldb")
+
+import repository
+from dbModels import Contribution, Course, Enroll
+from radial_projection import project
+from repository import _replay_enrollment, contribution_rows_path, update_summary_grade
+from trajectory_log import contribution_path, record_event
+
+TOPICS = 9
+
+
+def _learner(database, course, rng, steps, quiz_every=4):
+    # contributions as update_position / update_by_quiz chain them
+    start = rng.uniform(0, 0.1, TOPICS)
+    x, y = project(start)[0]
+    enroll = Enroll(course_id=course.id, polyline=start.tolist(), x_coordinate=float(x), y_coordinate=float(y))
+    database.session.add(enroll)
+    database.session.flush()
+    record_event(enroll.id, start, x, y, "start")
+    polyline, at = start, datetime(2026, 1, 1)
+    for step in range(steps):
+        if step % quiz_every == quiz_every - 1:
+            contribution_polyline, grade = None, None
+            new = np.maximum(polyline, rng.uniform(0, 0.8, TOPICS))
+        else:
+            # grades as Numeric(20, 10) keeps them
+            contribution_polyline, grade = rng.uniform(0, 1, TOPICS), round(float(rng.uniform(0.2, 1.0)), 4)
+            new = np.maximum(polyline, contribution_polyline * grade)
+        x, y = project(new)[0]
+        contribution = Contribution(enroll_id=enroll.id, submitted_on=at + timedelta(minutes=step),
+                                    description={"summary": True} if grade is not None else {"quiz_update": True},
+                                    prev_polyline=polyline.tolist(), polyline=new.tolist(),
+                                    contribution_polyline=None if contribution_polyline is None
+                                    else contribution_polyline.tolist(),
+                                    grade=grade, x_coordinate=float(x), y_coordinate=float(y))
+        database.session.add(contribution)
+        record_event(enroll.id, new, x, y, "summary" if grade is not None else "quiz", contribution=contribution,
+                     at=contribution.submitted_on)
+        polyline = new
+    enroll.polyline, enroll.x_coordinate, enroll.y_coordinate = polyline.tolist(), float(x), float(y)
+    database.session.commit()
+    return enroll
+
+
+@pytest.fixture
+def course(database):
+    course = Course(name="course")
+    database.session.add(course)
+    database.session.commit()
+    return course
+
+
+def _contributions(enroll_id):
+    return Contribution.query.filter_by(enroll_id=enroll_id).order_by(Contribution.id.asc()).all()
+
+
+def full_replay(contributions, grades):
+    # every contribution from the first, with `grades` ({id: grade}) applied
+    polyline = np.asarray(contributions[0].prev_polyline, dtype=np.float64)
+    path = []
+    for c in contributions:
+        if c.contribution_polyline is None:
+            graded = np.asarray(c.polyline, dtype=np.float64)
+        else:
+            graded = np.asarray(c.contribution_polyline, dtype=np.float64) * float(grades.get(c.id, c.grade))
+        prev, polyline = polyline, np.maximum(polyline, graded)
+        path.append((prev, polyline))
+    return path
+
+
+def _assert_replayed(enroll_id, expected):
+    contributions = _contributions(enroll_id)
+    for c, (prev, polyline) in zip(contributions, expected):
+        np.testing.assert_array_equal(np.asarray(c.prev_polyline, dtype=np.float64), prev)
+        np.testing.assert_array_equal(np.asarray(c.polyline, dtype=np.float64), polyline)
+        x, y = project(polyline)[0]
+        assert float(c.x_coordinate) == pytest.approx(x, abs=1e-9)
+        assert float(c.y_coordinate) == pytest.approx(y, abs=1e-9)
+    enroll = Enroll.query.get(enroll_id)
+    np.testing.assert_array_equal(np.asarray(enroll.polyline, dtype=np.float64), expected[-1][1])
+    # the trajectory log follows the rewritten contributions
+    log, rows = contribution_path(enroll_id), contribution_rows_path(enroll_id)
+    assert len(log) == len(rows)
+    for logged, stored in zip(log, rows):
+        np.testing.assert_allclose(np.asarray(logged, dtype=np.float64), stored, rtol=0, atol=1e-6)
+
+
+@pytest.mark.parametrize("position, grade", [(0, 0.0), (5, 1.0), (5, 0.05), (10, 3.0), (-1, 0.5)])
+def test_regrade_matches_a_full_replay(database, course, position, grade):
+    enroll = _learner(database, course, np.random.default_rng(21 + position), steps=16)
+    contributions = _contributions(enroll.id)
+    edited = [c for c in contributions if c.contribution_polyline is not None][position]
+    expected = full_replay(contributions, {edited.id: grade})
+
+    update_summary_grade(edited.id, grade)
+
+    database.session.expire_all()
+    _assert_replayed(enroll.id, expected)
+    assert Contribution.query.get(edited.id).is_graded
+
+
+def test_replay_stops_once_highlines_come_out_as_stored(database, course):
+    enroll = _learner(database, course, np.random.default_rng(5), steps=12)
+    contributions = _contributions(enroll.id)
+    # a raised grade on a contribution that stays under the highline it had reached by contributions[6]
+    edited = contributions[2]
+    edited.contribution_polyline = np.minimum(np.asarray(edited.contribution_polyline),
+                                              np.asarray(contributions[6].prev_polyline)).tolist()
+    edited.grade = 1.0
+    database.session.commit()
+    expected = full_replay(contributions, {})
+
+    replayed, polylines, last = _replay_enrollment(enroll.id, [edited])
+
+    assert replayed[0].id == edited.id
+    assert len(replayed) < len(contributions) - 2  # stopped before the end
+    assert last.id == contributions[-1].id
+    for current, polyline in zip(replayed, polylines):
+        index = [c.id for c in contributions].index(current.id)
+        np.testing.assert_array_equal(polyline, expected[index][1])
+    database.session.rollback()
+
+
+def test_replay_runs_past_every_edit(database, course):
+    enroll = _learner(database, course, np.random.default_rng(6), steps=10)
+    contributions = _contributions(enroll.id)
+    summaries = [c for c in contributions if c.contribution_polyline is not None]
+    edited = [summaries[1], summaries[-1]]
+    for c in edited:
+        c.grade = 0.0
+
+    replayed, _, _ = _replay_enrollment(enroll.id, edited)
+
+    # nothing before the last edit may be skipped, even where a highline is unchanged
+    assert [c.id for c in replayed][-1] >= edited[-1].id
+    database.session.rollback()
+
+
+def test_unchanged_grade_moves_nothing(database, course, monkeypatch):
+    enroll = _learner(database, course, np.random.default_rng(7), steps=8)
+    contributions = _contributions(enroll.id)
+    before = [(list(c.prev_polyline), list(c.polyline)) for c in contributions]
+    edited = next(c for c in contributions if c.contribution_polyline is not None)
+    calls, regraded = [], repository._regraded_polyline
+    monkeypatch.setattr(repository, "_regraded_polyline",
+                        lambda c, prev: calls.append(c.id) or regraded(c, prev))
+
+    update_summary_grade(edited.id, float(edited.grade))
+
+    database.session.expire_all()
+    assert [(list(c.prev_polyline), list(c.polyline)) for c in _contributions(enroll.id)] == before
+    assert len(calls) <= 2  # the edited contribution, and the one that shows nothing changed
+
+
+def _paths(enroll_id):
+    enroll = Enroll.query.get(enroll_id)
+    rows = [(c.prev_polyline, c.polyline, float(c.x_coordinate), float(c.y_coordinate), float(c.grade or 0))
+            for c in _contributions(enroll_id)]
+    return rows, (np.asarray(enroll.polyline).tolist(), float(enroll.x_coordinate), float(enroll.y_coordinate))
+
+
+def test_grades_batch_matches_one_call_per_grade(database, course, monkeypatch):
+    client = pytest.importorskip("app").app.test_client()
+    monkeypatch.setattr(repository, "GRADE_BATCH_ENROLLMENTS", 2)  # several commits
+    batched = [_learner(database, course, np.random.default_rng(seed), steps=9) for seed in range(5)]
+    single = [_learner(database, course, np.random.default_rng(seed), steps=9) for seed in range(5)]
+
+    body, final = [], {}
+    for learner, (b, s) in enumerate(zip(batched, single)):
+        pairs = [(c.id, d.id) for c, d in zip(_contributions(b.id), _contributions(s.id))
+                 if c.contribution_polyline is not None]
+        for n, (bid, sid) in enumerate(pairs[learner % 3::2]):
+            grade = 0.1 * (learner + n)
+            body += [{"contribution_id": bid, "grade": 9.0}, {"contribution_id": bid, "grade": grade}]
+            final[sid] = grade  # the last grade of a contribution wins
+    body.append({"contribution_id": 10 ** 9, "grade": 1})
+
+    response = client.post("/grades/batch", json={"grades": body})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["missing_contribution_ids"] == [10 ** 9]
+    assert sorted(p["enroll_id"] for p in data["positions"]) == sorted(e.id for e in batched)
+    for contribution_id, grade in final.items():
+        update_summary_grade(contribution_id, grade)
+    database.session.expire_all()
+    positions = {p["enroll_id"]: (p["x"], p["y"]) for p in data["positions"]}
+    for b, s in zip(batched, single):
+        assert _paths(b.id) == _paths(s.id)
+        assert positions[b.id] == pytest.approx(_paths(s.id)[1][1:], abs=1e-9)
+
+
+@pytest.mark.parametrize("body", [
+    None, {}, {"grades": []}, {"grades": {"contribution_id": 1, "grade": 1}},
+    {"grades": [{"contribution_id": 1}]}, {"grades": [{"contribution_id": 1, "grade": True}]},
+    {"grades": [{"contribution_id": 1, "grade": "0.5"}]}, {"grades": [{"contribution_id": "one", "grade": 0.5}]},
+    {"grades": [1]},
+])
+def test_grades_batch_rejects_bad_bodies(database, course, body):
+    client = pytest.importorskip("app").app.test_client()
+    enroll = _learner(database, course, np.random.default_rng(1), steps=4)
+    before = _paths(enroll.id)
+
+    response = client.post("/grades/batch", json=body)
+
+    assert response.status_code == 400 and "error" in response.get_json()
+    database.session.expire_all()
+    assert _paths(enroll.id) == before
+
+
+def test_grades_batch_size_bound(database, monkeypatch):
+    app = pytest.importorskip("app")
+    monkeypatch.setattr(app, "GRADES_BATCH_MAX", 3)
+
+    response = app.app.test_client().post("/grades/batch", json={
+        "grades": [{"contribution_id": i, "grade": 1} for i in range(1, 5)]})
+
+    assert response.status_code == 400
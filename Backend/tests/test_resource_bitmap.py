@@ -0,0 +1,114 @@
+# test_resource_bitmap.py
+#
+# Resource bitmaps: ordinal sets <-> ints, and the packed column format.
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from resource_bitmap import HEADER, MAGIC, from_ordinals, pack_bitmap, popcount, to_ordinals, unpack_bitmap
+
+
+@pytest.mark.parametrize("ordinals", [
+    [],
+    [0],
+    [7],
+    [8],
+    [0, 1, 2, 3, 4, 5, 6, 7, 8],
+    [3, 64, 65, 1000],
+])
+def test_ordinals_round_trip(ordinals):
+    bits = from_ordinals(ordinals)
+
+    assert bits == sum(1 << o for o in ordinals)
+    assert to_ordinals(bits).tolist() == sorted(ordinals)
+    assert popcount(bits) == len(ordinals)
+
+
+def test_random_ordinals_round_trip():
+    rng = np.random.default_rng(25)
+    for size in (1, 10, 500, 5000):
+        ordinals = rng.choice(20000, size=size, replace=False)
+        bits = from_ordinals(ordinals)
+        np.testing.assert_array_equal(to_ordinals(bits), np.sort(ordinals))
+        assert popcount(bits) == size
+
+
+def test_from_ordinals_drops_negatives_and_duplicates():
+    assert from_ordinals([2, 2, -1, 5, -7]) == (1 << 2) | (1 << 5)
+    assert from_ordinals(np.array([[1, 3], [3, 1]])) == (1 << 1) | (1 << 3)
+
+
+def test_set_operations_on_ints():
+    a, b = from_ordinals([1, 4, 9]), from_ordinals([4, 10])
+    assert to_ordinals(a | b).tolist() == [1, 4, 9, 10]
+    assert to_ordinals(a & ~b).tolist() == [1, 9]
+
+
+@pytest.mark.parametrize("bits", [0, 1, 0b1011, 1 << 7, 1 << 8, (1 << 200) | 5, from_ordinals(range(0, 3000, 7))])
+def test_pack_round_trip(bits):
+    blob = pack_bitmap(bits)
+
+    magic, version, length = HEADER.unpack_from(blob)
+    assert (magic, version, length) == (MAGIC, 1, bits.bit_length())
+    assert len(blob) == HEADER.size + (length + 7) // 8
+    assert unpack_bitmap(blob) == bits
+    assert unpack_bitmap(memoryview(blob)) == bits
+
+
+def test_pack_rejects_negative():
+    with pytest.raises(ValueError, match="non-negative"):
+        pack_bitmap(-1)
+
+
+def test_short_blob_rejected():
+    with pytest.raises(ValueError, match="shorter than its header"):
+        unpack_bitmap(MAGIC + b"\x01")
+
+
+@pytest.mark.parametrize("header", [
+    HEADER.pack(b"NV", 1, 8),
+    HEADER.pack(MAGIC, 2, 8),
+])
+def test_unknown_header_rejected(header):
+    with pytest.raises(ValueError, match="Unknown packed bitmap header"):
+        unpack_bitmap(header + b"\xff")
+
+
+@pytest.mark.parametrize("payload", [b"", b"\xff\x00"])
+def test_length_mismatch_rejected(payload):
+    with pytest.raises(ValueError, match="of 8 bits"):
+        unpack_bitmap(HEADER.pack(MAGIC, 1, 8) + payload)
+
+
+def test_column_raises_on_corrupt_value():
+    from resource_bitmap import ResourceBitmap
+
+    column = ResourceBitmap()
+    assert column.process_result_value(None, None) is None
+    assert column.process_result_value(pack_bitmap(0b101), None) == 0b101
+    with pytest.raises(ValueError):
+        column.process_result_value(HEADER.pack(MAGIC, 1, 64) + b"\x01", None)
+
+
+def test_corrupt_stored_bitmap_is_not_overwritten(database):
+    from dbModels import Enroll
+    from resource_ordinals import grant_resources
+
+    enroll = Enroll(course_id=1, accessible_bitmap=0b1011)
+    database.session.add(enroll)
+    database.session.commit()
+    enroll_id = enroll.id
+    corrupt = HEADER.pack(MAGIC, 1, 64) + b"\x0b"
+    database.session.execute(database.text("UPDATE enroll SET accessible_bitmap = :b WHERE id = :id"),
+                             {"b": corrupt, "id": enroll_id})
+    database.session.commit()
+    database.session.expire_all()
+
+    with pytest.raises(ValueError):
+        grant_resources(Enroll.query.get(enroll_id), [])
+    database.session.rollback()
+    stored = database.session.execute(database.text("SELECT accessible_bitmap FROM enroll WHERE id = :id"),
+                                      {"id": enroll_id}).scalar()
+    assert bytes(stored) == corrupt
@@ -0,0 +1,219 @@
+# test_resource_index.py
+#
+# DominanceIndex (merge-sort tree) and NeighbourIndex against brute-force
+# scans, and the cached per-course index across commits and rollbacks.
+
+import numpy as np
+import pytest
+
+pytest.importorskip("flask_mysqldb")  # dbModels
+
+from resource_index import PENDING_KEY, DominanceIndex, NeighbourIndex
+
+
+def brute_dominated(points, x, y, previous=None):
+    inside = {rid for rid, (px, py) in points.items() if px < x and py < y}
+    if previous is None:
+        return inside
+    x0, y0 = previous
+    return inside - {rid for rid, (px, py) in points.items() if px < x0 and py < y0}
+
+
+def random_points(rng, n, grid=None):
+    # grid: draw coordinates from that many values, so x and y repeat
+    if grid is None:
+        xy = rng.uniform(size=(n, 2))
+    else:
+        xy = rng.integers(0, grid, size=(n, 2)) / grid
+    ids = rng.permutation(10 * n)[:n] + 1
+    return {int(rid): (float(px), float(py)) for rid, (px, py) in zip(ids, xy)}
+
+
+def queries(rng, points, count):
+    # random corners, plus corners on existing coordinates (ties with the strict <)
+    values = np.array(list(points.values()))
+    for _ in range(count):
+        yield float(rng.uniform(-0.1, 1.1)), float(rng.uniform(-0.1, 1.1))
+        if len(values):
+            yield float(rng.choice(values[:, 0])), float(rng.choice(values[:, 1]))
+
+
+@pytest.mark.parametrize("n, grid", [(1, None), (2, None), (7, None), (64, None), (300, None),
+                                     (50, 4), (200, 10), (257, 16)])
+def test_dominated_matches_brute_force(n, grid):
+    rng = np.random.default_rng(n * 31 + (grid or 0))
+    points = random_points(rng, n, grid)
+    index = DominanceIndex(points)
+
+    for x, y in queries(rng, points, 40):
+        found = index.dominated(x, y)
+        assert len(found) == len(set(found))
+        assert set(found) == brute_dominated(points, x, y)
+
+
+@pytest.mark.parametrize("n, grid", [(5, None), (120, None), (120, 6), (300, 12)])
+def test_dominated_since_previous_matches_brute_force(n, grid):
+    rng = np.random.default_rng(n * 17 + (grid or 0))
+    points = random_points(rng, n, grid)
+    index = DominanceIndex(points)
+
+    for x, y in queries(rng, points, 20):
+        previous_corners = [
+            (x - 0.2, y - 0.2),  # inside the new rectangle
+            (x + 0.2, y + 0.2),  # outside: nothing new
+            (x - 0.2, y + 0.2),  # overlapping in x only
+            (x + 0.2, y - 0.2),  # overlapping in y only
+            (x, y),  # same corner
+            (float(rng.uniform(-0.1, 1.1)), float(rng.uniform(-0.1, 1.1))),
+        ]
+        for previous in previous_corners:
+            found = index.dominated(x, y, previous)
+            assert len(found) == len(set(found))
+            assert set(found) == brute_dominated(points, x, y, previous)
+
+
+def test_dominated_after_updates():
+    rng = np.random.default_rng(5)
+    points = random_points(rng, 80, 8)
+    index = DominanceIndex(points)
+    index.dominated(0.5, 0.5)  # build before updating
+
+    for rid in list(points)[:10]:
+        index.remove(rid)
+        del points[rid]
+    for rid in list(points)[:10]:
+        points[rid] = (float(rng.uniform()), float(rng.uniform()))
+        index.upsert(rid, *points[rid])
+    index.upsert(10 ** 6, 0.25, 0.25)
+    points[10 ** 6] = (0.25, 0.25)
+    index.upsert(list(points)[20], None, 0.5)
+    del points[list(points)[20]]
+
+    assert len(index) == len(points)
+    for x, y in queries(rng, points, 30):
+        assert set(index.dominated(x, y)) == brute_dominated(points, x, y)
+        assert set(index.dominated(x, y, (x - 0.3, y - 0.1))) == brute_dominated(points, x, y, (x - 0.3, y - 0.1))
+
+
+def test_previous_with_missing_coordinates():
+    points = {1: (0.1, 0.1), 2: (0.4, 0.2), 3: (0.9, 0.9)}
+    index = DominanceIndex(points)
+    assert set(index.dominated(0.5, 0.5, (None, None))) == {1, 2}
+    assert set(index.dominated(0.5, 0.5, (0.2, None))) == {1, 2}
+
+
+def test_empty_index():
+    assert DominanceIndex().dominated(1.0, 1.0) == []
+    assert DominanceIndex().dominated(1.0, 1.0, (0.5, 0.5)) == []
+
+
+def brute_nearest(ids, polylines, query, k):
+    distances = np.sum((np.asarray(polylines, dtype=np.float64) - query) ** 2, axis=1)
+    return [ids[i] for i in np.lexsort((np.arange(len(ids)), distances))[:k]]
+
+
+@pytest.mark.parametrize("n, dim", [(1, 4), (30, 6), (300, 8), (300, 24)])
+def test_nearest_matches_brute_force(n, dim):
+    rng = np.random.default_rng(n + dim)
+    ids = (rng.permutation(5 * n)[:n] + 1).tolist()
+    polylines = rng.uniform(size=(n, dim)).astype(np.float32)
+    index = NeighbourIndex(ids, polylines.tolist())
+
+    for _ in range(20):
+        query = rng.uniform(size=dim)
+        for k in (1, 7, n + 3):
+            assert index.nearest(query, k) == brute_nearest(ids, polylines, query, k)
+
+
+def test_nearest_after_updates():
+    rng = np.random.default_rng(16)
+    polylines = {rid: rng.uniform(size=5).tolist() for rid in range(1, 41)}
+    index = NeighbourIndex(list(polylines), list(polylines.values()))
+
+    for rid in range(1, 11):
+        index.remove(rid)
+        del polylines[rid]
+    for rid in range(11, 16):
+        polylines[rid] = rng.uniform(size=5).tolist()
+        index.upsert(rid, polylines[rid])
+    index.upsert(100, [0.5] * 5)
+    polylines[100] = [0.5] * 5
+    index.upsert(20, [0.1, 0.2])  # wrong size: dropped
+    del polylines[20]
+
+    query = np.full(5, 0.5)
+    assert index.nearest(query, 40) == brute_nearest(list(polylines), list(polylines.values()), query, 40)
+
+
+# ---- cached per-course index (get_resource_index / resources_changed) ----
+
+@pytest.fixture
+def course(database):
+    from dbModels import Course, Resource
+
+    course = Course(name="course")
+    database.session.add(course)
+    database.session.flush()
+    database.session.add_all(Resource(name=f"r{i}", course_id=course.id, polyline=[0.1 * i] * 4,
+                                      x_coordinate=0.1 * i, y_coordinate=0.1 * i) for i in range(1, 6))
+    database.session.commit()
+    return course
+
+
+def _add_resource(database, course, value):
+    from dbModels import Resource
+    from resource_index import resources_changed
+
+    resource = Resource(name="new", course_id=course.id, polyline=[value] * 4, x_coordinate=value, y_coordinate=value)
+    database.session.add(resource)
+    database.session.flush()
+    resources_changed(course.id, [resource])
+    return resource.id
+
+
+def test_committed_update_is_applied_to_the_cached_index(database, course):
+    from resource_index import get_resource_index, nearest_resources, resource_index_by_course, unlocked_resources
+
+    index = get_resource_index(course.id)
+    assert index.version == 0
+    resource_id = _add_resource(database, course, 0.05)
+
+    # the shared cached index does not change before the transaction commits
+    assert resource_index_by_course[course.id] is index and index.version == 0
+    assert resource_id not in index.neighbours.rows
+    database.session.commit()
+
+    assert database.session.info.get(PENDING_KEY) is None
+    assert get_resource_index(course.id) is index and index.version == 1
+    assert nearest_resources(course.id, [0.05] * 4, k=1) == [resource_id]
+    assert resource_id in unlocked_resources(course.id, 0.08, 0.08)
+
+
+def test_rolled_back_update_is_not_cached(database, course):
+    from resource_index import get_resource_index, resource_index_by_course
+
+    get_resource_index(course.id)
+    resource_id = _add_resource(database, course, 0.05)
+    # rebuilt inside the transaction (the version moved), so it holds the new row
+    assert resource_id in get_resource_index(course.id).neighbours.rows
+    database.session.rollback()
+
+    assert course.id not in resource_index_by_course
+    index = get_resource_index(course.id)
+    assert index.version == 0 and resource_id not in index.neighbours.rows
+
+
+def test_index_rebuilt_when_the_version_moved_elsewhere(database, course):
+    from resource_index import get_resource_index
+
+    index = get_resource_index(course.id)
+    database.session.execute(database.text(
+        "UPDATE course SET resources_version = resources_version + 1 WHERE id = :id"), {"id": course.id})
+    database.session.commit()
+    resource_id = _add_resource(database, course, 0.05)
+    database.session.commit()
+
+    # the staged rows alone would miss the other writer's change: rebuilt from the rows
+    rebuilt = get_resource_index(course.id)
+    assert rebuilt is not index and rebuilt.version == 2
+    assert resource_id in rebuilt.neighbours.rows
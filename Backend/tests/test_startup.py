@@ -0,0 +1,27 @@
+# test_startup.py
+#
+# Cold import of the web app in a fresh interpreter (cli_startup), held to a
+# time budget so startup regressions fail CI.
+
+import os
+
+import pytest
+
+pytest.importorskip("click")
+pytest.importorskip("flask_mysqldb")  # app -> dbModels
+
+from cli_startup import profile_cold_import
+
+# seconds; NAVIGATED_STARTUP_BUDGET overrides it on slow runners
+STARTUP_BUDGET_SECONDS = float(os.environ.get("NAVIGATED_STARTUP_BUDGET", "10"))
+
+
+def test_app_cold_import_within_budget():
+    wall, entries, returncode, stderr = profile_cold_import("app")
+    assert returncode == 0, f"Importing app failed:\n{stderr[-4000:]}"
+
+    slowest = sorted((e for e in entries if e[1] == 0), key=lambda e: -e[3])[:10]
+    report = "\n".join(f"  {cum_us / 1e6:8.3f}s  {name}" for name, _, _, cum_us in slowest)
+    assert wall <= STARTUP_BUDGET_SECONDS, (
+        f"Cold import of app took {wall:.2f}s, budget is {STARTUP_BUDGET_SECONDS:.2f}s. "
+        f"Slowest top-level imports:\n{report}")
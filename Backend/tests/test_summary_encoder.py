@@ -0,0 +1,85 @@
+# test_summary_encoder.py
+#
+# Per-course summary pipeline selection (/api/summary-encoder) and the mpnet
+# topic embeddings that single-encoder courses are positioned against, cached
+# per course and Course.topics_version.
+
+import numpy as np
+import pytest
+
+pytest.importorskip("flask_mysqldb")
+pytest.importorskip("nltk")  # app -> learning_summary_core -> text_preprocessing
+
+import inference_service
+from dbModels import Course, Topic
+from learning_summary_core import SINGLE_ENCODER, THREE_MODEL_ENCODER
+from topic_embeddings_loader import (bump_topics_version, get_single_encoder_topic_embeddings, get_summary_encoder,
+                                     get_summary_topic_embeddings)
+
+
+@pytest.fixture
+def course(database):
+    course = Course(name="course")
+    database.session.add(course)
+    database.session.flush()
+    database.session.add_all(Topic(name=f"topic {i}", description=f"about {i}", course_id=course.id)
+                             for i in range(3))
+    database.session.commit()
+    return course
+
+
+@pytest.fixture
+def encoded(monkeypatch):
+    # texts sent to the mpnet model, which answers with one vector per text
+    calls = []
+
+    def encode_sentences(texts, model='sentence'):
+        calls.append((model, list(texts)))
+        return np.arange(len(texts) * 4, dtype=np.float32).reshape(len(texts), 4) + len(calls)
+
+    monkeypatch.setattr(inference_service, "encode_sentences", encode_sentences)
+    return calls
+
+
+def test_encoder_setting_round_trip(database, course):
+    client = pytest.importorskip("app").app.test_client()
+    url = f"/api/summary-encoder/{course.id}"
+
+    assert client.get(url).get_json()["encoder"] == THREE_MODEL_ENCODER
+    response = client.put(url, json={"encoder": SINGLE_ENCODER})
+    assert response.status_code == 200 and response.get_json()["encoder"] == SINGLE_ENCODER
+    assert client.get(url).get_json()["encoder"] == SINGLE_ENCODER
+    assert get_summary_encoder(course.id) == SINGLE_ENCODER
+
+    assert client.put(url, json={"encoder": "fast"}).status_code == 400
+    assert get_summary_encoder(course.id) == SINGLE_ENCODER
+    assert client.get("/api/summary-encoder/999").status_code == 404
+
+
+def test_single_encoder_topics_cached_per_version(database, course, encoded):
+    first = get_single_encoder_topic_embeddings(course.id)
+    assert encoded == [("keyword_sentence", ["about 0", "about 1", "about 2"])]
+    assert get_single_encoder_topic_embeddings(course.id) is first
+    assert len(encoded) == 1
+
+    # a topic write elsewhere: only the committed version moves
+    database.session.execute(database.text("UPDATE course SET topics_version = topics_version + 1 WHERE id = :id"),
+                             {"id": course.id})
+    database.session.commit()
+    second = get_single_encoder_topic_embeddings(course.id)
+    assert len(encoded) == 2 and second is not first
+
+    database.session.add(Topic(name="topic 3", description="about 3", course_id=course.id))
+    bump_topics_version(course.id)
+    database.session.commit()
+    assert len(get_single_encoder_topic_embeddings(course.id)) == 4
+    assert len(encoded) == 3
+
+
+def test_summary_topic_embeddings_follow_the_encoder(database, course, encoded):
+    single = get_summary_topic_embeddings(course.id, SINGLE_ENCODER)
+
+    assert [vector.tolist() for vector in single] == [vector.tolist() for vector in
+                                                      get_single_encoder_topic_embeddings(course.id)]
+    # single-encoder vectors are never written over the stored (three-model) ones
+    assert all(topic.embedding is None for topic in Topic.query.filter_by(course_id=course.id))
@@ -0,0 +1,96 @@
+# test_summary_keywords.py
+#
+# Summary clustering reads the keywords stored when each summary was
+# submitted; only rows from before those columns existed go through KeyBERT,
+# once, in one batch, and keep what it found.
+
+import numpy as np
+import pytest
+
+pytest.importorskip("flask_mysqldb")
+pytest.importorskip("nltk")  # learning_summary_core -> text_preprocessing
+pytest.importorskip("sklearn")
+pytest.importorskip("sympy")
+
+import routes_summary
+from dbModels import Course, Enroll, SummaryCluster, SummaryCoordinates, Topic
+
+TOPICS = 6
+
+
+@pytest.fixture
+def topic(database):
+    course = Course(name="course")
+    database.session.add(course)
+    database.session.flush()
+    topic = Topic(name="topic", course_id=course.id)
+    enroll = Enroll(course_id=course.id)
+    database.session.add_all([topic, enroll])
+    database.session.flush()
+    return course.id, topic.id, enroll.id
+
+
+@pytest.fixture
+def extraction(monkeypatch):
+    # KeyBERT calls made by recompute_topic_clusters, and what they return
+    calls, results = [], []
+
+    def extract(texts, num_keywords=10):
+        calls.append(list(texts))
+        return results.pop(0) if results else [(["extracted"], [1.0]) for _ in texts]
+
+    monkeypatch.setattr(routes_summary, "extract_keywords_for_texts", extract)
+    return calls, results
+
+
+def _summaries(database, topic, keywords):
+    course_id, topic_id, enroll_id = topic
+    rng = np.random.default_rng(4)
+    rows = []
+    for i, kws in enumerate(keywords):
+        polyline = rng.uniform(0, 1, TOPICS)
+        rows.append(SummaryCoordinates(enroll_id=enroll_id, course_id=course_id, topic_id=topic_id,
+                                       summary=f"summary {i}", polyline=polyline.tolist(),
+                                       x_coordinate=float(polyline[0]), y_coordinate=float(polyline[1]),
+                                       keywords=kws, keyword_weights=None if kws is None else [1.0] * len(kws)))
+    database.session.add_all(rows)
+    database.session.flush()
+    return rows
+
+
+def test_stored_keywords_are_not_extracted_again(database, topic, extraction):
+    calls, _ = extraction
+    rows = _summaries(database, topic, [["graph", "tree"], ["graph"], ["heap"]])
+
+    labels, clusters = routes_summary.recompute_topic_clusters(topic[0], topic[1])
+
+    assert calls == []
+    assert len(labels) == len(rows)
+    keywords = {k for cluster in clusters.values() for k in cluster.top_keywords}
+    assert keywords == {"graph", "tree", "heap"}
+    assert all(row.cluster_id is not None for row in rows)
+
+
+def test_rows_without_keywords_are_extracted_once_and_kept(database, topic, extraction):
+    calls, _ = extraction
+    rows = _summaries(database, topic, [["graph"], None, None])
+
+    routes_summary.recompute_topic_clusters(*topic[:2])
+    database.session.commit()
+    routes_summary.recompute_topic_clusters(*topic[:2])
+
+    assert calls == [["summary 1", "summary 2"]]
+    assert [row.keywords for row in rows] == [["graph"], ["extracted"], ["extracted"]]
+    assert rows[1].keyword_weights == [1.0]
+
+
+def test_short_extraction_defaults_to_no_keywords(database, topic, extraction):
+    calls, results = extraction
+    results.append([])  # KeyBERT found no candidate word in the whole batch
+    rows = _summaries(database, topic, [None, None])
+
+    routes_summary.recompute_topic_clusters(*topic[:2])
+
+    assert [row.keywords for row in rows] == [[], []]
+    assert [row.keyword_weights for row in rows] == [[], []]
+    assert SummaryCluster.query.filter_by(topic_id=topic[1]).count() >= 1
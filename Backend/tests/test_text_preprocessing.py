@@ -0,0 +1,96 @@
+# test_text_preprocessing.py
+#
+# The shared preprocessing engine against the per-call implementation it
+# replaced (kept below as the reference): same output for HTML, punctuation,
+# single characters, stopwords and stemming, with memoized word functions.
+
+import re
+
+import numpy as np
+import pytest
+
+nltk = pytest.importorskip("nltk")
+pytest.importorskip("bs4")
+pytest.importorskip("lxml")
+
+from bs4 import BeautifulSoup
+from nltk.stem import PorterStemmer, WordNetLemmatizer
+
+import text_preprocessing
+from text_preprocessing import preprocess_texts, utils_preprocess_text
+
+STOPWORDS = {"the", "a", "is", "of", "and", "to", "in"}
+TEXTS = [
+    "The <b>binary</b> search tree is a tree of nodes &amp; edges.",
+    "Graphs: vertices, edges -- and 3 paths; a b c d!",
+    "x1y2z  multiple   spaces\tand\nnewlines",
+    "<p>Sorting <i>algorithms</i></p><br/>merge-sort, quick_sort & heap sort",
+    "",
+    "   ",
+    "I a e o u single letters x y z",
+    "Running runners ran quickly through the proofs of induction",
+    # the parser drops leading whitespace, so a leading single letter stays
+    " x marks the spot",
+    "\n\t y axis",
+]
+
+
+def reference_preprocess(text, flg_stemm=False, flg_lemm=True, lst_stopwords=None):
+    # utils_preprocess_text as it was before the shared engine
+    text = BeautifulSoup(text, 'lxml').get_text()
+    text = re.sub('[^a-zA-Z]', ' ', text)
+    text = re.sub(r"\s+[a-zA-Z]\s+", ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    lst_text = text.split()
+    if lst_stopwords is not None:
+        lst_text = [word for word in lst_text if word not in lst_stopwords]
+    if flg_stemm:
+        ps = PorterStemmer()
+        lst_text = [ps.stem(word) for word in lst_text]
+    if flg_lemm:
+        lem = WordNetLemmatizer()
+        lst_text = [lem.lemmatize(word) for word in lst_text]
+    return " ".join(lst_text)
+
+
+def _random_texts(count, seed=9):
+    rng = np.random.default_rng(seed)
+    alphabet = list("abcdefghij ABC  ,.-1<>&;\t\r\x0c") + ["<b>", "</b>", "&amp;", " x ", "\n"]
+    return ["".join(rng.choice(alphabet, size=rng.integers(0, 60))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("flg_stemm", [False, True])
+@pytest.mark.parametrize("stopwords", [None, STOPWORDS])
+def test_matches_reference(flg_stemm, stopwords):
+    for text in TEXTS + _random_texts(200):
+        expected = reference_preprocess(text.lower(), flg_stemm=flg_stemm, flg_lemm=False, lst_stopwords=stopwords)
+        assert utils_preprocess_text(text.lower(), flg_stemm=flg_stemm, flg_lemm=False,
+                                     lst_stopwords=stopwords) == expected, repr(text)
+
+
+def test_batch_matches_single_calls():
+    texts = TEXTS + _random_texts(50, seed=10)
+
+    batch = preprocess_texts(texts, lower=True, flg_stemm=True, flg_lemm=False, lst_stopwords=list(STOPWORDS))
+
+    assert batch == [utils_preprocess_text(t.lower(), flg_stemm=True, flg_lemm=False, lst_stopwords=STOPWORDS)
+                     for t in texts]
+
+
+def test_lemmatized_output_matches_reference():
+    try:
+        nltk.data.find("corpora/wordnet")
+    except LookupError:
+        pytest.skip("WordNet data is not installed")
+    for text in TEXTS:
+        assert utils_preprocess_text(text.lower(), lst_stopwords=STOPWORDS) == \
+            reference_preprocess(text.lower(), lst_stopwords=STOPWORDS)
+
+
+def test_repeated_words_are_memoized():
+    text_preprocessing.stem.cache_clear()
+    preprocess_texts(["sorting sorting sorted", "sorting trees"], flg_stemm=True, flg_lemm=False, lst_stopwords=None)
+
+    info = text_preprocessing.cache_info()["stem"]
+    assert info["misses"] == 3  # sorting, sorted, trees
+    assert info["hits"] == 2
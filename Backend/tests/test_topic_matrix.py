@@ -0,0 +1,86 @@
+# test_topic_matrix.py
+#
+# The per-course topic matrix: unit rows in topic id order, reused while
+# Course.topics_version stays put and rebuilt once any writer moves it.
+
+import numpy as np
+import pytest
+
+pytest.importorskip("flask_mysqldb")
+pytest.importorskip("nltk")  # topic_embeddings_loader -> learning_summary_core
+
+from dbModels import Course, Topic
+from topic_embeddings_loader import bump_topics_version, get_topic_matrix
+
+DIM = 8
+
+
+@pytest.fixture
+def course(database):
+    course = Course(name="course")
+    database.session.add(course)
+    database.session.commit()
+    return course
+
+
+def _add_topics(database, course, vectors):
+    topics = [Topic(name=f"topic {i}", course_id=course.id, embedding=vector) for i, vector in enumerate(vectors)]
+    database.session.add_all(topics)
+    bump_topics_version(course.id)
+    database.session.commit()
+    return topics
+
+
+def test_matrix_rows_are_unit_vectors_in_id_order(database, course):
+    vectors = np.random.default_rng(12).standard_normal((4, DIM))
+    topics = _add_topics(database, course, vectors.tolist())
+
+    matrix = get_topic_matrix(course.id)
+
+    assert matrix.topic_ids == [t.id for t in topics]
+    assert matrix.complete and matrix.version == 1
+    assert matrix.unit.dtype == np.float32 and matrix.unit.flags.c_contiguous
+    expected = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.testing.assert_allclose(matrix.unit, expected, rtol=0, atol=1e-6)
+
+
+def test_missing_embeddings_make_the_matrix_incomplete(database, course):
+    topics = _add_topics(database, course, [[1.0] * DIM, None, [0.5] * DIM])
+
+    matrix = get_topic_matrix(course.id)
+
+    assert matrix.topic_ids == [topics[0].id, topics[2].id]
+    assert not matrix.complete
+    assert get_topic_matrix(999) is None
+
+
+def test_matrix_is_reused_until_the_version_moves(database, course):
+    _add_topics(database, course, np.eye(3, DIM).tolist())
+    matrix = get_topic_matrix(course.id)
+    assert get_topic_matrix(course.id) is matrix
+
+    # another process changed a topic: only the committed version tells
+    database.session.execute(database.text("UPDATE topic SET embedding = NULL WHERE course_id = :id"),
+                             {"id": course.id})
+    database.session.commit()
+    assert get_topic_matrix(course.id) is matrix
+    database.session.execute(database.text("UPDATE course SET topics_version = topics_version + 1 WHERE id = :id"),
+                             {"id": course.id})
+    database.session.commit()
+    assert get_topic_matrix(course.id) is None
+
+
+def test_post_topic_bumps_the_version(database, course):
+    client = pytest.importorskip("app").app.test_client()
+    _add_topics(database, course, np.eye(2, DIM).tolist())
+    before = get_topic_matrix(course.id)
+
+    response = client.post("/topics", json={
+        "name": "new", "description": "new topic", "keywords": [], "polyline": [], "x_coordinate": 0,
+        "y_coordinate": 0, "course_id": course.id, "embedding": [0.0, 0.0, 1.0] + [0.0] * (DIM - 3)})
+    assert response.status_code == 201
+
+    database.session.expire_all()
+    assert Course.query.get(course.id).topics_version == 2
+    after = get_topic_matrix(course.id)
+    assert after is not before and len(after) == 3
@@ -0,0 +1,157 @@
+# test_trajectory_log.py
+#
+# The trajectory log against the contribution rows it stands in for:
+# /enrolledPolylines from the log must match the contribution-backed path for
+# the same enrollment, whichever route moved the learner.
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+pytest.importorskip("flask_mysqldb")
+
+from dbModels import Contribution, Course, Enroll, TrajectoryEvent
+from radial_projection import project
+from repository import contribution_rows_path
+from trajectory_log import contribution_path, position_at, record_event, record_events, seed_enrollment, trajectory
+
+TOPICS = 12
+TOLERANCE = 1e-6  # the log keeps float32 polylines
+
+
+@pytest.fixture
+def enroll(database):
+    course = Course(name="course")
+    database.session.add(course)
+    database.session.flush()
+    lowline = np.random.default_rng(0).uniform(0, 0.2, TOPICS)
+    enroll = Enroll(course_id=course.id, polyline=lowline.tolist(),
+                    x_coordinate=float(project(lowline)[0, 0]), y_coordinate=float(project(lowline)[0, 1]))
+    database.session.add(enroll)
+    database.session.flush()
+    return enroll
+
+
+def _move(db, enroll, polyline, kind, with_contribution=True, log=True):
+    # what repository.update_position / update_by_quiz do: move, contribution row, event
+    previous = (enroll.polyline, enroll.x_coordinate, enroll.y_coordinate)
+    prev_polyline = np.asarray(enroll.polyline, dtype=np.float64).tolist()
+    x, y = project(polyline)[0]
+    enroll.polyline, enroll.x_coordinate, enroll.y_coordinate = polyline.tolist(), float(x), float(y)
+    contribution = None
+    if with_contribution:
+        contribution = Contribution(enroll_id=enroll.id, submitted_on=datetime.utcnow(),
+                                    description={"quiz_update": True} if kind == "quiz" else {"summary": True},
+                                    prev_polyline=prev_polyline, polyline=polyline.tolist(),
+                                    x_coordinate=float(x), y_coordinate=float(y))
+        db.session.add(contribution)
+    if log:
+        record_event(enroll.id, polyline, x, y, kind, contribution=contribution, previous=previous)
+    db.session.commit()
+    return contribution
+
+
+def _assert_same_path(log_path, rows_path):
+    assert log_path is not None
+    assert len(log_path) == len(rows_path)
+    for logged, stored in zip(log_path, rows_path):
+        np.testing.assert_allclose(np.asarray(logged, dtype=np.float64),
+                                   np.asarray(stored, dtype=np.float64), rtol=0, atol=TOLERANCE)
+
+
+def test_path_matches_contribution_rows(database, enroll):
+    rng = np.random.default_rng(1)
+    record_event(enroll.id, enroll.polyline, enroll.x_coordinate, enroll.y_coordinate, "start")
+    database.session.commit()
+    polyline = np.asarray(enroll.polyline, dtype=np.float64)
+    for step in range(40):
+        polyline = np.maximum(polyline, rng.uniform(0, 1, TOPICS) * rng.uniform(0.2, 1.0))
+        if step % 5 == 3:
+            # watch / topic-summary moves: logged, but no contribution row
+            _move(database, enroll, polyline, "watch", with_contribution=False)
+        else:
+            _move(database, enroll, polyline, "quiz" if step % 3 else "summary")
+
+    _assert_same_path(contribution_path(enroll.id), contribution_rows_path(enroll.id))
+
+
+def test_no_contributions_give_empty_path(database, enroll):
+    record_event(enroll.id, enroll.polyline, enroll.x_coordinate, enroll.y_coordinate, "start")
+    _move(database, enroll, np.full(TOPICS, 0.5), "topic_summary", with_contribution=False)
+
+    assert contribution_path(enroll.id) == []
+    assert contribution_rows_path(enroll.id) == []
+
+
+def test_first_event_is_a_contribution(database, enroll):
+    # no start event: the log is seeded from the contribution's prev_polyline
+    _move(database, enroll, np.full(TOPICS, 0.4), "quiz")
+    _move(database, enroll, np.full(TOPICS, 0.6), "summary")
+
+    _assert_same_path(contribution_path(enroll.id), contribution_rows_path(enroll.id))
+    assert [event["kind"] for event in trajectory(enroll.id)] == ["start", "quiz", "summary"]
+
+
+def test_seeded_from_contributions_before_the_log(database, enroll):
+    rng = np.random.default_rng(2)
+    polyline = np.asarray(enroll.polyline, dtype=np.float64)
+    for _ in range(5):
+        polyline = np.maximum(polyline, rng.uniform(0, 1, TOPICS))
+        _move(database, enroll, polyline, "summary", log=False)
+    assert contribution_path(enroll.id) is None  # falls back to the rows
+
+    assert seed_enrollment(enroll) == 6
+    database.session.commit()
+    polyline = np.maximum(polyline, rng.uniform(0, 1, TOPICS))
+    _move(database, enroll, polyline, "quiz")
+
+    _assert_same_path(contribution_path(enroll.id), contribution_rows_path(enroll.id))
+
+
+def test_batched_events_continue_the_sequence(database, enroll):
+    record_event(enroll.id, enroll.polyline, enroll.x_coordinate, enroll.y_coordinate, "start")
+    database.session.commit()
+    polyline = np.asarray(enroll.polyline, dtype=np.float64)
+    for step in range(3):
+        polyline = np.minimum(polyline + 0.05, 1.0)
+        x, y = project(polyline)[0]
+        # as repository.update_positions_resources: move, then one record_events call
+        enroll.polyline, enroll.x_coordinate, enroll.y_coordinate = polyline.tolist(), float(x), float(y)
+        record_events([(enroll.id, polyline, x, y, "watch", None)])
+        database.session.commit()
+    _move(database, enroll, np.minimum(polyline + 0.1, 1.0), "quiz")
+
+    seqs = [row.seq for row in TrajectoryEvent.query.filter_by(enroll_id=enroll.id).order_by(TrajectoryEvent.seq)]
+    assert seqs == list(range(5))
+    _assert_same_path(contribution_path(enroll.id), contribution_rows_path(enroll.id))
+
+
+def test_post_contribution_is_logged(database, enroll):
+    backend = pytest.importorskip("app")
+    client = backend.app.test_client()
+    record_event(enroll.id, enroll.polyline, enroll.x_coordinate, enroll.y_coordinate, "start")
+    database.session.commit()
+
+    polyline = np.full(TOPICS, 0.7)
+    x, y = project(polyline)[0]
+    submitted = datetime.utcnow() + timedelta(seconds=1)
+    response = client.post("/contributions", json={
+        "enroll_id": enroll.id,
+        "submitted_on": submitted.strftime("%Y-%m-%d %H:%M:%S"),
+        "file_path": "",
+        "description": {},
+        "prev_polyline": np.asarray(enroll.polyline, dtype=np.float64).tolist(),
+        "polyline": polyline.tolist(),
+        "x_coordinate": float(x),
+        "y_coordinate": float(y),
+        "embedding": None,
+    })
+    assert response.status_code == 201
+
+    path = contribution_path(enroll.id)
+    _assert_same_path(path, contribution_rows_path(enroll.id))
+    _assert_same_path(client.get(f"/enrolledPolylines/{enroll.id}").get_json(), contribution_rows_path(enroll.id))
+    latest = position_at(enroll.id, datetime.utcnow() + timedelta(days=1))
+    assert latest["kind"] == "contribution"
+    assert latest["x"] == pytest.approx(x) and latest["y"] == pytest.approx(y)
@@ -0,0 +1,158 @@
+# test_vector_codec.py
+#
+# Packed float32 / float64 vectors: round trips, the legacy JSON layouts they
+# replace, rejected headers / lengths, and the learner polyline columns, which
+# must read back exactly what was written.
+
+import json
+import struct
+
+import numpy as np
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("sqlalchemy")
+
+from vector_codec import (DTYPE_F64, HEADER, MAGIC, PackedVector, decode_vector, is_packed, pack_vector,
+                          packed_dtype, unpack_vector)
+
+
+@pytest.mark.parametrize("values", [
+    [],
+    [0.5],
+    [0.0, 0.25, 1.0, -3.5],
+    np.linspace(0, 1, 768),
+    np.arange(12, dtype=np.float64).reshape(3, 4),
+])
+def test_round_trip(values):
+    blob = pack_vector(values)
+
+    assert is_packed(blob)
+    assert len(blob) == HEADER.size + 4 * np.size(values)
+    decoded = unpack_vector(blob)
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, np.asarray(values, dtype=np.float32).reshape(-1))
+
+
+def test_unpacked_array_is_read_only():
+    decoded = unpack_vector(pack_vector([1.0, 2.0]))
+    assert not decoded.flags.writeable
+
+
+def test_packed_values_pass_through():
+    blob = pack_vector([1.0, 2.0, 3.0])
+    assert pack_vector(blob) == blob
+    assert pack_vector(bytearray(blob)) == blob
+    assert pack_vector(memoryview(blob)) == blob
+
+
+@pytest.mark.parametrize("legacy, expected", [
+    # flat float list (Resource.polyline, Topic.embedding)
+    ("[0.1, 0.2, 0.3]", [0.1, 0.2, 0.3]),
+    ([0.1, 0.2, 0.3], [0.1, 0.2, 0.3]),
+    # [{x, y}] dicts of create_resource_polylines: the y values, in order
+    ('[{"x": 0, "y": 0.4}, {"x": 1, "y": 0.6}]', [0.4, 0.6]),
+    ([{"x": 0, "y": 0.4}, {"x": 1, "y": 0.6}], [0.4, 0.6]),
+    # nested lists (json.dumps(learner_polylines)), flattened row by row
+    ("[[0.1, 0.2], [0.3, 0.4]]", [0.1, 0.2, 0.3, 0.4]),
+    ([[0.1, [0.2]], [0.3]], [0.1, 0.2, 0.3]),
+    # JSON text stored twice over, and as bytes
+    (json.dumps("[1.0, 2.0]"), [1.0, 2.0]),
+    (b"[1.5, 2.5]", [1.5, 2.5]),
+    # empty
+    ("", []),
+    ("[]", []),
+])
+def test_legacy_layouts(legacy, expected):
+    expected = np.asarray(expected, dtype=np.float32)
+
+    np.testing.assert_array_equal(unpack_vector(pack_vector(legacy)), expected)
+    np.testing.assert_array_equal(decode_vector(legacy), expected)
+
+
+def test_decode_passes_arrays_and_none():
+    array = np.array([1.0, 2.0], dtype=np.float32)
+    assert decode_vector(array) is array
+    assert decode_vector(None) is None
+
+
+def test_short_blob_rejected():
+    with pytest.raises(ValueError, match="shorter than its header"):
+        unpack_vector(MAGIC + b"\x01")
+
+
+@pytest.mark.parametrize("header", [
+    struct.pack("<2sBxI", b"XX", 1, 2),
+    struct.pack("<2sBxI", MAGIC, 3, 2),
+])
+def test_unknown_header_rejected(header):
+    with pytest.raises(ValueError, match="Unknown packed vector header"):
+        unpack_vector(header + np.zeros(2, dtype="<f4").tobytes())
+
+
+@pytest.mark.parametrize("payload_values", [1, 3])
+def test_length_mismatch_rejected(payload_values):
+    blob = HEADER.pack(MAGIC, 1, 2) + np.zeros(payload_values, dtype="<f4").tobytes()
+    with pytest.raises(ValueError, match="dimension 2"):
+        unpack_vector(blob)
+
+
+def test_truncated_blob_rejected():
+    blob = pack_vector([1.0, 2.0, 3.0])
+    with pytest.raises(ValueError):
+        unpack_vector(blob[:-1])
+
+
+def test_float64_round_trip_is_exact():
+    values = np.random.default_rng(18).uniform(0, 1, 37)
+    blob = pack_vector(values.tolist(), DTYPE_F64)
+
+    assert HEADER.unpack_from(blob) == (MAGIC, 2, 37)
+    assert len(blob) == HEADER.size + 8 * 37
+    assert packed_dtype(blob) == np.float64
+    decoded = unpack_vector(blob)
+    assert decoded.dtype == np.float64
+    assert decoded.tolist() == values.tolist()
+    assert decode_vector(json.dumps(values.tolist()), DTYPE_F64).tolist() == values.tolist()
+
+
+def test_pack_converts_between_dtypes():
+    as_f32 = pack_vector([0.1, 0.2])
+    as_f64 = pack_vector(as_f32, DTYPE_F64)
+
+    assert packed_dtype(as_f64) == np.float64
+    np.testing.assert_array_equal(unpack_vector(as_f64), unpack_vector(as_f32))
+    assert packed_dtype(pack_vector(as_f64)) == np.float32
+    assert pack_vector(as_f64, DTYPE_F64) == as_f64
+    assert packed_dtype(b"[0.1]") is None
+
+
+def test_column_raises_on_corrupt_value():
+    column = PackedVector(DTYPE_F64)
+    assert column.process_result_value(None, None) is None
+    assert column.process_result_value(pack_vector([0.1], DTYPE_F64), None).tolist() == [0.1]
+    # a float32 row from before the column was float64 still reads
+    assert column.process_result_value(pack_vector([0.5]), None).tolist() == [0.5]
+    for corrupt in (HEADER.pack(MAGIC, 2, 4) + b"\x00" * 8, HEADER.pack(MAGIC, 9, 1) + b"\x00" * 4, b"[0.1,"):
+        with pytest.raises(ValueError):
+            column.process_result_value(corrupt, None)
+
+
+def test_learner_polylines_read_back_exactly(database):
+    from dbModels import Enroll, ExitPoint, SummaryCoordinates, TAT
+    from radial_projection import project
+
+    polyline = np.random.default_rng(13).uniform(0, 1, 23).tolist()
+    rows = [Enroll(course_id=1, polyline=polyline), TAT(course_id=1, polyline=polyline),
+            ExitPoint(course_id=1, polyline=polyline), SummaryCoordinates(enroll_id=1, course_id=1, polyline=polyline)]
+    database.session.add_all(rows)
+    database.session.commit()
+    ids = [(type(row), row.id) for row in rows]
+    database.session.expire_all()
+
+    for model, row_id in ids:
+        stored = database.session.get(model, row_id).polyline
+        assert stored.dtype == np.float64
+        assert stored.tolist() == polyline
+        # the same projection as from the JSON floats they replace, bit for bit
+        assert project(stored).tolist() == project(np.asarray(polyline)).tolist()
@@ -0,0 +1,184 @@
+# test_watch_buffer.py
+#
+# Resource-watch events applied together (update_positions_resources, the
+# coalescing WatchBuffer and POST /watchResource/batch) must leave every
+# learner where one watch at a time would have: WATCH_STEP times the summed
+# polylines added, and the resources unlocked along the way granted.
+
+import numpy as np
+import pytest
+
+pytest.importorskip("flask_mysqldb")
+
+import watch_buffer
+from dbModels import Course, Enroll, Resource
+from radial_projection import project
+from repository import WATCH_STEP, update_position_resource, update_positions_resources
+from resource_index import resources_changed
+from trajectory_log import trajectory
+
+TOPICS = 6
+
+
+@pytest.fixture
+def course(database):
+    course = Course(name="course")
+    database.session.add(course)
+    database.session.flush()
+    rng = np.random.default_rng(24)
+    polylines = rng.uniform(0, 1, (30, TOPICS))
+    resources = [Resource(name=f"r{i}", course_id=course.id, polyline=polyline.tolist(),
+                          x_coordinate=float(x), y_coordinate=float(y))
+                 for i, (polyline, (x, y)) in enumerate(zip(polylines, project(polylines).tolist()))]
+    database.session.add_all(resources)
+    database.session.flush()
+    resources_changed(course.id, resources)
+    database.session.commit()
+    return course
+
+
+def _learners(database, course, n, seed=0):
+    rng = np.random.default_rng(seed)
+    learners = []
+    for polyline in rng.uniform(0, 0.05, (n, TOPICS)):
+        x, y = project(polyline)[0]
+        learners.append(Enroll(course_id=course.id, polyline=polyline.tolist(), x_coordinate=float(x),
+                               y_coordinate=float(y), accessible_resources_json=[]))
+    database.session.add_all(learners)
+    database.session.commit()
+    return [learner.id for learner in learners]
+
+
+def _state(enroll_id):
+    enroll = Enroll.query.get(enroll_id)
+    return (np.asarray(enroll.polyline, dtype=np.float64), float(enroll.x_coordinate),
+            float(enroll.y_coordinate), sorted(enroll.accessible_resources))
+
+
+def _events(course, enroll_ids, seed):
+    rng = np.random.default_rng(seed)
+    resource_ids = [r.id for r in Resource.query.filter_by(course_id=course.id).order_by(Resource.id)]
+    return [(int(enroll_id), int(rng.choice(resource_ids))) for enroll_id in rng.choice(enroll_ids, 60)]
+
+
+def _assert_same_learners(database, batched, one_at_a_time):
+    database.session.expire_all()
+    for b, s in zip(batched, one_at_a_time):
+        (polyline, x, y, accessible), (polyline_s, x_s, y_s, accessible_s) = _state(b), _state(s)
+        np.testing.assert_allclose(polyline, polyline_s, rtol=1e-12, atol=0)
+        assert (x, y) == pytest.approx((x_s, y_s), abs=1e-9)
+        assert accessible == accessible_s
+
+
+def test_flush_matches_one_watch_at_a_time(database, course):
+    batched = _learners(database, course, 8)
+    one_at_a_time = _learners(database, course, 8)
+    events = _events(course, batched, seed=1)
+    twin = dict(zip(batched, one_at_a_time))
+    starts = {e: _state(e)[0] for e in batched}
+
+    positions, skipped = update_positions_resources(events)
+    for enroll_id, resource_id in events:
+        update_position_resource(twin[enroll_id], resource_id)
+
+    assert skipped == [] and set(positions) == {e for e, _ in events}
+    _assert_same_learners(database, batched, one_at_a_time)
+    for enroll_id in positions:
+        watched = [np.asarray(Resource.query.get(r).polyline, dtype=np.float64) for e, r in events if e == enroll_id]
+        polyline, x, y, accessible = _state(enroll_id)
+        np.testing.assert_allclose(polyline, starts[enroll_id] + WATCH_STEP * np.sum(watched, axis=0), atol=1e-12)
+        assert positions[enroll_id] == pytest.approx([x, y], abs=1e-9)
+        # everything below and left of the new position, since nothing was accessible before
+        assert accessible == sorted(r.id for r in Resource.query.filter_by(course_id=course.id)
+                                    if float(r.x_coordinate) < x and float(r.y_coordinate) < y)
+        assert [event["kind"] for event in trajectory(enroll_id)] == ["start", "watch"]  # one event per flush
+
+
+def test_unknown_and_mismatched_events_are_skipped(database, course):
+    (enroll_id,) = _learners(database, course, 1)
+    short = Resource(name="short", course_id=course.id, polyline=[0.5] * (TOPICS - 1))
+    database.session.add(short)
+    database.session.commit()
+    known = Resource.query.filter_by(course_id=course.id).first().id
+
+    positions, skipped = update_positions_resources(
+        [(enroll_id, known), (enroll_id, 10 ** 9), (10 ** 9, known), (enroll_id, short.id)])
+
+    assert list(positions) == [enroll_id]
+    assert skipped == [(enroll_id, 10 ** 9), (10 ** 9, known), (enroll_id, short.id)]
+    with pytest.raises(IndexError):
+        update_position_resource(enroll_id, 10 ** 9)
+
+
+def test_buffer_coalesces_watches_into_one_flush(database, course):
+    batched = _learners(database, course, 5)
+    one_at_a_time = _learners(database, course, 5)
+    events = _events(course, batched, seed=2)[:20]
+    twin = dict(zip(batched, one_at_a_time))
+    flushes = watch_buffer.flush_stats.flushes
+    buffer = watch_buffer.WatchBuffer(max_wait_ms=500, max_events=len(events) + 1)
+    buffer.start()
+
+    futures = [buffer.submit(enroll_id, resource_id) for enroll_id, resource_id in events]
+    unknown = buffer.submit(batched[0], 10 ** 9)
+    results = [future.result(timeout=10) for future in futures]
+
+    with pytest.raises(IndexError):
+        unknown.result(timeout=10)
+    assert watch_buffer.flush_stats.flushes == flushes + 1  # one flush for all of them
+    assert buffer.stats()["submitted"] == len(events) + 1
+    for enroll_id, resource_id in events:
+        update_position_resource(twin[enroll_id], resource_id)
+    _assert_same_learners(database, batched, one_at_a_time)
+    # every caller gets their learner's position after the whole flush
+    for (enroll_id, _), result in zip(events, results):
+        _, x, y, _ = _state(enroll_id)
+        assert result == pytest.approx([x, y], abs=1e-9)
+
+
+def test_full_buffer_flushes_without_waiting(database, course):
+    (enroll_id,) = _learners(database, course, 1)
+    resource_id = Resource.query.filter_by(course_id=course.id).first().id
+    buffer = watch_buffer.WatchBuffer(max_wait_ms=60_000, max_events=2)
+    buffer.start()
+
+    futures = [buffer.submit(enroll_id, resource_id) for _ in range(2)]
+
+    assert futures[1].result(timeout=10) == futures[0].result(timeout=10)
+
+
+def test_watch_resource_inline_by_default(database, course, monkeypatch):
+    monkeypatch.setattr(watch_buffer, "COALESCE_MS", 0)
+    (enroll_id,) = _learners(database, course, 1)
+    resource_id = Resource.query.filter_by(course_id=course.id).first().id
+
+    position = watch_buffer.watch_resource(enroll_id, resource_id)
+
+    assert watch_buffer.get_watch_buffer() is None
+    database.session.expire_all()
+    assert position == pytest.approx(list(_state(enroll_id)[1:3]), abs=1e-9)
+    with pytest.raises(IndexError):
+        watch_buffer.watch_resource(enroll_id, 10 ** 9)
+
+
+def test_watch_resource_batch_endpoint(database, course):
+    client = pytest.importorskip("app").app.test_client()
+    enroll_ids = _learners(database, course, 3)
+    events = _events(course, enroll_ids, seed=3)[:10]
+
+    response = client.post("/watchResource/batch", json={
+        "events": [{"enroll_id": e, "resource_id": r} for e, r in events] + [{"enroll_id": 10 ** 9,
+                                                                              "resource_id": events[0][1]}]})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["skipped"] == [{"enroll_id": 10 ** 9, "resource_id": events[0][1]}]
+    database.session.expire_all()
+    for position in data["positions"]:
+        _, x, y, _ = _state(position["enroll_id"])
+        assert (position["x"], position["y"]) == pytest.approx((x, y), abs=1e-9)
+    assert {p["enroll_id"] for p in data["positions"]} == {e for e, _ in events}
+
+    for body in (None, {}, {"events": []}, {"events": [{"enroll_id": 1}]}, {"events": [1]}):
+        response = client.post("/watchResource/batch", json=body)
+        assert response.status_code == 400 and "error" in response.get_json()
@@ -0,0 +1,133 @@
+# text_preprocessing.py
+#
+# Shared text preprocessing (HTML removal, letters-only, single-character
+# removal, stopwords, stemming / lemmatization) used before KeyBERT.
+# Patterns are compiled once, BeautifulSoup only runs when the text can hold
+# markup, and the stemmer / lemmatizer are process-wide with memoized words.
+
+import re
+import threading
+from functools import lru_cache
+
+from nltk.stem import WordNetLemmatizer, PorterStemmer
+
+from nltk_resources import ensure_nltk_data, get_stop_words
+
+WORD_CACHE_SIZE = 100_000
+
+_NON_LETTERS = re.compile(r'[^a-zA-Z]+')
+_SINGLE_CHARACTER = re.compile(r"\s+[a-zA-Z]\s+")
+# whitespace the lxml parser drops from the start of a document
+_HTML_LEADING_WHITESPACE = " \t\n\r\f"
+
+_stemmer = PorterStemmer()
+_lemmatizer = WordNetLemmatizer()
+_wordnet_ready = False
+_wordnet_lock = threading.Lock()
+
+
+def _ensure_wordnet():
+    # WordNet's lazy corpus loader is not thread-safe on first use
+    global _wordnet_ready
+    if _wordnet_ready:
+        return
+    with _wordnet_lock:
+        if not _wordnet_ready:
+            ensure_nltk_data()
+            from nltk.corpus import wordnet
+            wordnet.ensure_loaded()
+            _wordnet_ready = True
+
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def lemmatize(word: str) -> str:
+    return _lemmatizer.lemmatize(word)
+
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def stem(word: str) -> str:
+    return _stemmer.stem(word)
+
+
+def strip_html(text: str) -> str:
+    """
+    Visible text of `text`. Plain text (no '<' or '&') skips the parser but
+    loses its leading whitespace as it would there, so a single character at
+    the start is kept by the single-character removal, as before.
+    """
+    if '<' not in text and '&' not in text:
+        return text.lstrip(_HTML_LEADING_WHITESPACE)
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(text, 'lxml').get_text()
+
+
+def utils_preprocess_text(text: str, flg_stemm: bool = False, flg_lemm: bool = True, lst_stopwords=None) -> str:
+    """
+    Preprocess text by removing HTML tags, punctuations, numbers, stopwords, and applying stemming/lemmatization.
+
+    Parameters:
+        text (str): The text to preprocess.
+        flg_stemm (bool): Flag to apply stemming. Default is False.
+        flg_lemm (bool): Flag to apply lemmatization. Default is True.
+        lst_stopwords (list): List of stopwords to remove. Default is None.
+
+    Returns:
+        str: The preprocessed text.
+    """
+    text = strip_html(text)
+
+    # Punctuation/numbers -> one space, then single character removal
+    text = _NON_LETTERS.sub(' ', text)
+    text = _SINGLE_CHARACTER.sub(' ', text)
+
+    # split() also collapses the remaining runs of spaces
+    lst_text = text.split()
+
+    if lst_stopwords is not None:
+        lst_text = [word for word in lst_text if word not in lst_stopwords]
+
+    if flg_stemm:
+        lst_text = [stem(word) for word in lst_text]
+
+    if flg_lemm:
+        _ensure_wordnet()
+        lst_text = [lemmatize(word) for word in lst_text]
+
+    return " ".join(lst_text)
+
+
+def preprocess_texts(texts, lower: bool = True, flg_stemm: bool = False, flg_lemm: bool = True, lst_stopwords='english') -> list:
+    """
+    Batch utils_preprocess_text over an iterable (list, pandas Series, ...).
+
+    Parameters:
+        texts: Iterable of strings.
+        lower (bool): Lower-case each text first (what every caller does).
+        lst_stopwords: 'english' for the NLTK English stopwords, a collection, or None.
+
+    Returns:
+        list: Preprocessed strings, in input order.
+    """
+    if isinstance(lst_stopwords, str):
+        lst_stopwords = get_stop_words()
+    elif lst_stopwords is not None and not isinstance(lst_stopwords, (set, frozenset)):
+        lst_stopwords = set(lst_stopwords)
+    if flg_lemm:
+        _ensure_wordnet()
+
+    return [
+        utils_preprocess_text(t.lower() if lower else t, flg_stemm=flg_stemm, flg_lemm=flg_lemm, lst_stopwords=lst_stopwords)
+        for t in texts
+    ]
+
+
+def preprocess_column(df, column: str, target: str = 'clean_text', **kwargs):
+    """
+    Write the preprocessed `column` of DataFrame `df` into `target`.
+    """
+    df[target] = preprocess_texts(df[column].tolist(), **kwargs)
+    return df
+
+
+def cache_info() -> dict:
+    return {'lemmatize': lemmatize.cache_info()._asdict(), 'stem': stem.cache_info()._asdict()}
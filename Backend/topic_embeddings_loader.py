@@ -2,15 +2,42 @@
 
 import json
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from sqlalchemy import func
 
-from dbModels import db, Topic  # adjust import if models is in a package
+from dbModels import db, Topic, Course  # adjust import if models is in a package
+from model_registry import get_sentence_model
+import inference_service
+import polyline_kernel
+import course_snapshot
+from learning_summary_core import SINGLE_ENCODER, THREE_MODEL_ENCODER
 
 
-_topic_model = SentenceTransformer('bert-base-nli-mean-tokens')
+# stored Topic.embedding vectors per course, see get_topic_matrix
+# cache: {course_id: TopicMatrix}
+topic_matrix_by_course = {}
 
-# cache: {course_id: [np.array(...) ...]}
-topic_embeddings_by_course = {}
+# single-encoder (mpnet) topic vectors; not stored in Topic.embedding
+# cache: {course_id: (topics_version, [np.array(...) ...])}
+single_encoder_topic_embeddings_by_course = {}
+
+
+class TopicMatrix:
+    """
+    A course's stored topic embeddings as one contiguous, L2-normalised
+    float32 matrix (topics in id order), stamped with Course.topics_version.
+    """
+
+    def __init__(self, course_id, version, topic_ids, unit, complete):
+        # unit may be a read-only view into a course snapshot
+        self.course_id = course_id
+        self.version = version
+        self.topic_ids = topic_ids
+        self.unit = unit
+        # False when some topics of the course have no usable embedding
+        self.complete = complete
+
+    def __len__(self):
+        return len(self.topic_ids)
 
 
 def _description_to_text(description, name_fallback=None) -> str:
@@ -40,17 +67,6 @@ def _description_to_text(description, name_fallback=None) -> str:
         return str(description)
 
 
-def _get_cos_sim(a, b) -> float:
-    a = np.array(a)
-    b = np.array(b)
-    dot_product = float(np.dot(a, b))
-    norm_a = float(np.linalg.norm(a))
-    norm_b = float(np.linalg.norm(b))
-    if norm_a == 0 or norm_b == 0:
-        return 0.0
-    return dot_product / (norm_a * norm_b)
-
-
 def compute_topic_embeddings_for_course(course_id: int, commit: bool = True):
     """
     For given course_id:
@@ -74,7 +90,7 @@ def compute_topic_embeddings_for_course(course_id: int, commit: bool = True):
         for t in topics
     ]
 
-    emb_array = _topic_model.encode(texts, convert_to_tensor=False)
+    emb_array = get_sentence_model().encode(texts, convert_to_tensor=False)
     embeddings = []
 
     for topic, emb_vec in zip(topics, emb_array):
@@ -82,6 +98,7 @@ def compute_topic_embeddings_for_course(course_id: int, commit: bool = True):
         embeddings.append(vec)
         topic.embedding = vec.tolist()
 
+    bump_topics_version(course_id)
     if commit:
         db.session.commit()
 
@@ -98,20 +115,12 @@ def compute_topic_polylines_for_course(course_id: int, commit: bool = True):
     if not embeddings:
         return [], [], []
 
-    num_topics = len(topics)
-
-    for i in range(num_topics):
-        polyline = []
-        for j in range(num_topics):
-            if i == j:
-                cos_sim_scaled = 1.0
-            else:
-                cos_sim = _get_cos_sim(embeddings[i], embeddings[j])
-                cos_sim_scaled = (cos_sim + 1.0) / 2.0
-            polyline.append({"x": j, "y": float(cos_sim_scaled)})
-
-        topics[i].polyline = polyline
+    # scaled cos_sim(i, j) for all pairs at once; 1.0 on the diagonal
+    polyline_matrix = polyline_kernel.topic_polylines(embeddings)
+    for topic, row in zip(topics, polyline_matrix.tolist()):
+        topic.polyline = [{"x": j, "y": y} for j, y in enumerate(row)]
 
+    bump_topics_version(course_id)
     if commit:
         db.session.commit()
 
@@ -119,13 +128,85 @@ def compute_topic_polylines_for_course(course_id: int, commit: bool = True):
     return polylines, topics, embeddings
 
 
+def bump_topics_version(course_id):
+    """
+    Mark the course's topics as changed, in the current transaction, and drop
+    this process's cached topic vectors. Call it with every topic insert or
+    update; other processes see the new Course.topics_version once committed.
+    """
+    course_id = int(course_id)
+    db.session.query(Course).filter(Course.id == course_id).update(
+        {Course.topics_version: func.coalesce(Course.topics_version, 0) + 1},
+        synchronize_session=False,
+    )
+    topic_matrix_by_course.pop(course_id, None)
+    single_encoder_topic_embeddings_by_course.pop(course_id, None)
+
+
+def _topics_version(course_id: int) -> int:
+    return db.session.query(Course.topics_version).filter(Course.id == course_id).scalar() or 0
+
+
+def topic_rows(session, course_id: int):
+    return (
+        session.query(Topic.id, Topic.embedding)
+        .filter(Topic.course_id == course_id)
+        .order_by(Topic.id.asc())
+        .all()
+    )
+
+
+def topic_arrays(course_id: int, rows):
+    """
+    (topic id, embedding) rows -> (topic_ids, unit float32 matrix, complete).
+    """
+    topic_ids, vectors = [], []
+    for topic_id, emb in rows:
+        # PackedVector: float32 array, or None (missing)
+        if emb is not None and len(emb):
+            topic_ids.append(topic_id)
+            vectors.append(emb)
+
+    if vectors and len({len(v) for v in vectors}) > 1:
+        print(f"ERROR: Topic embeddings of course {course_id} have different sizes")
+        topic_ids, vectors = [], []
+
+    if vectors:
+        unit = polyline_kernel.normalize_rows(np.asarray(vectors, dtype=np.float64)).astype(np.float32)
+    else:
+        unit = np.empty((0, 0), dtype=np.float32)
+    return topic_ids, np.ascontiguousarray(unit), len(topic_ids) == len(rows)
+
+
+def _build_topic_matrix(course_id: int, version: int) -> TopicMatrix:
+    # from the course snapshot when it is at this version, else from the DB
+    arrays = course_snapshot.topic_arrays_at(course_id, version)
+    if arrays is None:
+        arrays = topic_arrays(course_id, topic_rows(db.session, course_id))
+    return TopicMatrix(course_id, version, *arrays)
+
+
+def get_topic_matrix(course_id: int):
+    """
+    Cached TopicMatrix of the course's stored Topic.embedding vectors, or
+    None when the course has none. Costs one Course.topics_version lookup
+    when cached; rebuilt when the version has moved on.
+    """
+    course_id = int(course_id)
+    version = _topics_version(course_id)
+    matrix = topic_matrix_by_course.get(course_id)
+    if matrix is None or matrix.version != version:
+        matrix = _build_topic_matrix(course_id, version)
+        topic_matrix_by_course[course_id] = matrix
+    return matrix if len(matrix) else None
+
+
 def init_topic_embeddings_cache():
     """
-    Build topic_embeddings_by_course for all courses that have topics.
+    Build the topic matrices of all courses that have topics.
     Call this once at app startup inside app.app_context().
     """
-    global topic_embeddings_by_course
-    topic_embeddings_by_course = {}
+    topic_matrix_by_course.clear()
 
     course_ids = [
         cid for (cid,) in db.session.query(Topic.course_id).distinct().all()
@@ -133,20 +214,60 @@ def init_topic_embeddings_cache():
     ]
 
     for course_id in course_ids:
-        embeddings, _ = compute_topic_embeddings_for_course(course_id, commit=True)
-        topic_embeddings_by_course[course_id] = embeddings
+        get_topic_embeddings(course_id)
 
 
 def get_topic_embeddings(course_id: int):
     """
-    Get list of numpy arrays for given course_id.
-    Lazy load if not present in cache.
+    Get list of (unit length) topic vectors for given course_id.
+    Computed from the topic descriptions and stored if any topic has none.
     """
-    global topic_embeddings_by_course
-
-    if course_id in topic_embeddings_by_course:
-        return topic_embeddings_by_course[course_id]
+    matrix = get_topic_matrix(course_id)
+    if matrix is not None and matrix.complete:
+        return list(matrix.unit)
 
     embeddings, _ = compute_topic_embeddings_for_course(course_id, commit=True)
-    topic_embeddings_by_course[course_id] = embeddings
     return embeddings
+
+
+def get_single_encoder_topic_embeddings(course_id: int):
+    """
+    Topic embeddings from the KeyBERT (mpnet) model, for courses running the
+    single-encoder summary pipeline. Computed once per course and topics_version.
+    """
+    version = _topics_version(course_id)
+    cached = single_encoder_topic_embeddings_by_course.get(course_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    topics = (
+        Topic.query
+        .filter_by(course_id=course_id)
+        .order_by(Topic.id.asc())
+        .all()
+    )
+    if not topics:
+        return []
+
+    texts = [_description_to_text(t.description, name_fallback=t.name) for t in topics]
+    emb_array = inference_service.encode_sentences(texts, model='keyword_sentence')
+    embeddings = [np.array(vec, dtype=float) for vec in emb_array]
+    single_encoder_topic_embeddings_by_course[course_id] = (version, embeddings)
+    return embeddings
+
+
+def get_summary_encoder(course_id: int) -> str:
+    """
+    Summary pipeline mode configured for the course (default: three_model).
+    """
+    course = Course.query.get(course_id)
+    return (course.summary_encoder if course is not None else None) or THREE_MODEL_ENCODER
+
+
+def get_summary_topic_embeddings(course_id: int, encoder: str):
+    """
+    Topic embeddings in the vector space of the given summary encoder.
+    """
+    if encoder == SINGLE_ENCODER:
+        return get_single_encoder_topic_embeddings(course_id)
+    return get_topic_embeddings(course_id)
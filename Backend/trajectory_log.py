@@ -0,0 +1,347 @@
+# trajectory_log.py
+#
+# Compact, append-only log of every learner's path through a course. Each
+# trajectory_event row keeps the learner's (x, y) inline and the polyline as
+# a packed float32 delta from the previous event; every SNAPSHOT_EVERY-th
+# event (by seq) stores the polyline in full. Deltas are taken from the
+# reconstructed previous polyline, so float32 rounding does not build up
+# between snapshots.
+#
+# Position at time T is the last row at or before T (one indexed read). The
+# polyline at T is rebuilt from the last SNAPSHOT_EVERY rows up to T, which
+# always include a snapshot, and the full path is one ordered read of the
+# enrollment. Enrollments from before the log are seeded from their
+# contributions when their first event is recorded.
+#
+# Writers lock the enroll rows (SELECT ... FOR UPDATE) before reading the last
+# seq, and read it with a locking read too, so concurrent moves of one learner
+# take turns instead of both writing seq = max + 1.
+
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from dbModels import db, Contribution, Enroll, TrajectoryEvent
+from radial_projection import project
+from vector_codec import DTYPE_F64, decode_vector
+
+SNAPSHOT_EVERY = int(os.environ.get("NAVIGATED_TRAJECTORY_SNAPSHOT_EVERY", 16))
+
+def _utc(at=None):
+    # naive UTC, as the DateTime column stores it; now when at is None
+    if at is None:
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    return at
+
+
+def _states(rows) -> list:
+    # float32 polyline after each row (rows in seq order); None until the first snapshot
+    states, state = [], None
+    for row in rows:
+        payload = row.payload
+        if row.is_snapshot:
+            state = payload
+        elif state is not None and payload is not None and len(payload) == len(state):
+            state = state + payload
+        else:
+            state = None
+        states.append(state)
+    return states
+
+
+def _encode(seq, previous, polyline):
+    # (is_snapshot, payload, reconstructed polyline) of event `seq` following `previous`
+    current = np.asarray(decode_vector(polyline), dtype=np.float32).reshape(-1)
+    if previous is None or len(previous) != len(current) or seq % SNAPSHOT_EVERY == 0:
+        return True, current, current
+    delta = current - previous
+    return False, delta, previous + delta
+
+
+def _lock(enroll_ids):
+    # writers of an enrollment's log queue up on its enroll row (in id order)
+    (db.session.query(Enroll.id).filter(Enroll.id.in_(sorted(set(enroll_ids))))
+     .order_by(Enroll.id.asc()).with_for_update().all())
+
+
+def _window(enroll_id, at=None, lock=False) -> list:
+    # rows (seq order) from the last snapshot up to the last event at or before
+    # `at`; lock: a locking read, which sees rows committed since the transaction began
+    query = TrajectoryEvent.query.filter(TrajectoryEvent.enroll_id == enroll_id)
+    if lock:
+        query = query.with_for_update()
+    if at is not None:
+        query = query.filter(TrajectoryEvent.recorded_at <= _utc(at))
+        order = (TrajectoryEvent.recorded_at.desc(), TrajectoryEvent.seq.desc())
+    else:
+        order = (TrajectoryEvent.seq.desc(),)
+    rows = query.order_by(*order).limit(SNAPSHOT_EVERY).all()[::-1]
+    if rows and not any(row.is_snapshot for row in rows):
+        # written with a larger SNAPSHOT_EVERY: read back to the last snapshot
+        last_snapshot = (query.filter(TrajectoryEvent.is_snapshot.is_(True))
+                         .with_entities(db.func.max(TrajectoryEvent.seq)).scalar())
+        if last_snapshot is not None:
+            rows = (query.filter(TrajectoryEvent.seq >= last_snapshot, TrajectoryEvent.seq <= rows[-1].seq)
+                    .order_by(TrajectoryEvent.seq.asc()).all())
+    return rows
+
+
+def _append(enroll_id, seq, previous, polyline, x, y, kind, contribution_id, at):
+    # add event `seq`; returns its reconstructed polyline
+    is_snapshot, payload, state = _encode(seq, previous, polyline)
+    db.session.add(TrajectoryEvent(
+        enroll_id=enroll_id,
+        seq=seq,
+        recorded_at=at,
+        kind=kind,
+        contribution_id=contribution_id,
+        is_snapshot=is_snapshot,
+        payload=payload,
+        x_coordinate=float(x),
+        y_coordinate=float(y),
+    ))
+    return state
+
+
+def _contribution_kind(contribution) -> str:
+    description = contribution.description if isinstance(contribution.description, dict) else {}
+    if description.get("summary"):
+        return "summary"
+    if description.get("quiz_update"):
+        return "quiz"
+    return "contribution"
+
+
+def _seed(enroll_id, before=None, previous=None):
+    """
+    Log the history an enrollment has from before the trajectory log: its
+    contributions (those before `before`) from the first one's prev_polyline
+    (`before`'s when there are none), else the `previous` position.
+
+    Returns:
+        tuple: (next seq, last polyline, last recorded_at)
+    """
+    query = Contribution.query.filter(Contribution.enroll_id == enroll_id)
+    if before is not None:
+        query = query.filter(Contribution.id < before.id)
+    contributions = query.order_by(Contribution.id.asc()).all()
+
+    events = []  # (kind, polyline, x, y, contribution_id, at)
+    first = contributions[0] if contributions else before
+    if first is not None:
+        start = decode_vector(first.prev_polyline, DTYPE_F64)
+        if start is not None and len(start):
+            x, y = project(start)[0]
+            events.append(("start", start, x, y, None, first.submitted_on))
+        for contribution in contributions:
+            polyline = decode_vector(contribution.polyline, DTYPE_F64)
+            if polyline is None or not len(polyline):
+                continue
+            if contribution.x_coordinate is None or contribution.y_coordinate is None:
+                x, y = project(polyline)[0]
+            else:
+                x, y = contribution.x_coordinate, contribution.y_coordinate
+            events.append((_contribution_kind(contribution), polyline, x, y, contribution.id, contribution.submitted_on))
+    if not events and previous is not None and previous[0] is not None and len(previous[0]):
+        polyline, x, y = previous
+        if x is None or y is None:
+            x, y = project(decode_vector(polyline, DTYPE_F64))[0]
+        events.append(("start", polyline, x, y, None, None))
+
+    seq, state, last_at = 0, None, None
+    for kind, polyline, x, y, contribution_id, at in events:
+        at = _utc(at)
+        if last_at is not None and at < last_at:
+            at = last_at
+        state = _append(enroll_id, seq, state, polyline, x, y, kind, contribution_id, at)
+        seq, last_at = seq + 1, at
+    return seq, state, last_at
+
+
+def seed_enrollment(enroll) -> int:
+    """
+    Log the history of an enrollment that has no events yet (its
+    contributions, else its current position). Does not commit.
+
+    Returns:
+        int: Number of events added.
+    """
+    _lock([enroll.id])
+    if TrajectoryEvent.query.filter(TrajectoryEvent.enroll_id == enroll.id).with_for_update().first() is not None:
+        return 0
+    seq, _, _ = _seed(enroll.id, previous=(enroll.polyline, enroll.x_coordinate, enroll.y_coordinate))
+    return seq
+
+
+def record_event(enroll_id, polyline, x, y, kind, contribution=None, at=None, previous=None):
+    """
+    Append the learner's new position to their trajectory. Does not commit.
+
+    Parameters:
+        polyline: Array, list or stored layout (JSON text, [{x, y}] dicts).
+        x, y: The new position; None projects the polyline.
+        kind (str): start, summary, quiz, contribution, topic_summary,
+            watch, regrade, ...
+        contribution: The Contribution this event records, if any.
+        at (datetime): Event time, default now; never before the last event.
+        previous: (polyline, x, y) before the move; starts the log of an
+            enrollment with neither events nor contributions.
+    """
+    if x is None or y is None:
+        x, y = project(decode_vector(polyline, DTYPE_F64))[0]
+    if contribution is not None and contribution.id is None:
+        db.session.flush()
+    _lock([enroll_id])
+    rows = _window(enroll_id, lock=True)
+    if rows:
+        seq, state, last_at = rows[-1].seq + 1, _states(rows)[-1], rows[-1].recorded_at
+    else:
+        seq, state, last_at = _seed(enroll_id, contribution, previous)
+    at = _utc(at)
+    if last_at is not None and at < last_at:
+        at = last_at
+    _append(enroll_id, seq, state, polyline, x, y, kind,
+            contribution.id if contribution is not None else None, at)
+
+
+def _tails(enroll_ids) -> dict:
+    # {enroll_id: its last SNAPSHOT_EVERY rows in seq order}, one locking read for all
+    last = (db.session.query(TrajectoryEvent.enroll_id, db.func.max(TrajectoryEvent.seq).label("last_seq"))
+            .filter(TrajectoryEvent.enroll_id.in_(enroll_ids))
+            .group_by(TrajectoryEvent.enroll_id)
+            .subquery())
+    rows = (TrajectoryEvent.query
+            .join(last, db.and_(TrajectoryEvent.enroll_id == last.c.enroll_id,
+                                TrajectoryEvent.seq > last.c.last_seq - SNAPSHOT_EVERY))
+            .order_by(TrajectoryEvent.enroll_id.asc(), TrajectoryEvent.seq.asc())
+            .with_for_update()
+            .all())
+    tails = {}
+    for row in rows:
+        tails.setdefault(row.enroll_id, []).append(row)
+    return tails
+
+
+def record_events(events):
+    """
+    record_event for many learners, reading their last events in one query.
+    Does not commit.
+
+    Parameters:
+        events: (enroll_id, polyline, x, y, kind, previous) tuples.
+    """
+    if not events:
+        return
+    enroll_ids = {event[0] for event in events}
+    _lock(enroll_ids)
+    tails = _tails(enroll_ids)
+    at = _utc()
+    last = {}  # enroll_id -> (next seq, polyline, recorded_at)
+    for enroll_id, polyline, x, y, kind, previous in events:
+        if enroll_id not in last:
+            rows = tails.get(enroll_id)
+            if not rows or not any(row.is_snapshot for row in rows):
+                # no events yet (seeded) or no snapshot in the tail
+                record_event(enroll_id, polyline, x, y, kind, previous=previous)
+                continue
+            last[enroll_id] = (rows[-1].seq + 1, _states(rows)[-1], rows[-1].recorded_at)
+        seq, state, last_at = last[enroll_id]
+        event_at = max(at, last_at) if last_at is not None else at
+        state = _append(enroll_id, seq, state, polyline, x, y, kind, None, event_at)
+        last[enroll_id] = (seq + 1, state, event_at)
+
+
+def rewrite_contributions(enroll_id, positions):
+    """
+    Replace the logged polylines and positions of re-graded contributions and
+    re-encode the events after them. Does not commit.
+
+    Parameters:
+        positions (dict): {contribution_id: (polyline, x, y)}
+
+    Returns:
+        np.ndarray: The polyline of the last event afterwards, or None when
+        the enrollment has no events.
+    """
+    _lock([enroll_id])
+    rows = (TrajectoryEvent.query.filter(TrajectoryEvent.enroll_id == enroll_id)
+            .order_by(TrajectoryEvent.seq.asc()).with_for_update().all())
+    states = _states(rows)
+    first = next((i for i, row in enumerate(rows) if row.contribution_id in positions), None)
+    if first is None:
+        return states[-1] if states else None
+    previous = states[first - 1] if first else None
+    for row, state in zip(rows[first:], states[first:]):
+        if row.contribution_id in positions:
+            state, x, y = positions[row.contribution_id]
+            row.x_coordinate = float(x)
+            row.y_coordinate = float(y)
+        elif state is None:
+            previous = None
+            continue
+        row.is_snapshot, row.payload, previous = _encode(row.seq, previous, state)
+    return previous
+
+
+def _event_dict(row, state, with_polyline=True) -> dict:
+    event = {
+        "seq": row.seq,
+        "recorded_at": row.recorded_at.isoformat() if row.recorded_at else None,
+        "kind": row.kind,
+        "contribution_id": row.contribution_id,
+        "x": float(row.x_coordinate) if row.x_coordinate is not None else None,
+        "y": float(row.y_coordinate) if row.y_coordinate is not None else None,
+    }
+    if with_polyline:
+        event["polyline"] = state.tolist() if state is not None else None
+    return event
+
+
+def trajectory(enroll_id, kinds=None) -> list:
+    """
+    The learner's full path (one read), oldest first, optionally only the
+    events of the given kinds.
+    """
+    rows = (TrajectoryEvent.query.filter(TrajectoryEvent.enroll_id == enroll_id)
+            .order_by(TrajectoryEvent.seq.asc()).all())
+    return [_event_dict(row, state) for row, state in zip(rows, _states(rows))
+            if kinds is None or row.kind in kinds]
+
+
+def contribution_path(enroll_id):
+    """
+    /enrolledPolylines from the log: the polyline before the learner's first
+    contribution, then the polyline after each contribution (what the
+    contribution rows' prev_polyline / polyline give); [] without
+    contributions. None when nothing is logged, or the log does not have the
+    position before the first contribution.
+    """
+    path = trajectory(enroll_id)
+    if not path:
+        return None
+    contributions = [i for i, event in enumerate(path) if event["contribution_id"] is not None]
+    if not contributions:
+        return []
+    if contributions[0] == 0:
+        return None
+    return [path[contributions[0] - 1]["polyline"]] + [path[i]["polyline"] for i in contributions]
+
+
+def position_at(enroll_id, at, with_polyline=False):
+    """
+    The learner's last event at or before `at`, or None. Without the
+    polyline this reads one row; with it, the rows back to a snapshot.
+    """
+    if not with_polyline:
+        row = (TrajectoryEvent.query
+               .filter(TrajectoryEvent.enroll_id == enroll_id, TrajectoryEvent.recorded_at <= _utc(at))
+               .order_by(TrajectoryEvent.recorded_at.desc(), TrajectoryEvent.seq.desc())
+               .first())
+        return _event_dict(row, None, with_polyline=False) if row is not None else None
+    rows = _window(enroll_id, at)
+    if not rows:
+        return None
+    return _event_dict(rows[-1], _states(rows)[-1])
@@ -1,6 +1,4 @@
 import numpy as np
-import math
-import heapq
 
 
 def convert_to_lists(data):
@@ -55,22 +53,6 @@ def calculate_centroid(polylines):
     return centroid.tolist()
 
 
-def two_polyline_distance(point1, point2):
-    if len(point1) != len(point2):
-        raise ValueError("Points must have the same dimensions")
-
-    return math.sqrt(sum((p2 - p1) ** 2 for p1, p2 in zip(point1, point2)))
-
-
-def nearest_seven(learner_polyline, resources_id_polylines):
-    top7 = []
-    for id_polyline in resources_id_polylines:
-        distance = two_polyline_distance(learner_polyline, id_polyline[1])
-        heapq.heappush(top7, (-distance, id_polyline[0]))
-        if len(top7) > 7:
-            heapq.heappop(top7)
-    return [id[1] for id in top7]
-
 def calculate_distance(pos1, pos2):
         return np.sqrt((pos1[0] - pos2[0]) ** 2 + (pos1[1] - pos2[1]) ** 2)
 
@@ -0,0 +1,166 @@
+# vector_codec.py
+#
+# Binary storage for polyline and embedding columns. A value is a packed
+# little-endian vector behind an 8-byte header:
+#   b"NV" | format version (uint8) | reserved (uint8) | dimension (uint32)
+# Version 1 holds float32 values (embeddings, resource polylines); version 2
+# holds float64 values, used for learner polylines so they round-trip exactly
+# as the JSON floats did. Reads return read-only numpy arrays over the
+# fetched bytes (no copy).
+# Rows still holding the old JSON text (float lists, [{x, y}] dicts, nested
+# lists from json.dumps(learner_polylines)) decode as well, so the columns
+# are converted online with `flask pack-vectors`.
+
+import json
+import struct
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+MAGIC = b"NV"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<2sBxI")
+DTYPE = np.dtype("<f4")
+DTYPE_F64 = np.dtype("<f8")
+# format version -> payload dtype
+DTYPES = {FORMAT_VERSION: DTYPE, 2: DTYPE_F64}
+VERSIONS = {dtype: version for version, dtype in DTYPES.items()}
+
+
+def is_packed(value) -> bool:
+    return isinstance(value, (bytes, bytearray, memoryview)) and bytes(value[:2]) == MAGIC
+
+
+def _legacy_values(value) -> list:
+    # JSON text / parsed JSON of any of the old layouts -> flat list of numbers
+    while isinstance(value, (bytes, bytearray, memoryview, str)):
+        if not isinstance(value, str):
+            value = bytes(value).decode("utf-8")
+        value = json.loads(value) if value.strip() else []
+    if isinstance(value, dict):
+        return [value["y"]]
+    if isinstance(value, (list, tuple)):
+        flat = []
+        for item in value:
+            if isinstance(item, (list, tuple, dict, str)):
+                flat.extend(_legacy_values(item))
+            else:
+                flat.append(item)
+        return flat
+    return [value]
+
+
+def packed_dtype(value):
+    """
+    Payload dtype of a packed value, or None for anything else.
+    """
+    if not is_packed(value) or len(value) < HEADER.size:
+        return None
+    return DTYPES.get(HEADER.unpack_from(value)[1])
+
+
+def pack_vector(values, dtype=DTYPE) -> bytes:
+    """
+    Header + `dtype` (float32 or float64) payload of a vector (list, array,
+    packed value, or legacy JSON text). Nested values are flattened; {x, y}
+    dicts contribute their y.
+    """
+    dtype = np.dtype(dtype)
+    if is_packed(values):
+        if packed_dtype(values) == dtype:
+            return bytes(values)
+        values = unpack_vector(values)
+    if not isinstance(values, np.ndarray):
+        values = _legacy_values(values)
+    array = np.ascontiguousarray(np.asarray(values, dtype=dtype).reshape(-1))
+    return HEADER.pack(MAGIC, VERSIONS[dtype], len(array)) + array.tobytes()
+
+
+def unpack_vector(blob) -> np.ndarray:
+    """
+    Read-only array (float32 or float64, as stored) over a packed value (no copy).
+    """
+    if len(blob) < HEADER.size:
+        raise ValueError("Packed vector is shorter than its header")
+    magic, version, dim = HEADER.unpack_from(blob)
+    dtype = DTYPES.get(version)
+    if magic != MAGIC or dtype is None:
+        raise ValueError(f"Unknown packed vector header {magic!r} v{version}")
+    if len(blob) != HEADER.size + dim * dtype.itemsize:
+        raise ValueError(f"Packed vector of dimension {dim} has {len(blob)} bytes")
+    return np.frombuffer(blob, dtype=dtype, count=dim, offset=HEADER.size)
+
+
+def decode_vector(value, dtype=DTYPE):
+    """
+    Stored value -> array, or None. Packed values keep their stored dtype;
+    legacy JSON is read as `dtype`.
+    """
+    if value is None:
+        return None
+    if isinstance(value, np.ndarray):
+        return value
+    if is_packed(value):
+        return unpack_vector(value)
+    return np.asarray(_legacy_values(value), dtype=dtype)
+
+
+class PackedVector(TypeDecorator):
+    """
+    Column of packed vectors, float32 by default (`dtype` "<f8" for float64).
+    Accepts lists, arrays and legacy JSON on write; returns numpy arrays on
+    read.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, dtype=DTYPE):
+        super().__init__()
+        self.dtype = np.dtype(dtype)
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return pack_vector(value, self.dtype)
+
+    def process_result_value(self, value, dialect):
+        # a value that cannot be decoded raises: reading it as None would let
+        # the next write replace the stored polyline or embedding
+        return decode_vector(value, self.dtype)
+
+    def compare_values(self, x, y):
+        if x is None or y is None:
+            return x is y
+        try:
+            return np.array_equal(decode_vector(x, self.dtype), decode_vector(y, self.dtype))
+        except (ValueError, KeyError, TypeError):
+            return False
+
+
+def json_default(o):
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if isinstance(o, np.generic):
+        return o.item()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def json_dumps(obj, **kwargs) -> str:
+    """
+    json.dumps that also writes numpy arrays and scalars (JSON columns).
+    """
+    return json.dumps(obj, default=json_default, **kwargs)
+
+
+class NumpyJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that writes numpy arrays and scalars as lists / numbers.
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (np.ndarray, np.generic)):
+            return json_default(o)
+        return DefaultJSONProvider.default(o)
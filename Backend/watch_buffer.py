@@ -0,0 +1,226 @@
+# watch_buffer.py
+#
+# Coalescing buffer in front of repository.update_positions_resources for
+# resource-watch events. With NAVIGATED_WATCH_COALESCE_MS > 0, /watchResource
+# calls arriving within that window (across all request threads) are applied
+# as one flush by a background thread: the learners' deltas are summed
+# together, positions and unlocks are updated in bulk and there is a single
+# commit. Every caller still gets its learner's position, after all events of
+# the flush. By default each call is its own flush, run inline.
+# POST /watchResource/batch flushes a client-side batch directly.
+# Flush latencies are reported by /health/watch-buffer.
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from dbModels import db
+from init import app
+from repository import update_positions_resources
+
+COALESCE_MS = float(os.environ.get("NAVIGATED_WATCH_COALESCE_MS", "0"))
+MAX_EVENTS = int(os.environ.get("NAVIGATED_WATCH_MAX_EVENTS", "1000"))
+REQUEST_TIMEOUT = float(os.environ.get("NAVIGATED_WATCH_TIMEOUT", "30"))
+
+# flush latencies kept for the percentiles in watch_buffer_stats
+LATENCY_WINDOW = 1000
+
+
+class FlushStats:
+    """
+    Counters and recent latencies of watch-event flushes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.events = 0
+        self.enrollments = 0
+        self.skipped = 0
+        self.total_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, events, enrollments, skipped, seconds):
+        with self._lock:
+            self.flushes += 1
+            self.events += events
+            self.enrollments += enrollments
+            self.skipped += skipped
+            self.total_flush_seconds += seconds
+            self.max_flush_seconds = max(self.max_flush_seconds, seconds)
+            self.recent.append(seconds)
+
+    def record_failure(self):
+        with self._lock:
+            self.failed_flushes += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            recent = np.array(self.recent) * 1000
+            return {
+                'flushes': self.flushes,
+                'failed_flushes': self.failed_flushes,
+                'events': self.events,
+                'enrollments': self.enrollments,
+                'skipped_events': self.skipped,
+                'mean_events_per_flush': round(self.events / self.flushes, 2) if self.flushes else None,
+                'mean_flush_ms': round(1000 * self.total_flush_seconds / self.flushes, 2) if self.flushes else None,
+                'p50_flush_ms': round(float(np.percentile(recent, 50)), 2) if len(recent) else None,
+                'p95_flush_ms': round(float(np.percentile(recent, 95)), 2) if len(recent) else None,
+                'max_flush_ms': round(1000 * self.max_flush_seconds, 2) if self.flushes else None,
+            }
+
+
+flush_stats = FlushStats()
+
+
+def flush(events):
+    """
+    Apply (enroll_id, resource_id) watch events now, in one transaction.
+
+    Returns:
+        tuple: ({enroll_id: [x, y]}, skipped pairs, flush seconds)
+    """
+    started = time.perf_counter()
+    try:
+        positions, skipped = update_positions_resources(events)
+    except Exception:
+        db.session.rollback()
+        flush_stats.record_failure()
+        raise
+    seconds = time.perf_counter() - started
+    flush_stats.record(len(events), len(positions), len(skipped), seconds)
+    return positions, skipped, seconds
+
+
+class _Event:
+    __slots__ = ('enroll_id', 'resource_id', 'future', 'enqueued_at')
+
+    def __init__(self, enroll_id, resource_id):
+        self.enroll_id = int(enroll_id)
+        self.resource_id = int(resource_id)
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class WatchBuffer:
+    """
+    Gathers watch events for up to max_wait_ms (or max_events) and flushes
+    them together on one background thread.
+    """
+
+    def __init__(self, max_wait_ms: float = COALESCE_MS, max_events: int = MAX_EVENTS):
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_events = max_events
+        self._events = queue.Queue()
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.max_queue_depth = 0
+        self.total_wait_seconds = 0.0
+
+    def start(self):
+        threading.Thread(target=self._flush_loop, daemon=True).start()
+        print(f"[watch_buffer] coalescing watch events for {self.max_wait * 1000:.1f}ms, "
+              f"max {self.max_events} per flush")
+
+    def submit(self, enroll_id, resource_id) -> Future:
+        event = _Event(enroll_id, resource_id)
+        self._events.put(event)
+        with self._lock:
+            self.submitted += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._events.qsize())
+        return event.future
+
+    def _flush_loop(self):
+        while True:
+            pending = [self._events.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(pending) < self.max_events:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._events.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            started = time.perf_counter()
+            with self._lock:
+                self.total_wait_seconds += sum(started - e.enqueued_at for e in pending)
+            try:
+                with app.app_context():
+                    positions, skipped, _ = flush([(e.enroll_id, e.resource_id) for e in pending])
+            except Exception as e:
+                print(f"ERROR: Failed to flush {len(pending)} watch events -> {e}")
+                for event in pending:
+                    event.future.set_exception(e)
+                continue
+
+            skipped = set(skipped)
+            for event in pending:
+                if (event.enroll_id, event.resource_id) in skipped:
+                    event.future.set_exception(IndexError(
+                        f"Unknown enrollment {event.enroll_id} or resource {event.resource_id}"))
+                else:
+                    event.future.set_result(positions[event.enroll_id])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'coalesce_ms': self.max_wait * 1000,
+                'max_events': self.max_events,
+                'queue_depth': self._events.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'submitted': self.submitted,
+                'mean_queue_wait_ms': round(1000 * self.total_wait_seconds / self.submitted, 2) if self.submitted else None,
+            }
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_watch_buffer():
+    """
+    The process-wide buffer, started on first use; None when
+    NAVIGATED_WATCH_COALESCE_MS is 0 (events are flushed inline).
+    """
+    global _buffer
+    if COALESCE_MS <= 0:
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                buffer = WatchBuffer()
+                buffer.start()
+                _buffer = buffer
+    return _buffer
+
+
+def watch_resource(enroll_id, resource_id):
+    """
+    [x, y] of the learner after watching the resource (and whatever else
+    was flushed with it). Raises IndexError for unknown ids.
+    """
+    buffer = get_watch_buffer()
+    if buffer is None:
+        positions, skipped, _ = flush([(enroll_id, resource_id)])
+        if skipped:
+            raise IndexError(f"Unknown enrollment {enroll_id} or resource {resource_id}")
+        return positions[int(enroll_id)]
+    return buffer.submit(enroll_id, resource_id).result(timeout=REQUEST_TIMEOUT)
+
+
+def watch_buffer_stats() -> dict:
+    stats = {'mode': 'inline' if COALESCE_MS <= 0 else ('buffered' if _buffer is not None else 'not started')}
+    if _buffer is not None:
+        stats.update(_buffer.stats())
+    stats.update(flush_stats.as_dict())
+    return stats
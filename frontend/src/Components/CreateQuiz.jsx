@@ -6,7 +6,7 @@ import RemoveCircleIcon from '@mui/icons-material/RemoveCircle';
 import { useNavigate } from 'react-router-dom';
 import QuestionMarkIcon from '@mui/icons-material/QuestionMark';
 
-import { getResponsePost, getResponseGet } from "../lib/utils";
+import { getResponsePost, getResponseGet, waitForJob } from "../lib/utils";
 
 const CreateQuiz = () => {
   const navigate = useNavigate();
@@ -198,11 +198,14 @@ const CreateQuiz = () => {
         total_questions: quizData.questions.length,
       };
 
-      const response = await getResponsePost("/createquiz", transformedQuizData);
+      const response = await waitForJob(await getResponsePost("/createquiz", transformedQuizData));
 
       // Assuming the response contains 'message', 'x', and 'y' in the format:
       // const response = await apiSubmitQuiz(formData);
 
+      if (!response?.data || response.data.error) {
+        throw new Error(response?.data?.error || 'Quiz creation failed');
+      }
       const { message, x, y } = response.data; // Adjust this based on your response structure
 
       // Truncate coordinates to 3 decimal places
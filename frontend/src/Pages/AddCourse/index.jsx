@@ -7,7 +7,7 @@ import CourseForm from "./components/CourseForm";
 import './css/AddCourse.css';
 import { Button, Modal, Spinner } from "react-bootstrap";
 import { useNavigate } from "react-router-dom";
-import { getResponsePost } from "../../lib/utils";
+import { getResponsePost, waitForJob } from "../../lib/utils";
 import { getWordCount } from '../../lib/utils';
 
 const AddCourse = () => {
@@ -140,7 +140,7 @@ const AddCourse = () => {
                 })),
             };
             console.log(topicsData);
-            const resTopics = await getResponsePost('/new-course-topics', topicsData);
+            const resTopics = await waitForJob(await getResponsePost('/new-course-topics', topicsData));
             if (resTopics.status !== 201) {
                 throw new Error("Failed topic mapping: " + (res.data?.error ?? "Server error"));
             }
@@ -3,7 +3,7 @@
 // associated learners.
 import { useEffect, useState } from "react";
 import { Form, Modal, Button, Placeholder } from "react-bootstrap";
-import { getResponseGet, getResponsePost } from "../../../lib/utils";
+import { getResponseGet, getResponsePost, waitForJob } from "../../../lib/utils";
 import CustomFileInput from "../../../Components/CustomFileInput";
 
 const AddResource = ({ show, onHide, courseId, onSuccess }) => {
@@ -78,9 +78,9 @@ const AddResource = ({ show, onHide, courseId, onSuccess }) => {
             formData.append("type", resType);
             formData.append("module", topics[topicIdx].name);
             formData.append("pdf_file", pdfFile);
-            res = await getResponsePost("/upload-pdf-resource",
+            res = await waitForJob(await getResponsePost("/upload-pdf-resource",
                 formData, { "Content-Type": "multipart/form-data" }
-            );
+            ));
         } else if (isYtRes()) {
             const data = {
                 name: resName,
@@ -90,9 +90,9 @@ const AddResource = ({ show, onHide, courseId, onSuccess }) => {
                 link: ytLink,
                 module: topics[topicIdx].name,
             };
-            res = await getResponsePost("/new-resources-topics",
+            res = await waitForJob(await getResponsePost("/new-resources-topics",
                 data, { 'Content-Type': 'application/json' }
-            );
+            ));
         }
         if (res && res.status === 201) {
             setSubmitMessage("Resource Mapped Successfully!");
@@ -1,7 +1,8 @@
 // This utility file provides functions for making HTTP requests using the configured Axios instance (api). 
 // It includes getResponsePost, getResponseGet, getResponseDelete, and getResponsePut for different HTTP methods, 
 // handling potential 404 errors by clearing local storage and reloading. The syncUserIds function fetches and stores
-// learner, teacher, and TA IDs. A getWordCount function calculates the number of words in a string.
+// learner, teacher, and TA IDs. waitForJob polls background jobs
+// started by 202 responses, with a deadline. A getWordCount function calculates the number of words in a string.
 // import React from "react";
 import api from "./axios";
 
@@ -29,6 +30,53 @@ export const getResponsePost = async (url, data, headers) => {
     }
 };
 
+// Heavy ingestion endpoints answer 202 with a job id; poll /jobs/<id> until the job
+// finishes and return an axios-like { status, data } built from the job result.
+// Gives up with { status, data: { error } } when the job is unknown (404), when
+// polling keeps failing, or after timeoutMs (504). A job still queued at the
+// deadline means no job worker is running (see the Backend setup in README.md).
+const MAX_FAILED_POLLS = 5;
+
+export const waitForJob = async (response, intervalMs = 1000, timeoutMs = 10 * 60 * 1000) => {
+    if (response?.status !== 202 || !response.data?.job_id) return response;
+    const jobId = response.data.job_id;
+    const deadline = Date.now() + timeoutMs;
+    let job = null;
+    let failedPolls = 0;
+    while (Date.now() < deadline) {
+        await new Promise((resolve) => setTimeout(resolve, intervalMs));
+        let res;
+        try {
+            res = await api.get('/jobs/' + jobId);
+        } catch (err) {
+            res = err?.response;
+        }
+        if (res?.status === 404) {
+            return { status: 404, data: { error: 'Job ' + jobId + ' not found' }, job };
+        }
+        if (res?.status !== 200 || !res.data?.status) {
+            failedPolls += 1;
+            if (failedPolls >= MAX_FAILED_POLLS) {
+                return {
+                    status: res?.status || 503,
+                    data: { error: 'Could not get the status of job ' + jobId },
+                    job,
+                };
+            }
+            continue;
+        }
+        failedPolls = 0;
+        job = res.data;
+        if (job.status === 'succeeded' || job.status === 'failed') {
+            return { status: job.http_status, data: job.result ?? {}, job };
+        }
+    }
+    const error = job?.status === 'queued'
+        ? 'Job ' + jobId + ' was never picked up; is a job worker running (python app.py or flask job-worker)?'
+        : 'Job ' + jobId + ' did not finish in time';
+    return { status: 504, data: { error }, job };
+};
+
 export const getResponseGet = async (url, headers, params) => {
     try {
         const response = await api.get(url, {